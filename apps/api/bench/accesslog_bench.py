@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+ACCESS LOG BENCHMARK - per-request cost of request logging on the event loop
+Drives a trivial FastAPI route in-process over ASGI (no sockets) with:
+  none      no logging middleware
+  emoji     server.py's old @app.middleware("http"): millisecond request ID,
+            X-Request-ID / X-Process-Time and one logger.info line per request
+  json      AccessLogMiddleware with the batched JSON access log
+
+    python bench/accesslog_bench.py
+    python bench/accesslog_bench.py --requests 50000 --concurrency 64 --out /tmp/access.log
+
+Log output goes to --out (default /dev/null) so terminal speed does not count.
+Reports microseconds per request and, for the old scheme, how many request
+IDs collided; "json" also reports the queue's own stats.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'lib'))
+
+from fastapi import FastAPI, Request  # noqa: E402
+
+from callwaiting_common.accesslog import AccessLog, AccessLogMiddleware  # noqa: E402
+
+
+def make_app(kind: str, out, ids: list) -> Tuple[FastAPI, Optional[AccessLog]]:
+    app = FastAPI()
+    log = None
+
+    @app.get("/api/ping")
+    async def ping(request: Request):
+        ids.append(request.state.request_id if kind != 'none' else None)
+        return {"ok": True}
+
+    if kind == 'emoji':
+        logger = logging.getLogger('bench.emoji')
+        logger.propagate = False
+        handler = logging.StreamHandler(out)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        logger.handlers = [handler]
+        logger.setLevel(logging.INFO)
+
+        @app.middleware("http")
+        async def add_request_id(request: Request, call_next):
+            request_id = f"req_{int(time.time() * 1000)}"
+            request.state.request_id = request_id
+            start_time = time.time()
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            response.headers["X-Request-ID"] = request_id
+            response.headers["X-Process-Time"] = str(process_time)
+            logger.info(f"📥 {request.method} {request.url.path} [{request_id}] - "
+                        f"{response.status_code} - {process_time:.3f}s")
+            return response
+    elif kind == 'json':
+        log = AccessLog(stream=out, fields={'service': 'bench'})
+        app.add_middleware(AccessLogMiddleware, log=log)
+    return app, log
+
+
+async def call(app, path: str = '/api/ping'):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def bench(kind: str, args) -> Dict[str, Any]:
+    ids: list = []
+    with open(args.out, 'a', encoding='utf-8') as out:
+        app, log = make_app(kind, out, ids)
+        if log is not None:
+            log.start()
+        for _ in range(200):
+            await call(app)
+        ids.clear()
+        remaining = iter(range(args.requests))
+
+        async def client():
+            for _ in remaining:
+                await call(app)
+                # Stands in for the socket read a real request waits on; lets the log writer run
+                await asyncio.sleep(0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        report = {
+            'us_per_request': round(elapsed / args.requests * 1e6, 2),
+            'requests_per_second': round(args.requests / elapsed, 1),
+        }
+        if kind != 'none':
+            report['duplicate_ids'] = len(ids) - len(set(ids))
+        if log is not None:
+            await log.stop()
+            report['access_log'] = log.stats()
+    return report
+
+
+async def main_async(args) -> Dict[str, Any]:
+    return {kind: await bench(kind, args) for kind in ('none', 'emoji', 'json')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--out', default=os.devnull)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    base = results['none']['us_per_request']
+    for kind, report in results.items():
+        line = (f"{kind:<6} {report['us_per_request']:>9} µs/req  (+{report['us_per_request'] - base:.2f} µs)  "
+                f"{report['requests_per_second']:>10} req/s")
+        if 'duplicate_ids' in report:
+            line += f"  {report['duplicate_ids']} duplicate IDs"
+        if 'access_log' in report:
+            stats = report['access_log']
+            line += (f"  record {stats['record_us_avg']} µs, {stats['batches']} batches, "
+                     f"{stats['write_ms_per_batch']} ms/batch, {stats['dropped']} dropped")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+CALL STATS BENCHMARK - dashboard queries from pre-aggregates against a log scan
+Loads --calls calls for one merchant, spread over --days days, into a SQLite
+call_log, builds the hourly and daily buckets from it (the rebuild path),
+then answers the same random ranges two ways:
+
+  scan        one SUM(CASE ...) over call_log rows in the range, the query a
+              dashboard would run on call_logs without pre-aggregation
+  buckets     CallStats.summary: daily buckets for whole days, hourly ones
+              for the edges
+
+    python bench/callstats_bench.py
+    python bench/callstats_bench.py --calls 1000000 --days 365 --queries 200
+
+Also reports incremental recording: call events per second through
+CallStats.record, each a transaction that updates the call and two buckets.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from callwaiting_api.callstats import CallStats, CALL_FIELDS, DAY, HOUR  # noqa: E402
+from callwaiting_api.storage import SQLiteStore  # noqa: E402
+
+MERCHANT = 'bench-merchant'
+
+# The scan a dashboard would run per load without pre-aggregates
+SCAN = """SELECT COUNT(*),
+    SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN status IN ('busy', 'no-answer', 'failed') THEN 1 ELSE 0 END),
+    SUM(CASE WHEN converted = 1 OR ai_response_type IN ('appointment', 'order') THEN 1 ELSE 0 END),
+    SUM(revenue_kobo)
+    FROM call_log WHERE merchant_id = ? AND direction = 'inbound'
+    AND status IN ('completed', 'busy', 'no-answer', 'failed') AND started_at >= ? AND started_at < ?"""
+
+
+def make_calls(count: int, start: int, days: int, rng: random.Random):
+    for i in range(count):
+        status = rng.choices(['completed', 'no-answer', 'busy', 'failed', 'ringing'], [60, 25, 8, 5, 2])[0]
+        ai = rng.choice([None, 'greeting', 'appointment', 'order', 'hold'])
+        started = start + rng.randint(0, days * DAY - 1)
+        yield (MERCHANT, f'CA{i:09d}', f'+23480{i % 100000000:08d}', 'inbound', status, rng.randint(0, 600), ai,
+               int(rng.random() < 0.05), rng.choice([0, 0, 0, 250000]), started, started)
+
+
+async def load(store: SQLiteStore, args, start: int) -> float:
+    insert = (f"INSERT INTO call_log (merchant_id, {', '.join(CALL_FIELDS)}) "
+              f"VALUES ({', '.join('?' * (len(CALL_FIELDS) + 1))})")
+
+    def bulk(connection):
+        connection.execute("BEGIN")
+        connection.executemany(insert, make_calls(args.calls, start, args.days, random.Random(1)))
+        connection.execute("COMMIT")
+        # Without this index the scan has to read every call; give it its best chance
+        connection.execute("CREATE INDEX IF NOT EXISTS bench_call_log_started ON call_log (merchant_id, started_at)")
+
+    started = time.perf_counter()
+    await store._run('bench_load', bulk)
+    return time.perf_counter() - started
+
+
+def ranges(count: int, start: int, days: int, rng: random.Random) -> List[Tuple[int, int]]:
+    result = []
+    for _ in range(count):
+        length = rng.choice([1, 7, 30, 90]) * DAY + rng.randint(0, 23) * HOUR
+        begin = start + rng.randint(0, max(1, days * DAY - length)) // HOUR * HOUR
+        result.append((begin, begin + length))
+    return result
+
+
+async def timed(queries, run) -> Dict[str, Any]:
+    started = time.perf_counter()
+    results = [await run(a, b) for a, b in queries]
+    elapsed = time.perf_counter() - started
+    return {'ms_per_query': round(elapsed / len(queries) * 1000, 3), 'results': results}
+
+
+async def main_async(args) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix='callstats-bench-')
+    store = SQLiteStore(os.path.join(workdir, 'bench.db'))
+    await store.open()
+    stats = CallStats(store)
+    start = 1735686000 - args.days * DAY
+    try:
+        load_s = await load(store, args, start)
+        rebuilt = await stats.rebuild(MERCHANT)
+        queries = ranges(args.queries, start, args.days, random.Random(2))
+
+        async def scan(a, b):
+            row = await store._run('scan', lambda c: c.execute(SCAN, (MERCHANT, a, b)).fetchone())
+            return [value or 0 for value in row]
+
+        async def buckets(a, b):
+            d = await stats.summary(MERCHANT, a, b)
+            return [d['totalCalls'], d['answeredCalls'], d['missedCalls'], d['conversions'],
+                    round(d['revenueSaved'] * 100)]
+
+        scanned, bucketed = await timed(queries, scan), await timed(queries, buckets)
+        mismatches = sum(1 for x, y in zip(scanned.pop('results'), bucketed.pop('results')) if x != y)
+
+        events = random.Random(3)
+        started = time.perf_counter()
+        for i in range(args.events):
+            await stats.record(MERCHANT, {'call_sid': f'EV{i % (args.events // 2 or 1)}', 'direction': 'inbound',
+                                          'status': events.choice(['ringing', 'completed', 'no-answer']),
+                                          'started_at': start + events.randint(0, args.days * DAY - 1),
+                                          'updated_at': None})
+        record_s = time.perf_counter() - started
+        return {
+            'calls': args.calls,
+            'load_s': round(load_s, 2),
+            'rebuild': rebuilt,
+            'scan': scanned,
+            'buckets': bucketed,
+            'mismatches': mismatches,
+            'events_per_second': round(args.events / record_s, 1),
+        }
+    finally:
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    rebuild = results['rebuild']
+    print(f"{results['calls']} calls loaded in {results['load_s']} s; rebuilt into {rebuild['buckets']} buckets "
+          f"in {rebuild['elapsed_ms']} ms")
+    print(f"scan     {results['scan']['ms_per_query']:>10} ms/query")
+    print(f"buckets  {results['buckets']['ms_per_query']:>10} ms/query   {results['mismatches']} mismatches")
+    print(f"record   {results['events_per_second']:>10} events/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+INTENT BENCHMARK - messages per second against intent tables of growing size
+Compares the compiled word automaton (callwaiting_api/intents.py) with the
+if-chain it replaced, generalized to a table: lowercase the message, then
+test `pattern in message` for every pattern of every intent in turn.
+
+    python bench/intent_bench.py
+    python bench/intent_bench.py --intents 100,1000,5000 --messages 20000
+
+Tables are synthetic: each intent has --patterns phrases of one to three
+words drawn from a shared vocabulary, and messages mix vocabulary words with
+filler. Both matchers see the same messages. The default table is checked
+first for substring false positives such as "hi" inside "this".
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from callwaiting_api.intents import IntentMatcher, DEFAULT_INTENTS_PATH, load_default_table, validate_table  # noqa: E402
+
+FILLER = "the a is it can you we our my please what when how do does to for and of on with this which".split()
+
+# Messages where a pattern occurs only inside another word
+SUBSTRING_TRAPS = ["Is this open on Sunday?", "Which one should I pick?", "Thanks, that's everything",
+                   "Nothing works for me", "Who's calling me?"]
+
+
+class SubstringChain:
+    """get_fallback_response's approach over a whole table: first intent with a substring hit"""
+
+    def __init__(self, table: Dict[str, Any]):
+        self.intents = [(row['name'], [p.lower() for p in row['patterns']]) for row in table['intents']]
+
+    def match(self, message: str):
+        lower = message.lower()
+        for name, patterns in self.intents:
+            for pattern in patterns:
+                if pattern in lower:
+                    return name
+        return None
+
+
+def make_table(intents: int, patterns: int, rng: random.Random) -> Dict[str, Any]:
+    vocabulary = [f"w{i}" for i in range(max(200, intents * 2))]
+    rows = []
+    for index in range(intents):
+        phrases = {' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))) for _ in range(patterns)}
+        rows.append({'name': f"intent{index}", 'patterns': sorted(phrases), 'reply': f"reply {index}",
+                     'priority': rng.randint(0, 3)})
+    return {'table': validate_table({'intents': rows, 'fallback': 'fallback'}), 'vocabulary': vocabulary}
+
+
+def make_messages(vocabulary: List[str], count: int, rng: random.Random) -> List[str]:
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(vocabulary) if rng.random() < 0.3 else rng.choice(FILLER)
+                 for _ in range(rng.randint(4, 20))]
+        messages.append(' '.join(words) + '?')
+    return messages
+
+
+def rate(match, messages: List[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    matched = sum(1 for message in messages if match(message))
+    elapsed = time.perf_counter() - started
+    return {'messages_per_second': round(len(messages) / elapsed, 1),
+            'us_per_message': round(elapsed / len(messages) * 1e6, 2),
+            'matched_fraction': round(matched / len(messages), 3)}
+
+
+def false_positives() -> Dict[str, Any]:
+    table = load_default_table(DEFAULT_INTENTS_PATH)
+    chain, automaton = SubstringChain(table), IntentMatcher(table)
+    return {message: {'substring': chain.match(message),
+                      'automaton': getattr(automaton.match(message).intent, 'name', None)}
+            for message in SUBSTRING_TRAPS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--intents', default='10,100,1000,5000', help='comma-separated table sizes')
+    parser.add_argument('--patterns', type=int, default=5, help='phrases per intent')
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {'false_positives': false_positives(), 'sizes': {}}
+    for size in [int(s) for s in args.intents.split(',')]:
+        rng = random.Random(size)
+        generated = make_table(size, args.patterns, rng)
+        messages = make_messages(generated['vocabulary'], args.messages, rng)
+        matcher = IntentMatcher(generated['table'])
+        chain = SubstringChain(generated['table'])
+        results['sizes'][str(size)] = {
+            'build_ms': matcher.build_ms,
+            'states': matcher.states,
+            'automaton': rate(lambda m: matcher.match(m).intent, messages),
+            'substring_chain': rate(chain.match, messages),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for message, verdicts in results['false_positives'].items():
+        print(f"{message!r:32} substring -> {verdicts['substring']!s:10} automaton -> {verdicts['automaton']}")
+    print(f"\n{'intents':>8} {'states':>8} {'build ms':>9} {'automaton msg/s':>16} {'µs':>8} "
+          f"{'substring msg/s':>16} {'µs':>9}")
+    for size, report in results['sizes'].items():
+        automaton, chain = report['automaton'], report['substring_chain']
+        print(f"{size:>8} {report['states']:>8} {report['build_ms']:>9} {automaton['messages_per_second']:>16} "
+              f"{automaton['us_per_message']:>8} {chain['messages_per_second']:>16} {chain['us_per_message']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+PHONE BENCHMARK - numbers per second through normalization and contact import
+Compares server.py's old validate_nigerian_phone + normalize_nigerian_phone
+(re imported and four patterns tried per call, then a second walk over the
+digits) with parse_phone, then streams a generated CSV through
+import_contacts into a MemoryStore in 64 KiB chunks.
+
+    python bench/phone_bench.py
+    python bench/phone_bench.py --numbers 200000 --duplicates 0.2 --invalid 0.05
+
+Numbers mix the formats merchants upload (+234, 234, 0803..., spaced and
+dashed); --duplicates and --invalid set the share of repeated and broken rows.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from callwaiting_api.phones import parse_phone  # noqa: E402
+from callwaiting_api.contacts import import_contacts  # noqa: E402
+from callwaiting_api.storage import MemoryStore  # noqa: E402
+
+PREFIXES = ['803', '806', '813', '703', '802', '808', '701', '805', '807', '809', '817', '903', '905', '915']
+FORMATS = ['+234{}', '234{}', '0{}', '{}', '+234 {0[0]}{0[1]}{0[2]} {0[3]}{0[4]}{0[5]} {0[6]}{0[7]}{0[8]}{0[9]}',
+           '0{0[0]}{0[1]}{0[2]}-{0[3]}{0[4]}{0[5]}-{0[6]}{0[7]}{0[8]}{0[9]}']
+
+
+def old_validate(phone: str) -> bool:
+    import re
+    patterns = [
+        r'^\+234[789][01]\d{8}$',
+        r'^234[789][01]\d{8}$',
+        r'^0[789][01]\d{8}$',
+        r'^[789][01]\d{8}$'
+    ]
+    return any(re.match(pattern, phone.replace(' ', '')) for pattern in patterns)
+
+
+def old_normalize(phone: str) -> str:
+    digits = ''.join(filter(str.isdigit, phone))
+    if digits.startswith('234'):
+        return '+' + digits
+    elif digits.startswith('0'):
+        return '+234' + digits[1:]
+    elif len(digits) == 10 and digits[0] in '789':
+        return '+234' + digits
+    return phone
+
+
+def old_parse(phone: str):
+    return old_normalize(phone) if old_validate(phone) else None
+
+
+def make_numbers(count: int, duplicates: float, invalid: float, rng: random.Random) -> List[str]:
+    numbers: List[str] = []
+    for _ in range(count):
+        roll = rng.random()
+        if numbers and roll < duplicates:
+            numbers.append(rng.choice(numbers))
+        elif roll < duplicates + invalid:
+            numbers.append(rng.choice(['12345', '0803123', 'n/a', '+1 415 555 0100', '0603 123 4567']))
+        else:
+            national = rng.choice(PREFIXES) + ''.join(rng.choice('0123456789') for _ in range(7))
+            numbers.append(rng.choice(FORMATS).format(national))
+    return numbers
+
+
+def rate(parse, numbers: List[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    valid = sum(1 for number in numbers if parse(number))
+    elapsed = time.perf_counter() - started
+    return {'numbers_per_second': round(len(numbers) / elapsed, 1),
+            'us_per_number': round(elapsed / len(numbers) * 1e6, 3), 'valid': valid}
+
+
+async def csv_import(numbers: List[str], chunk_size: int) -> Dict[str, Any]:
+    body = ('name,phone\n' + ''.join(f'"Customer {i}",{number}\n' for i, number in enumerate(numbers))).encode()
+
+    async def chunks():
+        for offset in range(0, len(body), chunk_size):
+            yield body[offset:offset + chunk_size]
+
+    report = await import_contacts(MemoryStore(), 'bench', chunks(), max_bytes=len(body))
+    report['errors'] = len(report['errors'])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--numbers', type=int, default=50000)
+    parser.add_argument('--duplicates', type=float, default=0.1)
+    parser.add_argument('--invalid', type=float, default=0.02)
+    parser.add_argument('--chunk-kb', type=int, default=64)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    numbers = make_numbers(args.numbers, args.duplicates, args.invalid, random.Random(42))
+    mismatches = sum(1 for number in numbers
+                     if old_parse(number) != (parse_phone(number).e164 if parse_phone(number) else None))
+    results = {
+        'old': rate(old_parse, numbers),
+        'parse_phone': rate(parse_phone, numbers),
+        # Forms the old functions rejected or mangled ("+234 (0)803...", dashed) show up here
+        'disagreements': mismatches,
+        'csv_import': asyncio.run(csv_import(numbers, args.chunk_kb * 1024)),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name in ('old', 'parse_phone'):
+        r = results[name]
+        print(f"{name:<12} {r['numbers_per_second']:>12} numbers/s {r['us_per_number']:>8} µs  {r['valid']} valid")
+    print(f"{'':<12} {results['disagreements']} numbers parsed differently")
+    r = results['csv_import']
+    print(f"csv import   {r['numbers_per_second']:>12} numbers/s  {r['rows']} rows, {r['imported']} new, "
+          f"{r['duplicates']} duplicates, {r['invalid']} invalid, {r['bytes']} bytes in {r['elapsed_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
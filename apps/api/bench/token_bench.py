@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+TOKEN BENCHMARK - server-side memory per login and verify throughput
+Compares the old scheme (a SHA-256 "token" that is only a key into
+sessions_db, which holds a copy of the user per login and is never evicted)
+with signed self-contained tokens plus the revocation denylist
+
+    python bench/token_bench.py
+    python bench/token_bench.py --logins 100000 --verifies 200000 --revoked 0.05
+
+Memory is measured with tracemalloc over the logins (and, for signed tokens,
+over revoking --revoked of them); the issued tokens themselves are held by
+clients and are not counted.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tracemalloc
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from callwaiting_api.tokens import TokenSigner, TimerWheelDenylist  # noqa: E402
+
+
+def make_user(index: int) -> Dict[str, Any]:
+    return {
+        'id': f"user_{1700000000000 + index}_{index % 4096:03x}",
+        'email': f"merchant{index}@example.com",
+        'business_name': f"Merchant {index} Ltd",
+        'phone': f"+23480{index % 10 ** 8:08d}",
+        'industry': 'general',
+        'created_at': '2025-01-01T00:00:00',
+        'password_hash': 'x' * 64,
+    }
+
+
+class SessionDictScheme:
+    """server.py before signed tokens"""
+
+    name = 'session_dict'
+
+    def __init__(self):
+        self.sessions_db = {}
+
+    def login(self, user: Dict[str, Any], index: int) -> str:
+        payload = {'user_id': user['id'], 'email': user['email'], 'exp': int(time.time()) + 86400, 'n': index}
+        token = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        # Each session held its own copy of the user (a fresh dict per login, as a JSON round trip would make)
+        self.sessions_db[token] = {'user': dict(user), 'exp': int(time.time()) + 86400}
+        return token
+
+    def verify(self, token: str):
+        session = self.sessions_db.get(token)
+        return session['user'] if session and session['exp'] > int(time.time()) else None
+
+    def revoke(self, token: str):
+        self.sessions_db.pop(token, None)
+
+
+class SignedScheme:
+    """TokenSigner with the in-process timer-wheel denylist"""
+
+    name = 'signed'
+
+    def __init__(self):
+        self.signer = TokenSigner(b'bench-secret-' * 4, ttl_seconds=86400, denylist=TimerWheelDenylist(86400))
+
+    def login(self, user: Dict[str, Any], index: int) -> str:
+        return self.signer.issue(user)
+
+    def verify(self, token: str):
+        try:
+            return TokenSigner.user(self.signer.verify(token))
+        except Exception:
+            return None
+
+    def revoke(self, token: str):
+        self.signer.revoke(self.signer.verify(token))
+
+
+def bench(scheme, users: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    tokens = [scheme.login(user, i) for i, user in enumerate(users)]
+    login_seconds = time.perf_counter() - started
+    # Issued tokens live on clients; only what the server keeps counts
+    tokens_size = sum(sys.getsizeof(token) for token in tokens) + sys.getsizeof(tokens)
+    after_logins = tracemalloc.get_traced_memory()[0] - tokens_size
+
+    revoked = random.Random(7).sample(tokens, int(len(tokens) * args.revoked))
+    for token in revoked:
+        scheme.revoke(token)
+    after_revokes = tracemalloc.get_traced_memory()[0] - tokens_size
+    tracemalloc.stop()
+
+    rng = random.Random(11)
+    sample = [rng.choice(tokens) for _ in range(args.verifies)]
+    started = time.perf_counter()
+    valid = sum(1 for token in sample if scheme.verify(token) is not None)
+    verify_seconds = time.perf_counter() - started
+
+    return {
+        'logins_per_second': round(len(users) / login_seconds, 1),
+        'server_bytes_after_logins': after_logins - before,
+        'server_bytes_per_login': round((after_logins - before) / len(users), 1),
+        'server_bytes_after_revocations': after_revokes - before,
+        'revoked': len(revoked),
+        'verifies_per_second': round(args.verifies / verify_seconds, 1),
+        'verify_us': round(verify_seconds / args.verifies * 1e6, 2),
+        'valid_fraction': round(valid / args.verifies, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=50000)
+    parser.add_argument('--verifies', type=int, default=100000)
+    parser.add_argument('--revoked', type=float, default=0.02, help="fraction of tokens logged out")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    users = [make_user(i) for i in range(args.logins)]
+    results = {scheme.name: bench(scheme, users, args) for scheme in (SessionDictScheme(), SignedScheme())}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, report in results.items():
+        print(f"{name:<13} {report['server_bytes_per_login']:>8} B/login  "
+              f"{report['server_bytes_after_revocations'] / 1024:>9.1f} KiB after {report['revoked']} logouts  "
+              f"{report['verifies_per_second']:>10} verifies/s ({report['verify_us']} µs)  "
+              f"{report['logins_per_second']:>10} logins/s")
+
+
+if __name__ == '__main__':
+    main()
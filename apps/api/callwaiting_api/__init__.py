@@ -0,0 +1,3 @@
+"""
+CALLWAITING API - support modules for server.py
+"""
@@ -0,0 +1,255 @@
+"""
+CALL STATISTICS - dashboard counters pre-aggregated per merchant by hour and day
+Every call status event updates the call's row in the call log and, in the
+same store transaction, adds the change in that call's contribution (total,
+answered, missed, conversions, revenue saved) to its hourly and daily
+buckets. A call that moves from ringing to completed, or is re-sent, is
+counted once. A dashboard query for any range reads whole days from the
+daily buckets and the partial days at either end from the hourly ones, so
+it costs O(buckets) however many calls there were. Each merchant has a
+revision that goes up whenever a bucket changes; it is the ETag, so an
+unchanged dashboard costs one key lookup. The log and the buckets change in
+one transaction, so a crash never leaves them apart; rebuild() recomputes
+the buckets from the log anyway, e.g. after old calls are loaded into it.
+"""
+
+import os
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 86400
+
+CALL_FIELDS = ('call_sid', 'phone_number', 'direction', 'status', 'duration_seconds', 'ai_response_type',
+               'converted', 'revenue_kobo', 'started_at', 'updated_at')
+COUNTERS = ('total', 'answered', 'missed', 'conversions', 'revenue_kobo')
+
+# call_logs statuses (database/payment-schema.sql) after which a call is counted
+ANSWERED = frozenset(('completed',))
+MISSED = frozenset(('busy', 'no-answer', 'failed'))
+# AI outcomes that count as a conversion without an explicit converted flag
+CONVERTING_RESPONSES = frozenset(('appointment', 'order'))
+
+Counts = Tuple[int, int, int, int, int]
+_NOTHING: Counts = (0, 0, 0, 0, 0)
+
+
+def contribution(call: Optional[Dict[str, Any]]) -> Counts:
+    """What one call adds to its buckets: inbound calls in a final status only"""
+    if call is None or call['direction'] != 'inbound':
+        return _NOTHING
+    status = call['status']
+    if status not in ANSWERED and status not in MISSED:
+        return _NOTHING
+    converted = bool(call['converted']) or call['ai_response_type'] in CONVERTING_RESPONSES
+    return (1, int(status in ANSWERED), int(status in MISSED), int(converted), int(call['revenue_kobo'] or 0))
+
+
+def merge_call(old: Optional[Dict[str, Any]], event: Dict[str, Any]) -> Dict[str, Any]:
+    """The call's row after event; fields the event leaves out (None) keep their value"""
+    call = dict(old) if old else {field: None for field in CALL_FIELDS}
+    for field in CALL_FIELDS:
+        if event.get(field) is not None:
+            call[field] = event[field]
+    if old:
+        # The call stays in the bucket of its first event
+        call['started_at'] = old['started_at']
+    call['direction'] = call['direction'] or 'inbound'
+    call['converted'] = int(bool(call['converted']))
+    call['revenue_kobo'] = int(call['revenue_kobo'] or 0)
+    return call
+
+
+class StatsAccumulator:
+    """Buckets summed from whole call rows; used to rebuild from the log"""
+
+    def __init__(self, utc_offset: int):
+        self.utc_offset = utc_offset
+        self.calls = 0
+        self.buckets: Dict[Tuple[str, int], List[int]] = {}
+
+    def add(self, call: Dict[str, Any]):
+        self.calls += 1
+        counts = contribution(call)
+        if counts == _NOTHING:
+            return
+        for key in bucket_keys(call['started_at'], self.utc_offset):
+            totals = self.buckets.setdefault(key, [0] * len(COUNTERS))
+            for i, value in enumerate(counts):
+                totals[i] += value
+
+
+def day_start(ts: int, utc_offset: int) -> int:
+    """Epoch second of local midnight on ts's day"""
+    return (ts + utc_offset) // DAY * DAY - utc_offset
+
+
+def bucket_keys(started_at: int, utc_offset: int) -> Tuple[Tuple[str, int], Tuple[str, int]]:
+    return ('hour', started_at // HOUR * HOUR), ('day', day_start(started_at, utc_offset))
+
+
+def call_deltas(old: Optional[Dict[str, Any]], new: Dict[str, Any],
+                utc_offset: int) -> List[Tuple[str, int, Counts]]:
+    """(bucket, start, counter changes) that take the buckets from old's contribution to new's"""
+    before, after = contribution(old), contribution(new)
+    if before == after:
+        return []
+    delta = tuple(a - b for a, b in zip(after, before))
+    return [(bucket, start, delta) for bucket, start in bucket_keys(new['started_at'], utc_offset)]
+
+
+class InvalidRange(ValueError):
+    """Stats range that is empty, reversed or too long"""
+
+
+def parse_time(value: Optional[str], utc_offset: int) -> Optional[int]:
+    """Epoch seconds from epoch seconds or ISO 8601; a time without a zone is local"""
+    if value is None or value == '':
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise InvalidRange(f"{value!r} is not ISO 8601 or epoch seconds")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone(timedelta(seconds=utc_offset)))
+    return int(parsed.timestamp())
+
+
+class CallStats:
+    """Records call events into the store's buckets and answers range queries from them"""
+
+    def __init__(self, store, utc_offset_minutes: int = 60, max_range_days: int = 366, max_series_points: int = 1000):
+        if utc_offset_minutes % 60:
+            # Local days must start on an hour boundary, or hourly buckets couldn't fill their edges
+            raise ValueError("API_STATS_UTC_OFFSET_MINUTES must be a whole number of hours")
+        self.store = store
+        self.utc_offset = utc_offset_minutes * 60
+        self.max_range_days = max_range_days
+        self.max_series_points = max_series_points
+        self.counters = {
+            'events': 0,
+            'events_changing_buckets': 0,
+            'summaries': 0,
+            'not_modified': 0,
+            'buckets_read': 0,
+            'rebuilds': 0,
+        }
+
+    @classmethod
+    def from_env(cls, store) -> "CallStats":
+        return cls(
+            store,
+            # Local day boundaries; Nigeria (WAT) is UTC+1 all year
+            utc_offset_minutes=int(os.getenv("API_STATS_UTC_OFFSET_MINUTES", "60")),
+            max_range_days=int(os.getenv("API_STATS_MAX_RANGE_DAYS", "366")),
+        )
+
+    async def record(self, merchant_id: str, event: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """Apply one status event; returns the call's row and the merchant's stats revision"""
+        changed = False
+
+        def apply(old: Optional[Dict[str, Any]]):
+            # Runs inside the store's transaction, with the call's row locked
+            nonlocal changed
+            new = merge_call(old, event)
+            deltas = call_deltas(old, new, self.utc_offset)
+            changed = bool(deltas)
+            return new, deltas
+
+        call, revision = await self.store.apply_call_event(merchant_id, event['call_sid'], apply)
+        self.counters['events'] += 1
+        if changed:
+            self.counters['events_changing_buckets'] += 1
+        return call, revision
+
+    def resolve_range(self, start: Optional[int], end: Optional[int], series: Optional[str] = None,
+                      days: int = 30) -> Tuple[int, int]:
+        """[start, end) widened to whole hours; the last `days` days up to now by default"""
+        end = int(time.time()) if end is None else end
+        start = end - days * DAY if start is None else start
+        start = start // HOUR * HOUR
+        end = -(-end // HOUR) * HOUR
+        if end <= start:
+            raise InvalidRange("'to' must be after 'from'")
+        if end - start > self.max_range_days * DAY:
+            raise InvalidRange(f"at most {self.max_range_days} days per query")
+        if series is not None and -(-(end - start) // (HOUR if series == 'hour' else DAY)) > self.max_series_points:
+            raise InvalidRange(f"at most {self.max_series_points} {series}s in a series")
+        return start, end
+
+    def etag(self, merchant_id: str, revision: int, start: int, end: int, series: Optional[str]) -> str:
+        key = f"{merchant_id}:{revision}:{start}:{end}:{series}:{self.utc_offset}"
+        return f'W/"{hashlib.blake2s(key.encode(), digest_size=12).hexdigest()}"'
+
+    async def revision(self, merchant_id: str) -> int:
+        return await self.store.call_stats_revision(merchant_id)
+
+    async def _read(self, merchant_id: str, bucket: str, start: int, end: int) -> List[Tuple[int, Counts]]:
+        if end <= start:
+            return []
+        rows = await self.store.call_stat_buckets(merchant_id, bucket, start, end)
+        self.counters['buckets_read'] += len(rows)
+        return rows
+
+    async def summary(self, merchant_id: str, start: int, end: int, series: Optional[str] = None) -> Dict[str, Any]:
+        """Totals for [start, end) (hour-aligned) and, if asked, sparse per-hour or per-day buckets"""
+        self.counters['summaries'] += 1
+        first_day = day_start(start + DAY - 1, self.utc_offset)
+        last_day = day_start(end, self.utc_offset)
+        if first_day < last_day:
+            parts = [('hour', start, first_day), ('day', first_day, last_day), ('hour', last_day, end)]
+        else:
+            parts = [('hour', start, end)]
+        totals = [0] * len(COUNTERS)
+        for bucket, part_start, part_end in parts:
+            for _, counts in await self._read(merchant_id, bucket, part_start, part_end):
+                for i, value in enumerate(counts):
+                    totals[i] += value
+
+        result = self._describe(totals)
+        if series is not None:
+            if series == 'day':
+                # Whole local days that overlap the range
+                rows = await self._read(merchant_id, 'day', day_start(start, self.utc_offset),
+                                        day_start(end - 1, self.utc_offset) + DAY)
+            else:
+                rows = await self._read(merchant_id, 'hour', start, end)
+            result['series'] = [{'start': bucket_start, **self._describe(counts)} for bucket_start, counts in rows]
+        return result
+
+    @staticmethod
+    def _describe(counts) -> Dict[str, Any]:
+        total, answered, missed, conversions, revenue_kobo = counts
+        return {
+            "totalCalls": total,
+            "answeredCalls": answered,
+            "missedCalls": missed,
+            "conversions": conversions,
+            "conversionRate": round(conversions / total, 4) if total else 0,
+            "revenueSaved": revenue_kobo / 100,
+        }
+
+    async def rebuild(self, merchant_id: str) -> Dict[str, Any]:
+        """Recompute every bucket from the call log; replaces what is stored"""
+        started = time.perf_counter()
+        accumulator = StatsAccumulator(self.utc_offset)
+        revision = await self.store.rebuild_call_stats(merchant_id, accumulator)
+        self.counters['rebuilds'] += 1
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"📊 Call stats rebuilt for {merchant_id}: {accumulator.calls} calls, "
+                    f"{len(accumulator.buckets)} buckets in {elapsed_ms} ms")
+        return {'calls': accumulator.calls, 'buckets': len(accumulator.buckets), 'revision': revision,
+                'elapsed_ms': elapsed_ms}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'utc_offset_minutes': self.utc_offset // 60,
+        }
@@ -0,0 +1,363 @@
+"""
+CHAT PROXY - streamed LLM replies through one pooled upstream client
+/api/chat/message with stream=true answers as server-sent events. The LLM
+key stays on the server: every worker keeps one keep-alive HTTP client to an
+OpenAI-compatible /chat/completions endpoint (Groq by default) and forwards
+tokens as they arrive. Stand-alone questions are answered from a response
+cache keyed by their content words, so "How much does it cost?" and "cost,
+how much?" share one entry. If the upstream has not produced a first token
+within the deadline, or fails before one, the merchant's intent reply is
+sent instead.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from callwaiting_api.intents import tokenize
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are CallWaiting.ai's website assistant. CallWaiting.ai answers missed business calls "
+    "with AI and follows up by SMS. Answer in two or three short sentences."
+)
+
+# Dropped from cache keys; what is left says what the question is about. Question words and
+# negations stay: "when can I call?" and "why call?" are different questions, as are "can"/"can't"
+_STOPWORDS = frozenset("""
+a an the is are was were be been am do does did can could would should will shall may might must
+i me my we our you your it its this that these those there here
+to of in on at for from with about and or but if so then than too very just please pls kindly
+hi hello hey thanks thank ok okay tell know want need get give let like much many any some
+""".split())
+
+
+class UpstreamError(Exception):
+    """The LLM endpoint answered with an error or malformed stream"""
+
+
+def semantic_key(message: str) -> Optional[str]:
+    """Sorted content words with a plural s dropped; None when nothing is left"""
+    words = set()
+    for word in tokenize(message):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.add(word)
+    return ' '.join(sorted(words)) or None
+
+
+def build_messages(system_prompt: str, history: List[Any], message: str,
+                   max_turns: int, max_chars: int) -> List[Dict[str, str]]:
+    """System prompt, the last max_turns of history and the message, trimmed oldest-first to max_chars
+
+    History entries may be {role, content} or the widget's {sender, content}.
+    """
+    turns = []
+    for entry in (history or [])[-max_turns:] if max_turns > 0 else []:
+        if not isinstance(entry, dict):
+            continue
+        role = entry.get('role') or entry.get('sender')
+        content = entry.get('content')
+        if role in ('bot', 'assistant'):
+            role = 'assistant'
+        elif role != 'user':
+            continue
+        if isinstance(content, str) and content.strip():
+            turns.append({'role': role, 'content': content[:max_chars]})
+
+    message = message[:max_chars]
+    budget = max_chars - len(message)
+    kept: List[Dict[str, str]] = []
+    for turn in reversed(turns):
+        if len(turn['content']) > budget:
+            break
+        kept.append(turn)
+        budget -= len(turn['content'])
+    kept.reverse()
+    return [{'role': 'system', 'content': system_prompt}, *kept, {'role': 'user', 'content': message}]
+
+
+class ResponseCache:
+    """LRU of complete answers by (merchant, semantic key), each kept ttl_seconds"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], answer: str):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class LLMClient:
+    """Streams chat completions from an OpenAI-compatible endpoint over one keep-alive pool"""
+
+    def __init__(self, base_url: str, api_key: str = "", model: str = "llama-3.1-8b-instant",
+                 max_connections: int = 20, timeout_seconds: float = 30.0, max_tokens: int = 300,
+                 temperature: float = 0.3):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("httpx not available. Install with: pip install httpx")
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.model = model
+        self.max_connections = max(1, max_connections)
+        self.timeout_seconds = timeout_seconds
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # Built on first use, so each pre-forked worker gets its own pool
+        self._client = None
+        self.counters = {
+            'requests': 0,
+            'errors': 0,
+            'tokens': 0,
+        }
+
+    def _pool(self):
+        if self._client is None:
+            headers = {'Authorization': f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections, keepalive_expiry=60),
+                # Waiting for a free pooled connection counts against the first-token deadline
+                timeout=httpx.Timeout(self.timeout_seconds, connect=5.0),
+            )
+        return self._client
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Content deltas as they arrive; raises UpstreamError"""
+        self.counters['requests'] += 1
+        body = {
+            'model': self.model,
+            'messages': messages,
+            'stream': True,
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+        }
+        try:
+            async with self._pool().stream('POST', f"{self.base_url}/chat/completions", json=body) as response:
+                if response.status_code != 200:
+                    detail = (await response.aread())[:200].decode('utf-8', 'replace')
+                    raise UpstreamError(f"HTTP {response.status_code}: {detail}")
+                finished = False
+                # Read to the end of the body even after [DONE]: a response closed early
+                # takes its connection out of the keep-alive pool
+                async for line in response.aiter_lines():
+                    if finished or not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        finished = True
+                        continue
+                    try:
+                        delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        raise UpstreamError(f"Malformed stream chunk: {e}")
+                    if delta:
+                        self.counters['tokens'] += 1
+                        yield delta
+        except UpstreamError:
+            self.counters['errors'] += 1
+            raise
+        except httpx.HTTPError as e:
+            self.counters['errors'] += 1
+            raise UpstreamError(f"{e.__class__.__name__}: {e}") from e
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'base_url': self.base_url,
+            'model': self.model,
+            'max_connections': self.max_connections,
+        }
+
+
+def _event(name: str, payload: Dict[str, Any]) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode('utf-8')
+
+
+class ChatProxy:
+    """Cache, then LLM with a first-token deadline, then the intent reply"""
+
+    def __init__(self, llm: Optional[LLMClient], intents, cache: ResponseCache,
+                 system_prompt: str = DEFAULT_SYSTEM_PROMPT, first_token_seconds: float = 4.0,
+                 history_turns: int = 6, history_chars: int = 4000):
+        self.llm = llm
+        self.intents = intents
+        self.cache = cache
+        self.system_prompt = system_prompt
+        self.first_token_seconds = first_token_seconds
+        self.history_turns = history_turns
+        self.history_chars = history_chars
+        self.counters = {
+            'streams': 0,
+            'from_cache': 0,
+            'from_llm': 0,
+            'fallback_slow': 0,
+            'fallback_error': 0,
+            'fallback_disabled': 0,
+            'failed_midstream': 0,
+            'abandoned': 0,
+        }
+
+    @classmethod
+    def from_env(cls, intents) -> "ChatProxy":
+        api_key = os.getenv("LLM_API_KEY") or os.getenv("GROQ_API_KEY", "")
+        base_url = os.getenv("LLM_API_URL") or ("https://api.groq.com/openai/v1" if api_key else "")
+        llm = None
+        if base_url and not HTTPX_AVAILABLE:
+            logger.warning("⚠️ httpx not installed; chat streaming answers from intents only")
+        elif base_url:
+            llm = LLMClient(
+                base_url,
+                api_key=api_key,
+                model=os.getenv("LLM_MODEL", "llama-3.1-8b-instant"),
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+                timeout_seconds=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+                max_tokens=int(os.getenv("LLM_MAX_TOKENS", "300")),
+            )
+        return cls(
+            llm,
+            intents,
+            ResponseCache(int(os.getenv("LLM_CACHE_SIZE", "1024")), float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))),
+            system_prompt=os.getenv("LLM_SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT),
+            first_token_seconds=float(os.getenv("LLM_FIRST_TOKEN_SECONDS", "4")),
+            history_turns=int(os.getenv("LLM_HISTORY_TURNS", "6")),
+            history_chars=int(os.getenv("LLM_HISTORY_CHARS", "4000")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.llm is not None
+
+    async def _fallback(self, merchant_id: Optional[str], message: str, reason: str, request_id: str):
+        self.counters[f'fallback_{reason}'] += 1
+        match = await self.intents.match(merchant_id, message)
+        yield _event('meta', {'request_id': request_id, 'source': 'intent', 'reason': reason,
+                              'intent': match.intent.name if match.intent else None,
+                              'confidence': match.confidence})
+        yield _event('token', {'text': match.reply})
+        yield _event('done', {'source': 'intent'})
+
+    async def stream(self, merchant_id: Optional[str], message: str, history: List[Any],
+                     request_id: str) -> AsyncIterator[bytes]:
+        """SSE events: meta (where the answer comes from), token..., then done or error
+
+        Nothing is sent until the first token or the fallback, so time to first byte is
+        time to first token.
+        """
+        self.counters['streams'] += 1
+        # Only stand-alone questions are cached; with history the answer depends on context
+        key = semantic_key(message)
+        cache_key = (merchant_id or '', key) if key and not history else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.counters['from_cache'] += 1
+                yield _event('meta', {'request_id': request_id, 'source': 'cache'})
+                yield _event('token', {'text': cached})
+                yield _event('done', {'source': 'cache'})
+                return
+        if self.llm is None:
+            async for event in self._fallback(merchant_id, message, 'disabled', request_id):
+                yield event
+            return
+
+        messages = build_messages(self.system_prompt, history, message, self.history_turns, self.history_chars)
+        upstream = self.llm.stream(messages)
+        try:
+            try:
+                first = await asyncio.wait_for(upstream.__anext__(), timeout=self.first_token_seconds)
+            except asyncio.TimeoutError:
+                reason = 'slow'
+            except (UpstreamError, StopAsyncIteration) as e:
+                logger.warning(f"⚠️ LLM upstream failed before the first token: {e or 'empty reply'}")
+                reason = 'error'
+            else:
+                reason = None
+            if reason is not None:
+                async for event in self._fallback(merchant_id, message, reason, request_id):
+                    yield event
+                return
+
+            self.counters['from_llm'] += 1
+            parts = [first]
+            yield _event('meta', {'request_id': request_id, 'source': 'llm'}) + _event('token', {'text': first})
+            try:
+                async for delta in upstream:
+                    parts.append(delta)
+                    yield _event('token', {'text': delta})
+            except UpstreamError as e:
+                self.counters['failed_midstream'] += 1
+                logger.warning(f"⚠️ LLM stream broke after {len(parts)} tokens: {e}")
+                yield _event('error', {'message': 'The assistant was interrupted, please try again'})
+                return
+            if cache_key is not None:
+                self.cache.put(cache_key, ''.join(parts))
+            yield _event('done', {'source': 'llm'})
+        except asyncio.CancelledError:
+            # Client went away; closing the upstream below returns its connection to the pool
+            self.counters['abandoned'] += 1
+            raise
+        finally:
+            await upstream.aclose()
+
+    async def close(self):
+        if self.llm is not None:
+            await self.llm.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'enabled': self.enabled,
+            'first_token_seconds': self.first_token_seconds,
+            'cache': self.cache.stats(),
+            'upstream': self.llm.stats() if self.llm else None,
+        }
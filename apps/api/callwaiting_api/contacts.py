@@ -0,0 +1,173 @@
+"""
+CONTACT IMPORT - CSV contact lists streamed in, normalized and deduplicated
+The upload is read a chunk at a time and never held whole: bytes are decoded
+incrementally, complete CSV records are cut at line ends (a quoted field may
+span lines and chunks), and each record's number goes through parse_phone.
+Numbers seen earlier in the file are skipped with a set lookup; the rest are
+written to the store in batches, which skips numbers the merchant already
+has. The report counts every outcome, lists the first errors with their row
+numbers and gives the throughput in numbers per second.
+"""
+
+import csv
+import time
+import codecs
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from callwaiting_api.phones import parse_phone
+
+logger = logging.getLogger(__name__)
+
+# Header names recognised for the number and name columns, lowercased
+PHONE_COLUMNS = ('phone', 'phone_number', 'phone number', 'mobile', 'msisdn', 'number', 'telephone', 'tel')
+NAME_COLUMNS = ('name', 'full_name', 'full name', 'contact', 'customer')
+
+
+class ImportTooLarge(ValueError):
+    """Upload is over the byte limit; batches written before it stay imported"""
+
+
+class ContactImport:
+    """One upload: feed() decoded text, then finish(); flush() writes the pending batch to the store"""
+
+    def __init__(self, store, merchant_id: str, batch_size: int = 2000, max_errors: int = 100):
+        self.store = store
+        self.merchant_id = merchant_id
+        self.batch_size = max(1, batch_size)
+        self.max_errors = max_errors
+        self.seen = set()
+        self.errors: List[Dict[str, Any]] = []
+        self.networks: Dict[str, int] = {}
+        self.counters = {
+            'rows': 0,
+            'valid': 0,
+            'invalid': 0,
+            'duplicates': 0,
+            'imported': 0,
+            'existing': 0,
+        }
+        self._phone_column: Optional[int] = None
+        self._name_column: Optional[int] = None
+        self._header_checked = False
+        self._row = 0
+        self._pending = ''
+        self._record: List[str] = []
+        self._in_quotes = False
+        self._batch: List[Tuple[str, str, str]] = []
+
+    def _error(self, row: int, value: str, message: str):
+        self.counters['invalid'] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'value': value[:64], 'error': message})
+
+    def _columns(self, fields: List[str]) -> bool:
+        """Pick columns from the first record; True if it was a header"""
+        self._header_checked = True
+        names = [field.strip().lower() for field in fields]
+        self._phone_column = next((i for i, name in enumerate(names) if name in PHONE_COLUMNS), None)
+        self._name_column = next((i for i, name in enumerate(names) if name in NAME_COLUMNS), None)
+        if self._phone_column is not None:
+            return True
+        # No header: the number is in the first column, a name (if any) in the second
+        self._phone_column, self._name_column = 0, 1 if len(fields) > 1 else None
+        return False
+
+    def _parse(self, records: List[str]):
+        # Row numbers count records, the header included
+        for fields in csv.reader(records):
+            self._row += 1
+            if not fields or not any(field.strip() for field in fields):
+                continue
+            if not self._header_checked and self._columns(fields):
+                continue
+            self.counters['rows'] += 1
+            if self._phone_column >= len(fields):
+                self._error(self._row, '', 'no phone column')
+                continue
+            raw = fields[self._phone_column]
+            phone = parse_phone(raw)
+            if phone is None:
+                self._error(self._row, raw, 'not a Nigerian mobile number')
+                continue
+            self.counters['valid'] += 1
+            if phone.e164 in self.seen:
+                self.counters['duplicates'] += 1
+                continue
+            self.seen.add(phone.e164)
+            self.networks[phone.network] = self.networks.get(phone.network, 0) + 1
+            name = ''
+            if self._name_column is not None and self._name_column < len(fields):
+                name = fields[self._name_column].strip()[:200]
+            self._batch.append((phone.e164, name, phone.network))
+
+    def feed(self, text: str):
+        """Parse every complete record in text; an unfinished one waits for the next chunk"""
+        lines = (self._pending + text).split('\n')
+        self._pending = lines.pop()
+        records = []
+        for line in lines:
+            # An odd number of quotes opens or closes a quoted field that runs past this line
+            if line.count('"') % 2:
+                self._in_quotes = not self._in_quotes
+            self._record.append(line + '\n')
+            if not self._in_quotes:
+                records.append(''.join(self._record))
+                self._record = []
+        if records:
+            self._parse(records)
+
+    def finish(self):
+        """Parse what is left after the last chunk"""
+        tail = ''.join(self._record) + self._pending
+        self._record, self._pending = [], ''
+        if tail.strip():
+            self._parse([tail])
+
+    @property
+    def batch_ready(self) -> bool:
+        return len(self._batch) >= self.batch_size
+
+    async def flush(self):
+        """Write the pending batch; numbers the merchant already had count as existing"""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        imported = await self.store.add_contacts(self.merchant_id, batch)
+        self.counters['imported'] += imported
+        self.counters['existing'] += len(batch) - imported
+
+
+async def import_contacts(store, merchant_id: str, chunks: AsyncIterator[bytes], max_bytes: int,
+                          batch_size: int = 2000, max_errors: int = 100) -> Dict[str, Any]:
+    """Stream a CSV upload into the merchant's contacts; raises ImportTooLarge past max_bytes"""
+    started = time.perf_counter()
+    job = ContactImport(store, merchant_id, batch_size=batch_size, max_errors=max_errors)
+    # utf-8-sig drops the byte order mark spreadsheet exports put in front
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise ImportTooLarge(f"CSV is larger than {max_bytes} bytes")
+        job.feed(decoder.decode(chunk))
+        if job.batch_ready:
+            await job.flush()
+    job.feed(decoder.decode(b'', final=True))
+    job.finish()
+    await job.flush()
+
+    elapsed = time.perf_counter() - started
+    report = {
+        **job.counters,
+        'networks': job.networks,
+        'errors': job.errors,
+        'errors_truncated': job.counters['invalid'] > len(job.errors),
+        'bytes': received,
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'numbers_per_second': round(job.counters['rows'] / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info(f"📇 Contacts imported for {merchant_id}: {job.counters['rows']} rows, "
+                f"{job.counters['imported']} new, {job.counters['invalid']} invalid, "
+                f"{report['numbers_per_second']} numbers/s")
+    return report
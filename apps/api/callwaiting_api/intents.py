@@ -0,0 +1,276 @@
+"""
+CHAT INTENTS - per-merchant intent tables compiled into one word automaton
+An intent is a set of phrases ("how much", "price", "free trial"), a reply
+and a priority. A merchant's intents are compiled into an Aho-Corasick
+automaton over word IDs, so a message is tokenized once and matched in one
+pass however many phrases there are. Matching whole words means "hi" no
+longer fires on "this". Each match has a confidence: the share of the
+message's words that the intent's phrases cover. The highest priority wins,
+then the highest confidence. Compiled automata are cached per merchant and
+rebuilt only when the stored table's revision changes.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lowercase words and numbers; an apostrophe suffix stays with its word ("what's", "don't")
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+DEFAULT_INTENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    'intents.default.json')
+
+# Table limits, so one merchant can't make every worker compile something huge
+MAX_INTENTS = 10000
+MAX_PATTERNS = 100000
+MAX_PATTERN_WORDS = 8
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+class InvalidIntents(ValueError):
+    """Intent table that can't be compiled; the message says why"""
+
+
+class Intent(NamedTuple):
+    name: str
+    patterns: Tuple[str, ...]
+    reply: str
+    priority: int = 0
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any]) -> "Intent":
+        return cls(str(row['name']), tuple(row.get('patterns', ())), str(row['reply']), int(row.get('priority', 0)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'patterns': list(self.patterns), 'reply': self.reply, 'priority': self.priority}
+
+
+class IntentMatch(NamedTuple):
+    intent: Optional[Intent]
+    reply: str
+    confidence: float
+
+
+def validate_table(table: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized {'intents': [...], 'fallback': str}; raises InvalidIntents"""
+    rows = table.get('intents')
+    if not isinstance(rows, list) or not rows:
+        raise InvalidIntents("intents must be a non-empty list")
+    if len(rows) > MAX_INTENTS:
+        raise InvalidIntents(f"at most {MAX_INTENTS} intents")
+    intents, names, patterns = [], set(), 0
+    for row in rows:
+        try:
+            if not isinstance(row.get('patterns'), list):
+                raise TypeError("patterns must be a list")
+            intent = Intent.from_dict(row)._replace(patterns=tuple(str(p) for p in row['patterns']))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise InvalidIntents(f"intent needs name, patterns, reply and an integer priority ({e})")
+        if intent.name in names:
+            raise InvalidIntents(f"duplicate intent {intent.name!r}")
+        names.add(intent.name)
+        for pattern in intent.patterns:
+            words = tokenize(pattern)
+            if not words:
+                raise InvalidIntents(f"{intent.name}: pattern {pattern!r} has no words")
+            if len(words) > MAX_PATTERN_WORDS:
+                raise InvalidIntents(f"{intent.name}: pattern {pattern!r} is longer than {MAX_PATTERN_WORDS} words")
+        patterns += len(intent.patterns)
+        intents.append(intent.to_dict())
+    if patterns > MAX_PATTERNS:
+        raise InvalidIntents(f"at most {MAX_PATTERNS} patterns in total")
+    return {'intents': intents, 'fallback': str(table.get('fallback') or '')}
+
+
+class IntentMatcher:
+    """Aho-Corasick automaton over word IDs for one intent table"""
+
+    def __init__(self, table: Dict[str, Any]):
+        self.intents = [Intent.from_dict(row) for row in table['intents']]
+        self.fallback = table.get('fallback', '')
+        self._words: Dict[str, int] = {}
+        # Per state: word ID -> next state, failure state, and (intent index, phrase length) ending here
+        self._goto: List[Dict[int, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[int, int], ...]] = [()]
+        started = time.perf_counter()
+        self._build()
+        self.build_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def _build(self):
+        outputs: List[List[Tuple[int, int]]] = [[]]
+        for index, intent in enumerate(self.intents):
+            for pattern in intent.patterns:
+                state = 0
+                words = tokenize(pattern)
+                for word in words:
+                    word_id = self._words.setdefault(word, len(self._words))
+                    next_state = self._goto[state].get(word_id)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][word_id] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append([])
+                    state = next_state
+                if (index, len(words)) not in outputs[state]:
+                    outputs[state].append((index, len(words)))
+
+        # Breadth-first: a state's failure link is the longest proper suffix that is also a prefix,
+        # and it inherits that state's outputs
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for word_id, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and word_id not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word_id, 0)
+                outputs[child].extend(outputs[self._fail[child]])
+                queue.append(child)
+        self._out = [tuple(out) for out in outputs]
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    def match(self, message: str) -> IntentMatch:
+        words = tokenize(message)
+        # intent index -> bitmask of the message words its phrases cover
+        covered: Dict[int, int] = {}
+        goto, fail, out, ids = self._goto, self._fail, self._out, self._words
+        state = 0
+        for position, word in enumerate(words):
+            word_id = ids.get(word)
+            if word_id is None:
+                # No phrase contains this word, so no match can span it
+                state = 0
+                continue
+            while state and word_id not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word_id, 0)
+            for index, length in out[state]:
+                covered[index] = covered.get(index, 0) | (((1 << length) - 1) << (position - length + 1))
+
+        if not covered:
+            return IntentMatch(None, self.fallback, 0.0)
+        best, best_key = None, None
+        for index, mask in covered.items():
+            confidence = bin(mask).count('1') / len(words)
+            key = (self.intents[index].priority, confidence, -index)
+            if best_key is None or key > best_key:
+                best, best_key = index, key
+        return IntentMatch(self.intents[best], self.intents[best].reply, round(best_key[1], 3))
+
+
+def load_default_table(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return validate_table(json.load(f))
+
+
+class IntentCatalog:
+    """Compiled matchers per merchant, rebuilt when the store's revision changes
+
+    Revisions are re-checked at most every refresh_seconds per merchant, so a
+    table saved on one worker reaches the others within that time; the worker
+    that saved it rebuilds at once. Merchants without a table use the default.
+    """
+
+    def __init__(self, store, default_table: Dict[str, Any], refresh_seconds: float = 5.0, max_cached: int = 256):
+        self.store = store
+        self.default = IntentMatcher(default_table)
+        self.refresh_seconds = refresh_seconds
+        self.max_cached = max(1, max_cached)
+        # merchant ID -> (revision, checked at, matcher); least recently used first
+        self._cache: "OrderedDict[str, Tuple[Optional[int], float, IntentMatcher]]" = OrderedDict()
+        self.counters = {
+            'matched': 0,
+            'unmatched': 0,
+            'builds': 0,
+            'revision_checks': 0,
+            'evictions': 0,
+        }
+        self._build_ms = 0.0
+
+    @classmethod
+    def from_env(cls, store) -> "IntentCatalog":
+        return cls(
+            store,
+            load_default_table(os.getenv("API_DEFAULT_INTENTS_FILE", DEFAULT_INTENTS_PATH)),
+            refresh_seconds=float(os.getenv("API_INTENTS_REFRESH_SECONDS", "5")),
+            max_cached=int(os.getenv("API_INTENTS_CACHE_SIZE", "256")),
+        )
+
+    def _compile(self, table: Dict[str, Any]) -> IntentMatcher:
+        matcher = IntentMatcher(table)
+        self.counters['builds'] += 1
+        self._build_ms += matcher.build_ms
+        return matcher
+
+    def _remember(self, merchant_id: str, revision: Optional[int], matcher: IntentMatcher):
+        self._cache[merchant_id] = (revision, time.monotonic(), matcher)
+        self._cache.move_to_end(merchant_id)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    async def matcher(self, merchant_id: Optional[str]) -> IntentMatcher:
+        if not merchant_id:
+            return self.default
+        cached = self._cache.get(merchant_id)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.refresh_seconds:
+            self._cache.move_to_end(merchant_id)
+            return cached[2]
+        self.counters['revision_checks'] += 1
+        revision = await self.store.intents_revision(merchant_id)
+        if cached is not None and cached[0] == revision:
+            self._remember(merchant_id, revision, cached[2])
+            return cached[2]
+        if revision is None:
+            matcher = self.default
+        else:
+            loaded = await self.store.intents(merchant_id)
+            if loaded is None:
+                revision, matcher = None, self.default
+            else:
+                revision, matcher = loaded[0], self._compile(loaded[1])
+        self._remember(merchant_id, revision, matcher)
+        return matcher
+
+    async def match(self, merchant_id: Optional[str], message: str) -> IntentMatch:
+        result = (await self.matcher(merchant_id)).match(message)
+        self.counters['matched' if result.intent else 'unmatched'] += 1
+        return result
+
+    async def table(self, merchant_id: str) -> Tuple[Optional[int], Dict[str, Any]]:
+        """(revision, table) the merchant is served; revision None for the default"""
+        loaded = await self.store.intents(merchant_id)
+        if loaded is None:
+            return None, {'intents': [i.to_dict() for i in self.default.intents], 'fallback': self.default.fallback}
+        return loaded
+
+    async def replace(self, merchant_id: str, table: Dict[str, Any]) -> int:
+        """Validate, compile and store; raises InvalidIntents before anything is saved"""
+        table = validate_table(table)
+        matcher = self._compile(table)
+        revision = await self.store.put_intents(merchant_id, table)
+        self._remember(merchant_id, revision, matcher)
+        return revision
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'cached': len(self._cache),
+            'max_cached': self.max_cached,
+            'default_intents': len(self.default.intents),
+            'build_ms_avg': round(self._build_ms / self.counters['builds'], 3) if self.counters['builds'] else None,
+        }
@@ -0,0 +1,149 @@
+"""
+PASSWORD HASHING - scrypt on a bounded worker pool, off the event loop
+hashlib.scrypt releases the GIL, so a small thread pool runs hashes in
+parallel while the event loop keeps serving every other request. Calls
+beyond the pool plus a short queue are refused at once (503) rather than
+piling up behind a login burst. Hashes record their own cost parameters:
+when the configured cost changes, or a legacy SHA-256 hash verifies, the
+caller re-hashes on that login.
+"""
+
+import os
+import hmac
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from callwaiting_api.storage import QueryTimings
+
+logger = logging.getLogger(__name__)
+
+# server.py's original SHA-256 with one static salt; still verified so old accounts can log in and upgrade
+_LEGACY_SALT = "callwaiting_salt_2024"
+
+
+class KdfOverloaded(Exception):
+    """Hash pool and its queue are full; retry_after is in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing overloaded, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """scrypt$n$r$p$salt$hash strings, computed on a dedicated thread pool"""
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, workers: int = 2, max_queue: int = 32):
+        if n < 2 or n & (n - 1):
+            raise ValueError("scrypt n must be a power of two")
+        self.n, self.r, self.p = n, r, p
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.timings = QueryTimings()
+        self.counters = {
+            'hashed': 0,
+            'verified': 0,
+            'mismatches': 0,
+            'rejected_overloaded': 0,
+            'rehash_needed': 0,
+        }
+        # EWMA of one hash, for Retry-After
+        self._hash_seconds = 0.05
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        return cls(
+            n=int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14))),
+            r=int(os.getenv("PASSWORD_SCRYPT_R", "8")),
+            p=int(os.getenv("PASSWORD_SCRYPT_P", "1")),
+            workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+            max_queue=int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32")),
+        )
+
+    def _scrypt(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        # maxmem covers 128 * r * n bytes with headroom
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, dklen=32,
+                              maxmem=256 * r * n + 2 ** 20)
+
+    def _encode(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        digest = self._scrypt(password, salt, self.n, self.r, self.p)
+        return "$".join(['scrypt', str(self.n), str(self.r), str(self.p),
+                         base64.b64encode(salt).decode('ascii'), base64.b64encode(digest).decode('ascii')])
+
+    @staticmethod
+    def _parse(stored: str) -> Optional[Tuple[int, int, int, bytes, bytes]]:
+        parts = stored.split('$')
+        if len(parts) != 6 or parts[0] != 'scrypt':
+            return None
+        return int(parts[1]), int(parts[2]), int(parts[3]), base64.b64decode(parts[4]), base64.b64decode(parts[5])
+
+    def _check(self, password: str, stored: str) -> bool:
+        parsed = self._parse(stored)
+        if parsed is None:
+            legacy = hashlib.sha256((password + _LEGACY_SALT).encode()).hexdigest()
+            return hmac.compare_digest(legacy, stored)
+        n, r, p, salt, digest = parsed
+        return hmac.compare_digest(self._scrypt(password, salt, n, r, p), digest)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Legacy hash, or scrypt at other cost parameters than configured"""
+        parsed = self._parse(stored)
+        return parsed is None or parsed[:3] != (self.n, self.r, self.p)
+
+    async def _submit(self, operation: str, fn, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.counters['rejected_overloaded'] += 1
+            backlog = self.pending / self.workers
+            raise KdfOverloaded(max(1, int(round(self._hash_seconds * backlog))))
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-kdf')
+        def timed():
+            began = time.perf_counter()
+            return fn(*args), began, time.perf_counter()
+
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            result, began, ended = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.pending -= 1
+        # Queue wait and KDF time separately: the first grows with load, the second with the cost parameters
+        self.timings.record(f"{operation}_queue", (began - submitted) * 1000)
+        self.timings.record(operation, (ended - began) * 1000)
+        self._hash_seconds = 0.9 * self._hash_seconds + 0.1 * (ended - began)
+        return result
+
+    async def hash(self, password: str) -> str:
+        stored = await self._submit('hash', self._encode, password)
+        self.counters['hashed'] += 1
+        return stored
+
+    async def verify(self, password: str, stored: str) -> bool:
+        matched = await self._submit('verify', self._check, password, stored)
+        self.counters['verified' if matched else 'mismatches'] += 1
+        if matched and self.needs_rehash(stored):
+            self.counters['rehash_needed'] += 1
+        return matched
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'params': {'n': self.n, 'r': self.r, 'p': self.p},
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'pending': self.pending,
+            'timings': self.timings.stats(),
+        }
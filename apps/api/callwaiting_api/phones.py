@@ -0,0 +1,42 @@
+"""
+PHONE NUMBERS - one-pass Nigerian mobile number normalization
+Separators are deleted with one str.translate and the rest is checked by a
+single precompiled pattern that accepts every form registration took
+(+234..., 234..., 0..., bare ten digits) plus "+234 (0) 803...". The
+network comes from a prefix table of NCC allocations. Ported numbers keep
+their original prefix, so treat it as a hint for SMS routing, not a fact.
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+# Spaces, dashes, dots, brackets, tabs and no-break spaces people put in numbers
+_SEPARATORS = str.maketrans('', '', ' -.()\t\u00a0')
+
+# Optional +234 / 234 (with or without a trunk 0), or just the trunk 0, then the
+# ten-digit national number: 7, 8 or 9, then 0 or 1, then eight digits
+_NIGERIAN_MOBILE = re.compile(r'(?:\+?234)?0?([789][01]\d{8})')
+
+# National number prefix -> network; four-digit entries override their three-digit one
+NETWORK_PREFIXES = {
+    **dict.fromkeys(('703', '706', '803', '806', '810', '813', '814', '816', '903', '906', '913', '916',
+                     '704', '7025', '7026'), 'mtn'),
+    **dict.fromkeys(('701', '708', '802', '808', '812', '901', '902', '904', '907', '911', '912'), 'airtel'),
+    **dict.fromkeys(('705', '805', '807', '811', '815', '905', '915'), 'glo'),
+    **dict.fromkeys(('809', '817', '818', '908', '909'), '9mobile'),
+}
+
+
+class PhoneNumber(NamedTuple):
+    e164: str
+    network: str
+
+
+def parse_phone(raw: str) -> Optional[PhoneNumber]:
+    """+234 form and network, or None if raw is not a Nigerian mobile number"""
+    match = _NIGERIAN_MOBILE.fullmatch(raw.translate(_SEPARATORS))
+    if match is None:
+        return None
+    national = match.group(1)
+    network = NETWORK_PREFIXES.get(national[:4]) or NETWORK_PREFIXES.get(national[:3], 'unknown')
+    return PhoneNumber('+234' + national, network)
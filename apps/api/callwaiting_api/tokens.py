@@ -0,0 +1,187 @@
+"""
+ACCESS TOKENS - self-contained HMAC-signed tokens and a revocation denylist
+Tokens are compact HS256 JWTs carrying the user's public fields, so verifying
+one is an HMAC and a JSON decode with no store lookup, and nothing is kept
+per login. Logout puts the token's ID on a denylist until the token would
+have expired anyway: a timer wheel of one-minute buckets in one process, or a
+shared-memory table (entries expire in place) across pre-forked workers.
+"""
+
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Fields copied from the user into the token; never the password hash
+CLAIM_FIELDS = ('id', 'email', 'business_name', 'phone', 'industry')
+
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b'=')
+
+
+class InvalidToken(Exception):
+    """Malformed, forged, expired or revoked"""
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+def parse_duration(value: str) -> int:
+    """Seconds from '3600', '30m', '24h' or '7d' (JWT_EXPIRY)"""
+    value = value.strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+class TimerWheelDenylist:
+    """Revoked token IDs bucketed by expiry; a whole bucket is dropped once its minute has passed
+
+    Lookups only check the bucket the token's own exp falls in, and expiry costs
+    one set clear per elapsed bucket no matter how many IDs it held.
+    """
+
+    def __init__(self, horizon_seconds: int, granularity_seconds: int = 60):
+        self.granularity = max(1, granularity_seconds)
+        # One spare bucket so the oldest live bucket is never reused early
+        self._buckets: List[Set[str]] = [set() for _ in range(horizon_seconds // self.granularity + 2)]
+        self._tick = int(time.time()) // self.granularity
+        self.revoked = 0
+        self.evicted = 0
+
+    def _advance(self, now: float):
+        tick = int(now) // self.granularity
+        if tick <= self._tick:
+            return
+        # Buckets for every tick that has fully passed; at most one lap of the wheel
+        for passed in range(max(self._tick, tick - len(self._buckets)), tick):
+            bucket = self._buckets[passed % len(self._buckets)]
+            self.evicted += len(bucket)
+            bucket.clear()
+        self._tick = tick
+
+    def add(self, token_id: str, expires_at: int):
+        now = time.time()
+        self._advance(now)
+        if expires_at <= now:
+            return
+        tick = min(expires_at // self.granularity, self._tick + len(self._buckets) - 1)
+        self._buckets[tick % len(self._buckets)].add(token_id)
+        self.revoked += 1
+
+    def __contains__(self, item) -> bool:
+        token_id, expires_at = item
+        self._advance(time.time())
+        return token_id in self._buckets[(expires_at // self.granularity) % len(self._buckets)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'kind': 'timer_wheel',
+            'entries': sum(len(bucket) for bucket in self._buckets),
+            'buckets': len(self._buckets),
+            'granularity_seconds': self.granularity,
+            'revoked_total': self.revoked,
+            'evicted_total': self.evicted,
+        }
+
+
+class SharedDenylist:
+    """Denylist in a SharedTable so a logout on one worker holds on all; expired entries read as missing"""
+
+    def __init__(self, table):
+        self.table = table
+        self.revoked = 0
+
+    def add(self, token_id: str, expires_at: int):
+        self.table.put(token_id, 1, float(expires_at))
+        self.revoked += 1
+
+    def __contains__(self, item) -> bool:
+        return item[0] in self.table
+
+    def stats(self) -> Dict[str, Any]:
+        return {'kind': 'shared_table', 'revoked_total': self.revoked, **self.table.stats()}
+
+
+class TokenSigner:
+    """Issues and verifies HS256 tokens; revoke() denylists one until its exp"""
+
+    def __init__(self, secret: bytes, ttl_seconds: int = 86400, denylist=None):
+        # Keyed once; each signature copies the prepared inner/outer state
+        self._mac = hmac.new(secret, digestmod=hashlib.sha256)
+        self.ttl_seconds = ttl_seconds
+        self.denylist = denylist if denylist is not None else TimerWheelDenylist(ttl_seconds)
+        self.counters = {
+            'issued': 0,
+            'verified': 0,
+            'rejected': 0,
+            'revoked': 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "TokenSigner":
+        secret = os.getenv("JWT_SECRET", "")
+        if len(secret) < 32 or secret.startswith("your_"):
+            # Fine for one node: generated before workers fork, so they all share it.
+            # Tokens do not survive a restart and other nodes reject them
+            logger.warning("⚠️ JWT_SECRET unset or shorter than 32 characters; using a random per-process secret")
+            secret = secrets.token_urlsafe(48)
+        return cls(secret.encode('utf-8'), ttl_seconds=parse_duration(os.getenv("JWT_EXPIRY", "24h")))
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return _b64encode(mac.digest())
+
+    def issue(self, user: Dict[str, Any]) -> str:
+        now = int(time.time())
+        claims = {field: user.get(field) for field in CLAIM_FIELDS}
+        claims.update(iat=now, exp=now + self.ttl_seconds, jti=secrets.token_urlsafe(12))
+        signing_input = _HEADER + b'.' + _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        self.counters['issued'] += 1
+        return (signing_input + b'.' + self._sign(signing_input)).decode('ascii')
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token; raises InvalidToken"""
+        try:
+            raw = token.encode('ascii')
+            header, payload, signature = raw.split(b'.')
+        except (UnicodeEncodeError, ValueError):
+            self.counters['rejected'] += 1
+            raise InvalidToken("Malformed token")
+        # Only our own header is accepted, so the algorithm can't be swapped
+        if header != _HEADER or not hmac.compare_digest(signature, self._sign(header + b'.' + payload)):
+            self.counters['rejected'] += 1
+            raise InvalidToken("Bad signature")
+        claims = json.loads(_b64decode(payload))
+        if claims['exp'] <= time.time():
+            self.counters['rejected'] += 1
+            raise InvalidToken("Token expired")
+        if (claims['jti'], claims['exp']) in self.denylist:
+            self.counters['rejected'] += 1
+            raise InvalidToken("Token revoked")
+        self.counters['verified'] += 1
+        return claims
+
+    def revoke(self, claims: Dict[str, Any]):
+        self.denylist.add(claims['jti'], int(claims['exp']))
+        self.counters['revoked'] += 1
+
+    @staticmethod
+    def user(claims: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: claims.get(field) for field in CLAIM_FIELDS}
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, 'ttl_seconds': self.ttl_seconds, 'denylist': self.denylist.stats()}
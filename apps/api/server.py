@@ -9,19 +9,21 @@ import sys
 import json
 import time
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Literal
 from pathlib import Path
 
 # Add the src directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+# Python modules shared with the TTS gateway (pre-fork workers, shared memory)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib'))
 
 try:
-    from fastapi import FastAPI, HTTPException, Request, Depends, status
+    from fastapi import FastAPI, HTTPException, Request, Depends, Query, status
     from fastapi.middleware.cors import CORSMiddleware
     from fastapi.middleware.trustedhost import TrustedHostMiddleware
     from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-    from fastapi.responses import JSONResponse
+    from fastapi.responses import JSONResponse, StreamingResponse, Response
     from pydantic import BaseModel, EmailStr
     import uvicorn
 except ImportError as e:
@@ -30,6 +32,16 @@ except ImportError as e:
     os.system("pip install fastapi uvicorn python-multipart email-validator")
     sys.exit(1)
 
+from callwaiting_api.storage import MemoryStore, DuplicateUser, store_from_env
+from callwaiting_api.tokens import TokenSigner, SharedDenylist, InvalidToken
+from callwaiting_api.passwords import PasswordHasher, KdfOverloaded
+from callwaiting_api.intents import IntentCatalog, InvalidIntents
+from callwaiting_api.chat import ChatProxy
+from callwaiting_api.phones import parse_phone
+from callwaiting_api.contacts import import_contacts, ImportTooLarge
+from callwaiting_api.callstats import CallStats, InvalidRange, contribution, parse_time
+from callwaiting_common.accesslog import AccessLog, AccessLogMiddleware, request_ids
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -68,22 +80,11 @@ app.add_middleware(
     allowed_hosts=["localhost", "127.0.0.1", "callwaitingai.odia.dev", "meetcallwaiting.ai"]
 )
 
-# Request ID middleware
-@app.middleware("http")
-async def add_request_id(request: Request, call_next):
-    request_id = f"req_{int(time.time() * 1000)}"
-    request.state.request_id = request_id
-    
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    
-    response.headers["X-Request-ID"] = request_id
-    response.headers["X-Process-Time"] = str(process_time)
-    
-    logger.info(f"📥 {request.method} {request.url.path} [{request_id}] - {response.status_code} - {process_time:.3f}s")
-    
-    return response
+# Request IDs and the JSON access log (API_ACCESS_LOG: stdout, stderr, off or a file;
+# API_ACCESS_LOG_SAMPLE=/api/health=0.01 keeps 1% of successful health checks).
+# Records are queued and written in batches by a background task
+access_log = AccessLog.from_env("API_ACCESS_LOG", service="api")
+app.add_middleware(AccessLogMiddleware, log=access_log)
 
 # Pydantic models
 class UserRegister(BaseModel):
@@ -100,6 +101,33 @@ class UserLogin(BaseModel):
 class ChatMessage(BaseModel):
     message: str
     history: Optional[list] = []
+    # Merchant whose intent table answers; the default table when unset
+    merchant_id: Optional[str] = None
+    # Answer as server-sent events (also chosen by Accept: text/event-stream)
+    stream: bool = False
+
+class IntentRule(BaseModel):
+    name: str
+    patterns: List[str]
+    reply: str
+    priority: int = 0
+
+class IntentTable(BaseModel):
+    intents: List[IntentRule]
+    fallback: Optional[str] = None
+
+class CallEvent(BaseModel):
+    # One status update for a call (Twilio-style); later events for the same call_sid update it
+    call_sid: str
+    status: Literal['ringing', 'in-progress', 'completed', 'busy', 'no-answer', 'failed']
+    direction: Optional[Literal['inbound', 'outbound']] = None
+    phone_number: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    ai_response_type: Optional[Literal['greeting', 'appointment', 'order', 'hold', 'goodbye', 'error']] = None
+    converted: Optional[bool] = None
+    # Naira; stored in kobo
+    revenue_saved: Optional[float] = None
+    timestamp: Optional[datetime] = None
 
 class APIResponse(BaseModel):
     success: bool
@@ -107,88 +135,101 @@ class APIResponse(BaseModel):
     data: Optional[Dict[str, Any]] = None
     request_id: str
 
-# In-memory storage for demo (replace with database)
-users_db = {}
-sessions_db = {}
+# Users (API_DATABASE_URL: memory://, sqlite:///path or postgresql://...). In memory
+# with API_WORKERS > 1 it becomes a shared-memory table
+store = store_from_env()
+
+# Signed, self-contained access tokens (JWT_SECRET, JWT_EXPIRY); nothing is stored per
+# login, only revoked token IDs until they would have expired
+tokens = TokenSigner.from_env()
+
+# scrypt on a small thread pool (PASSWORD_SCRYPT_*, PASSWORD_HASH_WORKERS); a login
+# burst queues there, bounded, instead of blocking the event loop
+passwords = PasswordHasher.from_env()
+
+# Chat intents per merchant (default table: intents.default.json), compiled into one
+# automaton each and cached until the stored table's revision changes
+intents = IntentCatalog.from_env(store)
+
+# Streamed chat replies from an OpenAI-compatible LLM (LLM_API_URL, LLM_API_KEY or
+# GROQ_API_KEY) over one keep-alive pool per worker; the key never leaves the server
+chat = ChatProxy.from_env(intents)
+
+# Dashboard counters per merchant in hourly and daily buckets, updated with every call
+# event; days start at local midnight (API_STATS_UTC_OFFSET_MINUTES, WAT by default)
+call_stats = CallStats.from_env(store)
+
+# Contact CSV imports are streamed; API_CONTACTS_MAX_MB caps one upload
+CONTACTS_MAX_BYTES = int(float(os.getenv("API_CONTACTS_MAX_MB", "20")) * 1024 * 1024)
+CONTACTS_BATCH_SIZE = int(os.getenv("API_CONTACTS_BATCH_SIZE", "2000"))
+CONTACTS_MAX_ERRORS = int(os.getenv("API_CONTACTS_MAX_ERRORS", "100"))
+
+@app.on_event("startup")
+async def open_store():
+    await store.open()
+    access_log.start()
+
+@app.on_event("shutdown")
+async def close_store():
+    await store.close()
+    passwords.close()
+    await chat.close()
+    await access_log.stop()
 
 def generate_request_id():
-    return f"req_{int(time.time() * 1000)}"
+    return request_ids.next()
 
 def validate_nigerian_phone(phone: str) -> bool:
     """Validate Nigerian phone number format"""
-    import re
-    patterns = [
-        r'^\+234[789][01]\d{8}$',  # +234 format
-        r'^234[789][01]\d{8}$',    # 234 format
-        r'^0[789][01]\d{8}$',      # Local format starting with 0
-        r'^[789][01]\d{8}$'        # Without leading 0 or country code
-    ]
-    return any(re.match(pattern, phone.replace(' ', '')) for pattern in patterns)
+    return parse_phone(phone) is not None
 
 def normalize_nigerian_phone(phone: str) -> str:
     """Normalize Nigerian phone number to +234 format"""
-    digits = ''.join(filter(str.isdigit, phone))
-    
-    if digits.startswith('234'):
-        return '+' + digits
-    elif digits.startswith('0'):
-        return '+234' + digits[1:]
-    elif len(digits) == 10 and digits[0] in '789':
-        return '+234' + digits
-    
-    return phone
-
-def generate_token(user_id: str, email: str) -> str:
-    """Generate JWT-like token (simplified for demo)"""
-    import hashlib
-    payload = {
-        "user_id": user_id,
-        "email": email,
-        "exp": int(time.time()) + 86400  # 24 hours
-    }
-    token_data = json.dumps(payload, sort_keys=True)
-    return hashlib.sha256(token_data.encode()).hexdigest()
+    parsed = parse_phone(phone)
+    return parsed.e164 if parsed else phone
+
+def generate_token(user: Dict[str, Any]) -> str:
+    """Signed HS256 token carrying the user's public fields"""
+    return tokens.issue(user)
 
 def verify_token(token: str) -> Optional[Dict[str, Any]]:
-    """Verify token and return user data"""
+    """Claims of a valid, unrevoked token; no store lookup"""
     try:
-        # In a real implementation, you'd use proper JWT verification
-        # For demo purposes, we'll check if token exists in sessions_db
-        if token in sessions_db:
-            session = sessions_db[token]
-            if session["exp"] > int(time.time()):
-                return session["user"]
+        return tokens.verify(token)
+    except InvalidToken:
         return None
     except Exception as e:
         logger.error(f"Token verification error: {e}")
         return None
 
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt-like approach (simplified for demo)"""
-    import hashlib
-    salt = "callwaiting_salt_2024"
-    return hashlib.sha256((password + salt).encode()).hexdigest()
-
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash"""
-    return hash_password(password) == hashed
+def kdf_overloaded(e: KdfOverloaded) -> HTTPException:
+    """503 with Retry-After once the password hash pool and its queue are full"""
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-ins right now, please retry shortly",
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user"""
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Claims of the bearer token"""
     if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication required"
         )
     
-    user = verify_token(credentials.credentials)
-    if not user:
+    claims = verify_token(credentials.credentials)
+    if not claims:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
     
-    return user
+    return claims
+
+async def get_current_user(claims: dict = Depends(get_token_claims)):
+    """Get current authenticated user"""
+    return TokenSigner.user(claims)
 
 # Health check endpoint
 @app.get("/api/health")
@@ -201,11 +242,18 @@ async def health_check(request: Request):
         "environment": os.getenv("NODE_ENV", "development"),
         "version": "1.0.0",
         "checks": {
-            "database": "connected",  # Simplified for demo
+            "database": store.backend,
             "memory": "ok",
             "python_version": sys.version,
             "platform": sys.platform
         },
+        "storage": store.stats(),
+        "tokens": tokens.stats(),
+        "passwords": passwords.stats(),
+        "access_log": access_log.stats(),
+        "intents": intents.stats(),
+        "chat": chat.stats(),
+        "call_stats": call_stats.stats(),
         "request_id": getattr(request.state, 'request_id', 'unknown')
     }
     
@@ -234,16 +282,9 @@ async def register_user(user_data: UserRegister, request: Request):
         # Normalize phone number
         normalized_phone = normalize_nigerian_phone(user_data.phone)
         
-        # Check if user already exists
-        if user_data.email.lower() in users_db:
-            raise HTTPException(
-                status_code=409,
-                detail="User with this email already exists"
-            )
-        
-        # Create user
-        user_id = f"user_{int(time.time() * 1000)}"
-        hashed_password = hash_password(user_data.password)
+        # Create user; time-ordered and unique across workers even within one millisecond
+        user_id = request_ids.next('user')
+        hashed_password = await passwords.hash(user_data.password)
         
         user = {
             "id": user_id,
@@ -255,14 +296,16 @@ async def register_user(user_data: UserRegister, request: Request):
             "password_hash": hashed_password
         }
         
-        users_db[user_data.email.lower()] = user
+        try:
+            await store.create_user(user)
+        except DuplicateUser:
+            raise HTTPException(
+                status_code=409,
+                detail="User with this email already exists"
+            )
         
         # Generate token
-        token = generate_token(user_id, user_data.email.lower())
-        sessions_db[token] = {
-            "user": user,
-            "exp": int(time.time()) + 86400
-        }
+        token = generate_token(user)
         
         logger.info(f"✅ User registered: {user_data.email}")
         
@@ -284,6 +327,8 @@ async def register_user(user_data: UserRegister, request: Request):
         
     except HTTPException:
         raise
+    except KdfOverloaded as e:
+        raise kdf_overloaded(e)
     except Exception as e:
         logger.error(f"Registration error: {e}")
         raise HTTPException(status_code=500, detail="Registration failed")
@@ -295,7 +340,7 @@ async def login_user(login_data: UserLogin, request: Request):
         request_id = getattr(request.state, 'request_id', generate_request_id())
         
         # Find user
-        user = users_db.get(login_data.email.lower())
+        user = await store.user_by_email(login_data.email.lower())
         if not user:
             raise HTTPException(
                 status_code=401,
@@ -303,18 +348,22 @@ async def login_user(login_data: UserLogin, request: Request):
             )
         
         # Verify password
-        if not verify_password(login_data.password, user["password_hash"]):
+        if not await passwords.verify(login_data.password, user["password_hash"]):
             raise HTTPException(
                 status_code=401,
                 detail="Invalid email or password"
             )
         
+        # Upgrade legacy or lower-cost hashes now that the plain password is at hand
+        if passwords.needs_rehash(user["password_hash"]):
+            try:
+                await store.update_password_hash(user["id"], await passwords.hash(login_data.password))
+                logger.info(f"🔐 Password hash upgraded: {login_data.email}")
+            except Exception as e:
+                logger.warning(f"⚠️ Password rehash skipped for {login_data.email}: {e}")
+        
         # Generate token
-        token = generate_token(user["id"], user["email"])
-        sessions_db[token] = {
-            "user": user,
-            "exp": int(time.time()) + 86400
-        }
+        token = generate_token(user)
         
         logger.info(f"✅ User logged in: {login_data.email}")
         
@@ -336,6 +385,8 @@ async def login_user(login_data: UserLogin, request: Request):
         
     except HTTPException:
         raise
+    except KdfOverloaded as e:
+        raise kdf_overloaded(e)
     except Exception as e:
         logger.error(f"Login error: {e}")
         raise HTTPException(status_code=500, detail="Login failed")
@@ -352,6 +403,20 @@ async def verify_token_endpoint(current_user: dict = Depends(get_current_user),
         request_id=request_id
     )
 
+@app.post("/api/auth/logout", response_model=APIResponse)
+async def logout_user(claims: dict = Depends(get_token_claims), request: Request = None):
+    """Revoke the bearer token until it expires"""
+    request_id = getattr(request.state, 'request_id', generate_request_id()) if request else generate_request_id()
+    
+    tokens.revoke(claims)
+    logger.info(f"👋 User logged out: {claims['email']}")
+    
+    return APIResponse(
+        success=True,
+        message="Logged out",
+        request_id=request_id
+    )
+
 # Chat endpoints
 @app.get("/api/chat/config")
 async def chat_config(request: Request):
@@ -359,11 +424,11 @@ async def chat_config(request: Request):
     request_id = getattr(request.state, 'request_id', generate_request_id())
     
     return {
-        "groqApiKey": os.getenv("GROQ_API_KEY") if os.getenv("GROQ_API_KEY") else None,
         "ttsUrl": os.getenv("TTS_URL", "http://localhost:3001/v1/synthesize"),
         "features": {
             "voiceEnabled": bool(os.getenv("GROQ_API_KEY")),
-            "ttsEnabled": True
+            "ttsEnabled": True,
+            "streaming": chat.enabled
         },
         "request_id": request_id
     }
@@ -380,15 +445,28 @@ async def process_chat_message(message_data: ChatMessage, request: Request):
                 detail="Message is required"
             )
         
-        # Simple fallback response system
-        response = get_fallback_response(message_data.message)
+        if message_data.stream or "text/event-stream" in request.headers.get("accept", ""):
+            logger.info(f"💬 Chat stream started: {len(message_data.message)} chars, "
+                        f"{len(message_data.history or [])} history turns")
+            return StreamingResponse(
+                chat.stream(message_data.merchant_id, message_data.message, message_data.history or [], request_id),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        match = await intents.match(message_data.merchant_id, message_data.message)
         
-        logger.info(f"💬 Chat message processed: {len(message_data.message)} chars")
+        logger.info(f"💬 Chat message processed: {len(message_data.message)} chars, "
+                    f"intent {match.intent.name if match.intent else None} ({match.confidence})")
         
         return APIResponse(
             success=True,
             message="Message processed successfully",
-            data={"response": response},
+            data={
+                "response": match.reply,
+                "intent": match.intent.name if match.intent else None,
+                "confidence": match.confidence
+            },
             request_id=request_id
         )
         
@@ -398,41 +476,154 @@ async def process_chat_message(message_data: ChatMessage, request: Request):
         logger.error(f"Chat processing error: {e}")
         raise HTTPException(status_code=500, detail="Message processing failed")
 
-def get_fallback_response(message: str) -> str:
-    """Get fallback response when AI is not available"""
-    lower_message = message.lower()
+@app.get("/api/chat/intents", response_model=APIResponse)
+async def get_chat_intents(current_user: dict = Depends(get_current_user), request: Request = None):
+    """The intent table answering this merchant's chat"""
+    request_id = getattr(request.state, 'request_id', generate_request_id()) if request else generate_request_id()
+    revision, table = await intents.table(current_user["id"])
     
-    if 'hello' in lower_message or 'hi' in lower_message:
-        return "Hello! I'm CallWaiting.ai's assistant. How can I help you today?"
-    elif 'pricing' in lower_message or 'cost' in lower_message:
-        return "Our pricing starts at $29/month for the Starter plan. Would you like to see our full pricing options?"
-    elif 'demo' in lower_message or 'trial' in lower_message:
-        return "Great! You can start a free 7-day trial right now. Would you like me to help you get started?"
-    elif 'call' in lower_message or 'phone' in lower_message:
-        return "CallWaiting.ai automatically answers your calls and sends SMS follow-ups to missed callers. It helps you never miss a potential customer!"
-    else:
-        return "Thanks for your message! Our team will get back to you soon. In the meantime, you can check out our pricing or start a free trial."
+    return APIResponse(
+        success=True,
+        message="Intents retrieved",
+        data={"revision": revision, "source": "default" if revision is None else "merchant", **table},
+        request_id=request_id
+    )
 
-# Dashboard endpoints (placeholder)
-@app.get("/api/dashboard/stats")
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user), request: Request = None):
-    """Get dashboard statistics"""
+@app.put("/api/chat/intents", response_model=APIResponse)
+async def put_chat_intents(table: IntentTable, current_user: dict = Depends(get_current_user),
+                           request: Request = None):
+    """Replace this merchant's intent table"""
     request_id = getattr(request.state, 'request_id', generate_request_id()) if request else generate_request_id()
+    try:
+        revision = await intents.replace(current_user["id"], {
+            "intents": [rule.model_dump() for rule in table.intents],
+            "fallback": table.fallback,
+        })
+    except InvalidIntents as e:
+        raise HTTPException(status_code=400, detail=f"Invalid intents: {e}")
+    except ValueError as e:
+        # Too large for a shared-memory slot (memory store with API_WORKERS > 1)
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    logger.info(f"🧠 Intents saved for {current_user['id']}: {len(table.intents)} intents, revision {revision}")
+    
+    return APIResponse(
+        success=True,
+        message="Intents saved",
+        data={"revision": revision, "intents": len(table.intents)},
+        request_id=request_id
+    )
+
+# Contact endpoints
+@app.post("/api/contacts/import", response_model=APIResponse)
+async def import_contact_list(request: Request, current_user: dict = Depends(get_current_user)):
+    """Import a CSV contact list sent as the raw request body (Content-Type: text/csv)
+
+    The body is streamed, so uploads of any row count use constant memory. A
+    header row naming a phone column (phone, mobile, msisdn, ...) is optional;
+    without one the number is the first column.
+    """
+    request_id = getattr(request.state, 'request_id', generate_request_id())
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > CONTACTS_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"CSV is larger than {CONTACTS_MAX_BYTES} bytes")
+    try:
+        report = await import_contacts(store, current_user["id"], request.stream(), CONTACTS_MAX_BYTES,
+                                       batch_size=CONTACTS_BATCH_SIZE, max_errors=CONTACTS_MAX_ERRORS)
+    except ImportTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"{e}; rows before the limit were imported")
+    
+    report["total_contacts"] = await store.contact_count(current_user["id"])
+    return APIResponse(
+        success=True,
+        message=f"Imported {report['imported']} new contacts",
+        data=report,
+        request_id=request_id
+    )
+
+# Dashboard endpoints
+@app.post("/api/calls/events", response_model=APIResponse)
+async def record_call_event(event: CallEvent, request: Request, current_user: dict = Depends(get_current_user)):
+    """Record a call status update and fold it into the dashboard counters"""
+    request_id = getattr(request.state, 'request_id', generate_request_id())
+    timestamp = event.timestamp
+    if timestamp is not None and timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone(timedelta(seconds=call_stats.utc_offset)))
+    now = int(timestamp.timestamp()) if timestamp else int(time.time())
+    phone = parse_phone(event.phone_number) if event.phone_number else None
+    
+    call, revision = await call_stats.record(current_user["id"], {
+        "call_sid": event.call_sid,
+        "phone_number": phone.e164 if phone else event.phone_number,
+        "direction": event.direction,
+        "status": event.status,
+        "duration_seconds": event.duration_seconds,
+        "ai_response_type": event.ai_response_type,
+        "converted": event.converted,
+        "revenue_kobo": round(event.revenue_saved * 100) if event.revenue_saved is not None else None,
+        "started_at": now,
+        "updated_at": now,
+    })
+    
+    return APIResponse(
+        success=True,
+        message="Call event recorded",
+        data={"call_sid": call["call_sid"], "status": call["status"], "counted": contribution(call)[0] == 1,
+              "revision": revision},
+        request_id=request_id
+    )
+
+@app.get("/api/dashboard/stats", response_model=APIResponse)
+async def get_dashboard_stats(request: Request, response: Response,
+                              from_: Optional[str] = Query(None, alias="from"),
+                              to: Optional[str] = Query(None),
+                              series: Optional[Literal['hour', 'day']] = Query(None),
+                              current_user: dict = Depends(get_current_user)):
+    """Call counters for [from, to) (ISO 8601 or epoch seconds; the last 30 days by default)
+
+    Answered from hourly and daily pre-aggregates. The ETag changes only when
+    the merchant's counters or the range do; send it back in If-None-Match
+    to get 304 without the counters being read.
+    """
+    request_id = getattr(request.state, 'request_id', generate_request_id())
+    try:
+        start, end = call_stats.resolve_range(parse_time(from_, call_stats.utc_offset),
+                                              parse_time(to, call_stats.utc_offset), series)
+    except InvalidRange as e:
+        raise HTTPException(status_code=400, detail=f"Invalid range: {e}")
+    
+    merchant_id = current_user["id"]
+    etag = call_stats.etag(merchant_id, await call_stats.revision(merchant_id), start, end, series)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        call_stats.counters['not_modified'] += 1
+        return Response(status_code=304, headers=headers)
     
-    # TODO: Implement real dashboard statistics
+    data = await call_stats.summary(merchant_id, start, end, series)
+    response.headers.update(headers)
     return APIResponse(
         success=True,
         message="Dashboard stats retrieved",
         data={
-            "totalCalls": 0,
-            "answeredCalls": 0,
-            "missedCalls": 0,
-            "conversionRate": 0,
-            "revenueSaved": 0
+            "from": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+            "to": datetime.fromtimestamp(end, timezone.utc).isoformat(),
+            **data
         },
         request_id=request_id
     )
 
+@app.post("/api/dashboard/stats/rebuild", response_model=APIResponse)
+async def rebuild_dashboard_stats(request: Request, current_user: dict = Depends(get_current_user)):
+    """Recompute this merchant's counters from the call log"""
+    request_id = getattr(request.state, 'request_id', generate_request_id())
+    result = await call_stats.rebuild(current_user["id"])
+    return APIResponse(
+        success=True,
+        message="Dashboard stats rebuilt",
+        data=result,
+        request_id=request_id
+    )
+
 # Payment endpoints (placeholder)
 @app.post("/api/payments/create-checkout")
 async def create_checkout(current_user: dict = Depends(get_current_user), request: Request = None):
@@ -456,7 +647,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "error": True,
             "message": exc.detail,
             "request_id": request_id
-        }
+        },
+        headers=exc.headers
     )
 
 @app.exception_handler(Exception)
@@ -472,19 +664,66 @@ async def general_exception_handler(request: Request, exc: Exception):
         }
     )
 
+def run_workers(host: str, port: int, workers: int):
+    """Pre-fork workers that share the user table and the token denylist"""
+    global store
+    from callwaiting_common.prefork import run_workers as prefork
+    from callwaiting_common.shm import SharedTable
+    
+    # SQL stores are shared through the database; each worker opens its own connections
+    if isinstance(store, MemoryStore):
+        store = MemoryStore(
+            users=SharedTable(
+                # Two entries per user: by email and by ID
+                slots=int(os.getenv("API_SHARED_USER_SLOTS", "8192")),
+                slot_bytes=2048,
+            ),
+            intents=SharedTable(
+                # One whole intent table per merchant
+                slots=int(os.getenv("API_SHARED_INTENT_SLOTS", "256")),
+                slot_bytes=int(os.getenv("API_SHARED_INTENT_KB", "256")) * 1024,
+            ),
+        )
+        intents.store = store
+        call_stats.store = store
+        # Contact lists and call logs don't fit shared slots, so each stays with the worker that took it
+        logger.warning(f"⚠️ memory:// with {workers} workers: contacts are kept per worker, so contact counts "
+                       f"and duplicate checks only see that worker's imports; use sqlite:// or postgresql://")
+        logger.warning(f"⚠️ memory:// with {workers} workers: call logs and stat buckets are kept per worker, "
+                       f"so dashboard totals and ETags depend on which worker answers; "
+                       f"use sqlite:// or postgresql://")
+    # A logout on one worker must hold on all; entries expire with their tokens
+    tokens.denylist = SharedDenylist(SharedTable(
+        slots=int(os.getenv("API_SHARED_REVOKED_SLOTS", "65536")),
+        slot_bytes=64,
+    ))
+    
+    def make_server(index: int):
+        access_log.fields['worker'] = index
+        logger.info(f"👷 Worker {index} (pid {os.getpid()}) ready")
+        return uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="info",
+                                             access_log=not access_log.enabled))
+    
+    prefork(make_server, host, port, workers)
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 3001))
     host = "0.0.0.0"
+    workers = int(os.getenv("API_WORKERS", "1"))
     
     logger.info(f"🚀 Starting CallWaiting.ai API Server on {host}:{port}")
     logger.info(f"📊 Environment: {os.getenv('NODE_ENV', 'development')}")
     logger.info(f"🌍 CORS enabled for localhost and production domains")
     logger.info(f"⚡ Nigerian network optimizations enabled")
     
-    uvicorn.run(
-        app,
-        host=host,
-        port=port,
-        log_level="info",
-        access_log=True
-    )
+    if workers > 1:
+        run_workers(host, port, workers)
+    else:
+        uvicorn.run(
+            app,
+            host=host,
+            port=port,
+            log_level="info",
+            # uvicorn's own line per request only when ours is off
+            access_log=not access_log.enabled
+        )
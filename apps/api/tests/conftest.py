@@ -0,0 +1,14 @@
+"""
+API unit tests: python -m pytest tests (from apps/api)
+Async code runs under asyncio.run, so nothing beyond pytest is needed
+"""
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+# callwaiting_common, as server.py finds it
+sys.path.insert(0, os.path.join(HERE, '..', '..', '..', 'lib'))
+# Stand-in upstreams shared with the load test (bench/standin)
+sys.path.insert(0, os.path.join(HERE, '..', '..', '..', 'bench', 'standin'))
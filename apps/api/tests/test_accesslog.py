@@ -0,0 +1,195 @@
+"""Request IDs and the batched JSON access log, alone and as ASGI middleware"""
+
+import asyncio
+import io
+import json
+
+import pytest
+
+from callwaiting_common import accesslog
+from callwaiting_common.accesslog import AccessLog, AccessLogMiddleware, RequestIds, _parse_sampling
+from callwaiting_common.shm import _FORK
+
+
+class Clock:
+    """Stands in for the time module inside accesslog.py, for RequestIds.next()"""
+
+    def __init__(self, now: float = 1_741_561_200.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+class FailingStream(io.StringIO):
+    def write(self, text):
+        raise OSError('disk full')
+
+
+def records(stream: io.StringIO):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_ids_strictly_increase_even_when_the_clock_steps_back(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(accesslog, 'time', clock)
+    ids = RequestIds()
+    issued = [ids.next() for _ in range(3)]
+    clock.now -= 5
+    issued += [ids.next() for _ in range(3)]
+    clock.now += 10
+    issued.append(ids.next('user'))
+    assert all(i.startswith('req_') for i in issued[:-1]) and issued[-1].startswith('user_')
+    bodies = [i.split('_', 1)[1] for i in issued]
+    assert bodies == sorted(bodies) and len(set(bodies)) == len(bodies)
+    assert all(len(body) == 27 for body in bodies)
+
+
+def test_a_full_millisecond_borrows_the_next_one(monkeypatch):
+    monkeypatch.setattr(accesslog, 'time', Clock())
+    ids = RequestIds()
+    issued = [ids.next() for _ in range(0x10001)]
+    assert len(set(issued)) == len(issued) and issued == sorted(issued)
+    # The 65537th ID is stamped one millisecond later with its sequence back at zero
+    assert int(issued[-1][4:15], 16) == int(issued[0][4:15], 16) + 1
+    assert issued[-1].endswith('0000')
+
+
+def test_forked_workers_never_collide():
+    ids = RequestIds()
+    ids.next()
+    results = _FORK.Queue()
+
+    def worker():
+        results.put([ids.next() for _ in range(2000)])
+
+    processes = [_FORK.Process(target=worker) for _ in range(3)]
+    for process in processes:
+        process.start()
+    issued = [results.get(timeout=10) for _ in processes]
+    for process in processes:
+        process.join(10)
+    issued.append([ids.next() for _ in range(2000)])
+    everything = [i for batch in issued for i in batch]
+    assert len(set(everything)) == len(everything)
+    # Same node, a different pid per worker
+    assert len({batch[0][15:21] for batch in issued}) == 1
+    assert len({batch[0][21:27] for batch in issued}) == 4
+
+
+def test_parse_sampling():
+    assert _parse_sampling('/api/health=0.01, /metrics=0,/x=7,junk') == {'/api/health': 0.01, '/metrics': 0.0,
+                                                                        '/x': 1.0}
+    assert _parse_sampling('') == {}
+
+
+def test_records_are_written_in_batches_with_constant_fields():
+    stream = io.StringIO()
+    log = AccessLog(stream, batch_size=2, flush_seconds=60, fields={'service': 'api', 'worker': 1})
+
+    async def run():
+        log.start()
+        for i in range(5):
+            log.record(f'req-{i}', 'GET', '/api/x', 200, 0.0123, client='10.0.0.1')
+        # A full batch wakes the writer without waiting for the timer
+        await asyncio.sleep(0.05)
+        written_before_stop = len(stream.getvalue().splitlines())
+        await log.stop()
+        return written_before_stop
+
+    written_before_stop = asyncio.run(run())
+    assert written_before_stop >= 2
+    lines = records(stream)
+    assert [line['request_id'] for line in lines] == [f'req-{i}' for i in range(5)]
+    assert lines[0] == {'ts': lines[0]['ts'], 'request_id': 'req-0', 'method': 'GET', 'path': '/api/x',
+                        'status': 200, 'duration_ms': 12.3, 'service': 'api', 'worker': 1, 'client': '10.0.0.1'}
+    assert log.counters['written'] == 5 and log.counters['batches'] == 3
+    assert log.stats()['queued'] == 0
+
+
+def test_sampled_paths_keep_errors():
+    stream = io.StringIO()
+    log = AccessLog(stream, sampling={'/api/health': 0.0})
+    log.record('a', 'GET', '/api/health', 200, 0.001)
+    log.record('b', 'GET', '/api/health', 503, 0.001)
+    log.record('c', 'GET', '/api/other', 200, 0.001)
+    asyncio.run(log.flush())
+    assert [line['request_id'] for line in records(stream)] == ['b', 'c']
+    assert log.counters['sampled_out'] == 1
+
+
+def test_full_queue_drops_and_counts():
+    log = AccessLog(io.StringIO(), max_queue=2)
+    for i in range(5):
+        log.record(str(i), 'GET', '/', 200, 0.0)
+    assert log.counters['enqueued'] == 2 and log.counters['dropped'] == 3
+    assert log.stats()['record_us_avg'] is not None
+
+
+def test_write_errors_lose_the_batch_not_the_writer():
+    log = AccessLog(FailingStream(), batch_size=2)
+    for i in range(3):
+        log.record(str(i), 'GET', '/', 200, 0.0)
+    asyncio.run(log.flush())
+    assert log.counters['write_errors'] == 2 and log.counters['written'] == 0
+    assert log.stats()['queued'] == 0
+
+
+def test_disabled_log_records_nothing(monkeypatch, tmp_path):
+    monkeypatch.setenv('TEST_ACCESS_LOG', 'off')
+    log = AccessLog.from_env('TEST_ACCESS_LOG')
+    assert not log.enabled
+    log.record('a', 'GET', '/', 200, 0.0)
+    assert log.counters['enqueued'] == 0
+
+    path = tmp_path / 'logs' / 'access.log'
+    monkeypatch.setenv('TEST_ACCESS_LOG', str(path))
+    monkeypatch.setenv('TEST_ACCESS_LOG_SAMPLE', '/metrics=0')
+    to_file = AccessLog.from_env('TEST_ACCESS_LOG', service='gateway')
+    to_file.record('b', 'GET', '/metrics', 200, 0.0)
+    to_file.record('c', 'GET', '/v1/voices', 200, 0.0)
+    asyncio.run(to_file.stop())
+    to_file.stream.close()
+    assert [json.loads(line)['request_id'] for line in path.read_text().splitlines()] == ['c']
+
+
+def test_middleware_stamps_the_request_and_logs_the_response():
+    fastapi = pytest.importorskip('fastapi')
+    pytest.importorskip('httpx')
+    from fastapi.responses import StreamingResponse
+    from fastapi.testclient import TestClient
+
+    app = fastapi.FastAPI()
+    stream = io.StringIO()
+    log = AccessLog(stream)
+    app.add_middleware(AccessLogMiddleware, log=log)
+
+    @app.get('/echo')
+    async def echo(request: fastapi.Request):
+        return {'request_id': request.state.request_id}
+
+    @app.get('/stream')
+    async def streamed():
+        async def body():
+            for _ in range(3):
+                await asyncio.sleep(0.02)
+                yield b'x'
+        return StreamingResponse(body())
+
+    @app.get('/boom')
+    async def boom():
+        raise RuntimeError('boom')
+
+    with TestClient(app, raise_server_exceptions=False) as client:
+        echoed = client.get('/echo')
+        assert echoed.json()['request_id'] == echoed.headers['x-request-id']
+        assert float(echoed.headers['x-process-time']) >= 0
+        assert client.get('/stream').content == b'xxx'
+        assert client.get('/boom').status_code == 500
+    asyncio.run(log.flush())
+
+    lines = records(stream)
+    assert [(line['path'], line['status']) for line in lines] == [('/echo', 200), ('/stream', 200), ('/boom', 500)]
+    assert lines[0]['request_id'] == echoed.headers['x-request-id']
+    # Streamed responses are timed to their last chunk
+    assert lines[1]['duration_ms'] >= 50
@@ -0,0 +1,211 @@
+"""CallStats pieces: call contributions, local-midnight buckets, ranges, parse_time, and ETag/304 on the endpoint"""
+
+import asyncio
+import importlib
+
+import pytest
+
+from callwaiting_api.callstats import (DAY, HOUR, CallStats, InvalidRange, bucket_keys, contribution, day_start,
+                                       merge_call, parse_time)
+from callwaiting_api.storage import MemoryStore
+
+MERCHANT = 'merchant-1'
+WAT = 3600
+# Monday 2025-03-10 00:00 WAT, which is Sunday 23:00 UTC
+MONDAY = 1741561200
+
+
+def call(status, direction='inbound', **fields):
+    return merge_call(None, {'call_sid': 'CA1', 'status': status, 'direction': direction, 'started_at': MONDAY,
+                             **fields})
+
+
+def test_only_inbound_calls_in_a_final_status_count():
+    assert contribution(None) == (0, 0, 0, 0, 0)
+    assert contribution(call('ringing')) == (0, 0, 0, 0, 0)
+    assert contribution(call('completed', direction='outbound')) == (0, 0, 0, 0, 0)
+    assert contribution(call('completed')) == (1, 1, 0, 0, 0)
+    assert contribution(call('no-answer')) == (1, 0, 1, 0, 0)
+    assert contribution(call('completed', ai_response_type='order', revenue_kobo=5000)) == (1, 1, 0, 1, 5000)
+    assert contribution(call('completed', converted=True)) == (1, 1, 0, 1, 0)
+
+
+def test_later_events_update_the_row_but_not_its_start():
+    first = call('ringing', phone_number='+2348031234567')
+    later = merge_call(first, {'call_sid': 'CA1', 'status': 'completed', 'started_at': MONDAY + 600,
+                               'phone_number': None, 'duration_seconds': 42})
+    assert later['status'] == 'completed' and later['duration_seconds'] == 42
+    assert later['phone_number'] == '+2348031234567'
+    assert later['started_at'] == MONDAY
+
+
+def test_days_start_at_local_midnight():
+    assert day_start(MONDAY, WAT) == MONDAY
+    assert day_start(MONDAY - 1, WAT) == MONDAY - DAY
+    assert day_start(MONDAY + DAY - 1, WAT) == MONDAY
+    # In UTC the same instant is still Sunday
+    assert day_start(MONDAY, 0) == MONDAY - 23 * HOUR
+    assert bucket_keys(MONDAY - 1, WAT) == (('hour', MONDAY - HOUR), ('day', MONDAY - DAY))
+    assert bucket_keys(MONDAY, WAT) == (('hour', MONDAY), ('day', MONDAY))
+
+
+def test_offset_must_be_whole_hours():
+    with pytest.raises(ValueError):
+        CallStats(MemoryStore(), utc_offset_minutes=30)
+
+
+def summarize(events, queries, utc_offset_minutes=60):
+    async def body():
+        store = MemoryStore()
+        await store.open()
+        stats = CallStats(store, utc_offset_minutes=utc_offset_minutes)
+        for sid, started in events:
+            await stats.record(MERCHANT, {'call_sid': sid, 'status': 'completed', 'direction': 'inbound',
+                                          'started_at': started})
+        results = []
+        for start, end, series in queries:
+            before = stats.counters['buckets_read']
+            summary = await stats.summary(MERCHANT, start, end, series)
+            results.append((summary, stats.counters['buckets_read'] - before))
+        await store.close()
+        return results
+    return asyncio.run(body())
+
+
+# Calls on either side of Monday's and Tuesday's local midnights
+EDGE_CALLS = [('sun-late', MONDAY - 1), ('mon-early', MONDAY), ('mon-late', MONDAY + DAY - 1),
+              ('tue-early', MONDAY + DAY), ('tue-noon', MONDAY + DAY + 12 * HOUR)]
+
+
+def test_whole_local_day_is_read_from_its_day_bucket():
+    [(summary, read)] = summarize(EDGE_CALLS, [(MONDAY, MONDAY + DAY, None)])
+    assert summary['totalCalls'] == 2
+    assert read == 1
+
+
+def test_partial_days_at_the_edges_are_read_from_hours():
+    # Sunday 23:00 to Tuesday 01:00: one hour, Monday's day bucket, one hour
+    [(summary, read)] = summarize(EDGE_CALLS, [(MONDAY - HOUR, MONDAY + DAY + HOUR, None)])
+    assert summary['totalCalls'] == 4
+    assert read == 3
+
+
+def test_range_inside_one_day_uses_hours_only():
+    [(summary, read)] = summarize(EDGE_CALLS, [(MONDAY + DAY - HOUR, MONDAY + DAY + 13 * HOUR, None)])
+    assert summary['totalCalls'] == 3
+    assert read == 3
+
+
+def test_day_series_covers_whole_local_days():
+    [(summary, _)] = summarize(EDGE_CALLS, [(MONDAY + 6 * HOUR, MONDAY + DAY + HOUR, 'day')])
+    assert summary['totalCalls'] == 2
+    assert [(point['start'], point['totalCalls']) for point in summary['series']] == [(MONDAY, 2), (MONDAY + DAY, 2)]
+
+
+def test_utc_days_split_the_same_calls_differently():
+    [(summary, _)] = summarize(EDGE_CALLS, [(MONDAY - 23 * HOUR, MONDAY + DAY + HOUR, 'day')], utc_offset_minutes=0)
+    # Sunday in UTC runs to Monday 01:00 WAT: sun-late and mon-early
+    assert [(point['start'], point['totalCalls']) for point in summary['series']] == [(MONDAY - 23 * HOUR, 2),
+                                                                                      (MONDAY + HOUR, 2)]
+
+
+def test_range_is_widened_to_whole_hours():
+    stats = CallStats(MemoryStore())
+    assert stats.resolve_range(MONDAY + 10, MONDAY + HOUR + 10) == (MONDAY, MONDAY + 2 * HOUR)
+    start, end = stats.resolve_range(None, MONDAY)
+    assert (start, end) == (MONDAY - 30 * DAY, MONDAY)
+
+
+@pytest.mark.parametrize('start, end, series, reason', [
+    (MONDAY, MONDAY, None, 'after'),
+    (MONDAY + HOUR, MONDAY, None, 'after'),
+    (MONDAY, MONDAY + 11 * DAY, None, 'at most 10 days'),
+    (MONDAY, MONDAY + 5 * DAY, 'hour', 'at most 100 hours'),
+])
+def test_bad_ranges_are_refused(start, end, series, reason):
+    stats = CallStats(MemoryStore(), max_range_days=10, max_series_points=100)
+    with pytest.raises(InvalidRange, match=reason):
+        stats.resolve_range(start, end, series)
+
+
+def test_limits_are_inclusive():
+    stats = CallStats(MemoryStore(), max_range_days=10, max_series_points=100)
+    assert stats.resolve_range(MONDAY, MONDAY + 10 * DAY, 'day') == (MONDAY, MONDAY + 10 * DAY)
+    assert stats.resolve_range(MONDAY, MONDAY + 100 * HOUR, 'hour') == (MONDAY, MONDAY + 100 * HOUR)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('', None),
+    ('1741561200', MONDAY),
+    # No zone: local time
+    ('2025-03-10T00:00:00', MONDAY),
+    ('2025-03-10', MONDAY),
+    ('2025-03-09T23:00:00Z', MONDAY),
+    ('2025-03-10T01:00:00+03:00', MONDAY - HOUR),
+])
+def test_parse_time(value, expected):
+    assert parse_time(value, WAT) == expected
+
+
+def test_parse_time_rejects_other_text():
+    with pytest.raises(InvalidRange):
+        parse_time('last tuesday', WAT)
+
+
+def test_etag_follows_revision_range_and_series():
+    stats = CallStats(MemoryStore())
+    tag = stats.etag(MERCHANT, 3, MONDAY, MONDAY + DAY, None)
+    assert tag.startswith('W/"') and tag == stats.etag(MERCHANT, 3, MONDAY, MONDAY + DAY, None)
+    others = {stats.etag(MERCHANT, 4, MONDAY, MONDAY + DAY, None), stats.etag('m2', 3, MONDAY, MONDAY + DAY, None),
+              stats.etag(MERCHANT, 3, MONDAY, MONDAY + 2 * DAY, None), stats.etag(MERCHANT, 3, MONDAY, MONDAY + DAY,
+                                                                                    'hour')}
+    assert tag not in others and len(others) == 4
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The API app on a fresh memory store, every request signed in as MERCHANT"""
+    pytest.importorskip('fastapi')
+    pytest.importorskip('httpx')
+    from fastapi.testclient import TestClient
+    monkeypatch.setenv('API_DATABASE_URL', 'memory://')
+    monkeypatch.setenv('API_ACCESS_LOG', '')
+    server = importlib.import_module('server')
+    monkeypatch.setattr(server, 'store', MemoryStore())
+    monkeypatch.setattr(server.call_stats, 'store', server.store)
+    server.app.dependency_overrides[server.get_current_user] = lambda: {'id': MERCHANT}
+    with TestClient(server.app, base_url='http://localhost') as client:
+        yield client
+    server.app.dependency_overrides.clear()
+
+
+def test_dashboard_stats_answers_304_until_a_call_changes_them(api):
+    query = {'from': '2025-03-10', 'to': '2025-03-11'}
+    first = api.get('/api/dashboard/stats', params=query)
+    assert first.status_code == 200 and first.json()['data']['totalCalls'] == 0
+    etag = first.headers['etag']
+
+    unchanged = api.get('/api/dashboard/stats', params=query, headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304 and unchanged.headers['etag'] == etag and not unchanged.content
+    # Another range has its own tag
+    other = api.get('/api/dashboard/stats', params={**query, 'series': 'hour'}, headers={'If-None-Match': etag})
+    assert other.status_code == 200
+
+    recorded = api.post('/api/calls/events', json={'call_sid': 'CA1', 'status': 'completed', 'direction': 'inbound',
+                                                   'timestamp': '2025-03-10T09:00:00'})
+    assert recorded.status_code == 200 and recorded.json()['data']['counted']
+    changed = api.get('/api/dashboard/stats', params=query, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['etag'] != etag
+    assert changed.json()['data']['totalCalls'] == 1
+
+    # A ringing update changes no counter, so the new tag still holds
+    api.post('/api/calls/events', json={'call_sid': 'CA2', 'status': 'ringing', 'timestamp': '2025-03-10T10:00:00'})
+    assert api.get('/api/dashboard/stats', params=query,
+                   headers={'If-None-Match': changed.headers['etag']}).status_code == 304
+
+
+def test_dashboard_stats_rejects_bad_ranges(api):
+    assert api.get('/api/dashboard/stats', params={'from': '2025-03-11', 'to': '2025-03-10'}).status_code == 400
+    assert api.get('/api/dashboard/stats', params={'from': 'yesterday'}).status_code == 400
+    assert api.get('/api/dashboard/stats', params={'from': '2020-01-01', 'to': '2025-01-01'}).status_code == 400
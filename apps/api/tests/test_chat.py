@@ -0,0 +1,199 @@
+"""ChatProxy against the OpenAI-compatible stand-in (bench/standin/openai_llm.py) on a local port"""
+
+import json
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+uvicorn = pytest.importorskip('uvicorn')
+pytest.importorskip('httpx')
+pytest.importorskip('fastapi')
+
+import openai_llm  # noqa: E402
+from callwaiting_api.chat import ChatProxy, LLMClient, ResponseCache, semantic_key  # noqa: E402
+from callwaiting_api.intents import DEFAULT_INTENTS_PATH, IntentCatalog, load_default_table  # noqa: E402
+from callwaiting_api.storage import MemoryStore  # noqa: E402
+
+PRICING_REPLY = "Our pricing starts at $29/month for the Starter plan. Would you like to see our full pricing options?"
+
+
+@pytest.fixture(scope='module')
+def llm_url():
+    server = uvicorn.Server(uvicorn.Config(openai_llm.app, host='127.0.0.1', port=0, log_level='warning',
+                                           access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "LLM stand-in did not start"
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/v1"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """Fast, short, reliable replies unless a test says otherwise"""
+    settings = {'FAKE_LLM_FIRST_TOKEN_MS': '0', 'FAKE_LLM_TOKEN_MS': '0', 'FAKE_LLM_TOKENS': '5',
+                'FAKE_LLM_FAIL_RATE': '0', 'FAKE_LLM_BREAK_AFTER': '0'}
+    for name, value in settings.items():
+        monkeypatch.setenv(name, value)
+    return monkeypatch
+
+
+def make_proxy(url, first_token_seconds: float = 2.0) -> ChatProxy:
+    intents = IntentCatalog(MemoryStore(), load_default_table(DEFAULT_INTENTS_PATH))
+    llm = LLMClient(url, model='standin', max_connections=4) if url else None
+    return ChatProxy(llm, intents, ResponseCache(), first_token_seconds=first_token_seconds)
+
+
+async def ask(proxy: ChatProxy, message: str, history=()) -> List[Tuple[str, Dict[str, Any]]]:
+    events = []
+    async for chunk in proxy.stream(None, message, list(history), 'req-test'):
+        for block in chunk.decode('utf-8').split('\n\n'):
+            if block:
+                name, data = block.split('\n')
+                events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def answer(events) -> str:
+    return ''.join(payload['text'] for name, payload in events if name == 'token')
+
+
+def run(proxy: ChatProxy, body):
+    async def main():
+        try:
+            return await body()
+        finally:
+            await proxy.close()
+    return asyncio.run(main())
+
+
+def test_llm_tokens_are_forwarded_then_cached(llm_url, standin):
+    proxy = make_proxy(llm_url)
+    requests_before = openai_llm._counters['requests']
+
+    async def body():
+        first = await ask(proxy, "How much does it cost?")
+        # Same content words, different phrasing: answered from the cache
+        second = await ask(proxy, "cost, how much??")
+        return first, second
+
+    first, second = run(proxy, body)
+    assert first[0] == ('meta', {'request_id': 'req-test', 'source': 'llm'})
+    assert [name for name, _ in first[1:]] == ['token'] * 5 + ['done']
+    assert answer(first) == ' '.join(openai_llm.WORDS[:5])
+    assert second[0][1]['source'] == 'cache'
+    assert answer(second) == answer(first)
+    assert openai_llm._counters['requests'] - requests_before == 1
+    assert proxy.counters['from_llm'] == 1 and proxy.counters['from_cache'] == 1
+
+
+def test_different_questions_get_different_cache_keys():
+    questions = ["When can I call you?", "How can I call you?", "Why should I call you?",
+                 "Where can I call you?", "Who can I call?", "Can I cancel?", "Can't I cancel?",
+                 "Is there a setup fee?", "Is there no setup fee?"]
+    keys = [semantic_key(q) for q in questions]
+    assert len(set(keys)) == len(questions), dict(zip(questions, keys))
+    # Rewordings of one question still share a key
+    assert semantic_key("How much does it cost?") == semantic_key("cost, how much??")
+    assert semantic_key("the and a") is None
+
+
+def test_questions_that_differ_only_by_question_word_each_go_upstream(llm_url, standin):
+    proxy = make_proxy(llm_url)
+
+    async def body():
+        return [await ask(proxy, q) for q in ("When can I call you?", "How can I call you?", "Why should I call you?")]
+
+    replies = run(proxy, body)
+    assert [events[0][1]['source'] for events in replies] == ['llm', 'llm', 'llm']
+    assert proxy.cache.stats()['entries'] == 3
+
+
+def test_questions_with_history_are_not_cached(llm_url, standin):
+    proxy = make_proxy(llm_url)
+    history = [{'sender': 'user', 'content': 'Hi'}, {'sender': 'assistant', 'content': 'Hello!'}]
+
+    async def body():
+        return [await ask(proxy, "How much does it cost?", history) for _ in range(2)]
+
+    replies = run(proxy, body)
+    assert [events[0][1]['source'] for events in replies] == ['llm', 'llm']
+    assert proxy.cache.stats()['entries'] == 0
+
+
+def test_slow_first_token_falls_back_to_the_intent_reply(llm_url, standin):
+    standin.setenv('FAKE_LLM_FIRST_TOKEN_MS', '1000')
+    proxy = make_proxy(llm_url, first_token_seconds=0.1)
+
+    async def body():
+        started = time.perf_counter()
+        events = await ask(proxy, "What are your prices?")
+        return events, time.perf_counter() - started
+
+    events, elapsed = run(proxy, body)
+    assert events[0][1]['source'] == 'intent'
+    assert events[0][1]['reason'] == 'slow'
+    assert events[0][1]['intent'] == 'pricing'
+    assert answer(events) == PRICING_REPLY
+    assert events[-1] == ('done', {'source': 'intent'})
+    assert elapsed < 0.8
+    assert proxy.counters['fallback_slow'] == 1
+    assert proxy.cache.stats()['entries'] == 0
+
+
+def test_upstream_error_falls_back_to_the_intent_reply(llm_url, standin):
+    standin.setenv('FAKE_LLM_FAIL_RATE', '1')
+    proxy = make_proxy(llm_url)
+
+    events = run(proxy, lambda: ask(proxy, "What are your prices?"))
+    assert events[0][1]['reason'] == 'error'
+    assert answer(events) == PRICING_REPLY
+    assert proxy.counters['fallback_error'] == 1
+    assert proxy.llm.counters['errors'] == 1
+
+
+def test_stream_broken_midway_ends_with_an_error_event(llm_url, standin):
+    standin.setenv('FAKE_LLM_TOKENS', '10')
+    standin.setenv('FAKE_LLM_BREAK_AFTER', '3')
+    proxy = make_proxy(llm_url)
+
+    async def body():
+        broken = await ask(proxy, "Tell me about missed calls")
+        # The partial answer was not cached, so the next ask goes upstream again
+        again = await ask(proxy, "Tell me about missed calls")
+        return broken, again
+
+    broken, again = run(proxy, body)
+    assert [name for name, _ in broken] == ['meta'] + ['token'] * 3 + ['error']
+    assert answer(broken) == ' '.join(openai_llm.WORDS[:3])
+    assert again[0][1]['source'] == 'llm'
+    assert proxy.counters['failed_midstream'] == 2
+
+
+def test_sequential_requests_reuse_one_connection(llm_url, standin):
+    proxy = make_proxy(llm_url)
+    connections_before = len(openai_llm._connections)
+
+    async def body():
+        for i in range(8):
+            await ask(proxy, f"question number {i} about bookings")
+
+    run(proxy, body)
+    assert proxy.llm.counters['requests'] == 8
+    assert len(openai_llm._connections) - connections_before == 1
+
+
+def test_without_an_llm_every_answer_is_an_intent_reply():
+    proxy = make_proxy(None)
+    events = run(proxy, lambda: ask(proxy, "What are your prices?"))
+    assert events[0][1]['reason'] == 'disabled'
+    assert answer(events) == PRICING_REPLY
+    assert not proxy.enabled
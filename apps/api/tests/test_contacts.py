@@ -0,0 +1,145 @@
+"""parse_phone on every accepted shape, and streamed CSV contact imports (ContactImport / import_contacts)"""
+
+import asyncio
+
+import pytest
+
+from callwaiting_api.contacts import ImportTooLarge, import_contacts
+from callwaiting_api.phones import parse_phone
+from callwaiting_api.storage import MemoryStore
+
+MERCHANT = 'merchant-1'
+
+
+@pytest.mark.parametrize('raw', ['+2348031234567', '2348031234567', '08031234567', '8031234567',
+                                 '+234 (0) 803 123 4567', '+234(0)8031234567', '234 0803 123 4567',
+                                 '0803-123-4567', '0803.123.4567', '(0803) 123 4567', '\t0803 123 4567 '])
+def test_every_accepted_shape_gives_one_number(raw):
+    assert parse_phone(raw) == ('+2348031234567', 'mtn')
+
+
+@pytest.mark.parametrize('raw', ['', 'abc', '0803123456', '080312345678', '06031234567', '08231234567',
+                                 '+1 803 123 4567', '+44 7911 123456', '2340803123456', '0803 123 456x', '+0803'])
+def test_other_input_is_not_a_nigerian_mobile(raw):
+    assert parse_phone(raw) is None
+
+
+@pytest.mark.parametrize('number, network', [
+    ('08021234567', 'airtel'), ('08051234567', 'glo'), ('09091234567', '9mobile'), ('09131234567', 'mtn'),
+    # Four-digit allocations win over their three-digit prefix
+    ('07025123456', 'mtn'), ('07026123456', 'mtn'), ('07021234567', 'unknown'), ('07041234567', 'mtn'),
+])
+def test_network_comes_from_the_longest_prefix(number, network):
+    assert parse_phone(number).network == network
+
+
+async def chunks_of(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def run_import(data: bytes, chunk_size: int = 1 << 16, store=None, **options):
+    store = store or MemoryStore()
+
+    async def body():
+        await store.open()
+        try:
+            options.setdefault('max_bytes', 1 << 20)
+            report = await import_contacts(store, MERCHANT, chunks_of(data, chunk_size), **options)
+            return report, await store.contact_count(MERCHANT)
+        finally:
+            await store.close()
+    return asyncio.run(body())
+
+
+CSV = ('name,phone\n'
+       '"Ada, Lagos office",0803 123 4567\n'
+       '"Chidi ""CJ""\nsecond line",+2348021234567\n'
+       'Bad,12345\n'
+       'Ada again,+234 (0) 803 123 4567\n'
+       ',\n'
+       'Ngozi,09091234567\n')
+
+
+def test_header_columns_quotes_dedupe_and_error_rows():
+    report, count = run_import(CSV.encode())
+    assert {key: report[key] for key in ('rows', 'valid', 'invalid', 'duplicates', 'imported', 'existing')} == {
+        'rows': 5, 'valid': 4, 'invalid': 1, 'duplicates': 1, 'imported': 3, 'existing': 0}
+    # Row 1 is the header; the quoted name spanning two lines is one record, so Bad is row 4
+    assert report['errors'] == [{'row': 4, 'value': '12345', 'error': 'not a Nigerian mobile number'}]
+    assert report['networks'] == {'mtn': 1, 'airtel': 1, '9mobile': 1}
+    assert count == 3
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 16])
+def test_records_split_across_chunks_parse_the_same(chunk_size):
+    data = ('﻿' + CSV.replace('\n', '\r\n') + 'Émeka,08051234567').encode('utf-8')
+    report, count = run_import(data, chunk_size=chunk_size)
+    assert (report['rows'], report['imported'], report['duplicates']) == (6, 4, 1)
+    assert report['errors'][0]['row'] == 4
+    assert report['bytes'] == len(data)
+    assert count == 4
+
+
+def test_names_keep_their_quotes_and_line_breaks():
+    store = MemoryStore()
+    run_import(CSV.replace('\n', '\r\n').encode(), chunk_size=5, store=store)
+    names = {phone: name for phone, (name, _, _) in store.contacts[MERCHANT].items()}
+    assert names == {'+2348031234567': 'Ada, Lagos office', '+2348021234567': 'Chidi "CJ"\r\nsecond line',
+                     '+2349091234567': 'Ngozi'}
+
+
+def test_bom_before_the_header_is_dropped():
+    report, _ = run_import('﻿Phone Number,Full Name\n08031234567,Ada\n'.encode('utf-8'), chunk_size=1)
+    assert (report['rows'], report['imported'], report['invalid']) == (1, 1, 0)
+
+
+def test_without_a_header_the_first_column_is_the_number():
+    report, count = run_import(b'08031234567,Ada\n08021234567\nnot-a-number,Bob\n')
+    assert (report['rows'], report['imported'], report['invalid']) == (3, 2, 1)
+    assert report['errors'][0]['row'] == 3
+    assert count == 2
+
+
+def test_header_picks_the_phone_column_wherever_it_is():
+    report, _ = run_import(b'id,customer,msisdn\n1,Ada,08031234567\n2,Bob\n')
+    assert (report['rows'], report['imported']) == (2, 1)
+    assert report['errors'] == [{'row': 3, 'value': '', 'error': 'no phone column'}]
+
+
+def test_numbers_the_merchant_already_has_count_as_existing():
+    store = MemoryStore()
+
+    async def body():
+        await store.open()
+        first = await import_contacts(store, MERCHANT, chunks_of(b'08031234567\n08021234567\n', 4), 1 << 20)
+        second = await import_contacts(store, MERCHANT, chunks_of(b'08031234567\n09091234567\n', 4), 1 << 20,
+                                       batch_size=1)
+        return first, second, await store.contact_count(MERCHANT)
+
+    first, second, count = asyncio.run(body())
+    assert first['imported'] == 2
+    assert (second['imported'], second['existing']) == (1, 1)
+    assert count == 3
+
+
+def test_errors_listed_are_capped():
+    report, _ = run_import(b''.join(b'bad%d\n' % i for i in range(10)), max_errors=3)
+    assert report['invalid'] == 10
+    assert [error['row'] for error in report['errors']] == [1, 2, 3]
+    assert report['errors_truncated']
+
+
+def test_upload_over_the_limit_raises_and_keeps_written_batches():
+    store = MemoryStore()
+    data = b''.join(b'080312345%02d\n' % i for i in range(50))
+
+    async def body():
+        await store.open()
+        with pytest.raises(ImportTooLarge):
+            await import_contacts(store, MERCHANT, chunks_of(data, 120), max_bytes=400, batch_size=5)
+        return await store.contact_count(MERCHANT)
+
+    count = asyncio.run(body())
+    # Three 10-row chunks were in before the fourth crossed 400 bytes; their batches stay imported
+    assert count == 30
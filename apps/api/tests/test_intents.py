@@ -0,0 +1,158 @@
+"""IntentMatcher (word automaton, priority then confidence) and IntentCatalog's revision-based refresh"""
+
+import asyncio
+
+import pytest
+
+from callwaiting_api.intents import (DEFAULT_INTENTS_PATH, IntentCatalog, IntentMatcher, InvalidIntents,
+                                     MAX_PATTERN_WORDS, load_default_table, tokenize, validate_table)
+from callwaiting_api.storage import MemoryStore
+
+
+def table(*intents, fallback='Sorry?'):
+    return validate_table({'intents': [{'name': name, 'patterns': list(patterns), 'reply': f"{name} reply",
+                                        'priority': priority} for name, patterns, priority in intents],
+                           'fallback': fallback})
+
+
+def test_tokenize_keeps_apostrophes_with_their_word():
+    assert tokenize("What's the PRICE? Don't-know, 24/7") == ["what's", 'the', 'price', "don't", 'know', '24', '7']
+
+
+def test_phrases_match_whole_words_only():
+    matcher = IntentMatcher(table(('greeting', ['hi'], 0)))
+    assert matcher.match("Hi there").intent.name == 'greeting'
+    # "hi" inside "this" and "chip" is not a greeting
+    result = matcher.match("this chip")
+    assert result.intent is None
+    assert result.reply == 'Sorry?' and result.confidence == 0.0
+
+
+def test_overlapping_phrases_are_all_found():
+    # "free trial price" needs the failure links: after "free trial" the automaton must still see "trial price"
+    matcher = IntentMatcher(table(('trial', ['free trial'], 0), ('trial-price', ['trial price'], 1),
+                                  ('free', ['free'], 0)))
+    assert matcher.match("free trial price").intent.name == 'trial-price'
+    assert matcher.match("is the free trial really free").intent.name == 'trial'
+
+
+def test_suffix_phrase_inside_a_longer_one_is_reported():
+    matcher = IntentMatcher(table(('long', ['how much does it cost'], 0), ('cost', ['cost'], 1)))
+    assert matcher.match("how much does it cost").intent.name == 'cost'
+
+
+def test_priority_beats_confidence():
+    matcher = IntentMatcher(table(('greeting', ['hello', 'good morning'], 0), ('pricing', ['price'], 10)))
+    result = matcher.match("good morning hello what price")
+    assert result.intent.name == 'pricing'
+    assert result.confidence == pytest.approx(1 / 5, abs=0.001)
+
+
+def test_confidence_is_the_share_of_words_covered_and_breaks_ties():
+    matcher = IntentMatcher(table(('calls', ['missed call'], 5), ('trial', ['free trial', 'demo'], 5)))
+    result = matcher.match("free trial demo about a missed call")
+    # trial covers free, trial, demo (3 of 7); calls covers missed, call (2 of 7)
+    assert result.intent.name == 'trial'
+    assert result.confidence == pytest.approx(3 / 7, abs=0.001)
+
+
+def test_equal_priority_and_confidence_goes_to_the_earlier_intent():
+    matcher = IntentMatcher(table(('first', ['price'], 0), ('second', ['cost'], 0)))
+    assert matcher.match("cost or price").intent.name == 'first'
+
+
+def test_default_table_matches_the_widget_questions():
+    matcher = IntentMatcher(load_default_table(DEFAULT_INTENTS_PATH))
+    assert matcher.match("How much does it cost?").intent.name == 'pricing'
+    assert matcher.match("Can I get a free trial?").intent.name == 'trial'
+    assert matcher.match("hello").intent.name == 'greeting'
+    assert matcher.match("xyz").intent is None
+
+
+@pytest.mark.parametrize('bad, reason', [
+    ({'intents': []}, 'non-empty'),
+    ({'intents': [{'name': 'a', 'patterns': 'price', 'reply': 'r'}]}, 'name, patterns'),
+    ({'intents': [{'name': 'a', 'patterns': ['x'], 'reply': 'r', 'priority': 'high'}]}, 'integer priority'),
+    ({'intents': [{'name': 'a', 'patterns': ['x'], 'reply': 'r'}, {'name': 'a', 'patterns': ['y'], 'reply': 'r'}]},
+     'duplicate'),
+    ({'intents': [{'name': 'a', 'patterns': ['?!'], 'reply': 'r'}]}, 'no words'),
+    ({'intents': [{'name': 'a', 'patterns': [' '.join(['w'] * (MAX_PATTERN_WORDS + 1))], 'reply': 'r'}]},
+     'longer than'),
+])
+def test_invalid_tables_say_why(bad, reason):
+    with pytest.raises(InvalidIntents, match=reason):
+        validate_table(bad)
+
+
+def test_catalog_rebuilds_only_when_the_revision_changes():
+    async def body():
+        store = MemoryStore()
+        default = table(('default', ['price'], 0))
+        saver = IntentCatalog(store, default, refresh_seconds=0)
+        reader = IntentCatalog(store, default, refresh_seconds=0)
+
+        # No table yet: the default, and nothing compiled
+        assert (await reader.match('m1', 'price')).intent.name == 'default'
+        assert reader.counters['builds'] == 0
+
+        await saver.replace('m1', table(('custom', ['price'], 0)))
+        assert saver.counters['builds'] == 1
+        assert (await reader.match('m1', 'price')).intent.name == 'custom'
+        assert (await reader.match('m1', 'price')).intent.name == 'custom'
+        # Two revision checks, one build: the second saw the same revision
+        assert reader.counters['builds'] == 1
+        assert reader.counters['revision_checks'] == 3
+
+        await saver.replace('m1', table(('updated', ['price'], 0)))
+        assert (await reader.match('m1', 'price')).intent.name == 'updated'
+        assert reader.counters['builds'] == 2
+        # Merchants without a table and requests without one both get the default
+        assert (await reader.match(None, 'price')).intent.name == 'default'
+        return reader
+
+    reader = asyncio.run(body())
+    assert reader.stats()['matched'] == 5
+
+
+def test_catalog_checks_revisions_at_most_every_refresh_seconds():
+    async def body():
+        store = MemoryStore()
+        default = table(('default', ['price'], 0))
+        saver = IntentCatalog(store, default, refresh_seconds=0)
+        reader = IntentCatalog(store, default, refresh_seconds=3600)
+        await saver.replace('m1', table(('custom', ['price'], 0)))
+        assert (await reader.match('m1', 'price')).intent.name == 'custom'
+        await saver.replace('m1', table(('updated', ['price'], 0)))
+        # Still within refresh_seconds: the cached matcher answers without asking the store
+        assert (await reader.match('m1', 'price')).intent.name == 'custom'
+        assert reader.counters['revision_checks'] == 1
+        # The worker that saved it rebuilt at once
+        assert (await saver.match('m1', 'price')).intent.name == 'updated'
+
+    asyncio.run(body())
+
+
+def test_catalog_evicts_the_least_recently_used_merchant():
+    async def body():
+        store = MemoryStore()
+        catalog = IntentCatalog(store, table(('default', ['price'], 0)), max_cached=2)
+        for merchant in ('m1', 'm2', 'm3'):
+            await catalog.replace(merchant, table((merchant, ['price'], 0)))
+        assert catalog.stats()['cached'] == 2
+        assert catalog.counters['evictions'] == 1
+        # m1 was evicted, so it is loaded and compiled again
+        assert (await catalog.match('m1', 'price')).intent.name == 'm1'
+        assert catalog.counters['builds'] == 4
+
+    asyncio.run(body())
+
+
+def test_invalid_table_is_rejected_before_it_is_saved():
+    async def body():
+        store = MemoryStore()
+        catalog = IntentCatalog(store, table(('default', ['price'], 0)))
+        with pytest.raises(InvalidIntents):
+            await catalog.replace('m1', {'intents': [{'name': 'a', 'patterns': [], 'reply': 'r', 'priority': 'x'}]})
+        assert await store.intents_revision('m1') is None
+
+    asyncio.run(body())
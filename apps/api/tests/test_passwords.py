@@ -0,0 +1,139 @@
+"""Password hashing: scrypt format and verification, legacy hashes and rehash, and overload shedding"""
+
+import asyncio
+import hashlib
+import importlib
+import threading
+
+import pytest
+
+from callwaiting_api.passwords import KdfOverloaded, PasswordHasher, _LEGACY_SALT
+from callwaiting_api.storage import MemoryStore
+
+# Cheap cost parameters so the tests don't spend their time in scrypt
+FAST = {'n': 2 ** 4, 'r': 1, 'p': 1}
+
+
+def legacy_hash(password: str) -> str:
+    return hashlib.sha256((password + _LEGACY_SALT).encode()).hexdigest()
+
+
+def run(hasher: PasswordHasher, body):
+    async def main():
+        try:
+            return await body()
+        finally:
+            hasher.close()
+    return asyncio.run(main())
+
+
+def test_hashes_record_their_parameters_and_verify():
+    hasher = PasswordHasher(**FAST)
+
+    async def body():
+        first, second = await hasher.hash('correct horse'), await hasher.hash('correct horse')
+        return first, second, [await hasher.verify(password, first) for password in ('correct horse', 'wrong')]
+
+    first, second, results = run(hasher, body)
+    assert first.startswith('scrypt$16$1$1$')
+    # A fresh salt each time
+    assert first != second
+    assert results == [True, False]
+    assert not hasher.needs_rehash(first)
+    assert hasher.counters['hashed'] == 2 and hasher.counters['verified'] == 1 and hasher.counters['mismatches'] == 1
+    assert hasher.stats()['timings']
+
+
+def test_legacy_sha256_hashes_verify_and_need_rehash():
+    hasher = PasswordHasher(**FAST)
+    stored = legacy_hash('old password')
+    assert run(hasher, lambda: hasher.verify('old password', stored))
+    assert not run(hasher, lambda: hasher.verify('other', stored))
+    assert hasher.needs_rehash(stored)
+    assert hasher.counters['rehash_needed'] == 1
+
+
+def test_hashes_at_other_costs_need_rehash_but_still_verify():
+    cheap = PasswordHasher(**FAST)
+    stored = run(cheap, lambda: cheap.hash('secret pass'))
+    stronger = PasswordHasher(n=2 ** 5, r=1, p=1)
+    assert stronger.needs_rehash(stored)
+    assert run(stronger, lambda: stronger.verify('secret pass', stored))
+
+
+def test_cost_must_be_a_power_of_two():
+    with pytest.raises(ValueError):
+        PasswordHasher(n=1000)
+
+
+def test_calls_past_the_pool_and_queue_are_refused_at_once():
+    hasher = PasswordHasher(workers=1, max_queue=1, **FAST)
+    release = threading.Event()
+    encode = hasher._encode
+
+    def slow_encode(password):
+        release.wait(5)
+        return encode(password)
+
+    hasher._encode = slow_encode
+
+    async def body():
+        running = [asyncio.ensure_future(hasher.hash(f'password {i}')) for i in range(2)]
+        await asyncio.sleep(0.05)
+        assert hasher.pending == 2
+        with pytest.raises(KdfOverloaded) as overloaded:
+            await hasher.hash('one too many')
+        release.set()
+        return overloaded.value, await asyncio.gather(*running)
+
+    overloaded, hashes = run(hasher, body)
+    assert overloaded.retry_after >= 1
+    assert len(hashes) == 2 and hasher.pending == 0
+    assert hasher.counters['rejected_overloaded'] == 1
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The API app on a memory store with cheap hashing"""
+    pytest.importorskip('fastapi')
+    pytest.importorskip('httpx')
+    from fastapi.testclient import TestClient
+    monkeypatch.setenv('API_DATABASE_URL', 'memory://')
+    monkeypatch.setenv('API_ACCESS_LOG', '')
+    server = importlib.import_module('server')
+    monkeypatch.setattr(server, 'store', MemoryStore())
+    monkeypatch.setattr(server, 'passwords', PasswordHasher(workers=1, max_queue=0, **FAST))
+    with TestClient(server.app, base_url='http://localhost') as client:
+        yield server, client
+
+
+def test_login_upgrades_a_legacy_hash(api):
+    server, client = api
+    user = {'id': 'user_1', 'email': 'ada@example.com', 'business_name': 'Ada Foods', 'phone': '+2348031234567',
+            'industry': 'food', 'password_hash': legacy_hash('old password')}
+    asyncio.run(server.store.create_user(user))
+
+    response = client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'old password'})
+    assert response.status_code == 200 and response.json()['data']['token']
+    upgraded = server.store.users['ada@example.com']['password_hash']
+    assert upgraded.startswith('scrypt$') and not server.passwords.needs_rehash(upgraded)
+    # The upgraded hash keeps working; the wrong password still doesn't
+    assert client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'old password'}
+                       ).status_code == 200
+    assert client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'guess'}).status_code == 401
+
+
+def test_overloaded_hashing_is_a_503_with_retry_after(api):
+    server, client = api
+    # The one pool slot is busy and there is no queue
+    server.passwords.pending = 1
+    response = client.post('/api/auth/register', json={'email': 'new@example.com', 'password': 'long enough',
+                                                       'business_name': 'New', 'phone': '08031234567'})
+    assert response.status_code == 503
+    assert int(response.headers['retry-after']) >= 1
+    assert client.post('/api/auth/login', json={'email': 'new@example.com', 'password': 'long enough'}
+                       ).status_code == 401
+    server.passwords.pending = 0
+    assert client.post('/api/auth/register', json={'email': 'new@example.com', 'password': 'long enough',
+                                                   'business_name': 'New', 'phone': '08031234567'}
+                       ).status_code == 200
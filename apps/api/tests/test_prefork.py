@@ -0,0 +1,85 @@
+"""Pre-fork master: one inherited listening socket, workers started by index, failing workers stop the master"""
+
+import os
+import signal
+import socket
+
+import pytest
+
+from callwaiting_common import prefork
+from callwaiting_common.prefork import bind_socket, run_workers
+
+
+class ExitingServer:
+    """Records that its worker ran on the inherited socket, then exits (or crashes)"""
+
+    def __init__(self, index: int, marker_dir, crash: bool = False):
+        self.index = index
+        self.marker_dir = marker_dir
+        self.crash = crash
+
+    def run(self, sockets):
+        (self.marker_dir / f"worker-{self.index}").write_text(str(sockets[0].getsockname()[1]))
+        if self.crash:
+            raise RuntimeError('cannot start')
+
+
+@pytest.fixture
+def signals():
+    # run_workers installs SIGTERM/SIGINT handlers in the master, i.e. the test process
+    saved = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    yield
+    for signum, handler in saved.items():
+        signal.signal(signum, handler)
+
+
+def test_bound_socket_is_listening_and_inheritable():
+    sock = bind_socket('127.0.0.1', 0)
+    try:
+        assert sock.get_inheritable()
+        client = socket.create_connection(sock.getsockname(), timeout=5)
+        client.close()
+    finally:
+        sock.close()
+
+
+@pytest.mark.parametrize('crash', [False, True])
+def test_workers_that_die_at_startup_stop_the_master(tmp_path, signals, crash):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    master = os.getpid()
+    run_workers(lambda index: ExitingServer(index, tmp_path, crash), '127.0.0.1', port, workers=1)
+
+    # Back in the master without respawning: the worker ran once, on the master's socket
+    assert os.getpid() == master
+    assert [path.name for path in tmp_path.iterdir()] == ['worker-0']
+    assert (tmp_path / 'worker-0').read_text() == str(port)
+
+
+def test_workers_that_die_later_are_replaced(tmp_path, signals, monkeypatch):
+    # Every exit counts as a crash after a healthy run, so the master keeps respawning until it is stopped
+    monkeypatch.setattr(prefork, 'MIN_WORKER_LIFETIME_SECONDS', 0.0)
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    spawned = []
+    original_spawn = prefork._spawn
+
+    def spawn(make_server, index, sock):
+        pid = original_spawn(make_server, index, sock)
+        spawned.append(pid)
+        if len(spawned) == 3:
+            os.kill(os.getpid(), signal.SIGTERM)
+        return pid
+
+    class RecordingServer(ExitingServer):
+        def run(self, sockets):
+            (self.marker_dir / f"run-{os.getpid()}").write_text(str(self.index))
+
+    monkeypatch.setattr(prefork, '_spawn', spawn)
+    run_workers(lambda index: RecordingServer(index, tmp_path), '127.0.0.1', port, workers=1)
+    # The original worker and two replacements; each ran as slot 0 once the one before it had exited
+    assert len(set(spawned)) == 3
+    assert all((tmp_path / f"run-{pid}").read_text() == '0' for pid in spawned[:2])
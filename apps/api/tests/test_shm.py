@@ -0,0 +1,154 @@
+"""Shared-memory structures: SharedTable slots, expiry and tombstones, SharedSegment laps, SharedCounters"""
+
+import struct
+import time
+
+import pytest
+
+from callwaiting_common.shm import _FORK, SharedCounters, SharedSegment, SharedTable, TableFull, _hash
+
+
+def colliding_keys(table: SharedTable, count: int):
+    """Keys that all start probing at the same slot"""
+    by_start = {}
+    i = 0
+    while True:
+        key = f"key-{i}"
+        group = by_start.setdefault(_hash(key.encode()) % table.slots, [])
+        group.append(key)
+        if len(group) == count:
+            return group
+        i += 1
+
+
+def in_child(target, *args):
+    process = _FORK.Process(target=target, args=args)
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+
+
+def test_table_round_trip_and_overwrite():
+    table = SharedTable(slots=16, slot_bytes=256)
+    table['user:1'] = {'name': 'Ada', 'roles': ['owner']}
+    assert table['user:1'] == {'name': 'Ada', 'roles': ['owner']}
+    table['user:1'] = {'name': 'Ada L.'}
+    assert table.get('user:1') == {'name': 'Ada L.'}
+    assert len(table) == 1
+    assert 'user:2' not in table
+    with pytest.raises(KeyError):
+        table['user:2']
+    with pytest.raises(ValueError, match='exceeds'):
+        table['big'] = 'x' * 300
+
+
+def test_deleted_keys_leave_later_keys_in_the_chain_reachable():
+    table = SharedTable(slots=8, slot_bytes=128)
+    first, second, third = colliding_keys(table, 3)
+    for key in (first, second, third):
+        table[key] = key
+    del table[first]
+    assert first not in table
+    # The tombstone keeps the probe going past the emptied slot
+    assert table[second] == second and table[third] == third
+    assert not table.pop(first)
+    with pytest.raises(KeyError):
+        del table[first]
+    # A re-added key takes the tombstone's slot
+    table[first] = 'again'
+    assert table[first] == 'again' and len(table) == 3
+
+
+def test_expired_entries_read_as_missing_and_free_their_slot():
+    table = SharedTable(slots=1, slot_bytes=128, expiry_field='expires_at')
+    table['session'] = {'user': 'u1', 'expires_at': time.time() - 1}
+    assert table.get('session') is None
+    assert len(table) == 0
+    # The only slot is reusable by another key
+    table['other'] = {'user': 'u2', 'expires_at': time.time() + 60}
+    assert table['other']['user'] == 'u2'
+    with pytest.raises(TableFull):
+        table['third'] = {'user': 'u3'}
+
+
+def test_entries_without_expiry_live_until_deleted():
+    table = SharedTable(slots=4, slot_bytes=128, expiry_field='expires_at')
+    table['forever'] = {'user': 'u1'}
+    table.put('explicit', 'value', expires_at=time.time() + 60)
+    assert table['forever'] == {'user': 'u1'} and table['explicit'] == 'value'
+
+
+def test_writes_in_one_process_are_seen_in_another():
+    table = SharedTable(slots=16, slot_bytes=128)
+    table['before'] = 1
+
+    def child():
+        assert table['before'] == 1
+        table['from-child'] = 'hello'
+        del table['before']
+
+    in_child(child)
+    assert table['from-child'] == 'hello'
+    assert 'before' not in table
+
+
+def test_read_during_a_stuck_write_gives_up():
+    table = SharedTable(slots=1, slot_bytes=128)
+    table['key'] = 'value'
+    table.LOCK_TIMEOUT = 0.05
+    # A writer that died mid-write: odd sequence, lock never released
+    table._lock.acquire()
+    struct.pack_into('<Q', table._map, 0, 1)
+    started = time.monotonic()
+    assert table.get('key') is None
+    assert time.monotonic() - started < 1
+    table._lock.release()
+
+    # With the lock free the read is retried under it and the half-written slot is reused
+    assert table.get('key') is None
+    table['key'] = 'rewritten'
+    assert table['key'] == 'rewritten'
+
+
+def test_segment_round_trip_and_limits():
+    segment = SharedSegment(capacity_bytes=4096, index_slots=64)
+    assert segment.put('a', b'audio-a')
+    assert segment.get('a') == b'audio-a' and 'a' in segment
+    assert segment.get('missing') is None
+    assert not segment.put('huge', b'x' * (segment.max_value + 1))
+    stats = segment.stats()
+    assert stats['entries'] == 1 and stats['laps'] == 0
+
+
+def test_lapped_segment_entries_are_misses():
+    segment = SharedSegment(capacity_bytes=4096, index_slots=64)
+    segment.put('old', b'o' * 1000)
+    for i in range(6):
+        segment.put(f'new-{i}', bytes([i]) * 1000)
+    # The ring went round and wrote over 'old'
+    assert segment.get('old') is None and 'old' not in segment
+    assert segment.get('new-5') == b'\x05' * 1000
+    stats = segment.stats()
+    assert stats['laps'] >= 1 and stats['bytes'] == 4096
+    assert stats['entries'] < 7
+
+
+def test_segment_entries_written_by_another_process_are_shared():
+    segment = SharedSegment(capacity_bytes=1 << 16, index_slots=64)
+    in_child(lambda: segment.put('greeting', b'hello'))
+    assert segment.get('greeting') == b'hello'
+
+
+def test_counters_sum_per_worker_rows():
+    counters = SharedCounters(['requests', 'streams'], workers=3)
+    counters.add('requests')
+
+    def worker(index: int):
+        counters.bind(index)
+        counters.add('requests', 5)
+        counters.set('streams', index)
+
+    in_child(worker, 1)
+    in_child(worker, 2)
+    assert counters.per_worker('requests') == [1, 5, 5]
+    assert counters.totals() == {'requests': 11, 'streams': 3}
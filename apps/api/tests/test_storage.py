@@ -0,0 +1,162 @@
+"""Contract every account store keeps: MemoryStore (dicts and shared tables) and SQLiteStore"""
+
+import asyncio
+import random
+
+import pytest
+
+from callwaiting_api.callstats import CallStats, DAY, HOUR
+from callwaiting_api.storage import DuplicateUser, MemoryStore, SQLiteStore
+from callwaiting_common.shm import SharedTable
+
+MERCHANT = 'merchant-1'
+# Monday 2025-03-10 00:00 WAT
+MONDAY = 1741561200
+
+
+@pytest.fixture(params=['memory', 'memory-shared', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStore()
+    if request.param == 'memory-shared':
+        # What run_workers builds for API_WORKERS > 1
+        return MemoryStore(users=SharedTable(slots=256, slot_bytes=2048),
+                           intents=SharedTable(slots=16, slot_bytes=64 * 1024))
+    return SQLiteStore(str(tmp_path / 'api.db'), pool_size=2)
+
+
+def run(store, body):
+    async def main():
+        await store.open()
+        try:
+            return await body(store)
+        finally:
+            await store.close()
+    return asyncio.run(main())
+
+
+def make_user(index: int):
+    return {
+        'id': f"user_{index}",
+        'email': f"merchant{index}@example.com",
+        'business_name': f"Merchant {index}",
+        'phone': '+2348031234567',
+        'industry': 'retail',
+        'created_at': '2025-01-01T00:00:00',
+        'password_hash': 'scrypt$old',
+    }
+
+
+def test_users_by_email_and_id(store):
+    async def body(store):
+        await store.create_user(make_user(1))
+        await store.create_user(make_user(2))
+        with pytest.raises(DuplicateUser):
+            await store.create_user({**make_user(3), 'email': 'merchant1@example.com'})
+
+        assert await store.user_by_email('merchant1@example.com') == make_user(1)
+        assert await store.user_by_id('user_2') == make_user(2)
+        assert await store.user_by_email('nobody@example.com') is None
+        assert await store.user_by_id('user_3') is None
+
+        await store.update_password_hash('user_1', 'scrypt$new')
+        assert (await store.user_by_id('user_1'))['password_hash'] == 'scrypt$new'
+        assert (await store.user_by_email('merchant2@example.com'))['password_hash'] == 'scrypt$old'
+        # Unknown IDs are ignored
+        await store.update_password_hash('user_3', 'scrypt$new')
+
+    run(store, body)
+    assert store.stats()['queries']['user_by_email']['count'] == 3
+
+
+def test_intent_revisions(store):
+    async def body(store):
+        assert await store.intents(MERCHANT) is None
+        assert await store.intents_revision(MERCHANT) is None
+        table = {'intents': [{'name': 'hours', 'patterns': ['open'], 'reply': 'We open at 9'}]}
+        assert await store.put_intents(MERCHANT, table) == 1
+        assert await store.put_intents(MERCHANT, {**table, 'fallback': 'Sorry'}) == 2
+        assert await store.intents(MERCHANT) == (2, {**table, 'fallback': 'Sorry'})
+        assert await store.intents_revision(MERCHANT) == 2
+        assert await store.intents('merchant-2') is None
+
+    run(store, body)
+
+
+def test_contacts_skip_numbers_already_stored(store):
+    async def body(store):
+        first = [('+2348031234567', 'Ada', 'mtn'), ('+2348021234567', 'Bola', 'airtel')]
+        assert await store.add_contacts(MERCHANT, first) == 2
+        assert await store.add_contacts(MERCHANT, [('+2348031234567', 'Ada again', 'mtn'),
+                                                   ('+2349051234567', 'Chidi', 'glo')]) == 1
+        assert await store.add_contacts(MERCHANT, []) == 0
+        assert await store.add_contacts('merchant-2', first) == 2
+        assert await store.contact_count(MERCHANT) == 3
+        assert await store.contact_count('merchant-2') == 2
+        assert await store.contact_count('merchant-3') == 0
+
+    run(store, body)
+
+
+def event(sid, status, started_at, **fields):
+    return {'call_sid': sid, 'status': status, 'started_at': started_at, 'direction': 'inbound', **fields}
+
+
+def test_call_events_update_buckets_once_per_call(store):
+    async def body(store):
+        stats = CallStats(store)
+        call, revision = await stats.record(MERCHANT, event('CA1', 'ringing', MONDAY + 9 * HOUR))
+        assert call['status'] == 'ringing' and revision == 0
+        # The final status counts the call; a repeat of it changes nothing
+        _, revision = await stats.record(MERCHANT, event('CA1', 'completed', MONDAY + 9 * HOUR + 40,
+                                                         ai_response_type='appointment', revenue_kobo=250000))
+        assert revision == 1
+        _, revision = await stats.record(MERCHANT, event('CA1', 'completed', MONDAY + 9 * HOUR + 40))
+        assert revision == 1
+        await stats.record(MERCHANT, event('CA2', 'no-answer', MONDAY + DAY + 30))
+        await stats.record(MERCHANT, event('CA3', 'completed', MONDAY + 10 * HOUR, direction='outbound'))
+        assert await store.call_stats_revision(MERCHANT) == 2
+        assert await store.call_stats_revision('merchant-2') == 0
+
+        assert await store.call_stat_buckets(MERCHANT, 'day', MONDAY, MONDAY + 2 * DAY) == [
+            (MONDAY, (1, 1, 0, 1, 250000)),
+            (MONDAY + DAY, (1, 0, 1, 0, 0)),
+        ]
+        hour = (MONDAY + 9 * HOUR) // HOUR * HOUR
+        assert await store.call_stat_buckets(MERCHANT, 'hour', hour, hour + HOUR) == [(hour, (1, 1, 0, 1, 250000))]
+        # [start, end): a bucket starting at end is left out
+        assert await store.call_stat_buckets(MERCHANT, 'hour', hour - HOUR, hour) == []
+
+        summary = await stats.summary(MERCHANT, MONDAY, MONDAY + 7 * DAY)
+        assert (summary['totalCalls'], summary['answeredCalls'], summary['missedCalls']) == (2, 1, 1)
+        assert summary['conversions'] == 1 and summary['revenueSaved'] == 2500.0
+
+    run(store, body)
+
+
+def test_rebuild_matches_incremental_buckets(store):
+    async def body(store):
+        stats = CallStats(store)
+        rng = random.Random(7)
+        for i in range(300):
+            started = MONDAY + rng.randint(0, 20 * DAY)
+            for status in ('ringing', rng.choice(['completed', 'busy', 'no-answer', 'failed', 'ringing'])):
+                await stats.record(MERCHANT, event(f'CA{i}', status, started,
+                                                   converted=rng.random() < 0.2, revenue_kobo=rng.choice([0, 5000])))
+        queries = [(MONDAY + rng.randint(0, 20 * DAY), rng.randint(1, 200) * HOUR) for _ in range(40)]
+
+        async def answers():
+            results = []
+            for start, length in queries:
+                start, end = stats.resolve_range(start, start + length)
+                results.append(await stats.summary(MERCHANT, start, end, series='day'))
+            return results
+
+        before = await answers()
+        revision = await store.call_stats_revision(MERCHANT)
+        rebuilt = await stats.rebuild(MERCHANT)
+        assert rebuilt['calls'] == 300
+        assert rebuilt['revision'] > revision
+        assert await answers() == before
+
+    run(store, body)
@@ -0,0 +1,173 @@
+"""Signed access tokens: issue and verify, forgery and expiry, and revocation on the denylists"""
+
+import base64
+import importlib
+import json
+
+import pytest
+
+from callwaiting_api import tokens
+from callwaiting_api.tokens import (InvalidToken, SharedDenylist, TimerWheelDenylist, TokenSigner, _b64decode,
+                                    _b64encode, parse_duration)
+from callwaiting_common.shm import _FORK, SharedTable
+
+SECRET = b'x' * 32
+USER = {'id': 'user_1', 'email': 'ada@example.com', 'business_name': 'Ada Foods', 'phone': '+2348031234567',
+        'industry': 'food', 'password_hash': 'never in a token'}
+
+
+class Clock:
+    """Stands in for the time module inside tokens.py"""
+
+    def __init__(self, now: float = 1_741_561_200.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tokens, 'time', clock)
+    return clock
+
+
+def claims_of(token: str) -> dict:
+    return json.loads(_b64decode(token.split('.')[1].encode()))
+
+
+@pytest.mark.parametrize('value, seconds', [('3600', 3600), ('30m', 1800), ('24h', 86400), ('7d', 604800),
+                                            (' 1.5H ', 5400)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+def test_issued_tokens_carry_public_fields_only(clock):
+    signer = TokenSigner(SECRET, ttl_seconds=3600)
+    token = signer.issue(USER)
+    claims = signer.verify(token)
+    assert TokenSigner.user(claims) == {k: v for k, v in USER.items() if k != 'password_hash'}
+    assert claims['exp'] == claims['iat'] + 3600
+    assert 'password_hash' not in claims_of(token)
+    # Every login gets its own token ID
+    assert signer.verify(signer.issue(USER))['jti'] != claims['jti']
+    assert signer.counters['issued'] == 2 and signer.counters['verified'] == 2
+
+
+def test_forged_and_malformed_tokens_are_rejected(clock):
+    signer = TokenSigner(SECRET)
+    token = signer.issue(USER)
+    header, payload, signature = token.split('.')
+
+    elevated = _b64encode(json.dumps({**claims_of(token), 'id': 'admin'}).encode()).decode()
+    unsigned = base64.urlsafe_b64encode(b'{"alg":"none","typ":"JWT"}').rstrip(b'=').decode()
+    other_key = TokenSigner(b'y' * 32).issue(USER)
+    for bad in (f"{header}.{elevated}.{signature}", f"{unsigned}.{payload}.", f"{unsigned}.{payload}.{signature}",
+                other_key, 'not-a-token', 'a.b.c.d', 'ünïcode.x.y'):
+        with pytest.raises(InvalidToken):
+            signer.verify(bad)
+    assert signer.counters['rejected'] == 7
+
+
+def test_tokens_expire(clock):
+    signer = TokenSigner(SECRET, ttl_seconds=60)
+    token = signer.issue(USER)
+    clock.now += 59
+    signer.verify(token)
+    clock.now += 1
+    with pytest.raises(InvalidToken, match='expired'):
+        signer.verify(token)
+
+
+def test_revoked_token_fails_while_others_still_verify(clock):
+    signer = TokenSigner(SECRET, ttl_seconds=3600)
+    kept, revoked = signer.issue(USER), signer.issue(USER)
+    signer.revoke(signer.verify(revoked))
+    with pytest.raises(InvalidToken, match='revoked'):
+        signer.verify(revoked)
+    signer.verify(kept)
+    assert signer.stats()['denylist']['entries'] == 1
+
+
+def test_timer_wheel_drops_whole_buckets_once_their_minute_passes(clock):
+    wheel = TimerWheelDenylist(horizon_seconds=600)
+    now = int(clock.now)
+    wheel.add('a', now + 30)
+    wheel.add('b', now + 45)
+    wheel.add('c', now + 300)
+    # Already expired: nothing to remember
+    wheel.add('old', now - 1)
+    assert wheel.stats()['entries'] == 3 and wheel.revoked == 3
+
+    assert ('a', now + 30) in wheel and ('b', now + 45) in wheel
+    # Looked up by the token's own exp: another exp is another bucket
+    assert ('a', now + 300) not in wheel
+
+    clock.now = now + 120
+    assert ('a', now + 30) not in wheel
+    assert ('c', now + 300) in wheel
+    assert wheel.evicted == 2 and wheel.stats()['entries'] == 1
+
+    # A long idle gap clears at most one lap of the wheel
+    clock.now = now + 100_000
+    assert ('c', now + 300) not in wheel
+    assert wheel.stats()['entries'] == 0
+
+
+def test_timer_wheel_buckets_are_reused_after_a_lap(clock):
+    wheel = TimerWheelDenylist(horizon_seconds=120)
+    now = int(clock.now)
+    laps = len(wheel._buckets) * 60
+    wheel.add('first', now + 90)
+    clock.now = now + laps
+    # Same bucket slot one lap later: the stale ID is gone, the new one is kept
+    wheel.add('second', now + 90 + laps)
+    assert ('first', now + 90 + laps) not in wheel
+    assert ('second', now + 90 + laps) in wheel
+
+
+def test_shared_denylist_revocation_holds_in_every_worker():
+    signer = TokenSigner(SECRET, ttl_seconds=3600, denylist=SharedDenylist(SharedTable(slots=64, slot_bytes=128)))
+    token = signer.issue(USER)
+
+    def worker():
+        # Logout handled by another worker
+        signer.revoke(signer.verify(token))
+
+    process = _FORK.Process(target=worker)
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+    with pytest.raises(InvalidToken, match='revoked'):
+        signer.verify(token)
+    assert signer.stats()['denylist']['kind'] == 'shared_table'
+
+
+def test_short_secret_falls_back_to_a_random_one(monkeypatch):
+    monkeypatch.setenv('JWT_SECRET', 'your_secret_here')
+    monkeypatch.setenv('JWT_EXPIRY', '2h')
+    first, second = TokenSigner.from_env(), TokenSigner.from_env()
+    assert first.ttl_seconds == 7200
+    with pytest.raises(InvalidToken):
+        second.verify(first.issue(USER))
+
+
+def test_logout_revokes_the_bearer_token(monkeypatch):
+    pytest.importorskip('fastapi')
+    pytest.importorskip('httpx')
+    from fastapi.testclient import TestClient
+    monkeypatch.setenv('API_DATABASE_URL', 'memory://')
+    monkeypatch.setenv('API_ACCESS_LOG', '')
+    server = importlib.import_module('server')
+    monkeypatch.setattr(server, 'tokens', TokenSigner(SECRET))
+    token = server.tokens.issue(USER)
+    auth = {'Authorization': f"Bearer {token}"}
+
+    with TestClient(server.app, base_url='http://localhost') as client:
+        verified = client.post('/api/auth/verify', headers=auth)
+        assert verified.status_code == 200
+        assert verified.json()['data']['user']['email'] == USER['email']
+        assert client.post('/api/auth/logout', headers=auth).status_code == 200
+        assert client.post('/api/auth/verify', headers=auth).status_code == 401
+        assert client.post('/api/auth/logout', headers=auth).status_code == 401
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+NORMALIZATION REPORT - how far text normalization collapses the cache key space
+Replays a request log through make_cache_key with and without the verbalizer
+and reports distinct keys, the best-case cache hit rate, the largest groups
+of variants that now share one synthesis, and the per-call normalization cost
+
+    python bench/normalize_report.py requests.jsonl [--top 10]
+    python bench/normalize_report.py --synthetic 5000
+
+The log is one request per line: a JSON body as sent to /v1/synthesize
+({"text", "voice", "rate", "volume"}) or plain text.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from edge_gateway import verbalize  # noqa: E402
+from edge_gateway.cache import make_cache_key, DEFAULT_OUTPUT_FORMAT  # noqa: E402
+
+# Variants callers actually send for the same prompt
+_PHONES = ['+2348031234567', '2348031234567', '08031234567', '8031234567', '0803 123 4567']
+_AMOUNTS = ['₦5,000', 'N5000', 'NGN 5,000', '5000 naira', '₦5,000.00']
+_DATES = ['12/03/2025', '2025-03-12', '12th March 2025', 'March 12, 2025']
+_TIMES = ['3:30pm', '3:30 PM', '15:30', '3.30 p.m.']
+_TEMPLATES = [
+    "Your balance is {amount}.",
+    "Please call us back on {phone}.",
+    "Your appointment is on {date} at {time}.",
+    "We received {amount} on {date}. Thank you!",
+    "Hello,  thanks for calling !  How can I help you today?",
+    "A payment of {amount} is due by {time} today.",
+]
+
+
+def synthetic_log(count: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        text = rng.choice(_TEMPLATES).format(
+            phone=rng.choice(_PHONES), amount=rng.choice(_AMOUNTS),
+            date=rng.choice(_DATES), time=rng.choice(_TIMES),
+        )
+        yield {'text': text}
+
+
+def read_log(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = {'text': line}
+            if isinstance(request, dict) and request.get('text'):
+                yield request
+
+
+def key_for(request: dict, text: str) -> str:
+    return make_cache_key(text, request.get('voice', 'en-US-AriaNeural'), request.get('rate', '+0%'),
+                          request.get('volume', '+0%'), DEFAULT_OUTPUT_FORMAT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', nargs='?', help='request log (JSON lines or plain text)')
+    parser.add_argument('--synthetic', type=int, default=0, help='generate this many requests instead')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--top', type=int, default=5, help='largest collapsed groups to show')
+    args = parser.parse_args()
+
+    if not args.log and not args.synthetic:
+        parser.error('give a request log or --synthetic N')
+    requests = list(read_log(args.log) if args.log else synthetic_log(args.synthetic, args.seed))
+    if not requests:
+        print("No requests with text in the log")
+        return
+
+    raw_keys, canonical_keys = set(), set()
+    variants = defaultdict(set)
+    cold_ns, cold_calls = 0, 0
+    for request in requests:
+        text = request['text'].strip()
+        misses_before = verbalize.speakable.cache_info().misses
+        started = time.perf_counter_ns()
+        speakable = verbalize.speakable(text)
+        elapsed = time.perf_counter_ns() - started
+        if verbalize.speakable.cache_info().misses > misses_before:
+            cold_ns += elapsed
+            cold_calls += 1
+        raw_keys.add(key_for(request, text))
+        canonical_keys.add(key_for(request, speakable))
+        variants[speakable].add(text)
+
+    # Memoized path: every text has been seen once by now
+    started = time.perf_counter_ns()
+    for request in requests:
+        verbalize.speakable(request['text'].strip())
+    warm_ns = (time.perf_counter_ns() - started) / len(requests)
+
+    total = len(requests)
+    print(f"📝 {total} requests")
+    print(f"   distinct keys       raw {len(raw_keys):6d}   normalized {len(canonical_keys):6d}   "
+          f"({(1 - len(canonical_keys) / len(raw_keys)) * 100:.1f}% fewer)")
+    print(f"   best-case hit rate  raw {(total - len(raw_keys)) / total * 100:5.1f}%   "
+          f"normalized {(total - len(canonical_keys)) / total * 100:5.1f}%")
+    print(f"   normalize cost      first sight {cold_ns / max(cold_calls, 1) / 1000:7.1f}us   "
+          f"memoized {warm_ns / 1000:7.2f}us")
+
+    groups = sorted(variants.items(), key=lambda item: len(item[1]), reverse=True)
+    shown = [group for group in groups if len(group[1]) > 1][:args.top]
+    if shown:
+        print("\n   largest collapsed groups:")
+    for speakable, texts in shown:
+        print(f"   {len(texts):3d} variants -> {speakable[:90]}")
+        for text in sorted(texts)[:3]:
+            print(f"                   {text[:90]}")
+
+
+if __name__ == '__main__':
+    main()
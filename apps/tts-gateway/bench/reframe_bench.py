@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+REFRAME BENCHMARK - cost of turning jittery upstream chunks into fixed frames
+Replays a seeded mix of tiny and large chunks (the shape Edge TTS streams have)
+through three re-framers and reports, per second of audio: sender writes,
+buffer objects allocated, bytes copied, CPU per frame and peak traced memory
+
+    python bench/reframe_bench.py [--format mulaw_8000] [--frame-ms 20] [--seconds 30]
+
+  naive       pending = pending + chunk; frame = pending[:n]; pending = pending[n:]
+  bytearray   buf += chunk; frame = bytes(buf[:n]); del buf[:n]
+  reframer    edge_gateway.framing.Reframer (staging buffer + memoryview slices)
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from edge_gateway.framing import Reframer, frame_size, silence_byte  # noqa: E402
+from edge_gateway.transcode import OUTPUT_FORMATS  # noqa: E402
+from edge_gateway.timing import MP3_BYTES_PER_MS  # noqa: E402
+
+
+def bytes_per_second(format_name: str) -> float:
+    spec = OUTPUT_FORMATS[format_name]
+    if spec['encoding'] == 'mp3':
+        return MP3_BYTES_PER_MS * 1000
+    return spec['rate'] * (1 if spec['encoding'] == 'mulaw' else 2)
+
+
+def upstream_chunks(total: int, seed: int):
+    """Mostly small chunks with occasional multi-kilobyte bursts"""
+    rng = random.Random(seed)
+    payload = bytes(rng.getrandbits(8) for _ in range(8192))
+    chunks, sent = [], 0
+    while sent < total:
+        size = min(total - sent, max(1, int(rng.lognormvariate(5.5, 1.2))), len(payload))
+        chunks.append(payload[:size])
+        sent += size
+    return chunks
+
+
+class Naive:
+    def __init__(self, frame_bytes: int):
+        self.frame_bytes = frame_bytes
+        self.pending = b''
+        self.allocations = 0
+        self.copied = 0
+
+    def push(self, data: bytes):
+        self.pending = self.pending + data
+        self.allocations += 1
+        self.copied += len(self.pending)
+        frames = []
+        while len(self.pending) >= self.frame_bytes:
+            frames.append(self.pending[:self.frame_bytes])
+            self.pending = self.pending[self.frame_bytes:]
+            self.allocations += 2
+            self.copied += self.frame_bytes + len(self.pending)
+        return frames
+
+    def flush(self):
+        return self.pending or None
+
+
+class ByteArray:
+    def __init__(self, frame_bytes: int):
+        self.frame_bytes = frame_bytes
+        self.buf = bytearray()
+        self.allocations = 0
+        self.copied = 0
+
+    def push(self, data: bytes):
+        self.buf += data
+        self.copied += len(data)
+        frames = []
+        while len(self.buf) >= self.frame_bytes:
+            # Slice copy, bytes() copy, then del shifts the remainder down
+            frames.append(bytes(self.buf[:self.frame_bytes]))
+            del self.buf[:self.frame_bytes]
+            self.allocations += 2
+            self.copied += 2 * self.frame_bytes + len(self.buf)
+        return frames
+
+    def flush(self):
+        return bytes(self.buf) or None
+
+
+class Counted(Reframer):
+    """Reframer with the same counters as the baselines"""
+
+    def __init__(self, frame_bytes: int, pad_byte):
+        super().__init__(frame_bytes, pad_byte)
+        self.allocations = 0
+        self.copied = 0
+
+    def push(self, data: bytes):
+        staged_before = self.bytes_staged
+        frames = super().push(data)
+        # A chunk that is exactly one frame is handed through untouched
+        made = sum(1 for frame in frames if frame is not data)
+        self.allocations += made
+        passed = len(data) if made < len(frames) else 0
+        # Staged bytes are copied twice: into the staging buffer, then out with their frame
+        self.copied += len(data) - passed + (self.bytes_staged - staged_before)
+        return frames
+
+
+def run(name: str, make, chunks, audio_seconds: float, make_timed=None):
+    framer = make()
+    tracemalloc.start()
+    started = time.perf_counter_ns()
+    frames = 0
+    for chunk in chunks:
+        frames += len(framer.push(chunk))
+    if framer.flush() is not None:
+        frames += 1
+    elapsed = time.perf_counter_ns() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Untraced re-runs for CPU (tracemalloc inflates every allocation), best of 5
+    cpu_ns = float('inf')
+    for _ in range(5):
+        timed = (make_timed or make)()
+        started = time.perf_counter_ns()
+        for chunk in chunks:
+            timed.push(chunk)
+        timed.flush()
+        cpu_ns = min(cpu_ns, time.perf_counter_ns() - started)
+
+    print(f"{name:<10} writes/audio-s {frames / audio_seconds:7.1f}  "
+          f"allocs/audio-s {framer.allocations / audio_seconds:8.1f}  "
+          f"copied/audio-byte {framer.copied / (sum(len(c) for c in chunks) or 1):6.2f}  "
+          f"ns/frame {cpu_ns / max(frames, 1):8.0f}  "
+          f"traced ns/frame {elapsed / max(frames, 1):8.0f}  "
+          f"peak {peak / 1024:7.1f}KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', default='mulaw_8000', choices=list(OUTPUT_FORMATS))
+    parser.add_argument('--frame-ms', type=float, default=20)
+    parser.add_argument('--seconds', type=float, default=30, help='seconds of audio to replay')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    spec = OUTPUT_FORMATS[args.format]
+    frame_bytes = frame_size(spec['encoding'], spec['rate'], args.frame_ms)
+    chunks = upstream_chunks(int(bytes_per_second(args.format) * args.seconds), args.seed)
+    sizes = sorted(len(c) for c in chunks)
+    print(f"🎚️ {args.format}: {args.seconds:.0f}s of audio in {len(chunks)} upstream chunks "
+          f"({len(chunks) / args.seconds:.1f} writes/audio-s, sizes p10 {sizes[len(sizes) // 10]} "
+          f"p50 {sizes[len(sizes) // 2]} p90 {sizes[len(sizes) * 9 // 10]} bytes) "
+          f"-> {frame_bytes}-byte frames")
+
+    pad = silence_byte(spec['encoding'])
+    run('naive', lambda: Naive(frame_bytes), chunks, args.seconds)
+    run('bytearray', lambda: ByteArray(frame_bytes), chunks, args.seconds)
+    # CPU is timed on the real class, without the counting wrapper
+    run('reframer', lambda: Counted(frame_bytes, pad), chunks, args.seconds,
+        make_timed=lambda: Reframer(frame_bytes, pad))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+TRANSCODE BENCHMARK - CPU cost of telephony output formats per stream
+Feeds an MP3 file through StreamTranscoder in 4 KB chunks (the size Edge TTS
+streams arrive in) and reports time to first output, in-process DSP CPU,
+ffmpeg CPU and the realtime factor for each format
+
+    python bench/transcode_bench.py [--input file.mp3] [--streams 20]
+
+Without ffmpeg only the resample + encode stage is measured, on synthetic PCM.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import resource
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from edge_gateway.transcode import (  # noqa: E402
+    OUTPUT_FORMATS, SOURCE_RATE, StreamTranscoder, ffmpeg_path, needs_transcoding,
+)
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streaming-test-fixed.mp3')
+FORMATS = [name for name in OUTPUT_FORMATS if needs_transcoding(name)]
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def run_stream(mp3: bytes, format_name: str, chunk_size: int):
+    transcoder = StreamTranscoder(format_name)
+    ffmpeg_before = children_cpu()
+    started = time.perf_counter()
+    async for _ in transcoder.transcode(chunked(mp3, chunk_size)):
+        pass
+    wall = time.perf_counter() - started
+    stats = transcoder.stats
+    audio_seconds = stats['samples_decoded'] / SOURCE_RATE
+    return {
+        'wall_ms': wall * 1000,
+        'first_output_ms': stats['first_output_ms'] or 0.0,
+        'dsp_cpu_ms': stats['dsp_cpu_ms'],
+        'ffmpeg_cpu_ms': (children_cpu() - ffmpeg_before) * 1000,
+        'audio_seconds': audio_seconds,
+        'bytes_out': stats['bytes_out'],
+    }
+
+
+def report(format_name: str, runs):
+    audio = runs[0]['audio_seconds'] or 1e-9
+    dsp = statistics.median(r['dsp_cpu_ms'] for r in runs)
+    ffmpeg = statistics.median(r['ffmpeg_cpu_ms'] for r in runs)
+    total_cpu = (dsp + ffmpeg) / 1000
+    print(f"{format_name:<12} audio {audio:6.2f}s  "
+          f"first out p50 {statistics.median(r['first_output_ms'] for r in runs):6.1f}ms  "
+          f"wall p50 {statistics.median(r['wall_ms'] for r in runs):7.1f}ms  "
+          f"dsp cpu {dsp:6.2f}ms  ffmpeg cpu {ffmpeg:6.1f}ms  "
+          f"cpu/audio-s {total_cpu / audio * 1000:6.2f}ms  "
+          f"streams/core {audio / total_cpu if total_cpu else float('inf'):7.0f}")
+
+
+def dsp_only(seconds: float, repeats: int, chunk_samples: int = 2048):
+    """Resample + encode cost on synthetic speech-band PCM (no decoder)"""
+    t = np.arange(int(seconds * SOURCE_RATE)) / SOURCE_RATE
+    pcm = (8000 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))).astype('<i2').tobytes()
+    for format_name in FORMATS:
+        timings = []
+        for _ in range(repeats):
+            transcoder = StreamTranscoder(format_name)
+            for i in range(0, len(pcm), chunk_samples * 2):
+                transcoder._convert(pcm[i:i + chunk_samples * 2])
+            timings.append(transcoder.stats['dsp_cpu_ms'])
+        dsp = statistics.median(timings)
+        print(f"{format_name:<12} audio {seconds:6.2f}s  dsp cpu {dsp:6.2f}ms  "
+              f"cpu/audio-s {dsp / seconds:6.3f}ms  streams/core {seconds * 1000 / dsp:8.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='MP3 file to transcode')
+    parser.add_argument('--streams', type=int, default=20, help='streams per format')
+    parser.add_argument('--chunk-size', type=int, default=4096, help='MP3 bytes per upstream chunk')
+    args = parser.parse_args()
+
+    if ffmpeg_path() is None:
+        print("⚠️ ffmpeg not found: measuring resample + encode only")
+        dsp_only(seconds=10.0, repeats=args.streams)
+        return
+
+    with open(args.input, 'rb') as f:
+        mp3 = f.read()
+    print(f"🎛️ {os.path.basename(args.input)}: {len(mp3)} bytes, {args.streams} streams per format")
+    for format_name in FORMATS:
+        runs = [await run_stream(mp3, format_name, args.chunk_size) for _ in range(args.streams)]
+        report(format_name, runs)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -8,25 +8,55 @@ import os
 import sys
 import json
 import time
+
+# Taken before the heavy imports so startup time covers the whole cold start
+_PROCESS_START = time.time()
+
 import logging
 import asyncio
 import tempfile
+from collections import deque
 from typing import Optional, Dict, Any
 from pathlib import Path
 
 # FastAPI for production server
-from fastapi import FastAPI, HTTPException, Request, Response
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
+# Python modules shared with apps/api (pre-fork workers, shared memory)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib'))
+
+from callwaiting_common.prefork import run_workers
+from callwaiting_common.shm import SharedCounters, SharedSegment
+from callwaiting_common.accesslog import AccessLog, AccessLogMiddleware
+from edge_gateway.cache import AudioCache, make_cache_key, DEFAULT_OUTPUT_FORMAT
+from edge_gateway.singleflight import FlightGroup
+from edge_gateway.segmenter import split_segments, IncrementalSegmenter
+from edge_gateway.pipeline import SegmentPipeline
+from edge_gateway.live import LiveSession
+from edge_gateway.scheduler import AdmissionController, AdmissionRejected
+from edge_gateway.telemetry import (
+    CLUSTER_COUNTERS, GatewayMetrics, cluster_families, component_families, engine_families, tenant_families,
+)
+from edge_gateway.engines import create_engine, EDGE_TTS_AVAILABLE
+from edge_gateway.resilience import ResilientEngine
+from edge_gateway.transcode import OUTPUT_FORMATS, StreamTranscoder, resolve_format, needs_transcoding
+from edge_gateway import verbalize
+from edge_gateway.framing import Reframer, reframed, frame_size, silence_byte
+from edge_gateway.voices import VoiceCatalog
+from edge_gateway.tenants import TenantRegistry, Tenant, QuotaExceeded, DEFAULT_TENANT
+from edge_gateway.prerender import (load_manifest, normalize_items, parse_parallelism, render_batch,
+                                    default_manifest_path)
+from edge_gateway.timing import (
+    FRAMED_MEDIA_TYPE, audio_only, expected_audio_bytes, framed, rebase_word, word_from_edge, words_from_cache,
+)
+
 # Edge TTS - VERIFIED WORKING
-try:
-    import edge_tts
-    EDGE_TTS_AVAILABLE = True
+if EDGE_TTS_AVAILABLE:
     print("✅ Edge TTS library loaded successfully")
-except ImportError:
-    EDGE_TTS_AVAILABLE = False
+else:
     print("❌ Edge TTS library not available")
     print("Install with: pip install edge-tts")
 
@@ -43,9 +73,21 @@ logger = logging.getLogger(__name__)
 class EdgeTTSServer:
     """Edge TTS server - verified working"""
     
-    def __init__(self):
-        if not EDGE_TTS_AVAILABLE:
+    def __init__(self, worker: int = 0, cluster: Optional[SharedCounters] = None,
+                 shared_cache: Optional[SharedSegment] = None):
+        # Worker index and shared-memory state when pre-forked (see run_workers below)
+        self.worker = worker
+        # TTS_ENGINE=local swaps in an offline stand-in (tests, dev without network)
+        engine_name = os.getenv("TTS_ENGINE", "edge")
+        if engine_name == 'edge' and not EDGE_TTS_AVAILABLE:
             raise RuntimeError("Edge TTS library not available. Install with: pip install edge-tts")
+        # Hedging and circuit breaking around the primary; TTS_FALLBACK_ENGINE=local
+        # keeps calls talking (silently) while the upstream is down
+        fallback_name = os.getenv("TTS_FALLBACK_ENGINE", "")
+        self.engine = ResilientEngine.from_env(
+            create_engine(engine_name),
+            create_engine(fallback_name) if fallback_name else None,
+        )
             
         self.app = FastAPI(
             title="CallWaiting.ai Edge TTS Gateway",
@@ -53,27 +95,79 @@ class EdgeTTSServer:
             version="1.0.0"
         )
         
-        # Statistics
-        self.stats = {
-            'requests_total': 0,
-            'requests_successful': 0,
-            'requests_failed': 0,
-            'start_time': time.time()
+        # Metrics registry; /health, /v1/stats and /metrics all read from it
+        self.metrics = GatewayMetrics(cluster, worker)
+        
+        # JSON access log with request IDs, queued and written in batches (TTS_ACCESS_LOG,
+        # TTS_ACCESS_LOG_SAMPLE=/health=0.01,/metrics=0 for scrapes and probes)
+        self.access_log = AccessLog.from_env("TTS_ACCESS_LOG", service="tts-gateway", worker=worker)
+        
+        # Edge voices by ID, alias and locale; requests are validated against it before any
+        # upstream call. Loaded from a disk snapshot, refreshed in the background
+        self.voices = VoiceCatalog.from_env(self.engine.list_voices)
+        
+        # Content-addressed audio cache (memory LRU + disk)
+        self.cache = AudioCache.from_env(shared=shared_cache)
+        if self.cache:
+            self.cache.cluster = cluster
+        # Phones, naira amounts, dates and times verbalized before synthesis and the cache key
+        self.normalize_text = os.getenv("TTS_NORMALIZE_TEXT", "true").lower() not in ("0", "false", "no")
+        
+        # Identical in-flight syntheses share one upstream session; it is cancelled when
+        # its last reader disconnects and pauses while readers are this far behind
+        self.flights = FlightGroup(max_ahead_bytes=int(os.getenv("TTS_STREAM_BUFFER_KB", "256")) * 1024)
+        
+        # Sentence-pipelined streaming for long texts
+        self.pipeline_config = {
+            'threshold_chars': int(os.getenv("TTS_PIPELINE_THRESHOLD_CHARS", "250")),
+            'max_chars': int(os.getenv("TTS_PIPELINE_MAX_CHARS", "20000")),
+            'segment_chars': int(os.getenv("TTS_PIPELINE_SEGMENT_CHARS", "200")),
+            'first_segment_chars': int(os.getenv("TTS_PIPELINE_FIRST_SEGMENT_CHARS", "80")),
+            'max_parallel': int(os.getenv("TTS_PIPELINE_MAX_PARALLEL", "3")),
+        }
+        self.pipeline_history = deque(maxlen=20)
+        
+        # API key -> tenant, with per-tenant request/character buckets (shared via Redis when
+        # TTS_REDIS_URL is set); the tenant's weight is its share of a saturated upstream
+        self.tenants = TenantRegistry.from_env(workers=cluster.workers if cluster is not None else 1)
+        
+        # Admission control in front of every upstream session
+        self.scheduler = AdmissionController.from_env()
+        self.scheduler.on_admit = lambda priority, waited: self.metrics.queue_wait.labels(priority).observe(waited)
+        self.metrics.registry.collector(lambda: component_families(self.cache, self.flights, self.scheduler))
+        self.metrics.registry.collector(lambda: engine_families(self.engine))
+        self.metrics.registry.collector(lambda: tenant_families(self.tenants))
+        if cluster is not None:
+            self.metrics.registry.collector(lambda: cluster_families(cluster))
+        
+        # Warm-up runs in the background after the port is bound
+        self.readiness = {
+            'state': 'starting',
+            'warm': False,
+            'warmup_attempts': 0,
+            'last_probe': None,
+            'startup_seconds': None,
         }
+        self.probe_interval = float(os.getenv("TTS_PROBE_INTERVAL_SECONDS", "60"))
+        self._background_tasks = []
         
-        # Edge TTS voices mapping
-        self.voice_map = {
-            'alloy': 'en-US-AriaNeural',
-            'echo': 'en-US-GuyNeural', 
-            'fable': 'en-US-JennyNeural',
-            'onyx': 'en-US-DavisNeural',
-            'nova': 'en-US-SaraNeural',
-            'shimmer': 'en-US-MichelleNeural'
+        # Batch pre-rendering; manifests listed here are rendered once warm-up succeeds
+        self.batch_config = {
+            'max_items': int(os.getenv("TTS_BATCH_MAX_ITEMS", "500")),
+            'max_parallelism': int(os.getenv("TTS_BATCH_MAX_PARALLELISM", "8")),
+            'default_parallelism': int(os.getenv("TTS_BATCH_PARALLELISM", "4")),
         }
+        manifests = os.getenv("TTS_PRERENDER_MANIFESTS")
+        # Unset means the API's default intents, which are only found when the API sits beside the gateway
+        self.prerender_default = manifests is None
+        self.prerender_manifests = [path.strip() for path in (manifests if manifests is not None
+                                                               else default_manifest_path()).split(',')
+                                    if path.strip()]
+        self.prerender_reports = {}
         
         self._setup_middleware()
         self._setup_routes()
-        self._initialize_edge_tts()
+        self._setup_lifecycle()
     
     def _setup_middleware(self):
         """Setup FastAPI middleware"""
@@ -84,6 +178,7 @@ class EdgeTTSServer:
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        self.app.add_middleware(AccessLogMiddleware, log=self.access_log)
     
     def _setup_routes(self):
         """Setup API routes"""
@@ -94,84 +189,138 @@ class EdgeTTSServer:
             return {
                 "status": "healthy",
                 "timestamp": time.time(),
-                "uptime": time.time() - self.stats['start_time'],
-                "stats": self.stats,
+                "uptime": time.time() - self.metrics.start_time,
+                "stats": self.metrics.snapshot(),
                 "service": "edge-tts",
                 "engine": "microsoft-edge"
             }
         
+        @self.app.get("/livez")
+        async def liveness():
+            """Process is up and serving; says nothing about upstream"""
+            return {
+                "status": "alive",
+                "uptime": time.time() - self.metrics.start_time,
+                "startup_seconds": self.readiness['startup_seconds'],
+            }
+        
+        @self.app.get("/readyz")
+        async def readiness():
+            """Ready once warm-up reached the upstream engine"""
+            body = {
+                "status": self.readiness['state'],
+                "engine": self.engine.name,
+                **self.readiness,
+            }
+            return JSONResponse(body, status_code=200 if self.readiness['warm'] else 503)
+        
+        @self.app.get("/metrics")
+        async def metrics():
+            """Prometheus text exposition"""
+            return PlainTextResponse(
+                self.metrics.registry.render(),
+                media_type="text/plain; version=0.0.4; charset=utf-8"
+            )
+        
         @self.app.post("/v1/synthesize/stream")
         async def stream_synthesize_text(request: Request):
             """Streaming synthesis endpoint for real-time voice"""
+            tracker = self.metrics.track('stream')
             try:
-                from fastapi.responses import StreamingResponse
-                
-                self.stats['requests_total'] += 1
-                
+                tenant = self._tenant(request.headers)
                 # Parse request
                 data = await request.json()
                 text = data.get('text', '').strip()
-                voice = data.get('voice', 'en-US-AriaNeural')
+                voice = self._voice(data.get('voice'))
                 language = data.get('language', 'en')
+                rate = data.get('rate', '+0%')
+                volume = data.get('volume', '+0%')
+                priority = AdmissionController.normalize_priority(data.get('priority'), default='live')
+                output_format = self._output_format(data.get('format'))
+                # 'framed' multiplexes audio and word timings into one length-prefixed stream
+                stream_format = data.get('stream_format', 'audio')
+                if stream_format not in ('audio', 'framed'):
+                    raise HTTPException(status_code=400, detail="stream_format must be 'audio' or 'framed'")
+                with_words = stream_format == 'framed'
+                # Optional fixed-duration frames (e.g. 20 for RTP) instead of upstream chunk sizes
+                frame_ms = self._frame_ms(data.get('frame_ms'), output_format)
+                tracker.set_voice(voice)
+                
+                pipelined = data.get('pipeline')
+                if pipelined is None:
+                    pipelined = len(text) > self.pipeline_config['threshold_chars']
                 
                 if not text:
                     raise HTTPException(status_code=400, detail="Text is required")
                 
-                if len(text) > 1000:
-                    raise HTTPException(status_code=400, detail="Text too long (max 1000 characters)")
+                max_chars = self.pipeline_config['max_chars'] if pipelined else 1000
+                if len(text) > max_chars:
+                    raise HTTPException(status_code=400, detail=f"Text too long (max {max_chars} characters)")
                 
+                await self.tenants.charge(tenant, characters=len(text))
+                text = self._speakable(text)
                 logger.info(f"🎵 Streaming synthesis: {text[:50]}...")
                 
-                async def generate_audio_stream():
-                    try:
-                        communicate = edge_tts.Communicate(text, voice, rate="+0%", volume="+0%")
-                        
-                        chunk_count = 0
-                        async for chunk in communicate.stream():
-                            if chunk["type"] == "audio":
-                                chunk_count += 1
-                                logger.debug(f"🎵 Streaming chunk {chunk_count}: {len(chunk['data'])} bytes")
-                                yield chunk["data"]
-                            elif chunk["type"] == "WordBoundary":
-                                # Optional: Send word boundary info for real-time highlighting
-                                pass
-
-                        self.stats['requests_successful'] += 1
-                        logger.info(f"✅ Streaming synthesis completed: {chunk_count} chunks")
-                    except Exception as e:
-                        self.stats['requests_failed'] += 1
-                        logger.error(f"❌ Streaming synthesis failed: {e}")
-                        raise
+                if pipelined:
+                    return await self._pipelined_stream_response(text, voice, rate, volume, priority, tenant,
+                                                                 output_format, with_words, frame_ms, tracker)
+                
+                cache_key = make_cache_key(text, voice, rate, volume, DEFAULT_OUTPUT_FORMAT)
+                cached = await self.cache.get_entry(cache_key) if self.cache else None
+                
+                if cached is not None:
+                    audio = self._cached_items(cached, with_words)
+                else:
+                    source = lambda: self._edge_audio_source(text, voice, rate, volume, cache_key, priority, tenant)
+                    audio = self.flights.stream(cache_key, source, expected_audio_bytes(text))
+                    audio = await self._prime(audio if with_words else audio_only(audio))
+                
+                audio = self._output_stages(audio, output_format, frame_ms, with_words)
 
                 return StreamingResponse(
-                    generate_audio_stream(),
-                    media_type="audio/mpeg",
+                    self._tracked_stream(audio, tracker),
+                    media_type=FRAMED_MEDIA_TYPE if with_words else OUTPUT_FORMATS[output_format]['media_type'],
                     headers={
                         "X-Service": "edge-tts",
                         "X-Engine": "microsoft-edge",
                         "X-Streaming": "true",
+                        "X-Audio-Format": output_format,
+                        "X-Cache": "HIT" if cached is not None else "MISS",
                         "Cache-Control": "no-cache",
                         "Connection": "keep-alive"
                     }
                 )
                 
+            except HTTPException:
+                tracker.finish('invalid')
+                raise
+            except QuotaExceeded as e:
+                tracker.finish('rejected')
+                raise self._throttled(e)
+            except AdmissionRejected as e:
+                tracker.finish('rejected')
+                raise self._overloaded(e)
             except Exception as e:
-                self.stats['requests_failed'] += 1
+                tracker.finish('failed')
                 logger.error(f"❌ Streaming synthesis failed: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Streaming synthesis failed: {str(e)}")
 
         @self.app.post("/v1/synthesize")
         async def synthesize_text(request: Request):
             """Main synthesis endpoint"""
+            tracker = self.metrics.track('synthesize')
             try:
-                self.stats['requests_total'] += 1
-                
+                tenant = self._tenant(request.headers)
                 # Parse request
                 data = await request.json()
                 text = data.get('text', '').strip()
-                voice = data.get('voice', 'en-US-AriaNeural')
+                voice = self._voice(data.get('voice'))
                 language = data.get('language', 'en')
-                format_type = data.get('format', 'wav')
+                format_type = self._output_format(data.get('format', 'wav'))
+                rate = data.get('rate', '+0%')
+                volume = data.get('volume', '+0%')
+                priority = AdmissionController.normalize_priority(data.get('priority'))
+                tracker.set_voice(voice)
                 
                 if not text:
                     raise HTTPException(status_code=400, detail="Text is required")
@@ -179,93 +328,256 @@ class EdgeTTSServer:
                 if len(text) > 1000:
                     raise HTTPException(status_code=400, detail="Text too long (max 1000 characters)")
                 
+                await self.tenants.charge(tenant, characters=len(text))
+                text = self._speakable(text)
                 logger.info(f"🎵 Synthesizing with Edge TTS: {text[:50]}...")
                 
                 # Generate audio using Edge TTS
-                audio_data = await self._synthesize_with_edge_tts(text, voice, language)
+                audio_data = await self._synthesize_with_edge_tts(text, voice, language, rate=rate, volume=volume,
+                                                                  priority=priority, tenant=tenant)
+                if needs_transcoding(format_type):
+                    audio_data = b''.join([data async for data in self._transcoded(self._single_chunk(audio_data), format_type)])
                 
-                self.stats['requests_successful'] += 1
+                tracker.chunk(len(audio_data))
+                tracker.finish('success')
                 logger.info("✅ Edge TTS synthesis completed successfully")
                 
                 return Response(
                     content=audio_data,
-                    media_type="audio/mpeg",  # Edge TTS returns MP3 format
-                    headers={"X-Service": "edge-tts", "X-Engine": "microsoft-edge"}
+                    media_type=OUTPUT_FORMATS[format_type]['media_type'],
+                    headers={"X-Service": "edge-tts", "X-Engine": "microsoft-edge", "X-Audio-Format": format_type}
                 )
                 
+            except HTTPException:
+                tracker.finish('invalid')
+                raise
+            except QuotaExceeded as e:
+                tracker.finish('rejected')
+                raise self._throttled(e)
+            except AdmissionRejected as e:
+                tracker.finish('rejected')
+                raise self._overloaded(e)
             except Exception as e:
-                self.stats['requests_failed'] += 1
+                tracker.finish('failed')
                 logger.error(f"❌ Edge TTS synthesis failed: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Edge TTS synthesis failed: {str(e)}")
         
+        @self.app.post("/v1/synthesize/batch")
+        async def batch_synthesize(request: Request):
+            """Pre-render many prompts into the cache for instant replay"""
+            tracker = self.metrics.track('batch')
+            try:
+                tenant = self._tenant(request.headers)
+                data = await request.json()
+                if not self.cache:
+                    raise HTTPException(status_code=400, detail="Audio cache is disabled; nothing to pre-render into")
+                if not isinstance(data, dict):
+                    raise HTTPException(status_code=400, detail="Expected a JSON object")
+                
+                raw_items = data.get('items') or []
+                if not raw_items:
+                    raise HTTPException(status_code=400, detail="items is required")
+                if len(raw_items) > self.batch_config['max_items']:
+                    raise HTTPException(status_code=400, detail=f"Too many items (max {self.batch_config['max_items']})")
+                try:
+                    items = normalize_items(raw_items, data.get('defaults'))
+                    for item in items:
+                        item['format'] = resolve_format(item['format'])
+                        item['voice'] = self.voices.resolve(item['voice'])
+                    parallelism = parse_parallelism(data.get('parallelism'), self.batch_config['default_parallelism'],
+                                                    self.batch_config['max_parallelism'])
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                
+                # One request for the whole batch, every item's characters; only once the batch is valid
+                await self.tenants.charge(tenant, characters=sum(len(item['text']) for item in items))
+                
+                logger.info(f"📦 Batch pre-render: {len(items)} items, parallelism {parallelism}")
+                report = await render_batch(items, lambda item: self._prerender_item(item, tenant), parallelism)
+                summary = report['summary']
+                logger.info(f"✅ Batch pre-render: {summary['rendered']} rendered, {summary['cached']} cached, "
+                            f"{summary['failed']} failed in {summary['wall_ms']}ms")
+                
+                tracker.finish('success' if not summary['failed'] else 'failed')
+                return report
+            
+            except HTTPException:
+                tracker.finish('invalid')
+                raise
+            except QuotaExceeded as e:
+                tracker.finish('rejected')
+                raise self._throttled(e)
+            except Exception as e:
+                tracker.finish('failed')
+                logger.error(f"❌ Batch pre-render failed: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Batch pre-render failed: {str(e)}")
+        
+        @self.app.websocket("/v1/synthesize/ws")
+        async def live_synthesize(websocket: WebSocket):
+            """Incremental text in, binary audio frames out (LLM token streams)"""
+            await self._live_session(websocket)
+        
         @self.app.get("/v1/voices")
-        async def get_voices():
-            """Get available voices"""
+        async def get_voices(locale: Optional[str] = None, gender: Optional[str] = None):
+            """Get available voices, optionally filtered by locale (en-NG) and gender"""
+            voices = self.voices.list_voices(locale, gender)
             return {
-                "voices": [
-                    {"id": "alloy", "name": "Aria", "language": "en", "gender": "female", "edge_voice": "en-US-AriaNeural"},
-                    {"id": "echo", "name": "Guy", "language": "en", "gender": "male", "edge_voice": "en-US-GuyNeural"},
-                    {"id": "fable", "name": "Jenny", "language": "en", "gender": "female", "edge_voice": "en-US-JennyNeural"},
-                    {"id": "onyx", "name": "Davis", "language": "en", "gender": "male", "edge_voice": "en-US-DavisNeural"},
-                    {"id": "nova", "name": "Sara", "language": "en", "gender": "female", "edge_voice": "en-US-SaraNeural"},
-                    {"id": "shimmer", "name": "Michelle", "language": "en", "gender": "female", "edge_voice": "en-US-MichelleNeural"}
-                ]
+                "voices": voices,
+                "count": len(voices),
+                "source": self.voices.source,
             }
         
         @self.app.get("/v1/stats")
         async def get_stats():
             """Get server statistics"""
             return {
-                "stats": self.stats,
-                "uptime": time.time() - self.stats['start_time'],
+                "stats": self.metrics.snapshot(),
+                "latency": self.metrics.latency_summary(),
+                "cache": self.cache.stats() if self.cache else None,
+                "coalescing": self.flights.stats(),
+                "pipeline": self._pipeline_stats(),
+                "scheduler": self.scheduler.stats(),
+                "tenants": self.tenants.stats(),
+                "access_log": self.access_log.stats(),
+                "engine_resilience": self.engine.stats(),
+                "normalization": {'enabled': self.normalize_text, **verbalize.stats()},
+                "voices": self.voices.stats(),
+                "readiness": self.readiness,
+                "prerender": {path: report['summary'] for path, report in self.prerender_reports.items()},
+                "uptime": time.time() - self.metrics.start_time,
                 "service": "edge-tts",
                 "engine": "microsoft-edge"
             }
     
-    def _initialize_edge_tts(self):
-        """Initialize Edge TTS"""
-        logger.info("🚀 Initializing Edge TTS Service...")
+    def _setup_lifecycle(self):
+        """Start warm-up and periodic upstream probes without blocking startup"""
+        
+        @self.app.on_event("startup")
+        async def start_background_tasks():
+            self.access_log.start()
+            self._background_tasks.append(asyncio.create_task(self._warm_up()))
+            self._background_tasks.append(asyncio.create_task(self.voices.run()))
+            # One worker pre-renders; the others read its results from the shared segment and disk
+            if self.worker == 0:
+                if self.cache and self.prerender_manifests:
+                    self._background_tasks.append(asyncio.create_task(self._prerender_manifests()))
+                elif self.cache and self.prerender_default:
+                    logger.warning("⚠️ No warm-up manifest: the API's intents.default.json is not beside the "
+                                   "gateway, so the default chat replies start cold; mount it and set "
+                                   "TTS_PRERENDER_MANIFESTS (or set it empty to silence this)")
         
+        @self.app.on_event("shutdown")
+        async def stop_background_tasks():
+            for task in self._background_tasks:
+                task.cancel()
+            await self.access_log.stop()
+    
+    async def _probe_upstream(self) -> Dict[str, Any]:
+        """Time a short synthesis up to its first audio chunk"""
+        started = time.perf_counter()
+        probe = {'timestamp': time.time(), 'ok': False, 'latency_ms': None, 'error': None}
         try:
-            # Test Edge TTS with a simple synthesis
-            logger.info("🧪 Testing Edge TTS with sample text...")
-            
-            # Run a test synthesis
-            async def test_synthesis():
-                communicate = edge_tts.Communicate("Hello, this is a test.", "en-US-AriaNeural")
-                async for chunk in communicate.stream():
+            async def first_audio():
+                # Probe the primary directly so hedging and fallback don't mask an outage
+                async for chunk in self.engine.primary.stream("Hello, this is a test.", "en-US-AriaNeural"):
                     if chunk["type"] == "audio":
-                        break  # Just test that it works
-            
-            # Run the test
-            asyncio.run(test_synthesis())
-            
-            logger.info("✅ Edge TTS test successful")
-            logger.info("✅ Edge TTS Service initialized successfully")
+                        return
+                raise RuntimeError("probe produced no audio")
             
+            await asyncio.wait_for(first_audio(), timeout=15)
+            probe['ok'] = True
         except Exception as e:
-            logger.error(f"❌ Edge TTS initialization failed: {e}")
-            raise RuntimeError(f"Edge TTS initialization failed: {e}")
+            probe['error'] = str(e) or e.__class__.__name__
+        probe['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        self.readiness['last_probe'] = probe
+        return probe
+    
+    async def _warm_up(self):
+        """Initialize Edge TTS: retry the probe with backoff until it succeeds, then keep probing"""
+        logger.info("🚀 Initializing Edge TTS Service...")
+        self.readiness['state'] = 'warming'
+        
+        delay = 1.0
+        while not self.readiness['warm']:
+            self.readiness['warmup_attempts'] += 1
+            logger.info("🧪 Testing Edge TTS with sample text...")
+            probe = await self._probe_upstream()
+            if probe['ok']:
+                self.readiness['warm'] = True
+                self.readiness['state'] = 'ready'
+                logger.info(f"✅ Edge TTS warm-up successful ({probe['latency_ms']}ms to first audio)")
+                break
+            logger.error(f"❌ Edge TTS warm-up failed: {probe['error']} (retrying in {delay:.0f}s)")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        
+        while self.probe_interval > 0:
+            await asyncio.sleep(self.probe_interval)
+            probe = await self._probe_upstream()
+            # Stay ready on a failed probe: cached and coalesced audio still works
+            self.readiness['state'] = 'ready' if probe['ok'] else 'degraded'
+            if not probe['ok']:
+                logger.warning(f"⚠️ Upstream probe failed: {probe['error']}")
+    
+    async def _prerender_manifests(self):
+        """Render the startup manifests in the background once the upstream is reachable"""
+        while not self.readiness['warm']:
+            await asyncio.sleep(1.0)
+        
+        for path in self.prerender_manifests:
+            try:
+                items = load_manifest(path)
+                for item in items:
+                    item['format'] = resolve_format(item['format'])
+                    item['voice'] = self.voices.resolve(item['voice'])
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Pre-render manifest {path} unusable: {e}")
+                continue
+            
+            logger.info(f"📦 Pre-rendering {len(items)} prompts from {path}")
+            report = await render_batch(items, self._prerender_item, self.batch_config['default_parallelism'])
+            self.prerender_reports[path] = report
+            summary = report['summary']
+            logger.info(f"✅ Pre-rendered {path}: {summary['rendered']} rendered, {summary['cached']} cached, "
+                        f"{summary['failed']} failed in {summary['wall_ms']}ms")
+    
+    async def _prerender_item(self, item: Dict[str, Any], tenant: Tenant = DEFAULT_TENANT) -> Dict[str, Any]:
+        """Make sure one prompt is in the cache; MP3 is stored and telephony formats transcode on replay"""
+        voice = self.voices.resolve(item['voice'])
+        text = self._speakable(item['text'])
+        cache_key = make_cache_key(text, voice, item['rate'], item['volume'], DEFAULT_OUTPUT_FORMAT)
+        if self.cache.contains(cache_key):
+            # Also promotes disk entries into the memory tier
+            entry = await self.cache.get_entry(cache_key)
+            if entry is not None:
+                return {'status': 'cached', 'bytes': len(entry[0])}
+        
+        source = lambda: self._edge_audio_source(text, voice, item['rate'], item['volume'], cache_key, 'batch', tenant)
+        audio = await self.flights.collect(cache_key, source, lambda: self.cache.peek(cache_key))
+        if not self.cache.contains(cache_key):
+            raise RuntimeError("Rendered by the fallback engine; not cached")
+        return {'status': 'rendered', 'bytes': len(audio)}
     
-    async def _synthesize_with_edge_tts(self, text: str, voice: str, language: str) -> bytes:
+    async def _synthesize_with_edge_tts(self, text: str, voice: str, language: str,
+                                        rate: str = "+0%", volume: str = "+0%",
+                                        priority: str = "standard", tenant: Tenant = DEFAULT_TENANT) -> bytes:
         """Synthesize using Edge TTS - VERIFIED WORKING"""
         try:
-            # Get Edge TTS voice
-            edge_voice = self.voice_map.get(voice, 'en-US-AriaNeural')
+            # Repeated prompts are answered from the cache without an upstream round trip
+            cache_key = make_cache_key(text, voice, rate, volume, DEFAULT_OUTPUT_FORMAT)
+            if self.cache:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"⚡ Edge TTS cache hit: {len(cached)} bytes")
+                    return cached
             
-            logger.info(f"🎵 Generating audio with Edge TTS voice: {edge_voice}")
+            logger.info(f"🎵 Generating audio with Edge TTS voice: {voice}")
             
-            # Create Edge TTS communicate object
-            communicate = edge_tts.Communicate(text, edge_voice)
-            
-            # Collect audio data
-            audio_chunks = []
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    audio_chunks.append(chunk["data"])
-            
-            # Combine all audio chunks
-            audio_data = b''.join(audio_chunks)
+            # Joins an identical in-flight synthesis if there is one
+            source = lambda: self._edge_audio_source(text, voice, rate, volume, cache_key, priority, tenant)
+            # The source already joined the audio to cache it; reuse that object instead of joining again
+            stored = (lambda: self.cache.peek(cache_key)) if self.cache else None
+            audio_data = await self.flights.collect(cache_key, source, stored)
             
             logger.info(f"✅ Edge TTS generated {len(audio_data)} bytes of audio")
             return audio_data
@@ -274,21 +586,413 @@ class EdgeTTSServer:
             logger.error(f"❌ Edge TTS synthesis failed: {e}")
             raise
     
+    async def _pipelined_stream_response(self, text: str, voice: str, rate: str, volume: str,
+                                         priority: str, tenant: Tenant, output_format: str, with_words: bool,
+                                         frame_ms: Optional[float], tracker) -> StreamingResponse:
+        """Stream long text as concurrently rendered, strictly ordered segments"""
+        cfg = self.pipeline_config
+        segments = split_segments(
+            text,
+            target_chars=cfg['segment_chars'],
+            first_chars=cfg['first_segment_chars'],
+            max_chars=cfg['segment_chars'] * 2,
+        )
+        pipeline = SegmentPipeline(
+            segments,
+            lambda segment: self._stream_segment(segment, voice, rate, volume, priority, tenant, words=with_words),
+            max_parallel=cfg['max_parallel'],
+            rebase=rebase_word,
+        )
+        audio = await self._prime(pipeline.stream())
+        audio = self._output_stages(audio, output_format, frame_ms, with_words)
+        
+        async def generate_audio_stream():
+            try:
+                async for data in self._tracked_stream(audio, tracker):
+                    yield data
+                
+                logger.info(f"✅ Pipelined synthesis: {len(segments)} segments, "
+                            f"first byte {pipeline.first_byte_ms}ms, total {pipeline.total_ms}ms")
+            finally:
+                self.pipeline_history.append({
+                    'timestamp': time.time(),
+                    'chars': len(text),
+                    **pipeline.summary(),
+                })
+        
+        return StreamingResponse(
+            generate_audio_stream(),
+            media_type=FRAMED_MEDIA_TYPE if with_words else OUTPUT_FORMATS[output_format]['media_type'],
+            headers={
+                "X-Service": "edge-tts",
+                "X-Engine": "microsoft-edge",
+                "X-Streaming": "true",
+                "X-Audio-Format": output_format,
+                "X-Pipeline-Segments": str(len(segments)),
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive"
+            }
+        )
+    
+    async def _live_session(self, websocket: WebSocket):
+        """
+        WebSocket protocol, all client messages JSON:
+          {"type": "text", "text": "..."}   fragment; finished sentences start synthesizing at once
+          {"type": "flush"}                 speak whatever is buffered now
+          {"type": "cancel"} / {"type": "barge_in"}   drop buffered text and stop all synthesis
+          {"type": "end"}                   speak the rest, then close
+        Voice, rate, volume, format, frame_ms, priority, words=true and api_key come from the query string.
+        Opening the session costs one request; each text fragment is charged its characters.
+        Audio is sent as binary frames; segment/segment_end/word/flushed/done/cancelled/error as JSON.
+        """
+        params = websocket.query_params
+        rate = params.get('rate', '+0%')
+        volume = params.get('volume', '+0%')
+        priority = AdmissionController.normalize_priority(params.get('priority'), default='live')
+        with_words = params.get('words', '').lower() in ('1', 'true', 'yes')
+        try:
+            tenant = self._tenant(websocket.headers, params.get('api_key'))
+            await self.tenants.charge(tenant)
+            voice = self.voices.resolve(params.get('voice'))
+            output_format = resolve_format(params.get('format'))
+            frame_ms = self._frame_ms(params.get('frame_ms'), output_format)
+        except QuotaExceeded as e:
+            await websocket.close(code=1008, reason=str(e)[:120])
+            return
+        except ValueError as e:
+            await websocket.close(code=1003, reason=str(e)[:120])
+            return
+        except HTTPException as e:
+            await websocket.close(code=1008 if e.status_code == 401 else 1003, reason=str(e.detail)[:120])
+            return
+        
+        await websocket.accept()
+        tracker = self.metrics.track('ws', voice)
+        tracker.stream_started()
+        
+        async def send_audio(data: bytes):
+            tracker.chunk(len(data))
+            await websocket.send_bytes(data)
+        
+        def utterance_end(status: str, summary: Dict[str, Any]):
+            self.pipeline_history.append({'timestamp': time.time(), 'source': 'ws', 'status': status, **summary})
+        
+        cfg = self.pipeline_config
+        session = LiveSession(
+            # Cancel leaves the flight; its upstream session stops unless another caller shares it
+            lambda segment: self._stream_segment(self._speakable(segment), voice, rate, volume, priority, tenant,
+                                                 words=with_words),
+            send_audio,
+            websocket.send_json,
+            IncrementalSegmenter(
+                target_chars=cfg['segment_chars'],
+                first_chars=cfg['first_segment_chars'],
+                max_chars=cfg['segment_chars'] * 2,
+            ),
+            max_parallel=cfg['max_parallel'],
+            rebase=rebase_word,
+            wrap_audio=lambda audio: self._output_stages(audio, output_format, frame_ms),
+        )
+        session.on_utterance_end = utterance_end
+        logger.info(f"🔌 Live synthesis session opened ({voice}, {output_format})")
+        
+        try:
+            while True:
+                try:
+                    message = await websocket.receive_json()
+                    kind = message.get('type')
+                except (ValueError, KeyError, AttributeError):
+                    await websocket.send_json({'type': 'error', 'detail': 'Messages must be JSON objects'})
+                    continue
+                
+                if kind == 'text':
+                    fragment = message.get('text') or ''
+                    if len(fragment) > cfg['max_chars']:
+                        await websocket.send_json({'type': 'error', 'detail': f"Fragment too long (max {cfg['max_chars']} characters)"})
+                        continue
+                    try:
+                        await self.tenants.charge(tenant, requests=0, characters=len(fragment))
+                    except QuotaExceeded as e:
+                        # The fragment is dropped; the session stays open for when the bucket refills
+                        await websocket.send_json({'type': 'error', 'detail': str(e), 'retry_after': e.retry_after})
+                        continue
+                    await session.text(fragment)
+                elif kind == 'flush':
+                    await session.flush()
+                elif kind in ('cancel', 'barge_in'):
+                    await session.cancel(kind)
+                elif kind == 'end':
+                    await session.finish()
+                    tracker.finish('success')
+                    await websocket.close()
+                    break
+                else:
+                    await websocket.send_json({'type': 'error', 'detail': f"Unknown message type: {kind}"})
+        except WebSocketDisconnect:
+            logger.info("🔌 Live synthesis client disconnected")
+        except Exception as e:
+            tracker.finish('failed')
+            logger.error(f"❌ Live synthesis session failed: {e}")
+        finally:
+            await session.abort()
+            tracker.finish('cancelled')
+            logger.info(f"🔌 Live synthesis session closed: {session.stats}")
+    
+    async def _stream_segment(self, text: str, voice: str, rate: str, volume: str, priority: str,
+                              tenant: Tenant = DEFAULT_TENANT, words: bool = False):
+        """Audio for one segment: cache first, otherwise a (shared) upstream session"""
+        cache_key = make_cache_key(text, voice, rate, volume, DEFAULT_OUTPUT_FORMAT)
+        if self.cache:
+            cached = await self.cache.get_entry(cache_key)
+            if cached is not None:
+                async for item in self._cached_items(cached, words):
+                    yield item
+                return
+        
+        source = lambda: self._edge_audio_source(text, voice, rate, volume, cache_key, priority, tenant)
+        audio = self.flights.stream(cache_key, source, expected_audio_bytes(text))
+        async for data in (audio if words else audio_only(audio)):
+            yield data
+    
+    async def _prime(self, audio):
+        """Pull the first chunk before responding so shedding and early upstream errors get a real status"""
+        try:
+            first = await audio.__anext__()
+        except StopAsyncIteration:
+            first = None
+        
+        async def primed():
+            if first is None:
+                return
+            yield first
+            async for data in audio:
+                yield data
+        
+        return primed()
+    
+    async def _single_chunk(self, data: bytes):
+        yield data
+    
+    async def _cached_items(self, entry, with_words: bool):
+        """Replay a cache entry; word timings stored with it come first"""
+        data, words = entry
+        if with_words:
+            for word in words_from_cache(words) or ():
+                yield word
+        yield data
+    
+    def _output_format(self, requested: Optional[str]) -> str:
+        """Per-request output format; unknown or unavailable formats are a 400"""
+        try:
+            return resolve_format(requested)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    def _voice(self, requested: Optional[str]) -> str:
+        """Edge voice ID for a request; unknown voices are a 400 before any upstream call"""
+        try:
+            return self.voices.resolve(requested)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{e}; see /v1/voices")
+    
+    def _tenant(self, headers, query_key: Optional[str] = None) -> Tenant:
+        """Tenant for the request's API key (Bearer, X-API-Key or ?api_key=); 401 when unknown"""
+        authorization = headers.get('authorization', '')
+        api_key = (authorization[7:].strip() if authorization.lower().startswith('bearer ') else None) \
+            or headers.get('x-api-key') or query_key
+        tenant = self.tenants.resolve(api_key)
+        if tenant is None:
+            raise HTTPException(status_code=401, detail="Invalid API key" if api_key else "API key required",
+                                headers={"WWW-Authenticate": "Bearer"})
+        return tenant
+    
+    def _speakable(self, text: str) -> str:
+        """Canonical spoken form, so textual variants of one utterance share a synthesis"""
+        return verbalize.speakable(text) if self.normalize_text else text
+    
+    def _frame_ms(self, requested, output_format: str) -> Optional[float]:
+        """Validate a requested frame duration against the output format; None keeps upstream chunking"""
+        if requested in (None, '', 0):
+            return None
+        spec = OUTPUT_FORMATS[output_format]
+        try:
+            frame_size(spec['encoding'], spec['rate'], float(requested))
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid frame_ms: {e}")
+        return float(requested)
+    
+    def _output_stages(self, audio, output_format: str, frame_ms: Optional[float] = None,
+                       with_words: bool = False):
+        """Transcode, re-frame, then multiplex word timings, as the request asked"""
+        spec = OUTPUT_FORMATS[output_format]
+        if needs_transcoding(output_format):
+            audio = self._transcoded(audio, output_format)
+        if frame_ms:
+            frame_bytes = frame_size(spec['encoding'], spec['rate'], frame_ms)
+            audio = reframed(audio, Reframer(frame_bytes, silence_byte(spec['encoding'])))
+        if with_words:
+            audio = framed(audio)
+        return audio
+    
+    async def _transcoded(self, audio, output_format: str):
+        """MP3 chunks re-encoded for telephony as they arrive; word timings pass straight through"""
+        transcoder = StreamTranscoder(output_format)
+        words = []
+        
+        async def mp3_only():
+            async for item in audio:
+                if isinstance(item, bytes):
+                    yield item
+                else:
+                    words.append(item)
+        
+        try:
+            async for data in transcoder.transcode(mp3_only()):
+                while words:
+                    yield words.pop(0)
+                yield data
+            while words:
+                yield words.pop(0)
+        finally:
+            stats = transcoder.stats
+            self.metrics.transcode_cpu.labels(output_format).observe(stats['dsp_cpu_ms'] / 1000)
+            logger.debug(f"🎛️ Transcoded {stats['mp3_bytes_in']} MP3 bytes to {stats['bytes_out']} "
+                         f"{output_format} bytes ({stats['dsp_cpu_ms']:.1f}ms DSP CPU)")
+    
+    async def _tracked_stream(self, audio, tracker):
+        """Forward audio chunks while recording timings and the stream's outcome"""
+        tracker.stream_started()
+        try:
+            async for data in audio:
+                tracker.chunk(len(data))
+                logger.debug(f"🎵 Streaming chunk {tracker.chunks}: {len(data)} bytes")
+                yield data
+            
+            tracker.finish('success')
+            logger.info(f"✅ Streaming synthesis completed: {tracker.chunks} chunks, {tracker.bytes} bytes")
+        except Exception as e:
+            tracker.finish('failed')
+            logger.error(f"❌ Streaming synthesis failed: {e}")
+            raise
+        finally:
+            # Client went away before the last chunk
+            tracker.finish('cancelled')
+    
+    def _overloaded(self, e: AdmissionRejected) -> HTTPException:
+        """503 with a Retry-After hint for requests shed by admission control"""
+        logger.warning(f"🚦 Shedding {e.priority} request: {e.reason}")
+        return HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    def _throttled(self, e: QuotaExceeded) -> HTTPException:
+        """429 for a tenant over quota; Retry-After unless the request can never fit"""
+        logger.warning(f"🚦 Throttling tenant {e.tenant_id}: {e.limit}")
+        return HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)} if e.retry_after is not None else None
+        )
+    
+    def _pipeline_stats(self) -> Dict[str, Any]:
+        """Recent per-segment timings for tuning segment size and fan-out"""
+        history = list(self.pipeline_history)
+        timings = [t for entry in history for t in entry['timings']]
+        first_bytes = [t['first_byte_ms'] for t in timings if t['first_byte_ms'] is not None]
+        return {
+            'config': self.pipeline_config,
+            'recent_requests': len(history),
+            'avg_segment_chars': round(sum(t['chars'] for t in timings) / len(timings), 1) if timings else None,
+            'avg_segment_first_byte_ms': round(sum(first_bytes) / len(first_bytes), 1) if first_bytes else None,
+            'avg_segment_render_ms': round(sum(t['render_ms'] for t in timings) / len(timings), 1) if timings else None,
+            'recent': history[-5:],
+        }
+    
+    async def _edge_audio_source(self, text: str, edge_voice: str, rate: str, volume: str, cache_key: str,
+                                 priority: str = "standard", tenant: Tenant = DEFAULT_TENANT):
+        """One upstream Edge TTS session: audio bytes interleaved with WordEvents; caches both"""
+        audio_chunks = []
+        words = []
+        from_fallback = False
+        # Queued behind other tenants in proportion to characters over weight
+        async with self.scheduler.slot(priority, tenant.id, tenant.weight, cost=len(text)):
+            upstream = self.engine.stream(text, edge_voice, rate=rate, volume=volume)
+            try:
+                async for chunk in upstream:
+                    if chunk["type"] == "audio":
+                        from_fallback = from_fallback or chunk.get("fallback", False)
+                        audio_chunks.append(chunk["data"])
+                        yield chunk["data"]
+                    elif chunk["type"] == "WordBoundary":
+                        word = word_from_edge(chunk)
+                        words.append(word)
+                        yield word
+            finally:
+                # A cancelled flight closes us mid-utterance: end the upstream session too
+                await upstream.aclose()
+        
+        if self.cache and not from_fallback:
+            await self.cache.put(cache_key, b''.join(audio_chunks), words or None)
+    
     def run(self, host="0.0.0.0", port=3001):
         """Run the Edge TTS server"""
         logger.info(f"🚀 Starting Edge TTS Server on {host}:{port}")
         logger.info("✅ Service: Edge TTS")
         logger.info("✅ Engine: Microsoft Edge")
         logger.info("✅ Quality: Neural voices")
-        
-        uvicorn.run(
+        self.uvicorn_server(host, port).run()
+    
+    def uvicorn_server(self, host: str, port: int) -> "uvicorn.Server":
+        config = uvicorn.Config(
             self.app,
             host=host,
             port=port,
             log_level="info",
-            access_log=True
+            # uvicorn's own line per request only when ours is off
+            access_log=not self.access_log.enabled
         )
+        return _TimedServer(config, self.readiness)
+    
+    @staticmethod
+    def run_workers(workers: int, host="0.0.0.0", port=3001):
+        """Pre-fork `workers` servers sharing one port, one audio cache segment and one set of counters"""
+        cluster = SharedCounters(CLUSTER_COUNTERS, workers)
+        shared_cache = None
+        if os.getenv("TTS_CACHE_ENABLED", "true").lower() not in ("0", "false", "no"):
+            shared_cache = SharedSegment(
+                int(float(os.getenv("TTS_SHARED_CACHE_MB", "256")) * 1024 * 1024),
+                index_slots=int(os.getenv("TTS_SHARED_CACHE_SLOTS", "65536")),
+            )
+        
+        def make_server(index: int):
+            cluster.bind(index)
+            server = EdgeTTSServer(worker=index, cluster=cluster, shared_cache=shared_cache)
+            logger.info(f"👷 Worker {index} (pid {os.getpid()}) ready")
+            return server.uvicorn_server(host, port)
+        
+        logger.info(f"🚀 Starting Edge TTS Server on {host}:{port} with {workers} workers")
+        run_workers(make_server, host, port, workers)
+
+
+class _TimedServer(uvicorn.Server):
+    """uvicorn server that records how long it took to get a bound port"""
+    
+    def __init__(self, config, readiness: Dict[str, Any]):
+        super().__init__(config)
+        self._readiness = readiness
+    
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        startup_seconds = round(time.time() - _PROCESS_START, 3)
+        self._readiness['startup_seconds'] = startup_seconds
+        logger.info(f"⏱️ Port bound {startup_seconds}s after process start")
 
 if __name__ == "__main__":
-    server = EdgeTTSServer()
-    server.run()
+    workers = int(os.getenv("TTS_WORKERS", "1"))
+    if workers > 1:
+        EdgeTTSServer.run_workers(workers)
+    else:
+        server = EdgeTTSServer()
+        server.run()
@@ -0,0 +1,3 @@
+"""
+EDGE GATEWAY - support modules for edge-tts-server.py
+"""
@@ -0,0 +1,357 @@
+"""
+AUDIO CACHE - content-addressed, two tiers (three with workers)
+In-memory LRU bounded by total bytes in front of a persistent on-disk store;
+entries carry the utterance's word timings when the engine reported them.
+With pre-forked workers a shared-memory segment sits between the two, so a
+prompt synthesized by one worker is a hit on all of them.
+"""
+
+import os
+import json
+import struct
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Edge TTS always answers in this container/codec unless told otherwise
+DEFAULT_OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share a key"""
+    return ' '.join(text.split())
+
+
+# (audio, words) where words is a list of [offset_ms, duration_ms, text] or None
+Entry = Tuple[bytes, Optional[List]]
+# Rough in-memory cost of one word timing, for the byte budget
+WORD_OVERHEAD_BYTES = 64
+
+
+# Shared-segment payload: words JSON length, audio, words JSON
+_PACKED_WORDS = struct.Struct('<I')
+
+
+def pack_entry(entry: Entry) -> bytes:
+    data, words = entry
+    sidecar = json.dumps(words, separators=(',', ':')).encode('utf-8') if words else b''
+    return b''.join((_PACKED_WORDS.pack(len(sidecar)), data, sidecar))
+
+
+def unpack_entry(packed: bytes) -> Entry:
+    (words_len,) = _PACKED_WORDS.unpack_from(packed)
+    end = len(packed) - words_len
+    words = json.loads(packed[end:]) if words_len else None
+    return packed[_PACKED_WORDS.size:end], words
+
+
+def _entry_size(entry: Entry) -> int:
+    data, words = entry
+    return len(data) + (len(words) * WORD_OVERHEAD_BYTES if words else 0)
+
+
+def make_cache_key(text: str, voice: str, rate: str, volume: str, output_format: str) -> str:
+    """Hash of everything that changes the synthesized audio"""
+    material = '\x1f'.join([normalize_text(text), voice, rate, volume, output_format])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class MemoryTier:
+    """LRU of audio entries bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: Entry):
+        size = _entry_size(entry)
+        if size > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= _entry_size(previous)
+
+        self._entries[key] = entry
+        self.bytes += size
+
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= _entry_size(evicted)
+            self.evictions += 1
+
+
+class DiskTier:
+    """Directory of audio files named by cache key, LRU-evicted by total bytes
+    Word timings live next to the audio in a .words JSON sidecar"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.audio"
+
+    def _words_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.words"
+
+    def _load_index(self):
+        """Rebuild the LRU order from file mtimes left by a previous run"""
+        entries = []
+        for path in self.root.glob("*/*.audio"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            try:
+                sidecar = path.with_suffix('.words').stat().st_size
+            except OSError:
+                sidecar = 0
+            entries.append((st.st_mtime, path.stem, st.st_size + sidecar))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.bytes += size
+
+        if entries:
+            logger.info(f"💾 Audio cache restored {len(entries)} entries ({self.bytes} bytes) from {self.root}")
+
+        with self._lock:
+            self._evict_locked()
+
+    def get(self, key: str) -> Optional[Entry]:
+        path = self._path(key)
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+            elif not path.exists():
+                return None
+            else:
+                # Written by another worker since this one indexed the directory
+                self._adopt_locked(key, path)
+
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self.bytes -= size
+            return None
+
+        try:
+            words = json.loads(self._words_path(key).read_bytes())
+        except (OSError, ValueError):
+            words = None
+        return data, words
+
+    def _adopt_locked(self, key: str, path: Path):
+        try:
+            size = path.stat().st_size + (self._words_path(key).stat().st_size
+                                          if self._words_path(key).exists() else 0)
+        except OSError:
+            return
+        self._index[key] = size
+        self.bytes += size
+
+    def _write_atomic(self, path: Path, data: bytes):
+        # Write-then-rename so a crash never leaves a truncated entry behind
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def put(self, key: str, entry: Entry):
+        data, words = entry
+        sidecar = json.dumps(words, separators=(',', ':')).encode('utf-8') if words else b''
+        size = len(data) + len(sidecar)
+        if size > self.max_bytes:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Sidecar first: an audio file is never visible without its word timings
+        if sidecar:
+            self._write_atomic(self._words_path(key), sidecar)
+        self._write_atomic(path, data)
+
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous
+            self._index[key] = size
+            self.bytes += size
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self.bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            for path in (self._path(key), self._words_path(key)):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+class AudioCache:
+    """Memory tier backed by an optional disk tier"""
+
+    def __init__(self, memory_bytes: int, disk_dir: Optional[str] = None, disk_bytes: int = 0,
+                 shared=None):
+        self.memory = MemoryTier(memory_bytes)
+        # SharedSegment from callwaiting_common.shm, created by the master before forking
+        self.shared = shared
+        self.disk = DiskTier(disk_dir, disk_bytes) if disk_dir and disk_bytes > 0 else None
+        # Cluster-wide SharedCounters (cache_hits / cache_misses), when running workers
+        self.cluster = None
+        self.counters = {
+            'hits_memory': 0,
+            'hits_shared': 0,
+            'hits_disk': 0,
+            'misses': 0,
+            'stores': 0,
+            'store_errors': 0,
+        }
+
+    @classmethod
+    def from_env(cls, shared=None) -> Optional["AudioCache"]:
+        """Build the cache from TTS_CACHE_* settings, or None when disabled"""
+        if os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+
+        default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "audio")
+        memory_mb = float(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+        disk_mb = float(os.getenv("TTS_CACHE_DISK_MB", "1024"))
+        disk_dir = os.getenv("TTS_CACHE_DIR", default_dir)
+
+        return cls(
+            memory_bytes=int(memory_mb * 1024 * 1024),
+            disk_dir=disk_dir or None,
+            disk_bytes=int(disk_mb * 1024 * 1024),
+            shared=shared,
+        )
+
+    def contains(self, key: str) -> bool:
+        """Presence check that does not count as a hit or touch the LRU order"""
+        return (key in self.memory._entries
+                or (self.shared is not None and key in self.shared)
+                or (self.disk is not None and key in self.disk._index))
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """The memory tier's audio object itself, without counting a hit or touching the LRU order"""
+        entry = self.memory._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = await self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    async def get_entry(self, key: str) -> Optional[Entry]:
+        """Audio plus word timings (None if the entry was stored without them)"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count('hits_memory')
+            return entry
+
+        if self.shared is not None:
+            packed = self.shared.get(key)
+            if packed is not None:
+                entry = unpack_entry(packed)
+                self._count('hits_shared')
+                self.memory.put(key, entry)
+                return entry
+
+        if self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                self._count('hits_disk')
+                self.memory.put(key, entry)
+                if self.shared is not None:
+                    self.shared.put(key, pack_entry(entry))
+                return entry
+
+        self._count('misses')
+        return None
+
+    def _count(self, outcome: str):
+        self.counters[outcome] += 1
+        if self.cluster is not None:
+            self.cluster.add('cache_misses' if outcome == 'misses' else 'cache_hits')
+
+    async def put(self, key: str, data: bytes, words: Optional[List] = None):
+        if not data:
+            return
+
+        entry = (data, words)
+        self.memory.put(key, entry)
+        self.counters['stores'] += 1
+        if self.shared is not None:
+            self.shared.put(key, pack_entry(entry))
+
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, entry)
+            except OSError as e:
+                self.counters['store_errors'] += 1
+                logger.warning(f"⚠️ Audio cache disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.counters['hits_memory'] + self.counters['hits_shared'] + self.counters['hits_disk']
+        lookups = hits + self.counters['misses']
+        return {
+            **self.counters,
+            'hits': hits,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'memory': {
+                'entries': len(self.memory),
+                'bytes': self.memory.bytes,
+                'max_bytes': self.memory.max_bytes,
+                'evictions': self.memory.evictions,
+            },
+            'shared': self.shared.stats() if self.shared is not None else None,
+            'disk': {
+                'entries': len(self.disk),
+                'bytes': self.disk.bytes,
+                'max_bytes': self.disk.max_bytes,
+                'evictions': self.disk.evictions,
+            } if self.disk is not None else None,
+        }
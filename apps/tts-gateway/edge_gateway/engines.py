@@ -0,0 +1,119 @@
+"""
+SYNTHESIS ENGINES - what the gateway talks to upstream
+EdgeEngine wraps edge_tts.Communicate; LocalEngine is an offline stand-in
+that emits silent MP3 frames with the same chunk shape and pacing
+"""
+
+import os
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+try:
+    import edge_tts
+    EDGE_TTS_AVAILABLE = True
+except ImportError:
+    edge_tts = None
+    EDGE_TTS_AVAILABLE = False
+
+# One MPEG-2 Layer III frame, 24 kHz mono at 48 kbit/s, with zeroed side
+# info: decodes as 24 ms of silence and matches Edge TTS's output format
+SILENT_MP3_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + bytes(140)
+FRAME_SECONDS = 576 / 24000
+# 100-nanosecond ticks, the unit Edge TTS uses for boundary offsets
+TICKS_PER_SECOND = 10_000_000
+
+
+class EdgeEngine:
+    """Microsoft Edge read-aloud service via edge-tts"""
+
+    name = 'edge'
+
+    def __init__(self):
+        if not EDGE_TTS_AVAILABLE:
+            raise RuntimeError("Edge TTS library not available. Install with: pip install edge-tts")
+
+    async def stream(self, text: str, voice: str, rate: str = "+0%", volume: str = "+0%") -> AsyncIterator[Dict[str, Any]]:
+        try:
+            # edge-tts 7 reports sentence boundaries unless asked for words
+            communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume, boundary="WordBoundary")
+        except TypeError:
+            communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume)
+        stream = communicate.stream()
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            # Closes the websocket at once when the reader stops early
+            await stream.aclose()
+
+    async def list_voices(self) -> List[Dict[str, Any]]:
+        return await edge_tts.list_voices()
+
+
+class LocalEngine:
+    """Offline stand-in: silence sized like real speech, no network"""
+
+    name = 'local'
+
+    def __init__(self, first_chunk_ms: float = 0.0, chars_per_second: float = 15.0,
+                 frames_per_chunk: int = 8, realtime_factor: float = 0.0):
+        self.first_chunk_ms = first_chunk_ms
+        self.chars_per_second = chars_per_second
+        self.frames_per_chunk = max(1, frames_per_chunk)
+        # 0 emits as fast as possible; 1.0 paces chunks at playback speed
+        self.realtime_factor = realtime_factor
+
+    @classmethod
+    def from_env(cls) -> "LocalEngine":
+        return cls(
+            first_chunk_ms=float(os.getenv("TTS_LOCAL_FIRST_CHUNK_MS", "0")),
+            realtime_factor=float(os.getenv("TTS_LOCAL_REALTIME_FACTOR", "0")),
+        )
+
+    async def stream(self, text: str, voice: str, rate: str = "+0%", volume: str = "+0%") -> AsyncIterator[Dict[str, Any]]:
+        if self.first_chunk_ms:
+            await asyncio.sleep(self.first_chunk_ms / 1000)
+
+        words = text.split()
+        seconds = max(len(text) / self.chars_per_second, FRAME_SECONDS)
+        frames = max(1, int(seconds / FRAME_SECONDS))
+
+        # Spread word boundaries evenly and interleave them with the audio they describe
+        word_ticks = int(seconds * TICKS_PER_SECOND / max(len(words), 1))
+        boundaries = [(i * word_ticks, word) for i, word in enumerate(words)]
+        next_boundary = 0
+
+        chunk = SILENT_MP3_FRAME * self.frames_per_chunk
+        for start in range(0, frames, self.frames_per_chunk):
+            count = min(self.frames_per_chunk, frames - start)
+            chunk_end = int((start + count) * FRAME_SECONDS * TICKS_PER_SECOND)
+            while next_boundary < len(boundaries) and boundaries[next_boundary][0] < chunk_end:
+                offset, word = boundaries[next_boundary]
+                yield {"type": "WordBoundary", "offset": offset, "duration": word_ticks, "text": word}
+                next_boundary += 1
+
+            yield {"type": "audio", "data": chunk if count == self.frames_per_chunk else SILENT_MP3_FRAME * count}
+            if self.realtime_factor:
+                await asyncio.sleep(count * FRAME_SECONDS * self.realtime_factor)
+            else:
+                await asyncio.sleep(0)
+
+        for offset, word in boundaries[next_boundary:]:
+            yield {"type": "WordBoundary", "offset": offset, "duration": word_ticks, "text": word}
+
+    async def list_voices(self) -> List[Dict[str, Any]]:
+        # Speaks any voice name; the catalog keeps its snapshot or built-in list
+        return []
+
+
+def create_engine(name: str):
+    """Engine by name: 'edge' (default) or 'local'"""
+    if name == 'local':
+        logger.info("🧪 Using local stand-in engine (offline, silent audio)")
+        return LocalEngine.from_env()
+    if name == 'edge':
+        return EdgeEngine()
+    raise ValueError(f"Unknown TTS engine: {name}")
@@ -0,0 +1,118 @@
+"""
+RE-FRAMING - coalesce upstream audio chunks into fixed-duration frames
+Edge TTS chunk sizes vary wildly; RTP and WebSocket senders want steady
+writes (20 ms for telephony, larger for browsers). Whole frames are sliced
+straight out of the incoming chunk; only the partial frame at a chunk boundary
+is staged, in one preallocated buffer written through memoryview slices, so
+nothing is ever re-concatenated.
+"""
+
+from typing import AsyncIterator, List, Optional
+
+# MP3 can only be cut between frames: one 24 kHz MPEG-2 Layer III frame at
+# 48 kbit/s is 144 bytes / 24 ms
+MP3_FRAME_BYTES = 144
+MP3_FRAME_MS = 24
+
+# Silence in each raw encoding, used to pad the last frame to full size
+_SILENCE = {
+    'mulaw': 0xFF,
+    'pcm_s16le': 0x00,
+}
+
+MIN_FRAME_MS = 10
+MAX_FRAME_MS = 1000
+
+
+def frame_size(encoding: str, rate: int, frame_ms: float) -> int:
+    """Bytes per frame of `frame_ms` for an output encoding"""
+    if not MIN_FRAME_MS <= frame_ms <= MAX_FRAME_MS:
+        raise ValueError(f"frame_ms must be between {MIN_FRAME_MS} and {MAX_FRAME_MS}")
+    if encoding == 'mp3':
+        return max(1, round(frame_ms / MP3_FRAME_MS)) * MP3_FRAME_BYTES
+    if encoding == 'mulaw':
+        return int(rate * frame_ms / 1000)
+    if encoding == 'pcm_s16le':
+        return int(rate * frame_ms / 1000) * 2
+    raise ValueError(f"Cannot re-frame {encoding} audio")
+
+
+def silence_byte(encoding: str) -> Optional[int]:
+    """Padding for a short last frame; MP3 is never padded"""
+    return _SILENCE.get(encoding)
+
+
+class Reframer:
+    """Fixed-size frames out of arbitrarily sized chunks"""
+
+    def __init__(self, frame_bytes: int, pad_byte: Optional[int] = None):
+        self.frame_bytes = frame_bytes
+        self.pad_byte = pad_byte
+        # Staging area for the one partial frame that can exist between pushes
+        self._staging = bytearray(frame_bytes)
+        self._view = memoryview(self._staging)
+        self._fill = 0
+        self.frames_out = 0
+        self.bytes_staged = 0
+
+    def push(self, data: bytes) -> List[bytes]:
+        frames: List[bytes] = []
+        size = self.frame_bytes
+        total = len(data)
+        pos = 0
+
+        if self._fill:
+            take = min(size - self._fill, total)
+            # Small chunks are staged whole; only a split chunk needs a (zero-copy) view
+            self._view[self._fill:self._fill + take] = data if take == total else memoryview(data)[:take]
+            self._fill += take
+            self.bytes_staged += take
+            pos = take
+            if self._fill < size:
+                return frames
+            frames.append(bytes(self._staging))
+            self._fill = 0
+
+        if pos == 0 and total == size:
+            # Already exactly one frame: hand the caller's object through untouched
+            frames.append(data)
+            pos = total
+        # Slicing bytes copies straight into the new frame object, with no intermediate
+        while total - pos >= size:
+            frames.append(data[pos:pos + size])
+            pos += size
+
+        rest = total - pos
+        if rest:
+            self._view[:rest] = data if rest == total else memoryview(data)[pos:]
+            self._fill = rest
+            self.bytes_staged += rest
+
+        self.frames_out += len(frames)
+        return frames
+
+    def flush(self) -> Optional[bytes]:
+        """The short last frame, padded with silence where the encoding allows"""
+        if not self._fill:
+            return None
+        if self.pad_byte is not None:
+            self._view[self._fill:] = bytes([self.pad_byte]) * (self.frame_bytes - self._fill)
+            frame = bytes(self._staging)
+        else:
+            frame = bytes(self._view[:self._fill])
+        self._fill = 0
+        self.frames_out += 1
+        return frame
+
+
+async def reframed(stream: AsyncIterator, reframer: Reframer) -> AsyncIterator:
+    """Re-frame the audio in a stream; metadata items (word timings) pass through in order"""
+    async for item in stream:
+        if not isinstance(item, bytes):
+            yield item
+            continue
+        for frame in reframer.push(item):
+            yield frame
+    tail = reframer.flush()
+    if tail is not None:
+        yield tail
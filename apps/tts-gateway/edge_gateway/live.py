@@ -0,0 +1,180 @@
+"""
+LIVE SESSION - incremental text in, audio out, for one WebSocket connection
+Fragments go through the incremental segmenter; finished segments are rendered
+by an open-ended pipeline while more text is still arriving. cancel/barge_in
+tear the pipeline down (and its upstream sessions) immediately.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+
+from edge_gateway.segmenter import IncrementalSegmenter
+from edge_gateway.pipeline import SegmentPipeline, SegmentSynth
+
+logger = logging.getLogger(__name__)
+
+SendAudio = Callable[[bytes], Awaitable[None]]
+SendEvent = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class LiveSession:
+    """Protocol state for one connection; the server owns the socket"""
+
+    def __init__(self, synth: SegmentSynth, send_audio: SendAudio, send_event: SendEvent,
+                 segmenter: IncrementalSegmenter, max_parallel: int = 2,
+                 rebase: Optional[Callable] = None, wrap_audio: Optional[Callable] = None):
+        self.segmenter = segmenter
+        self.max_parallel = max_parallel
+        self.rebase = rebase
+        # Hook to post-process the continuous MP3 stream (e.g. telephony transcoding)
+        self.wrap_audio = wrap_audio
+        self.on_utterance_end: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self._synth = synth
+        self._send_audio = send_audio
+        self._send_event = send_event
+        self._pipeline: Optional[SegmentPipeline] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._flush_marker: Optional[int] = None
+        self._events: List[Dict[str, Any]] = []
+        # The receive loop, the sender and event drains all write to one socket
+        self._send_lock = asyncio.Lock()
+        self._bytes_sent = 0
+        self.stats = {
+            'segments': 0,
+            'bytes_sent': 0,
+            'flushes': 0,
+            'cancels': 0,
+            'barge_ins': 0,
+        }
+
+    async def text(self, fragment: str):
+        for segment in self.segmenter.push(fragment):
+            await self._enqueue(segment)
+
+    async def flush(self):
+        """Speak whatever is buffered now; a 'flushed' event follows its last audio"""
+        for segment in self.segmenter.flush():
+            await self._enqueue(segment)
+        self.stats['flushes'] += 1
+        if self._pipeline is None:
+            await self._event({'type': 'flushed', 'segments': 0})
+        else:
+            self._flush_marker = len(self._pipeline.segments)
+
+    async def cancel(self, reason: str = 'cancel'):
+        """Drop buffered text and stop every queued and in-flight segment"""
+        dropped_text = self.segmenter.pending
+        self.segmenter.reset()
+        pipeline, sender = self._pipeline, self._sender
+        self._pipeline = self._sender = None
+        self._flush_marker = None
+        self._events.clear()
+
+        queued = 0
+        if pipeline is not None:
+            queued = len(pipeline.segments) - len(pipeline.timings)
+            sender.cancel()
+            try:
+                await sender
+            except BaseException:
+                pass
+            self._utterance_end('cancelled', pipeline)
+
+        self.stats['barge_ins' if reason == 'barge_in' else 'cancels'] += 1
+        await self._event({
+            'type': 'barge_in' if reason == 'barge_in' else 'cancelled',
+            'segments_dropped': queued,
+            'chars_dropped': len(dropped_text),
+            # How far playback got this turn, so the agent can trim what the caller actually heard
+            'bytes_sent': self._bytes_sent,
+        })
+        self._bytes_sent = 0
+
+    async def finish(self):
+        """End of input: speak the rest and wait until it has all been sent"""
+        for segment in self.segmenter.flush():
+            await self._enqueue(segment)
+        if self._pipeline is not None:
+            self._pipeline.close()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+
+    async def abort(self):
+        """Connection gone: stop everything without sending"""
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except BaseException:
+                pass
+            self._utterance_end('cancelled', self._pipeline)
+            self._pipeline = self._sender = None
+
+    async def _enqueue(self, segment: str):
+        if self._pipeline is None:
+            self._pipeline = SegmentPipeline([], self._synth, max_parallel=self.max_parallel,
+                                             open_ended=True, rebase=self.rebase)
+            self._pipeline.on_segment_done = self._segment_done
+            self._sender = asyncio.create_task(self._send(self._pipeline))
+        self._pipeline.add(segment)
+        self.stats['segments'] += 1
+        await self._event({'type': 'segment', 'index': len(self._pipeline.segments) - 1, 'text': segment})
+
+    def _segment_done(self, timing: Dict[str, Any]):
+        # Queued rather than sent here so they go out after this segment's last audio frame
+        self._events.append({'type': 'segment_end', **timing})
+        if self._flush_marker is not None and timing['index'] + 1 >= self._flush_marker:
+            self._flush_marker = None
+            self._events.append({'type': 'flushed', 'segments': timing['index'] + 1, 'bytes_sent': self._bytes_sent})
+            # A flush ends the turn: barge-in byte counts start again from here
+            self._bytes_sent = 0
+        # The pipeline may now sit waiting for text, so don't wait for the next frame
+        drain = asyncio.ensure_future(self._drain_events())
+        # A closed socket surfaces in the sender; only retrieve the error here
+        drain.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _event(self, event: Dict[str, Any]):
+        async with self._send_lock:
+            await self._send_event(event)
+
+    async def _drain_events(self):
+        async with self._send_lock:
+            while self._events:
+                await self._send_event(self._events.pop(0))
+
+    async def _send(self, pipeline: SegmentPipeline):
+        audio = pipeline.stream()
+        if self.wrap_audio is not None:
+            audio = self.wrap_audio(audio)
+        try:
+            async for data in audio:
+                await self._drain_events()
+                if not isinstance(data, bytes):
+                    # Word timings ride the JSON channel
+                    await self._event(data.as_event())
+                    continue
+                async with self._send_lock:
+                    await self._send_audio(data)
+                self._bytes_sent += len(data)
+                self.stats['bytes_sent'] += len(data)
+            await self._drain_events()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Live synthesis failed: {e}")
+            if self._pipeline is pipeline:
+                self._pipeline = self._sender = None
+            self._utterance_end('failed', pipeline)
+            await self._event({'type': 'error', 'detail': str(e)})
+            return
+        if self._pipeline is pipeline:
+            self._pipeline = self._sender = None
+        self._utterance_end('success', pipeline)
+        await self._event({'type': 'done', 'segments': len(pipeline.segments)})
+
+    def _utterance_end(self, status: str, pipeline: SegmentPipeline):
+        if self.on_utterance_end is not None:
+            self.on_utterance_end(status, pipeline.summary())
@@ -0,0 +1,233 @@
+"""
+METRICS - minimal Prometheus-style registry
+Counters, gauges and histograms with labels, rendered in the text exposition format
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Any
+
+LabelValues = Tuple[str, ...]
+# (name, type, help, [(labels, value), ...]) produced by collectors at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(str(kwargs[n]) for n in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def samples(self) -> Iterable[Tuple[LabelValues, Any]]:
+        return list(self._children.items())
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def total(self, **match) -> float:
+        """Sum over children whose labels match the given values"""
+        idx = {self.labelnames.index(k): str(v) for k, v in match.items()}
+        return sum(
+            child.value for values, child in self.samples()
+            if all(values[i] == v for i, v in idx.items())
+        )
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def value(self) -> float:
+        return self._default().value
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Bucket-interpolated estimate, same approach as histogram_quantile()"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.bounds[i] if i < len(self.bounds) else None
+            if n and seen + n >= rank:
+                if upper is None:
+                    return self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            if upper is not None:
+                lower = upper
+        return self.bounds[-1]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors; renders Prometheus text"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        """Register a callback producing metric families at scrape time"""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, child in metric.samples():
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, n in zip(metric.buckets + (float('inf'),), child.counts):
+                        cumulative += n
+                        le = 'le="' + _format_value(bound) + '"'
+                        lines.append(f"{metric.name}_bucket{_format_labels(metric.labelnames, values, le)} {cumulative}")
+                    labels = _format_labels(metric.labelnames, values)
+                    lines.append(f"{metric.name}_sum{labels} {_format_value(child.sum)}")
+                    lines.append(f"{metric.name}_count{labels} {child.count}")
+                else:
+                    labels = _format_labels(metric.labelnames, values)
+                    lines.append(f"{metric.name}{labels} {_format_value(child.value)}")
+
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = tuple(labels.keys())
+                    lines.append(f"{name}{_format_labels(names, tuple(labels.values()))} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
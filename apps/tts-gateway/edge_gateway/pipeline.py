@@ -0,0 +1,149 @@
+"""
+SEGMENT PIPELINE - render segments concurrently, stream them strictly in order
+At most max_parallel segments are rendering or buffered ahead of the reader;
+open-ended pipelines accept segments while streaming (live text input)
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional
+
+# Segments yield audio bytes, optionally interleaved with metadata items (word timings)
+SegmentSynth = Callable[[str], AsyncIterator[Any]]
+
+
+class _SegmentRender:
+    """Background render of one segment into an in-order buffer"""
+
+    def __init__(self, index: int, text: str, synth: SegmentSynth, started: float):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.timing: Dict[str, Any] = {
+            'index': index,
+            'chars': len(text),
+            'bytes': 0,
+            'start_ms': round((time.perf_counter() - started) * 1000, 1),
+            'first_byte_ms': None,
+            'render_ms': None,
+        }
+        self._text = text
+        self._synth = synth
+        self._changed = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        t0 = time.perf_counter()
+        try:
+            async for data in self._synth(self._text):
+                if isinstance(data, bytes):
+                    if self.timing['first_byte_ms'] is None:
+                        self.timing['first_byte_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+                    self.timing['bytes'] += len(data)
+                self.chunks.append(data)
+                self._changed.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.timing['render_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+            self.done = True
+            self._changed.set()
+
+    async def drain(self) -> AsyncIterator[bytes]:
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                yield self.chunks[index]
+                self.chunks[index] = None  # release what the reader already has
+                index += 1
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def cancel(self):
+        if not self._task.done():
+            self._task.cancel()
+
+
+class SegmentPipeline:
+    """Ordered streaming over concurrently rendered segments"""
+
+    def __init__(self, segments: List[str], synth: SegmentSynth, max_parallel: int = 3,
+                 open_ended: bool = False, rebase: Optional[Callable[[Any, int], Any]] = None):
+        self.segments = list(segments)
+        self.max_parallel = max(1, max_parallel)
+        self.timings: List[Dict[str, Any]] = []
+        self.first_byte_ms: Optional[float] = None
+        self.total_ms: Optional[float] = None
+        # Called with each segment's timing once the reader has all of its audio
+        self.on_segment_done: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.closed = not open_ended
+        # Maps a segment's metadata item to stream time, given the audio bytes before the segment
+        self._rebase = rebase
+        self._synth = synth
+        self._added = asyncio.Event()
+
+    def add(self, segment: str):
+        """Queue another segment on an open-ended pipeline"""
+        if self.closed:
+            raise RuntimeError("Pipeline is closed")
+        self.segments.append(segment)
+        self._added.set()
+
+    def close(self):
+        """No more segments; stream() ends after the last queued one"""
+        self.closed = True
+        self._added.set()
+
+    async def stream(self) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        renders: List[_SegmentRender] = []
+        audio_bytes = 0
+
+        def launch_until(limit: int):
+            while len(renders) < min(limit, len(self.segments)):
+                i = len(renders)
+                renders.append(_SegmentRender(i, self.segments[i], self._synth, started))
+
+        try:
+            i = 0
+            while True:
+                launch_until(i + self.max_parallel)
+                if i >= len(self.segments):
+                    if self.closed:
+                        break
+                    self._added.clear()
+                    await self._added.wait()
+                    continue
+
+                segment_base = audio_bytes
+                async for data in renders[i].drain():
+                    if not isinstance(data, bytes):
+                        yield self._rebase(data, segment_base) if self._rebase else data
+                        continue
+                    if self.first_byte_ms is None:
+                        self.first_byte_ms = round((time.perf_counter() - started) * 1000, 1)
+                    audio_bytes += len(data)
+                    yield data
+                self.timings.append(renders[i].timing)
+                if self.on_segment_done is not None:
+                    self.on_segment_done(renders[i].timing)
+                # Reader moved past segment i: one more may start rendering
+                i += 1
+        finally:
+            for render in renders:
+                render.cancel()
+            self.total_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'segments': len(self.segments),
+            'max_parallel': self.max_parallel,
+            'first_byte_ms': self.first_byte_ms,
+            'total_ms': self.total_ms,
+            'timings': self.timings,
+        }
@@ -0,0 +1,144 @@
+"""
+PRE-RENDER - render many prompts into the cache ahead of the first call
+Used by /v1/synthesize/batch and by the startup manifest warm-up; bounded
+parallelism, per-item status and a throughput summary
+"""
+
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from edge_gateway.timing import MP3_BYTES_PER_MS
+
+logger = logging.getLogger(__name__)
+
+ITEM_DEFAULTS = {
+    'voice': 'en-US-AriaNeural',
+    'rate': '+0%',
+    'volume': '+0%',
+    'format': 'mp3',
+}
+
+# render(item) -> {'status': 'rendered' | 'cached', 'bytes': int}
+RenderFn = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def normalize_items(raw_items: List[Any], defaults: Optional[Dict[str, Any]] = None,
+                    max_chars: int = 1000) -> List[Dict[str, Any]]:
+    """Fill defaults and validate; raises ValueError naming the bad item"""
+    base = {**ITEM_DEFAULTS, **(defaults or {})}
+    items = []
+    for index, raw in enumerate(raw_items):
+        if isinstance(raw, str):
+            raw = {'text': raw}
+        if not isinstance(raw, dict):
+            raise ValueError(f"Item {index}: expected an object or a string")
+        item = {**base, **raw}
+        item['text'] = str(item.get('text') or '').strip()
+        if not item['text']:
+            raise ValueError(f"Item {index}: text is required")
+        if len(item['text']) > max_chars:
+            raise ValueError(f"Item {index}: text too long (max {max_chars} characters)")
+        item.setdefault('id', str(index))
+        items.append(item)
+    return items
+
+
+def parse_parallelism(value: Any, default: int, maximum: int) -> int:
+    """A request's parallelism clamped to 1..maximum, default when absent; raises ValueError"""
+    if value is None:
+        return max(1, min(default, maximum))
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("parallelism must be an integer")
+    try:
+        parallelism = int(value)
+    except ValueError:
+        raise ValueError("parallelism must be an integer")
+    return max(1, min(parallelism, maximum))
+
+
+def intent_table_items(table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Every reply in an API chat intent table, plus its fallback"""
+    items = [{'id': f"fallback.{intent.get('name', index)}", 'text': intent['reply']}
+             for index, intent in enumerate(table.get('intents', [])) if intent.get('reply')]
+    if table.get('fallback'):
+        items.append({'id': 'fallback.default', 'text': table['fallback']})
+    return items
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """Manifest: {"defaults": {...}, "items": [...]}, a bare list of items, or an API intent table"""
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        return normalize_items(manifest)
+    if 'items' not in manifest and 'intents' in manifest:
+        return normalize_items(intent_table_items(manifest), manifest.get('defaults'))
+    return normalize_items(manifest.get('items', []), manifest.get('defaults'))
+
+
+async def render_batch(items: List[Dict[str, Any]], render: RenderFn, parallelism: int = 4) -> Dict[str, Any]:
+    """Render items concurrently, at most `parallelism` at a time"""
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    started = time.perf_counter()
+
+    async def run(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            t0 = time.perf_counter()
+            result = {
+                'index': index,
+                'id': item['id'],
+                'voice': item['voice'],
+                'format': item['format'],
+                'chars': len(item['text']),
+                'status': 'failed',
+                'bytes': 0,
+                'audio_seconds': 0.0,
+                'ms': None,
+                'error': None,
+            }
+            try:
+                outcome = await render(item)
+                result['status'] = outcome['status']
+                result['bytes'] = outcome['bytes']
+                result['audio_seconds'] = round(outcome['bytes'] / MP3_BYTES_PER_MS / 1000, 2)
+            except Exception as e:
+                result['error'] = str(e) or e.__class__.__name__
+            result['ms'] = round((time.perf_counter() - t0) * 1000, 1)
+            return result
+
+    results = await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
+    wall = time.perf_counter() - started
+
+    counts = {'rendered': 0, 'cached': 0, 'failed': 0}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    chars = sum(r['chars'] for r in results if r['status'] != 'failed')
+    audio_seconds = sum(r['audio_seconds'] for r in results)
+
+    return {
+        'summary': {
+            'items': len(results),
+            **counts,
+            'parallelism': parallelism,
+            'wall_ms': round(wall * 1000, 1),
+            'items_per_second': round(len(results) / wall, 2) if wall else None,
+            'chars_per_second': round(chars / wall, 1) if wall else None,
+            'audio_seconds': round(audio_seconds, 2),
+            # Seconds of audio produced per wall-clock second
+            'audio_per_wall_second': round(audio_seconds / wall, 2) if wall else None,
+        },
+        'items': results,
+    }
+
+
+# The API's default chat intents (apps/api/intents.default.json): its replies are the default warm-up
+DEFAULT_INTENTS_PATH = Path(__file__).resolve().parents[2] / 'api' / 'intents.default.json'
+
+
+def default_manifest_path() -> str:
+    """The API's default intent table when it sits beside the gateway (a checkout); none otherwise"""
+    return str(DEFAULT_INTENTS_PATH) if DEFAULT_INTENTS_PATH.exists() else ''
@@ -0,0 +1,307 @@
+"""
+RESILIENT ENGINE - hedged requests and circuit breaking around the primary engine
+A slow first chunk triggers one duplicate request and the first stream to
+produce audio wins; repeated failures open the breaker and route to the fallback
+"""
+
+import os
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Primary engine is failing fast and there is no fallback"""
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open trial after a cool-down
+
+    admit() hands each request let through a ticket; only the half-open trial's
+    ticket can release the trial, so a request admitted while the breaker was
+    closed can't free the slot for a second concurrent trial.
+    """
+
+    # Ticket for a request admitted while closed; it holds no trial
+    NO_TRIAL = 0
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        # Number of the latest half-open trial, which is also its ticket
+        self._trial = 0
+
+    def admit(self) -> Optional[int]:
+        """None to keep off the primary; otherwise a ticket for release_trial"""
+        if self.state == 'closed':
+            return self.NO_TRIAL
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = 'half_open'
+            self._trial_in_flight = False
+        if self.state == 'half_open' and not self._trial_in_flight:
+            # Let exactly one request through to test the upstream
+            self._trial_in_flight = True
+            self._trial += 1
+            return self._trial
+        return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def release_trial(self, ticket: int):
+        """A request let through ended with no outcome (hang-up, barge-in): if it was the trial, the next may try"""
+        if ticket != self.NO_TRIAL and ticket == self._trial:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+        if self.state != 'closed':
+            logger.info("🔌 Circuit closed: primary engine recovered")
+        self.state = 'closed'
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.times_opened += 1
+                logger.warning(f"🔌 Circuit opened after {self.consecutive_failures} consecutive failures")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'times_opened': self.times_opened,
+        }
+
+
+class _Contender:
+    """One attempt at the primary engine, read up to its first audio chunk in the background"""
+
+    def __init__(self, stream: AsyncIterator[Dict[str, Any]]):
+        self.stream = stream
+        self.prefix: List[Dict[str, Any]] = []
+        self.task = asyncio.ensure_future(self._until_audio())
+
+    async def _until_audio(self):
+        async for chunk in self.stream:
+            self.prefix.append(chunk)
+            if chunk["type"] == "audio":
+                return
+        raise RuntimeError("Engine produced no audio")
+
+    async def close(self):
+        if not self.task.done():
+            self.task.cancel()
+        try:
+            await self.task
+        except BaseException:
+            pass
+        try:
+            await self.stream.aclose()
+        except Exception:
+            pass
+
+
+class ResilientEngine:
+    """Primary engine with hedging, a circuit breaker and an optional fallback engine"""
+
+    def __init__(self, primary, fallback=None, breaker: Optional[CircuitBreaker] = None,
+                 hedge_percentile: float = 95.0, hedge_min_ms: float = 250.0,
+                 hedge_default_ms: float = 1500.0, hedge_budget: float = 0.1,
+                 window: int = 200):
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker or CircuitBreaker()
+        self.name = primary.name
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_ms = hedge_min_ms
+        self.hedge_default_ms = hedge_default_ms
+        # Hedges may add at most this fraction of extra upstream requests
+        self.hedge_budget = hedge_budget
+        self._latencies = deque(maxlen=window)
+        self.counters = {
+            'requests': 0,
+            'hedges_issued': 0,
+            'hedges_won': 0,
+            'hedges_skipped_budget': 0,
+            'primary_failures': 0,
+            'fallbacks': 0,
+            'short_circuited': 0,
+        }
+
+    @classmethod
+    def from_env(cls, primary, fallback=None) -> "ResilientEngine":
+        return cls(
+            primary,
+            fallback,
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("TTS_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("TTS_BREAKER_RESET_SECONDS", "30")),
+            ),
+            hedge_percentile=float(os.getenv("TTS_HEDGE_PERCENTILE", "95")),
+            hedge_min_ms=float(os.getenv("TTS_HEDGE_MIN_MS", "250")),
+            hedge_default_ms=float(os.getenv("TTS_HEDGE_DEFAULT_MS", "1500")),
+            hedge_budget=float(os.getenv("TTS_HEDGE_BUDGET", "0.1")),
+        )
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first chunk before hedging"""
+        if len(self._latencies) < 20:
+            delay_ms = self.hedge_default_ms
+        else:
+            ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+            delay_ms = ordered[index]
+        return max(delay_ms, self.hedge_min_ms) / 1000
+
+    async def stream(self, text: str, voice: str, rate: str = "+0%", volume: str = "+0%") -> AsyncIterator[Dict[str, Any]]:
+        self.counters['requests'] += 1
+
+        ticket = self.breaker.admit()
+        if ticket is None:
+            self.counters['short_circuited'] += 1
+            async for chunk in self._fallback_or_raise(text, voice, rate, volume, CircuitOpenError("Primary engine circuit open")):
+                yield chunk
+            return
+
+        # Set once the attempt counts as a success or a failure; a stream abandoned before
+        # either (or a race cancelled before any audio) must not hold the half-open trial
+        outcome = False
+        try:
+            started = time.perf_counter()
+            try:
+                winner = await self._race_first_audio(text, voice, rate, volume)
+            except Exception as e:
+                self.counters['primary_failures'] += 1
+                self.breaker.record_failure()
+                outcome = True
+                logger.warning(f"⚠️ Primary engine failed before first audio: {e}")
+                async for chunk in self._fallback_or_raise(text, voice, rate, volume, e):
+                    yield chunk
+                return
+
+            self._latencies.append((time.perf_counter() - started) * 1000)
+
+            try:
+                for chunk in winner.prefix:
+                    yield chunk
+                async for chunk in winner.stream:
+                    yield chunk
+            except Exception:
+                # Audio already went out, so there is nothing to fall back to
+                self.counters['primary_failures'] += 1
+                self.breaker.record_failure()
+                outcome = True
+                raise
+            finally:
+                await winner.close()
+
+            self.breaker.record_success()
+            outcome = True
+        finally:
+            if not outcome:
+                self.breaker.release_trial(ticket)
+
+    async def _race_first_audio(self, text: str, voice: str, rate: str, volume: str) -> _Contender:
+        """First contender to produce audio wins; a hedge starts if the first is slow"""
+        first = _Contender(self.primary.stream(text, voice, rate=rate, volume=volume))
+        try:
+            done, _ = await asyncio.wait({first.task}, timeout=self.hedge_delay())
+            if done:
+                first.task.result()
+                return first
+
+            if self.counters['hedges_issued'] >= self.hedge_budget * self.counters['requests']:
+                self.counters['hedges_skipped_budget'] += 1
+                await first.task
+                return first
+        except BaseException:
+            # Failed, or the caller went away before any audio: don't leave the upstream running
+            await first.close()
+            raise
+
+        self.counters['hedges_issued'] += 1
+        hedge = _Contender(self.primary.stream(text, voice, rate=rate, volume=volume))
+        contenders = {first.task: first, hedge.task: hedge}
+        pending = set(contenders)
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = contenders[task]
+                        if winner is hedge:
+                            self.counters['hedges_won'] += 1
+                        for other in contenders.values():
+                            if other is not winner:
+                                await other.close()
+                        return winner
+                    error = task.exception()
+        except BaseException:
+            for contender in contenders.values():
+                await contender.close()
+            raise
+
+        raise error
+
+    async def _fallback_or_raise(self, text: str, voice: str, rate: str, volume: str, error: BaseException):
+        if self.fallback is None:
+            raise error
+        self.counters['fallbacks'] += 1
+        async for chunk in self.fallback.stream(text, voice, rate=rate, volume=volume):
+            # Tagged so callers can keep fallback audio out of the cache
+            yield {**chunk, 'fallback': True}
+
+    async def list_voices(self) -> List[Dict[str, Any]]:
+        return await self.primary.list_voices()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'primary': self.primary.name,
+            'fallback': self.fallback.name if self.fallback is not None else None,
+            **self.counters,
+            'hedge_delay_ms': round(self.hedge_delay() * 1000, 1),
+            'breaker': self.breaker.stats(),
+        }
+
+
+class FaultyEngine:
+    """Wraps an engine and injects latency and failures (tests and load drills)"""
+
+    def __init__(self, inner, first_chunk_ms: float = 0.0, slow_probability: float = 0.0,
+                 slow_ms: float = 0.0, failure_probability: float = 0.0,
+                 seed: Optional[int] = None):
+        self.inner = inner
+        self.name = f"faulty-{inner.name}"
+        self.first_chunk_ms = first_chunk_ms
+        self.slow_probability = slow_probability
+        self.slow_ms = slow_ms
+        self.failure_probability = failure_probability
+        self._random = random.Random(seed)
+
+    async def stream(self, text: str, voice: str, rate: str = "+0%", volume: str = "+0%") -> AsyncIterator[Dict[str, Any]]:
+        delay = self.first_chunk_ms
+        if self._random.random() < self.slow_probability:
+            delay += self.slow_ms
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self._random.random() < self.failure_probability:
+            raise ConnectionError("Injected upstream failure")
+        async for chunk in self.inner.stream(text, voice, rate=rate, volume=volume):
+            yield chunk
@@ -0,0 +1,251 @@
+"""
+ADMISSION CONTROL - bounded upstream concurrency with priority classes
+Live-call streaming is admitted ahead of standard and batch work; once the
+wait queue is full the lowest-priority request is shed immediately. Within a
+class, waiters are ordered by start-time fair queuing: each tenant's queued
+work is tagged in virtual time by cost / weight, so a tenant flooding the
+queue only delays itself.
+"""
+
+import os
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, List, Any, Optional
+
+PRIORITY_CLASSES = {
+    'live': 0,
+    'standard': 1,
+    'batch': 2,
+}
+
+
+class AdmissionRejected(Exception):
+    """Request shed by admission control; retry_after is in seconds"""
+
+    def __init__(self, reason: str, priority: str, retry_after: int):
+        super().__init__(f"Gateway overloaded ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('rank', 'start', 'seq', 'priority', 'future', 'enqueued')
+
+    def __init__(self, rank: int, start: float, seq: int, priority: str, future: asyncio.Future):
+        self.rank = rank
+        # Virtual start tag within the class
+        self.start = start
+        self.seq = seq
+        self.priority = priority
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+    def order(self):
+        return (self.rank, self.start, self.seq)
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.order() < other.order()
+
+
+class _Slot:
+    """Async context manager holding one upstream slot"""
+
+    def __init__(self, controller: "AdmissionController", priority: str, tenant: str, weight: float, cost: float):
+        self._controller = controller
+        self._priority = priority
+        self._tenant = tenant
+        self._weight = weight
+        self._cost = cost
+
+    async def __aenter__(self):
+        await self._controller.acquire(self._priority, self._tenant, self._weight, self._cost)
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._controller.release(time.perf_counter() - self._started)
+        return False
+
+
+class AdmissionController:
+    """Concurrency limit plus a bounded, priority-ordered wait queue"""
+
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 200, queue_timeout: float = 10.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        # Optional hook receiving (priority, seconds waited) for every admission
+        self.on_admit: Optional[Callable[[str, float], None]] = None
+        self.active = 0
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._queued: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+        # Fair queuing state per class: virtual time, and each tenant's last finish tag
+        self._virtual: Dict[str, float] = {name: 0.0 for name in PRIORITY_CLASSES}
+        self._finish: Dict[str, Dict[str, float]] = {name: {} for name in PRIORITY_CLASSES}
+        # EWMA of how long a slot is held, used for Retry-After hints
+        self._hold_ewma = 1.0
+        self._classes: Dict[str, Dict[str, float]] = {
+            name: {
+                'admitted': 0,
+                'queued_total': 0,
+                'rejected_queue_full': 0,
+                'rejected_timeout': 0,
+                'wait_ms_total': 0.0,
+                'wait_ms_max': 0.0,
+            }
+            for name in PRIORITY_CLASSES
+        }
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrent=int(os.getenv("TTS_MAX_CONCURRENT_UPSTREAM", "32")),
+            max_queue=int(os.getenv("TTS_MAX_QUEUE", "200")),
+            queue_timeout=float(os.getenv("TTS_QUEUE_TIMEOUT_SECONDS", "10")),
+        )
+
+    @staticmethod
+    def normalize_priority(priority: Optional[str], default: str = 'standard') -> str:
+        return priority if priority in PRIORITY_CLASSES else default
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    def slot(self, priority: str = 'standard', tenant: str = 'default', weight: float = 1.0,
+             cost: float = 1.0) -> _Slot:
+        """cost is in arbitrary work units (e.g. characters); only its ratio between tenants matters"""
+        return _Slot(self, self.normalize_priority(priority), tenant, max(weight, 0.01), max(cost, 0.01))
+
+    def retry_after(self) -> int:
+        """Rough time until the current backlog drains"""
+        backlog = self.queued + self.active
+        return max(1, int(round(self._hold_ewma * backlog / self.max_concurrent)))
+
+    def _tag(self, priority: str, tenant: str, weight: float, cost: float) -> float:
+        """Start tag for a new waiter; the tenant's next one starts where this one finishes"""
+        finish = self._finish[priority]
+        start = max(self._virtual[priority], finish.get(tenant, 0.0))
+        finish[tenant] = start + cost / weight
+        return start
+
+    async def acquire(self, priority: str, tenant: str = 'default', weight: float = 1.0, cost: float = 1.0):
+        stats = self._classes[priority]
+
+        if self.active < self.max_concurrent and self.queued == 0:
+            self.active += 1
+            self._record_admit(priority, 0.0)
+            return
+
+        if self.queued >= self.max_queue:
+            # Among equals, shed the waiter furthest ahead of its fair share
+            victim = self._lowest_waiter()
+            if victim is None or victim.rank < PRIORITY_CLASSES[priority] or (
+                    victim.rank == PRIORITY_CLASSES[priority] and
+                    victim.start <= max(self._virtual[priority], self._finish[priority].get(tenant, 0.0))):
+                stats['rejected_queue_full'] += 1
+                raise AdmissionRejected('queue full', priority, self.retry_after())
+            # Make room by shedding a lower-priority waiter
+            self._queued[victim.priority] -= 1
+            self._classes[victim.priority]['rejected_queue_full'] += 1
+            victim.future.set_exception(AdmissionRejected('preempted', victim.priority, self.retry_after()))
+
+        waiter = _Waiter(PRIORITY_CLASSES[priority], self._tag(priority, tenant, weight, cost), next(self._seq),
+                         priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, waiter)
+        self._queued[priority] += 1
+        stats['queued_total'] += 1
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self._granted(waiter):
+                # Granted in the same tick the timeout fired: keep the slot
+                self._record_admit(priority, time.perf_counter() - waiter.enqueued)
+                return
+            self._drop(waiter)
+            stats['rejected_timeout'] += 1
+            raise AdmissionRejected('queue timeout', priority, self.retry_after())
+        except asyncio.CancelledError:
+            if self._granted(waiter):
+                # We were handed a slot but nobody will use it
+                self.release(0.0)
+            elif not waiter.future.done():
+                self._drop(waiter)
+            raise
+
+        self._record_admit(priority, time.perf_counter() - waiter.enqueued)
+
+    def release(self, held_seconds: float):
+        if held_seconds > 0:
+            self._hold_ewma = 0.9 * self._hold_ewma + 0.1 * held_seconds
+
+        while self._heap:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue
+            # Hand the slot straight to the best waiter; active count is unchanged
+            self._queued[waiter.priority] -= 1
+            self._advance(waiter)
+            waiter.future.set_result(True)
+            return
+
+        self.active -= 1
+
+    def _advance(self, waiter: _Waiter):
+        """Virtual time follows the start tag of the waiter in service"""
+        priority = waiter.priority
+        self._virtual[priority] = max(self._virtual[priority], waiter.start)
+        if not self._queued[priority]:
+            # Class drained: tenants at or behind virtual time start level next time
+            virtual = self._virtual[priority]
+            self._finish[priority] = {t: f for t, f in self._finish[priority].items() if f > virtual}
+
+    def _lowest_waiter(self) -> Optional[_Waiter]:
+        pending = [w for w in self._heap if not w.future.done()]
+        return max(pending, key=_Waiter.order) if pending else None
+
+    @staticmethod
+    def _granted(waiter: _Waiter) -> bool:
+        future = waiter.future
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    def _drop(self, waiter: _Waiter):
+        """Withdraw a waiter that is still pending"""
+        waiter.future.cancel()
+        self._queued[waiter.priority] -= 1
+
+    def _record_admit(self, priority: str, waited: float):
+        stats = self._classes[priority]
+        waited_ms = waited * 1000
+        stats['admitted'] += 1
+        stats['wait_ms_total'] += waited_ms
+        stats['wait_ms_max'] = max(stats['wait_ms_max'], waited_ms)
+        if self.on_admit is not None:
+            self.on_admit(priority, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        classes = {}
+        for name, s in self._classes.items():
+            classes[name] = {
+                'queued': self._queued[name],
+                'admitted': s['admitted'],
+                'queued_total': s['queued_total'],
+                'rejected_queue_full': s['rejected_queue_full'],
+                'rejected_timeout': s['rejected_timeout'],
+                'avg_wait_ms': round(s['wait_ms_total'] / s['admitted'], 2) if s['admitted'] else 0.0,
+                'max_wait_ms': round(s['wait_ms_max'], 2),
+            }
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'active': self.active,
+            'queued': self.queued,
+            'rejected': sum(c['rejected_queue_full'] + c['rejected_timeout'] for c in classes.values()),
+            'retry_after_hint': self.retry_after(),
+            'classes': classes,
+        }
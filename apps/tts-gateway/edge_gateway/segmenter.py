@@ -0,0 +1,126 @@
+"""
+TEXT SEGMENTER - split long input at sentence and clause boundaries
+Short first segment for early first byte, larger ones after that;
+IncrementalSegmenter does the same for text that arrives in fragments
+"""
+
+import re
+from typing import List
+
+# Split after sentence punctuation (optionally followed by closing quotes/brackets)
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|(?<=[.!?…]["\')\]])\s+|\n+')
+# Clause boundaries used when a single sentence is too long
+_CLAUSE_END = re.compile(r'(?<=[,;:])\s+|\s+(?=[—–-]\s)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _split_long(piece: str, max_chars: int) -> List[str]:
+    """Break an over-long sentence at clauses, then at word boundaries"""
+    if len(piece) <= max_chars:
+        return [piece]
+
+    parts: List[str] = []
+    for clause in _CLAUSE_END.split(piece):
+        clause = clause.strip()
+        if not clause:
+            continue
+        if len(clause) <= max_chars:
+            parts.append(clause)
+            continue
+
+        # No punctuation to work with: cut on the last space before the limit
+        while len(clause) > max_chars:
+            cut = clause.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            parts.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            parts.append(clause)
+    return parts
+
+
+def split_segments(text: str, target_chars: int = 200, first_chars: int = 80,
+                   max_chars: int = 400) -> List[str]:
+    """Split text into speakable segments, merging short sentences up to target_chars"""
+    pieces: List[str] = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = _WHITESPACE.sub(' ', sentence).strip()
+        if sentence:
+            pieces.extend(_split_long(sentence, max_chars))
+
+    segments: List[str] = []
+    current = ''
+    for piece in pieces:
+        limit = first_chars if not segments else target_chars
+        if current and len(current) + 1 + len(piece) > limit:
+            segments.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        segments.append(current)
+
+    return segments
+
+
+class IncrementalSegmenter:
+    """Emit segments as soon as text fragments complete a sentence"""
+
+    def __init__(self, target_chars: int = 200, first_chars: int = 80, max_chars: int = 400):
+        self.target_chars = target_chars
+        self.first_chars = first_chars
+        self.max_chars = max_chars
+        self.emitted = 0
+        self._buffer = ''
+
+    @property
+    def pending(self) -> str:
+        return self._buffer
+
+    def push(self, fragment: str) -> List[str]:
+        """Add a fragment; returns the segments it completed"""
+        self._buffer += fragment
+
+        # A boundary only counts once whitespace follows it: "3." may still become "3.5"
+        last_end = None
+        for last_end in _SENTENCE_END.finditer(self._buffer):
+            pass
+
+        if last_end is not None:
+            complete = self._buffer[:last_end.start()]
+            self._buffer = self._buffer[last_end.end():]
+            return self._emit(split_segments(
+                complete,
+                target_chars=self.target_chars,
+                first_chars=self.first_chars if not self.emitted else self.target_chars,
+                max_chars=self.max_chars,
+            ))
+
+        if len(self._buffer) > self.max_chars:
+            # Run-on text: speak what we can, keep the unfinished tail
+            parts = _split_long(_WHITESPACE.sub(' ', self._buffer).strip(), self.max_chars)
+            trailing = ' ' if self._buffer[-1].isspace() else ''
+            self._buffer = parts[-1] + trailing
+            return self._emit(parts[:-1])
+
+        return []
+
+    def flush(self) -> List[str]:
+        """Everything still buffered, as segments"""
+        text, self._buffer = self._buffer, ''
+        return self._emit(split_segments(
+            text,
+            target_chars=self.target_chars,
+            first_chars=self.first_chars if not self.emitted else self.target_chars,
+            max_chars=self.max_chars,
+        ))
+
+    def reset(self):
+        """Drop buffered text (cancel / barge-in); the next segment is a first segment again"""
+        self._buffer = ''
+        self.emitted = 0
+
+    def _emit(self, segments: List[str]) -> List[str]:
+        self.emitted += len(segments)
+        return segments
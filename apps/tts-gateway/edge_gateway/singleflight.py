@@ -0,0 +1,204 @@
+"""
+SINGLE-FLIGHT - coalesce identical in-flight syntheses
+One upstream session per key; every caller replays what it has produced
+so far and then follows the live tail. A session nobody is listening to any
+more is cancelled, and one whose readers fall too far behind stops reading
+upstream until they catch up.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+SourceFactory = Callable[[], AsyncIterator[bytes]]
+
+
+class StreamFlight:
+    """A single upstream audio stream fanned out to any number of subscribers"""
+
+    def __init__(self, key: str, source: AsyncIterator[bytes], max_ahead_bytes: int = 0,
+                 expected_bytes: int = 0):
+        self.key = key
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.waiters = 0
+        # Audio bytes read from upstream so far, and the estimate for the whole utterance
+        self.bytes = 0
+        self.expected_bytes = expected_bytes
+        # Called once if the flight is cancelled because every reader left
+        self.on_cancel: Optional[Callable[["StreamFlight"], None]] = None
+        # Upstream reads pause while the furthest reader is this many bytes behind (0 = never)
+        self.max_ahead_bytes = max_ahead_bytes
+        self.paused = 0
+        self._positions: Dict[object, int] = {}
+        self._source = source
+        self._changed = asyncio.Event()
+        self._caught_up = asyncio.Event()
+        self._audio: Optional[bytes] = None
+        self._task = asyncio.ensure_future(self._pump())
+
+    async def _pump(self):
+        try:
+            async for data in self._source:
+                self.chunks.append(data)
+                if isinstance(data, bytes):
+                    self.bytes += len(data)
+                self._notify()
+                if self.max_ahead_bytes:
+                    await self._backpressure()
+        except asyncio.CancelledError:
+            self.error = RuntimeError("Upstream synthesis cancelled")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            # Paused or cancelled mid-read: close the upstream session now, not at GC
+            try:
+                await self._source.aclose()
+            except Exception:
+                pass
+
+    async def _backpressure(self):
+        """Hold upstream reads while every streaming reader is max_ahead_bytes behind"""
+        paused = False
+        while self._positions and not self.waiters and \
+                self.bytes - max(self._positions.values()) > self.max_ahead_bytes:
+            if not paused:
+                self.paused += 1
+                paused = True
+            self._caught_up.clear()
+            await self._caught_up.wait()
+
+    def _notify(self):
+        # Wake everyone waiting on this generation and start a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """Replay chunks produced so far, then follow the live tail"""
+        self.subscribers += 1
+        token = object()
+        self._positions[token] = 0
+        try:
+            index = 0
+            while True:
+                if index < len(self.chunks):
+                    data = self.chunks[index]
+                    yield data
+                    index += 1
+                    if isinstance(data, bytes):
+                        self._positions[token] += len(data)
+                        self._caught_up.set()
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            del self._positions[token]
+            self._caught_up.set()
+            self._abandoned()
+
+    async def wait(self, stored: Optional[Callable[[], Optional[bytes]]] = None) -> bytes:
+        """Wait for completion and return the whole utterance (audio only, no word events)
+        `stored` may hand back the bytes the source already assembled, saving a second join"""
+        self.waiters += 1
+        # A paused pump only re-checks on this event, and a waiter lifts the pause
+        self._caught_up.set()
+        try:
+            while not self.done:
+                await self._changed.wait()
+        finally:
+            self.waiters -= 1
+            self._abandoned()
+        if self.error is not None:
+            raise self.error
+        if self._audio is None and stored is not None:
+            self._audio = stored()
+        if self._audio is None:
+            # Joined once so every buffered waiter gets the same bytes object
+            self._audio = b''.join(c for c in self.chunks if isinstance(c, bytes))
+        return self._audio
+
+    def _abandoned(self):
+        """Last reader gone before the end (hang-up, barge-in): stop the upstream session"""
+        if self.done or self.cancelled or self.subscribers or self.waiters:
+            return
+        self.cancelled = True
+        self._task.cancel()
+        if self.on_cancel is not None:
+            self.on_cancel(self)
+
+
+class FlightGroup:
+    """Registry of in-flight syntheses keyed by cache key"""
+
+    def __init__(self, max_ahead_bytes: int = 0):
+        self._flights: Dict[str, StreamFlight] = {}
+        self.max_ahead_bytes = max_ahead_bytes
+        self.counters = {
+            'upstream_started': 0,
+            'coalesced': 0,
+            'cancelled': 0,
+            'cancelled_bytes_saved': 0,
+            'backpressure_pauses': 0,
+        }
+
+    def _join(self, key: str, factory: SourceFactory, expected_bytes: int = 0) -> StreamFlight:
+        flight = self._flights.get(key)
+        # A cancelled flight may not have finished unwinding yet; it will never produce audio
+        if flight is not None and not flight.done and not flight.cancelled:
+            self.counters['coalesced'] += 1
+            return flight
+
+        flight = StreamFlight(key, factory(), self.max_ahead_bytes, expected_bytes)
+        flight.on_cancel = self._cancelled
+        self._flights[key] = flight
+        self.counters['upstream_started'] += 1
+        flight._task.add_done_callback(lambda _: self._release(key, flight))
+        return flight
+
+    def _cancelled(self, flight: StreamFlight):
+        # Estimate: the rest of the utterance upstream would still have sent
+        self.counters['cancelled'] += 1
+        self.counters['cancelled_bytes_saved'] += max(0, flight.expected_bytes - flight.bytes)
+        logger.info(f"✂️ Upstream synthesis cancelled after {flight.bytes} bytes: no readers left")
+
+    def _release(self, key: str, flight: StreamFlight):
+        self.counters['backpressure_pauses'] += flight.paused
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def stream(self, key: str, factory: SourceFactory, expected_bytes: int = 0) -> AsyncIterator[bytes]:
+        """Subscribe to the flight for key, starting it if needed"""
+        flight = self._join(key, factory, expected_bytes)
+        subscription = flight.subscribe()
+        try:
+            async for data in subscription:
+                yield data
+        finally:
+            # Leave the flight now when our reader goes away, not whenever the subscription is collected
+            await subscription.aclose()
+
+    async def collect(self, key: str, factory: SourceFactory,
+                      stored: Optional[Callable[[], Optional[bytes]]] = None) -> bytes:
+        """Buffered variant: all waiters share the same result bytes"""
+        flight = self._join(key, factory)
+        return await flight.wait(stored)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'in_flight': len(self._flights),
+            'subscribers': sum(f.subscribers for f in self._flights.values()),
+            'max_ahead_bytes': self.max_ahead_bytes,
+        }
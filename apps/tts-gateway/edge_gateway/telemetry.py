@@ -0,0 +1,260 @@
+"""
+GATEWAY TELEMETRY - metric families for the Edge TTS gateway
+Every request is tracked by one RequestTracker so its outcome is counted exactly once
+"""
+
+import re
+import time
+from typing import Dict, Any, Optional
+
+from edge_gateway.metrics import (
+    MetricsRegistry,
+    LATENCY_BUCKETS,
+    DURATION_BUCKETS,
+    BYTES_BUCKETS,
+    COUNT_BUCKETS,
+)
+
+# Anything that does not look like a voice name is folded into one label value
+_VOICE_LABEL = re.compile(r'^(?:[a-z]{2,3}-[A-Z]{2}-[A-Za-z]+Neural|[a-z]{2,16})$')
+
+
+# Cluster-wide counters kept in shared memory when the gateway runs several workers
+CLUSTER_COUNTERS = (
+    'requests_total', 'requests_success', 'requests_failed', 'requests_invalid',
+    'requests_rejected', 'requests_cancelled', 'streams_in_flight', 'cache_hits', 'cache_misses',
+)
+
+
+def voice_label(voice: Optional[str]) -> str:
+    return voice if voice and _VOICE_LABEL.match(voice) else 'other'
+
+
+class GatewayMetrics:
+    """Registry plus the gateway's own metric families"""
+
+    def __init__(self, cluster=None, worker: int = 0):
+        self.registry = MetricsRegistry()
+        self.start_time = time.time()
+        # SharedCounters over CLUSTER_COUNTERS, bound to this worker's row
+        self.cluster = cluster
+        self.worker = worker
+
+        self.requests = self.registry.counter(
+            'tts_requests_total', 'Synthesis requests by endpoint, voice and outcome',
+            ('endpoint', 'voice', 'status'))
+        self.first_chunk = self.registry.histogram(
+            'tts_time_to_first_chunk_seconds', 'Time from request to first audio chunk',
+            ('endpoint',), LATENCY_BUCKETS)
+        self.duration = self.registry.histogram(
+            'tts_synthesis_seconds', 'Time from request to last audio chunk',
+            ('endpoint',), DURATION_BUCKETS)
+        self.audio_bytes = self.registry.histogram(
+            'tts_audio_bytes', 'Audio bytes returned per request',
+            ('endpoint',), BYTES_BUCKETS)
+        self.audio_chunks = self.registry.histogram(
+            'tts_audio_chunks', 'Audio chunks returned per request',
+            ('endpoint',), COUNT_BUCKETS)
+        self.streams_in_flight = self.registry.gauge(
+            'tts_streams_in_flight', 'Streaming responses currently being sent')
+        self.queue_wait = self.registry.histogram(
+            'tts_queue_wait_seconds', 'Time spent waiting for an upstream slot',
+            ('priority',), LATENCY_BUCKETS)
+        self.transcode_cpu = self.registry.histogram(
+            'tts_transcode_cpu_seconds', 'Resample and encode CPU time per transcoded stream',
+            ('format',), (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+    def track(self, endpoint: str, voice: Optional[str] = None) -> "RequestTracker":
+        return RequestTracker(self, endpoint, voice)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The legacy stats dict, derived from the registry (summed over all workers when there are several)"""
+        if self.cluster is not None:
+            totals = self.cluster.totals()
+            return {
+                'requests_total': totals['requests_total'],
+                'requests_successful': totals['requests_success'],
+                'requests_failed': totals['requests_failed'] + totals['requests_invalid'],
+                'requests_rejected': totals['requests_rejected'],
+                'streams_in_flight': totals['streams_in_flight'],
+                'start_time': self.start_time,
+                'workers': self.cluster.workers,
+                'worker': self.worker,
+            }
+        return {
+            'requests_total': int(self.requests.total()),
+            'requests_successful': int(self.requests.total(status='success')),
+            'requests_failed': int(self.requests.total(status='failed') + self.requests.total(status='invalid')),
+            'requests_rejected': int(self.requests.total(status='rejected')),
+            'streams_in_flight': int(self.streams_in_flight.value()),
+            'start_time': self.start_time,
+        }
+
+    def latency_summary(self) -> Dict[str, Any]:
+        """p50/p95/p99 estimates per endpoint from the histograms"""
+        summary = {}
+        for (endpoint,), child in self.first_chunk.samples():
+            total = self.duration.labels(endpoint)
+            summary[endpoint] = {
+                'count': child.count,
+                'first_chunk_p50': child.quantile(0.5),
+                'first_chunk_p95': child.quantile(0.95),
+                'first_chunk_p99': child.quantile(0.99),
+                'total_p50': total.quantile(0.5),
+                'total_p95': total.quantile(0.95),
+                'total_p99': total.quantile(0.99),
+            }
+        return summary
+
+
+class RequestTracker:
+    """Timing and outcome of one request; finish() only counts once"""
+
+    def __init__(self, metrics: GatewayMetrics, endpoint: str, voice: Optional[str]):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.voice = voice_label(voice)
+        self.started = time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.bytes = 0
+        self.chunks = 0
+        self.finished = False
+        self.streaming = False
+
+    def set_voice(self, voice: Optional[str]):
+        self.voice = voice_label(voice)
+
+    def stream_started(self):
+        self.streaming = True
+        self.metrics.streams_in_flight.inc()
+        if self.metrics.cluster is not None:
+            self.metrics.cluster.add('streams_in_flight')
+
+    def chunk(self, size: int):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+            self.metrics.first_chunk.labels(self.endpoint).observe(self.first_chunk_at - self.started)
+        self.chunks += 1
+        self.bytes += size
+
+    def finish(self, status: str):
+        if self.finished:
+            return
+        self.finished = True
+        if self.streaming:
+            self.metrics.streams_in_flight.dec()
+        cluster = self.metrics.cluster
+        if cluster is not None:
+            if self.streaming:
+                cluster.add('streams_in_flight', -1)
+            cluster.add('requests_total')
+            cluster.add(f'requests_{status}')
+
+        self.metrics.requests.labels(self.endpoint, self.voice, status).inc()
+        if status == 'success':
+            self.metrics.duration.labels(self.endpoint).observe(time.perf_counter() - self.started)
+            self.metrics.audio_bytes.labels(self.endpoint).observe(self.bytes)
+            self.metrics.audio_chunks.labels(self.endpoint).observe(self.chunks)
+
+
+def component_families(cache, flights, scheduler):
+    """Scrape-time families for the cache, single-flight group and scheduler"""
+    families = []
+
+    if cache is not None:
+        stats = cache.stats()
+        tiers = [('memory', stats['memory'])]
+        if stats['shared'] is not None:
+            tiers.append(('shared', stats['shared']))
+        if stats['disk'] is not None:
+            tiers.append(('disk', stats['disk']))
+        families += [
+            ('tts_cache_hits_total', 'counter', 'Audio cache hits by tier',
+             [({'tier': 'memory'}, stats['hits_memory']), ({'tier': 'shared'}, stats['hits_shared']),
+              ({'tier': 'disk'}, stats['hits_disk'])]),
+            ('tts_cache_misses_total', 'counter', 'Audio cache misses', [({}, stats['misses'])]),
+            ('tts_cache_evictions_total', 'counter', 'Audio cache evictions by tier',
+             [({'tier': name}, tier['evictions']) for name, tier in tiers if 'evictions' in tier]),
+            ('tts_cache_bytes', 'gauge', 'Audio bytes held by tier',
+             [({'tier': name}, tier['bytes']) for name, tier in tiers]),
+            ('tts_cache_entries', 'gauge', 'Audio cache entries by tier',
+             [({'tier': name}, tier['entries']) for name, tier in tiers]),
+        ]
+
+    flight_stats = flights.stats()
+    families += [
+        ('tts_upstream_sessions_total', 'counter', 'Upstream synthesis sessions started',
+         [({}, flight_stats['upstream_started'])]),
+        ('tts_coalesced_requests_total', 'counter', 'Requests that joined an in-flight synthesis',
+         [({}, flight_stats['coalesced'])]),
+        ('tts_flights_in_flight', 'gauge', 'Upstream syntheses currently running',
+         [({}, flight_stats['in_flight'])]),
+        ('tts_stream_cancellations_total', 'counter', 'Upstream syntheses cancelled because every reader left',
+         [({}, flight_stats['cancelled'])]),
+        ('tts_cancelled_bytes_saved_total', 'counter', 'Estimated upstream audio bytes not synthesized after cancellation',
+         [({}, flight_stats['cancelled_bytes_saved'])]),
+        ('tts_stream_backpressure_pauses_total', 'counter', 'Upstream reads paused for slow readers',
+         [({}, flight_stats['backpressure_pauses'])]),
+    ]
+
+    sched = scheduler.stats()
+    classes = sched['classes']
+    families += [
+        ('tts_scheduler_active', 'gauge', 'Upstream slots in use', [({}, sched['active'])]),
+        ('tts_scheduler_capacity', 'gauge', 'Upstream slot limit', [({}, sched['max_concurrent'])]),
+        ('tts_scheduler_queued', 'gauge', 'Requests waiting for a slot',
+         [({'priority': p}, c['queued']) for p, c in classes.items()]),
+        ('tts_scheduler_admitted_total', 'counter', 'Requests admitted to an upstream slot',
+         [({'priority': p}, c['admitted']) for p, c in classes.items()]),
+        ('tts_scheduler_rejected_total', 'counter', 'Requests shed by admission control',
+         [({'priority': p, 'reason': 'queue_full'}, c['rejected_queue_full']) for p, c in classes.items()] +
+         [({'priority': p, 'reason': 'timeout'}, c['rejected_timeout']) for p, c in classes.items()]),
+    ]
+    return families
+
+
+def engine_families(engine):
+    """Scrape-time families for hedging, fallback and the circuit breaker"""
+    stats = engine.stats()
+    breaker = stats['breaker']
+    return [
+        ('tts_engine_hedges_total', 'counter', 'Hedged duplicate upstream requests by outcome',
+         [({'outcome': 'issued'}, stats['hedges_issued']), ({'outcome': 'won'}, stats['hedges_won']),
+          ({'outcome': 'skipped_budget'}, stats['hedges_skipped_budget'])]),
+        ('tts_engine_primary_failures_total', 'counter', 'Primary engine failures',
+         [({}, stats['primary_failures'])]),
+        ('tts_engine_fallbacks_total', 'counter', 'Requests served by the fallback engine',
+         [({}, stats['fallbacks'])]),
+        ('tts_engine_hedge_delay_seconds', 'gauge', 'Current first-chunk delay before hedging',
+         [({}, stats['hedge_delay_ms'] / 1000)]),
+        ('tts_engine_circuit_open', 'gauge', 'Whether the primary engine circuit is open (1) or half-open (0.5)',
+         [({}, {'closed': 0, 'half_open': 0.5, 'open': 1}[breaker['state']])]),
+        ('tts_engine_circuit_opened_total', 'counter', 'Times the primary engine circuit opened',
+         [({}, breaker['times_opened'])]),
+    ]
+
+
+def tenant_families(tenants):
+    """Scrape-time families for per-tenant quota outcomes"""
+    usage = tenants.stats()['usage']
+    return [
+        ('tts_tenant_requests_total', 'counter', 'Requests by tenant and quota outcome',
+         [({'tenant': t, 'outcome': outcome}, u[outcome]) for t, u in usage.items() for outcome in ('allowed', 'throttled')]),
+        ('tts_tenant_characters_total', 'counter', 'Characters charged to each tenant',
+         [({'tenant': t}, u['characters']) for t, u in usage.items()]),
+    ]
+
+
+def cluster_families(cluster):
+    """Scrape-time families summed over every worker, so any one worker's /metrics covers the whole gateway"""
+    totals = cluster.totals()
+    statuses = ('success', 'failed', 'invalid', 'rejected', 'cancelled')
+    return [
+        ('tts_cluster_workers', 'gauge', 'Pre-forked gateway workers', [({}, cluster.workers)]),
+        ('tts_cluster_requests_total', 'counter', 'Synthesis requests across all workers by outcome',
+         [({'status': status}, totals[f'requests_{status}']) for status in statuses]),
+        ('tts_cluster_streams_in_flight', 'gauge', 'Streaming responses being sent across all workers',
+         [({}, totals['streams_in_flight'])]),
+        ('tts_cluster_cache_lookups_total', 'counter', 'Audio cache lookups across all workers by outcome',
+         [({'outcome': 'hit'}, totals['cache_hits']), ({'outcome': 'miss'}, totals['cache_misses'])]),
+    ]
@@ -0,0 +1,262 @@
+"""
+TENANTS - API key to tenant, token-bucket quotas, fair-share weights
+Tenant rows mirror tenant_configs in database/tts-schema.sql (api_key,
+tenant_id, rate_limit) plus a fair-share weight and character limits. They
+are read from a JSON file into an in-process index, re-read when the file
+changes. Every request takes from its tenant's request and character
+buckets; buckets live in-process, or in Redis so all gateways share them.
+"""
+
+import os
+import time
+import json
+import math
+import hashlib
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+# rate_limit key -> (bucket, window seconds); bucket capacity is the limit, refilled evenly over the window
+LIMIT_WINDOWS = {
+    'requests_per_minute': ('requests', 60),
+    'requests_per_hour': ('requests', 3600),
+    'requests_per_day': ('requests', 86400),
+    'characters_per_minute': ('characters', 60),
+    'characters_per_day': ('characters', 86400),
+}
+
+
+class QuotaExceeded(Exception):
+    """Tenant is over a limit; retry_after is None when the request can never fit"""
+
+    def __init__(self, tenant_id: str, limit: str, retry_after: Optional[int]):
+        if retry_after is None:
+            message = f"Request is larger than tenant {tenant_id}'s {limit} quota"
+        else:
+            message = f"Tenant {tenant_id} exceeded {limit}, retry in {retry_after}s"
+        super().__init__(message)
+        self.tenant_id = tenant_id
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class Tenant(NamedTuple):
+    id: str
+    weight: float
+    # rate_limit key -> limit; missing keys are unlimited
+    limits: Dict[str, int]
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Tenant":
+        limits = {name: int(value) for name, value in (row.get('rate_limit') or {}).items()
+                  if name in LIMIT_WINDOWS and value is not None and int(value) > 0}
+        return cls(id=str(row['tenant_id']), weight=max(float(row.get('weight', 1.0)), 0.01), limits=limits)
+
+
+# Keyless requests when tenancy is off: no quotas, equal share
+DEFAULT_TENANT = Tenant('default', 1.0, {})
+
+
+def key_digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+class LocalBuckets:
+    """In-process token buckets; also the stand-in for Redis in tests and single-node setups"""
+
+    def __init__(self, scale: float = 1.0):
+        # Pre-forked workers each get 1/workers of every limit
+        self.scale = scale
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, buckets: List[Tuple[str, float, float, float]]) -> List[float]:
+        """All-or-nothing take of (key, capacity, refill per second, cost); seconds to wait per bucket"""
+        now = time.monotonic()
+        levels, waits = [], []
+        for key, capacity, rate, cost in buckets:
+            capacity, rate = capacity * self.scale, rate * self.scale
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            levels.append(tokens)
+            if cost > capacity:
+                waits.append(math.inf)
+            else:
+                waits.append(max(0.0, (cost - tokens) / rate))
+        if not any(waits):
+            for (key, _, _, cost), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - cost, now)
+        return waits
+
+
+# KEYS: bucket keys; ARGV: per bucket capacity, rate, cost. Redis TIME keeps every gateway on one clock
+_TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local levels, waits, granted = {}, {}, true
+for i, key in ipairs(KEYS) do
+  local capacity, rate, cost = tonumber(ARGV[i*3-2]), tonumber(ARGV[i*3-1]), tonumber(ARGV[i*3])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  levels[i] = tokens
+  if cost > capacity then
+    waits[i] = '-1'
+    granted = false
+  elseif tokens < cost then
+    waits[i] = tostring((cost - tokens) / rate)
+    granted = false
+  else
+    waits[i] = '0'
+  end
+end
+if granted then
+  for i, key in ipairs(KEYS) do
+    local capacity, rate, cost = tonumber(ARGV[i*3-2]), tonumber(ARGV[i*3-1]), tonumber(ARGV[i*3])
+    redis.call('HSET', key, 'tokens', levels[i] - cost, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 60)
+  end
+end
+return waits
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every gateway through Redis; falls back to local buckets if Redis fails"""
+
+    def __init__(self, url: str, fallback: LocalBuckets, prefix: str = 'tts:bucket:'):
+        self._client = aioredis.from_url(url)
+        self._script = self._client.register_script(_TAKE_SCRIPT)
+        self._fallback = fallback
+        self.prefix = prefix
+        self.errors = 0
+
+    async def take(self, buckets: List[Tuple[str, float, float, float]]) -> List[float]:
+        args = []
+        for _, capacity, rate, cost in buckets:
+            args += [capacity, rate, cost]
+        try:
+            waits = await self._script(keys=[self.prefix + key for key, _, _, _ in buckets], args=args)
+        except Exception as e:
+            # Quotas keep working per process while Redis is away
+            self.errors += 1
+            if self.errors == 1 or self.errors % 100 == 0:
+                logger.warning(f"⚠️ Redis token buckets unavailable ({e}); using local buckets")
+            return await self._fallback.take(buckets)
+        return [math.inf if float(wait) < 0 else float(wait) for wait in waits]
+
+
+class TenantRegistry:
+    """API keys -> tenants from a JSON file, with quotas enforced on every request"""
+
+    def __init__(self, path: Optional[str] = None, buckets=None, reload_seconds: float = 30.0,
+                 anonymous_tenant: Optional[str] = None):
+        self.path = path
+        self.buckets = buckets or LocalBuckets()
+        self.reload_seconds = reload_seconds
+        # Tenant that keyless requests are charged to; None makes a key mandatory
+        self.anonymous_tenant = anonymous_tenant
+        self._by_key: Dict[str, Tenant] = {}
+        self._by_id: Dict[str, Tenant] = {}
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self.counters: Dict[str, Dict[str, int]] = {}
+        if path:
+            self._reload()
+
+    @classmethod
+    def from_env(cls, workers: int = 1) -> "TenantRegistry":
+        local = LocalBuckets(scale=1.0 / max(1, workers))
+        buckets = local
+        redis_url = os.getenv("TTS_REDIS_URL", "")
+        if redis_url:
+            if REDIS_AVAILABLE:
+                buckets = RedisBuckets(redis_url, local)
+            else:
+                logger.warning("⚠️ TTS_REDIS_URL is set but the redis package is missing; quotas are per process")
+        return cls(
+            path=os.getenv("TTS_TENANTS_FILE", "") or None,
+            buckets=buckets,
+            reload_seconds=float(os.getenv("TTS_TENANTS_RELOAD_SECONDS", "30")),
+            anonymous_tenant=os.getenv("TTS_ANONYMOUS_TENANT", "") or None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def _reload(self):
+        """Re-read the tenants file if it changed; a broken file keeps the previous tenants"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            rows = data.get('tenants', []) if isinstance(data, dict) else data
+            by_key, by_id = {}, {}
+            for row in rows:
+                if not row.get('active', True):
+                    continue
+                tenant = Tenant.from_row(row)
+                by_id[tenant.id] = tenant
+                # Plain keys as in tenant_configs, or only their SHA-256 so the file holds no secrets
+                digest = row.get('api_key_sha256') or (key_digest(row['api_key']) if row.get('api_key') else None)
+                if digest:
+                    by_key[digest.lower()] = tenant
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"❌ Tenants file {self.path} unusable: {e}")
+            return
+        self._by_key, self._by_id, self._mtime = by_key, by_id, mtime
+        logger.info(f"🏢 Loaded {len(by_id)} tenants from {self.path}")
+
+    def resolve(self, api_key: Optional[str]) -> Optional[Tenant]:
+        """Tenant for an API key (None when unknown); DEFAULT_TENANT when tenancy is off"""
+        if not self.enabled:
+            return DEFAULT_TENANT
+        now = time.monotonic()
+        if now - self._checked >= self.reload_seconds:
+            self._checked = now
+            self._reload()
+        if api_key:
+            return self._by_key.get(key_digest(api_key))
+        if self.anonymous_tenant:
+            return self._by_id.get(self.anonymous_tenant)
+        return None
+
+    async def charge(self, tenant: Tenant, requests: int = 1, characters: int = 0):
+        """Take from the tenant's buckets or raise QuotaExceeded; nothing is taken on refusal"""
+        wanted = []
+        for name, limit in tenant.limits.items():
+            kind, window = LIMIT_WINDOWS[name]
+            cost = requests if kind == 'requests' else characters
+            if cost:
+                wanted.append((name, (f"{tenant.id}:{name}", float(limit), limit / window, float(cost))))
+        counters = self.counters.setdefault(tenant.id, {'allowed': 0, 'throttled': 0, 'characters': 0})
+        if wanted:
+            waits = await self.buckets.take([bucket for _, bucket in wanted])
+            worst = max(range(len(waits)), key=lambda i: waits[i])
+            if waits[worst] > 0:
+                counters['throttled'] += 1
+                retry_after = None if math.isinf(waits[worst]) else max(1, math.ceil(waits[worst]))
+                raise QuotaExceeded(tenant.id, wanted[worst][0], retry_after)
+        counters['allowed'] += 1
+        counters['characters'] += characters
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'tenants': len(self._by_id),
+            'shared_buckets': isinstance(self.buckets, RedisBuckets),
+            'redis_errors': getattr(self.buckets, 'errors', 0),
+            'anonymous_tenant': self.anonymous_tenant,
+            'usage': self.counters,
+        }
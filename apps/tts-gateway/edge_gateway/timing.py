@@ -0,0 +1,85 @@
+"""
+WORD TIMING - WordBoundary events and the framed audio+metadata stream
+Engine word boundaries travel next to the audio bytes through single-flight,
+the pipeline and the cache; streams that only want audio filter them out
+"""
+
+import json
+import struct
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional, Union
+
+# 100-nanosecond ticks, the unit Edge TTS uses for boundary offsets
+TICKS_PER_MS = 10_000
+# Edge output is CBR 48 kbit/s MP3: audio position from byte count
+MP3_BYTES_PER_MS = 6.0
+# Typical neural-voice speaking rate at +0%, for sizing audio before it exists
+SPOKEN_CHARS_PER_SECOND = 15.0
+
+# Framed stream: 1-byte kind, 4-byte big-endian payload length, payload
+FRAME_HEADER = struct.Struct('>BI')
+FRAME_AUDIO = 0x01
+FRAME_EVENT = 0x02
+FRAMED_MEDIA_TYPE = 'application/vnd.callwaiting.tts-frames'
+
+
+class WordEvent(NamedTuple):
+    """One spoken word; offset is from the start of the stream"""
+    offset_ms: float
+    duration_ms: float
+    text: str
+
+    def shifted(self, ms: float) -> "WordEvent":
+        return self._replace(offset_ms=round(self.offset_ms + ms, 1))
+
+    def as_event(self) -> dict:
+        return {'type': 'word', 'offset_ms': self.offset_ms, 'duration_ms': self.duration_ms, 'text': self.text}
+
+
+StreamItem = Union[bytes, WordEvent]
+
+
+def expected_audio_bytes(text: str) -> int:
+    """Rough MP3 size of an utterance, from its length"""
+    return int(len(text) / SPOKEN_CHARS_PER_SECOND * 1000 * MP3_BYTES_PER_MS)
+
+
+def word_from_edge(chunk: dict) -> WordEvent:
+    """Edge TTS WordBoundary chunk -> WordEvent"""
+    return WordEvent(
+        round(chunk['offset'] / TICKS_PER_MS, 1),
+        round(chunk['duration'] / TICKS_PER_MS, 1),
+        chunk['text'],
+    )
+
+
+def words_from_cache(raw: Optional[Iterable]) -> Optional[List[WordEvent]]:
+    """Cache entries keep words as plain [offset_ms, duration_ms, text] lists"""
+    if raw is None:
+        return None
+    return [WordEvent(*word) for word in raw]
+
+
+def rebase_word(item: StreamItem, audio_bytes_before: int) -> StreamItem:
+    """Segment-relative word offset -> stream-relative, for concatenated segments"""
+    if isinstance(item, WordEvent) and audio_bytes_before:
+        return item.shifted(audio_bytes_before / MP3_BYTES_PER_MS)
+    return item
+
+
+async def audio_only(stream: AsyncIterator[StreamItem]) -> AsyncIterator[bytes]:
+    async for item in stream:
+        if isinstance(item, bytes):
+            yield item
+
+
+def encode_frame(item: StreamItem) -> bytes:
+    if isinstance(item, bytes):
+        return FRAME_HEADER.pack(FRAME_AUDIO, len(item)) + item
+    payload = json.dumps(item.as_event(), separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(FRAME_EVENT, len(payload)) + payload
+
+
+async def framed(stream: AsyncIterator[StreamItem]) -> AsyncIterator[bytes]:
+    """Audio and word events multiplexed into length-prefixed frames"""
+    async for item in stream:
+        yield encode_frame(item)
@@ -0,0 +1,211 @@
+"""
+TELEPHONY TRANSCODING - MP3 in, 8/16 kHz mu-law or 16-bit PCM out, as it streams
+ffmpeg decodes MP3 frames incrementally; resampling and encoding are vectorized
+NumPy/SciPy with filter state carried across chunks, so nothing waits for the
+whole utterance
+"""
+
+import os
+import asyncio
+import logging
+import shutil
+import time
+from math import gcd
+from typing import AsyncIterator, Dict, Any, Optional
+
+import numpy as np
+from scipy.signal import firwin, lfilter
+
+logger = logging.getLogger(__name__)
+
+# Edge TTS output: 24 kHz mono MP3
+SOURCE_RATE = 24000
+
+# name -> (encoding, sample rate, media type); 'wav' is what older clients send
+# and has always meant "whatever the engine returns", i.e. MP3
+OUTPUT_FORMATS: Dict[str, Dict[str, Any]] = {
+    'mp3': {'encoding': 'mp3', 'rate': SOURCE_RATE, 'media_type': 'audio/mpeg'},
+    'wav': {'encoding': 'mp3', 'rate': SOURCE_RATE, 'media_type': 'audio/mpeg'},
+    'mulaw_8000': {'encoding': 'mulaw', 'rate': 8000, 'media_type': 'audio/basic'},
+    'pcm_8000': {'encoding': 'pcm_s16le', 'rate': 8000, 'media_type': 'audio/L16;rate=8000;endianness=little-endian'},
+    'pcm_16000': {'encoding': 'pcm_s16le', 'rate': 16000, 'media_type': 'audio/L16;rate=16000;endianness=little-endian'},
+}
+
+
+def ffmpeg_path() -> Optional[str]:
+    return os.getenv("TTS_FFMPEG_PATH") or shutil.which("ffmpeg")
+
+
+def resolve_format(name: Optional[str]) -> str:
+    """Validate a requested output format; None means MP3"""
+    name = (name or 'mp3').lower()
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported format '{name}' (supported: {', '.join(OUTPUT_FORMATS)})")
+    if OUTPUT_FORMATS[name]['encoding'] != 'mp3' and ffmpeg_path() is None:
+        raise ValueError(f"Format '{name}' needs ffmpeg, which is not installed on this gateway")
+    return name
+
+
+def needs_transcoding(name: str) -> bool:
+    return OUTPUT_FORMATS[name]['encoding'] != 'mp3'
+
+
+def _build_mulaw_table() -> np.ndarray:
+    """G.711 mu-law code for every int16 value, indexed by the value as uint16"""
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    # 14-bit magnitude with the standard bias, as in the reference (Sun) encoder
+    pcm = samples >> 2
+    negative = pcm < 0
+    magnitude = np.minimum(np.where(negative, -pcm, pcm), 8159) + 0x21
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    codes = np.where(segment >= 8, 0x7F, (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    codes ^= np.where(negative, 0x7F, 0xFF)
+    table = np.empty(65536, dtype=np.uint8)
+    table[samples.astype(np.int16).view(np.uint16)] = codes
+    return table
+
+
+_MULAW_TABLE = _build_mulaw_table()
+
+
+def encode_mulaw(samples: np.ndarray) -> bytes:
+    return _MULAW_TABLE[samples.astype(np.int16).view(np.uint16)].tobytes()
+
+
+def encode_pcm16(samples: np.ndarray) -> bytes:
+    return samples.astype('<i2').tobytes()
+
+
+class StreamingResampler:
+    """Rational-ratio FIR resampler whose filter state and output phase survive chunk boundaries"""
+
+    def __init__(self, src_rate: int, dst_rate: int, taps_per_phase: int = 24):
+        divisor = gcd(src_rate, dst_rate)
+        self.up = dst_rate // divisor
+        self.down = src_rate // divisor
+        self.passthrough = self.up == self.down == 1
+        if self.passthrough:
+            return
+
+        factor = max(self.up, self.down)
+        # Low-pass just under the lower Nyquist; gain `up` restores zero-stuffed amplitude
+        self.taps = firwin(taps_per_phase * factor + 1, 0.9 / factor, window=('kaiser', 6.0)) * self.up
+        self.zi = np.zeros(len(self.taps) - 1)
+        self.phase = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.passthrough or not len(samples):
+            return samples.astype(np.float64)
+
+        if self.up > 1:
+            stuffed = np.zeros(len(samples) * self.up)
+            stuffed[::self.up] = samples
+        else:
+            stuffed = samples.astype(np.float64)
+
+        filtered, self.zi = lfilter(self.taps, 1.0, stuffed, zi=self.zi)
+        out = filtered[self.phase::self.down]
+        self.phase = (self.phase - len(filtered)) % self.down
+        return out
+
+    def flush(self) -> np.ndarray:
+        """Push the filter's group delay out with trailing silence"""
+        if self.passthrough:
+            return np.zeros(0)
+        return self.process(np.zeros((len(self.taps) // 2) // self.up + 1))
+
+
+class StreamTranscoder:
+    """One output stream: MP3 chunks in, encoded telephony audio out"""
+
+    def __init__(self, format_name: str, read_size: int = 4096):
+        spec = OUTPUT_FORMATS[format_name]
+        self.format_name = format_name
+        self.encoding = spec['encoding']
+        self.rate = spec['rate']
+        self.read_size = read_size
+        self.resampler = StreamingResampler(SOURCE_RATE, self.rate)
+        self.encode = encode_mulaw if self.encoding == 'mulaw' else encode_pcm16
+        self.stats = {
+            'format': format_name,
+            'mp3_bytes_in': 0,
+            'samples_decoded': 0,
+            'bytes_out': 0,
+            'dsp_cpu_ms': 0.0,
+            'first_output_ms': None,
+        }
+
+    def _convert(self, pcm: bytes) -> bytes:
+        cpu_started = time.thread_time()
+        samples = np.frombuffer(pcm, dtype='<i2')
+        resampled = self.resampler.process(samples)
+        encoded = self.encode(np.clip(np.rint(resampled), -32768, 32767))
+        self.stats['samples_decoded'] += len(samples)
+        self.stats['dsp_cpu_ms'] += (time.thread_time() - cpu_started) * 1000
+        return encoded
+
+    async def transcode(self, mp3_chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        binary = ffmpeg_path()
+        if binary is None:
+            raise RuntimeError("ffmpeg is required for transcoding")
+
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            binary, '-hide_banner', '-loglevel', 'error',
+            # Decode as soon as frames arrive instead of probing the stream first
+            '-probesize', '32', '-analyzeduration', '0', '-fflags', 'nobuffer',
+            '-f', 'mp3', '-i', 'pipe:0',
+            '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(SOURCE_RATE),
+            '-flush_packets', '1', 'pipe:1',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+
+        async def feed():
+            try:
+                async for chunk in mp3_chunks:
+                    self.stats['mp3_bytes_in'] += len(chunk)
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            finally:
+                if not process.stdin.is_closing():
+                    process.stdin.close()
+
+        feeder = asyncio.create_task(feed())
+        carry = b''
+        try:
+            while True:
+                pcm = await process.stdout.read(self.read_size)
+                if not pcm:
+                    break
+                # Keep whole 16-bit samples; an odd trailing byte waits for the next read
+                pcm = carry + pcm
+                usable = len(pcm) & ~1
+                carry = pcm[usable:]
+                encoded = self._convert(pcm[:usable])
+                if encoded:
+                    if self.stats['first_output_ms'] is None:
+                        self.stats['first_output_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                    self.stats['bytes_out'] += len(encoded)
+                    yield encoded
+
+            # Surface upstream errors before declaring the stream complete
+            await feeder
+            tail = self.encode(np.clip(np.rint(self.resampler.flush()), -32768, 32767))
+            if tail:
+                self.stats['bytes_out'] += len(tail)
+                yield tail
+
+            if await process.wait() != 0:
+                raise RuntimeError(f"ffmpeg exited with status {process.returncode}")
+        finally:
+            if not feeder.done():
+                feeder.cancel()
+                try:
+                    await feeder
+                except BaseException:
+                    pass
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
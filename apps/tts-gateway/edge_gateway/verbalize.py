@@ -0,0 +1,261 @@
+"""
+TEXT NORMALIZATION - one speakable form per utterance, before the cache key
+Phone numbers, naira amounts, dates and times are verbalized and stray
+punctuation is tidied, so "₦5,000" and "N5000", or "0803 123 4567" and
+"+2348031234567", synthesize (and cache) once. Rules are compiled at import;
+repeated texts come straight from an LRU.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Any
+
+CACHE_SIZE = 4096
+
+_ONES = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine',
+         'ten', 'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen',
+         'seventeen', 'eighteen', 'nineteen']
+_TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+_SCALES = [(1_000_000_000, 'billion'), (1_000_000, 'million'), (1_000, 'thousand')]
+_ORDINAL_WORDS = {'one': 'first', 'two': 'second', 'three': 'third', 'five': 'fifth',
+                  'eight': 'eighth', 'nine': 'ninth', 'twelve': 'twelfth'}
+
+_MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+           'August', 'September', 'October', 'November', 'December']
+_MONTH_LOOKUP = {name[:3].lower(): index + 1 for index, name in enumerate(_MONTHS)}
+_MONTH_NAMES = r'(?:' + '|'.join(_MONTHS + [name[:3] for name in _MONTHS if len(name) > 3] + ['Sept']) + r')\b\.?'
+
+
+def number_words(n: int) -> str:
+    """English words for a non-negative integer"""
+    if n < 20:
+        return _ONES[n]
+    if n < 100:
+        tens, ones = divmod(n, 10)
+        return _TENS[tens] + (f"-{_ONES[ones]}" if ones else '')
+    if n < 1000:
+        hundreds, rest = divmod(n, 100)
+        return f"{_ONES[hundreds]} hundred" + (f" and {number_words(rest)}" if rest else '')
+    for scale, name in _SCALES:
+        if n >= scale:
+            high, rest = divmod(n, scale)
+            words = f"{number_words(high)} {name}"
+            if rest:
+                words += (' and ' if rest < 100 else ' ') + number_words(rest)
+            return words
+    return str(n)
+
+
+def ordinal_words(n: int) -> str:
+    words = number_words(n)
+    head, sep, last = words.rpartition('-') if '-' in words else words.rpartition(' ')
+    if last in _ORDINAL_WORDS:
+        last = _ORDINAL_WORDS[last]
+    elif last.endswith('y'):
+        last = last[:-1] + 'ieth'
+    else:
+        last += 'th'
+    return head + sep + last
+
+
+def year_words(year: int) -> str:
+    if 2000 <= year < 2010:
+        return number_words(year).replace(' and ', ' ')
+    high, low = divmod(year, 100)
+    if low == 0:
+        return f"{number_words(high)} hundred"
+    return f"{number_words(high)} {'oh ' + _ONES[low] if low < 10 else number_words(low)}"
+
+
+def _digits(group: str) -> str:
+    return ' '.join(_ONES[int(d)] for d in group)
+
+
+# --- phone numbers: the shapes validate_nigerian_phone accepts, spaces/dashes allowed ---
+# With +234, 234 (optionally "(0)") or the trunk 0 in front it is a phone number wherever it appears
+_PHONE = re.compile(r'(?<![\w+])(?:\+?234[\s-]?(?:\(0\)[\s-]?)?|0)([789][01]\d)[\s-]?(\d{3})[\s-]?(\d{4})(?!\d)')
+# Ten bare digits may be an order or reference number; only a cue word shortly before makes them a phone
+_BARE_PHONE = re.compile(r'\b((?:call|dial|phone|mobile|reach|text|whatsapp)\b[^\d.!?]{0,20}?)'
+                         r'(?<![\w+])([789][01]\d)[\s-]?(\d{3})[\s-]?(\d{4})(?!\d)', re.IGNORECASE)
+
+
+def _phone_words(prefix: str, exchange: str, line: str) -> str:
+    # Read in the local form people dial: 0803, 123, 4567
+    return f"{_digits('0' + prefix)}, {_digits(exchange)}, {_digits(line)}"
+
+
+def _phone(m: re.Match) -> str:
+    return _phone_words(m.group(1), m.group(2), m.group(3))
+
+
+def _bare_phone(m: re.Match) -> str:
+    return m.group(1) + _phone_words(m.group(2), m.group(3), m.group(4))
+
+
+# --- naira: ₦5,000 / N5000 / NGN 5,000.00 / 5000 naira / ₦2.5m; "N5000 naira" says naira once ---
+_AMOUNT = r'(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d{1,2}))?'
+_MULTIPLIER = r'(?:\s?(k|m|bn|thousand|million|billion)\b)?'
+_NAIRA_PREFIX = re.compile(r'(?:₦|\bNGN\s?|\bN(?=\d))\s?' + _AMOUNT + _MULTIPLIER + r'(?:\s?naira\b)?',
+                           re.IGNORECASE)
+_NAIRA_SUFFIX = re.compile(r'\b' + _AMOUNT + _MULTIPLIER + r'\s?(?:naira|NGN)\b', re.IGNORECASE)
+_MULTIPLIERS = {'k': 1_000, 'thousand': 1_000, 'm': 1_000_000, 'million': 1_000_000,
+                'bn': 1_000_000_000, 'billion': 1_000_000_000}
+
+
+def _naira(m: re.Match) -> str:
+    whole, fraction, multiplier = int(m.group(1).replace(',', '')), m.group(2), m.group(3)
+    kobo = int(fraction.ljust(2, '0')) if fraction else 0
+    if multiplier:
+        total_kobo = (whole * 100 + kobo) * _MULTIPLIERS[multiplier.lower()]
+        whole, kobo = divmod(total_kobo, 100)
+    words = f"{number_words(whole)} naira"
+    if kobo:
+        words += f" {number_words(kobo)} kobo"
+    return words
+
+
+# --- dates: 12/03/2025 (day first), 2025-03-12, 12th March 2025, March 12, 2025 ---
+_DATE_ISO = re.compile(r'(?<![\w.-])(\d{4})-(\d{1,2})-(\d{1,2})(?![\w.-]\w)')
+# Slashes only: "2.10.12" is a version and "3-4-2025" a range or a code far more often than a date
+_DATE_NUMERIC = re.compile(r'(?<![\w/])(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})(?![\w/])')
+# Month names must be capitalized, so "you may 2..." is left alone
+_DATE_DAY_MONTH = re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)?(?:\s+of)?\s+(' + _MONTH_NAMES + r')(?:,?\s+(\d{4}))?\b')
+_DATE_MONTH_DAY = re.compile(r'\b(' + _MONTH_NAMES + r')\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b')
+
+
+def _date_words(day: int, month: int, year) -> str:
+    words = f"the {ordinal_words(day)} of {_MONTHS[month - 1]}"
+    if year:
+        year = int(year)
+        words += f", {year_words(year + 2000 if year < 100 else year)}"
+    return words
+
+
+def _valid_date(day: int, month: int) -> bool:
+    return 1 <= month <= 12 and 1 <= day <= 31
+
+
+def _date_iso(m: re.Match) -> str:
+    year, month, day = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    return _date_words(day, month, year) if _valid_date(day, month) else m.group(0)
+
+
+def _date_numeric(m: re.Match) -> str:
+    day, month = int(m.group(1)), int(m.group(2))
+    return _date_words(day, month, m.group(3)) if _valid_date(day, month) else m.group(0)
+
+
+def _month(name: str) -> int:
+    return _MONTH_LOOKUP[name[:3].lower()]
+
+
+def _date_day_month(m: re.Match) -> str:
+    day, month = int(m.group(1)), _month(m.group(2))
+    return _date_words(day, month, m.group(3)) if _valid_date(day, month) else m.group(0)
+
+
+def _date_month_day(m: re.Match) -> str:
+    day, month = int(m.group(2)), _month(m.group(1))
+    return _date_words(day, month, m.group(3)) if _valid_date(day, month) else m.group(0)
+
+
+# --- times: 3:30pm / 3.30 p.m. / 15:30 / 3pm / 09:05 ---
+# A bare hour needs "5pm" or "5 p.m.": in "I am 5 am I?" the "am" is a verb
+_TIME_MERIDIEM = re.compile(r'\b(\d{1,2})(?:[:.]([0-5]\d)\s?|\s?(?=[ap]\.\s?m\.))?([ap])(\.\s?m\.|m\b)',
+                            re.IGNORECASE)
+_TIME_24H = re.compile(r'\b([01]?\d|2[0-3]):([0-5]\d)\b')
+
+
+def _time_words(hour: int, minute: int, meridiem) -> str:
+    words = number_words(hour)
+    if minute:
+        words += f" {'oh ' + _ONES[minute] if minute < 10 else number_words(minute)}"
+    elif meridiem is None:
+        words += " o'clock"
+    return f"{words} {meridiem}" if meridiem else words
+
+
+def _time_meridiem(m: re.Match) -> str:
+    hour, minute = int(m.group(1)), int(m.group(2) or 0)
+    if not 1 <= hour <= 12:
+        return m.group(0)
+    words = _time_words(hour, minute, 'AM' if m.group(3).lower() == 'a' else 'PM')
+    # "p.m." at the end of the text also ends the sentence
+    if m.group(4).endswith('.') and not m.string[m.end():].strip():
+        words += '.'
+    return words
+
+
+def _time_24h(m: re.Match) -> str:
+    hour, minute = int(m.group(1)), int(m.group(2))
+    # Only the afternoon/midnight half is unambiguous; 9:30 stays "nine thirty"
+    if hour == 0:
+        return _time_words(12, minute, 'AM')
+    if hour > 12:
+        return _time_words(hour - 12, minute, 'PM')
+    return _time_words(hour, minute, None)
+
+
+# --- punctuation and whitespace ---
+_TYPOGRAPHY = str.maketrans({'’': "'", '‘': "'", '“': '"', '”': '"', '…': '...', '*': None,
+                             '~': None, '#': None, '`': None})
+# Markdown _emphasis_ underscores become spaces; inside a word ("john_doe") they stay
+_UNDERSCORES = re.compile(r'_+')
+_SPACE_BEFORE_PUNCT = re.compile(r'\s+([,.;:!?])')
+_REPEATED_PUNCT = re.compile(r'([!?,;:])[!?,;:]+|\.{4,}')
+_THOUSANDS = re.compile(r'\b(\d{1,3}(?:,\d{3})+)\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _underscores(m: re.Match) -> str:
+    text, start, end = m.string, m.start(), m.end()
+    if start and end < len(text) and text[start - 1].isalnum() and text[end].isalnum():
+        return m.group(0)
+    return ' '
+
+
+# Anything beyond whitespace that a rule could change; plain prose skips the rule chain
+_NEEDS_RULES = re.compile(r'[\d₦*_~#`’‘“”…]|[!?,;:.]{2}|\s[,.;:!?]')
+
+# Order matters: phone digits must not be read as amounts, dates before times
+_RULES = [
+    (_PHONE, _phone),
+    (_BARE_PHONE, _bare_phone),
+    (_NAIRA_PREFIX, _naira),
+    (_NAIRA_SUFFIX, _naira),
+    (_DATE_ISO, _date_iso),
+    (_DATE_NUMERIC, _date_numeric),
+    (_DATE_DAY_MONTH, _date_day_month),
+    (_DATE_MONTH_DAY, _date_month_day),
+    (_TIME_MERIDIEM, _time_meridiem),
+    (_TIME_24H, _time_24h),
+    (_THOUSANDS, lambda m: m.group(1).replace(',', '')),
+]
+
+_counters = {'rewritten': 0, 'unchanged': 0}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def speakable(text: str) -> str:
+    """Canonical spoken form of a text; identical inputs are served from the LRU"""
+    result = _WHITESPACE.sub(' ', text).strip()
+    if _NEEDS_RULES.search(result):
+        result = _UNDERSCORES.sub(_underscores, result.translate(_TYPOGRAPHY))
+        for pattern, replace in _RULES:
+            result = pattern.sub(replace, result)
+        result = _REPEATED_PUNCT.sub(lambda m: m.group(1) or '...', result)
+        result = _SPACE_BEFORE_PUNCT.sub(r'\1', result)
+        result = _WHITESPACE.sub(' ', result).strip()
+    _counters['rewritten' if result != text else 'unchanged'] += 1
+    return result
+
+
+def stats() -> Dict[str, Any]:
+    info = speakable.cache_info()
+    return {
+        **_counters,
+        'memo_hits': info.hits,
+        'memo_misses': info.misses,
+        'memo_size': info.currsize,
+        'memo_max': info.maxsize,
+    }
@@ -0,0 +1,224 @@
+"""
+VOICE CATALOG - every upstream voice, resolved before any upstream connection
+Starts from a disk snapshot (or a small built-in list) so startup never waits
+on the network, refreshes from the engine in the background once the TTL is
+up, and keeps one lookup table over voice IDs, aliases, full names and
+locales so resolve() is a single dict hit. Until a real list has been seen,
+any well-formed voice name is let through.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# edge_tts.list_voices() entries: ShortName, Name, Locale, Gender, FriendlyName, ...
+VoiceLister = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+# OpenAI-style names existing clients send
+DEFAULT_ALIASES = {
+    'alloy': 'en-US-AriaNeural',
+    'echo': 'en-US-GuyNeural',
+    'fable': 'en-US-JennyNeural',
+    'onyx': 'en-US-DavisNeural',
+    'nova': 'en-US-SaraNeural',
+    'shimmer': 'en-US-MichelleNeural',
+}
+DEFAULT_VOICE = 'en-US-AriaNeural'
+
+_BUILTIN = [
+    ('en-US-AriaNeural', 'Female'), ('en-US-GuyNeural', 'Male'), ('en-US-JennyNeural', 'Female'),
+    ('en-US-DavisNeural', 'Male'), ('en-US-SaraNeural', 'Female'), ('en-US-MichelleNeural', 'Female'),
+    ('en-NG-EzinneNeural', 'Female'), ('en-NG-AbeoNeural', 'Male'), ('en-GB-SoniaNeural', 'Female'),
+]
+
+# xx-YY-NameNeural, xx-YY-Script-NameNeural, ...
+_VOICE_SHAPE = re.compile(r'^[a-z]{2,3}(-[A-Za-z]{2,4}){1,2}-[A-Za-z0-9]+Neural$')
+
+
+class UnknownVoice(ValueError):
+    """Voice is not in the catalog (or not even shaped like a voice name)"""
+
+
+class Voice(NamedTuple):
+    id: str
+    name: str
+    locale: str
+    gender: str
+
+    @classmethod
+    def from_upstream(cls, entry: Dict[str, Any]) -> "Voice":
+        short_name = entry['ShortName']
+        return cls(
+            id=short_name,
+            name=short_name.rsplit('-', 1)[-1].replace('Neural', ''),
+            locale=entry.get('Locale') or short_name.rsplit('-', 1)[0],
+            gender=entry.get('Gender') or 'Unknown',
+        )
+
+    def as_dict(self, aliases: List[str]) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'language': self.locale.split('-')[0],
+            'locale': self.locale,
+            'gender': self.gender.lower(),
+            'edge_voice': self.id,
+            'aliases': aliases,
+        }
+
+
+class VoiceCatalog:
+    """Upstream voice list with O(1) resolution and a TTL-driven background refresh"""
+
+    def __init__(self, lister: VoiceLister, snapshot_path: Optional[str] = None, ttl_seconds: float = 86400.0,
+                 aliases: Optional[Dict[str, str]] = None, default: str = DEFAULT_VOICE):
+        self.lister = lister
+        self.snapshot_path = snapshot_path
+        self.ttl_seconds = ttl_seconds
+        self.aliases = dict(DEFAULT_ALIASES if aliases is None else aliases)
+        self.default = default
+        # 'builtin' until a snapshot or upstream list is loaded; only then are unknown names rejected
+        self.source = 'builtin'
+        self.fetched_at: Optional[float] = None
+        self.counters = {
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'rejected': 0,
+        }
+        self._install([{'ShortName': voice, 'Gender': gender} for voice, gender in _BUILTIN], 'builtin', None)
+        self._load_snapshot()
+
+    @classmethod
+    def from_env(cls, lister: VoiceLister) -> "VoiceCatalog":
+        default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "voices.json")
+        return cls(
+            lister,
+            snapshot_path=os.getenv("TTS_VOICE_CATALOG_PATH", default_path) or None,
+            ttl_seconds=float(os.getenv("TTS_VOICE_CATALOG_TTL_SECONDS", "86400")),
+            default=os.getenv("TTS_DEFAULT_VOICE", DEFAULT_VOICE),
+        )
+
+    @property
+    def authoritative(self) -> bool:
+        return self.source != 'builtin'
+
+    def _install(self, entries: List[Dict[str, Any]], source: str, fetched_at: Optional[float]):
+        voices = [Voice.from_upstream(entry) for entry in entries if entry.get('ShortName')]
+        by_id = {voice.id: voice for voice in voices}
+        by_locale: Dict[str, List[Voice]] = {}
+        for voice in voices:
+            by_locale.setdefault(voice.locale, []).append(voice)
+
+        # Lower-cased keys; later entries win: IDs over full names over aliases over a bare
+        # locale ("en-NG"), which resolves to that locale's first voice
+        lookup: Dict[str, Voice] = {}
+        for locale, members in by_locale.items():
+            lookup[locale.lower()] = members[0]
+        for alias, target in self.aliases.items():
+            if target in by_id:
+                lookup[alias.lower()] = by_id[target]
+        for entry in entries:
+            if entry.get('Name') and entry.get('ShortName') in by_id:
+                lookup[entry['Name'].lower()] = by_id[entry['ShortName']]
+        for voice in voices:
+            lookup[voice.id.lower()] = voice
+
+        # Swapped in one assignment so concurrent resolves see either the old or the new catalog
+        self._tables = (by_id, by_locale, lookup)
+        self.source = source
+        self.fetched_at = fetched_at
+
+    def resolve(self, requested: Optional[str]) -> str:
+        """Upstream voice ID for an ID, alias, full name or locale; raises UnknownVoice"""
+        name = (requested or '').strip() or self.default
+        voice = self._tables[2].get(name.lower())
+        if voice is not None:
+            return voice.id
+        if not self.authoritative and _VOICE_SHAPE.match(name):
+            return name
+        self.counters['rejected'] += 1
+        raise UnknownVoice(f"Unknown voice '{name}'")
+
+    def list_voices(self, locale: Optional[str] = None, gender: Optional[str] = None) -> List[Dict[str, Any]]:
+        by_id, by_locale, _ = self._tables
+        voices = by_locale.get(locale, []) if locale else list(by_id.values())
+        if gender:
+            voices = [voice for voice in voices if voice.gender.lower() == gender.lower()]
+        aliases: Dict[str, List[str]] = {}
+        for alias, target in self.aliases.items():
+            aliases.setdefault(target, []).append(alias)
+        return [voice.as_dict(aliases.get(voice.id, [])) for voice in voices]
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('voices'):
+                self._install(snapshot['voices'], 'snapshot', snapshot.get('fetched_at'))
+                logger.info(f"🗣️ Voice catalog: {len(self._tables[0])} voices from {self.snapshot_path}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ Voice catalog snapshot unusable ({self.snapshot_path}): {e}")
+
+    def _save_snapshot(self, entries: List[Dict[str, Any]]):
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+            # Written aside and renamed, so other workers never read half a file
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': self.fetched_at, 'voices': entries}, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write voice catalog snapshot: {e}")
+
+    async def refresh(self) -> bool:
+        """Fetch the upstream list; on failure (or an empty list) the current catalog stays"""
+        try:
+            entries = await self.lister()
+            if not entries:
+                raise ValueError("engine returned no voices")
+        except Exception as e:
+            self.counters['refresh_failures'] += 1
+            logger.warning(f"⚠️ Voice catalog refresh failed: {e}")
+            return False
+        self._install(entries, 'upstream', time.time())
+        self.counters['refreshes'] += 1
+        self._save_snapshot(entries)
+        logger.info(f"🗣️ Voice catalog refreshed: {len(self._tables[0])} voices")
+        return True
+
+    def _seconds_until_stale(self) -> float:
+        if self.fetched_at is None:
+            return 0.0
+        return max(0.0, self.fetched_at + self.ttl_seconds - time.time())
+
+    async def run(self, retry_seconds: float = 60.0):
+        """Background task: refresh whenever the catalog is older than the TTL (0 = load once)"""
+        while True:
+            if self.ttl_seconds <= 0 and self.source == 'upstream':
+                return
+            await asyncio.sleep(self._seconds_until_stale() if self.ttl_seconds > 0 else 0)
+            if not await self.refresh():
+                await asyncio.sleep(retry_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        by_id, by_locale, _ = self._tables
+        return {
+            **self.counters,
+            'source': self.source,
+            'voices': len(by_id),
+            'locales': len(by_locale),
+            'aliases': len(self.aliases),
+            'fetched_at': self.fetched_at,
+            'age_seconds': round(time.time() - self.fetched_at, 1) if self.fetched_at else None,
+            'ttl_seconds': self.ttl_seconds,
+        }
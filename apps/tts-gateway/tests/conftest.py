@@ -0,0 +1,46 @@
+"""
+Gateway unit tests: python -m pytest tests (from apps/tts-gateway)
+Async code runs under asyncio.run, so nothing beyond pytest is needed
+"""
+
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+# callwaiting_common, as edge-tts-server.py finds it
+sys.path.insert(0, os.path.join(HERE, '..', '..', '..', 'lib'))
+
+
+@pytest.fixture
+def make_gateway(tmp_path, monkeypatch):
+    """The gateway app on the offline engine, one tenant allowed 100 characters a minute"""
+    pytest.importorskip('fastapi')
+    pytest.importorskip('httpx')
+    tenants = tmp_path / 'tenants.json'
+    tenants.write_text(json.dumps({'tenants': [
+        {'tenant_id': 'acme', 'api_key': 'acme-key',
+         'rate_limit': {'requests_per_minute': 100, 'characters_per_minute': 100}},
+    ]}))
+    for name, value in {'TTS_ENGINE': 'local', 'TTS_FALLBACK_ENGINE': '', 'TTS_CACHE_DIR': str(tmp_path / 'cache'),
+                        'TTS_TENANTS_FILE': str(tenants), 'TTS_PRERENDER_MANIFESTS': '',
+                        'TTS_VOICE_CATALOG_PATH': '', 'TTS_ACCESS_LOG': '', 'TTS_PROBE_INTERVAL_SECONDS': '0'}.items():
+        monkeypatch.setenv(name, value)
+    spec = importlib.util.spec_from_file_location('edge_tts_server', os.path.join(HERE, '..', 'edge-tts-server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    from fastapi.testclient import TestClient
+
+    def make():
+        server = module.EdgeTTSServer()
+        return server, TestClient(server.app)
+    return make
+
+
+@pytest.fixture
+def gateway(make_gateway):
+    return make_gateway()
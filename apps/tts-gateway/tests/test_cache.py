@@ -0,0 +1,146 @@
+"""AudioCache: content-addressed keys, the byte-bounded memory LRU, the disk tier and tier promotion"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from callwaiting_common.shm import SharedSegment
+from edge_gateway.cache import (DEFAULT_OUTPUT_FORMAT, WORD_OVERHEAD_BYTES, AudioCache, DiskTier, MemoryTier,
+                                make_cache_key, pack_entry, unpack_entry)
+
+WORDS = [[0, 300, 'Hello'], [350, 400, 'there']]
+
+
+def key(text: str = 'Hello there', voice: str = 'en-NG-EzinneNeural') -> str:
+    return make_cache_key(text, voice, '+0%', '+0%', DEFAULT_OUTPUT_FORMAT)
+
+
+def test_key_ignores_whitespace_and_covers_everything_that_changes_audio():
+    assert key('Hello  there ') == key('Hello there') == key('\nHello\tthere')
+    variants = {key('Hello there!'), key(voice='en-US-AriaNeural'),
+                make_cache_key('Hello there', 'en-NG-EzinneNeural', '+10%', '+0%', DEFAULT_OUTPUT_FORMAT),
+                make_cache_key('Hello there', 'en-NG-EzinneNeural', '+0%', '-10%', DEFAULT_OUTPUT_FORMAT),
+                make_cache_key('Hello there', 'en-NG-EzinneNeural', '+0%', '+0%', 'raw-8khz-8bit-mono-mulaw')}
+    assert key() not in variants and len(variants) == 5
+
+
+def test_packed_entries_round_trip():
+    assert unpack_entry(pack_entry((b'audio', WORDS))) == (b'audio', WORDS)
+    assert unpack_entry(pack_entry((b'audio', None))) == (b'audio', None)
+
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    tier = MemoryTier(max_bytes=30)
+    tier.put('a', (b'x' * 10, None))
+    tier.put('b', (b'x' * 10, None))
+    tier.put('c', (b'x' * 10, None))
+    tier.get('a')
+    tier.put('d', (b'x' * 10, None))
+    assert tier.get('b') is None
+    assert [k for k in ('a', 'c', 'd') if tier.get(k)] == ['a', 'c', 'd']
+    assert (tier.bytes, tier.evictions) == (30, 1)
+    # Replacing an entry swaps its size; one bigger than the whole tier is not kept
+    tier.put('a', (b'x' * 5, None))
+    assert tier.bytes == 25
+    tier.put('huge', (b'x' * 31, None))
+    assert tier.get('huge') is None and len(tier) == 3
+
+
+def test_word_timings_count_against_the_memory_budget():
+    tier = MemoryTier(max_bytes=10 + 2 * WORD_OVERHEAD_BYTES)
+    tier.put('a', (b'x' * 10, WORDS))
+    assert tier.bytes == tier.max_bytes
+    tier.put('b', (b'y', None))
+    assert tier.get('a') is None
+
+
+def test_disk_tier_survives_a_restart_in_lru_order(tmp_path):
+    tier = DiskTier(str(tmp_path), max_bytes=1000)
+    tier.put('aa11', (b'a' * 300, WORDS))
+    tier.put('bb22', (b'b' * 300, None))
+    tier.put('cc33', (b'c' * 300, None))
+    # Touch the oldest, so after a restart bb22 is the least recently used
+    past = time.time() - 100
+    for name, offset in (('aa11', 3), ('bb22', 1), ('cc33', 2)):
+        os.utime(tmp_path / name[:2] / f"{name}.audio", (past + offset, past + offset))
+
+    restarted = DiskTier(str(tmp_path), max_bytes=1000)
+    assert len(restarted) == 3
+    assert restarted.get('aa11') == (b'a' * 300, WORDS)
+    restarted.put('dd44', (b'd' * 300, None))
+    assert restarted.get('bb22') is None
+    # The sidecar went with its audio
+    assert not (tmp_path / 'bb' / 'bb22.words').exists() and not (tmp_path / 'bb' / 'bb22.audio').exists()
+    assert restarted.bytes <= 1000
+
+
+def test_disk_tier_adopts_entries_written_by_another_worker(tmp_path):
+    mine = DiskTier(str(tmp_path), max_bytes=10_000)
+    theirs = DiskTier(str(tmp_path), max_bytes=10_000)
+    theirs.put('ee55', (b'audio', WORDS))
+    assert mine.get('ee55') == (b'audio', WORDS)
+    assert len(mine) == 1 and mine.bytes > len(b'audio')
+
+
+def test_disk_tier_forgets_a_file_deleted_under_it(tmp_path):
+    tier = DiskTier(str(tmp_path), max_bytes=10_000)
+    tier.put('ff66', (b'audio', None))
+    (tmp_path / 'ff' / 'ff66.audio').unlink()
+    assert tier.get('ff66') is None
+    assert len(tier) == 0 and tier.bytes == 0
+
+
+def test_lookups_fall_through_tiers_and_promote(tmp_path):
+    async def run():
+        writer = AudioCache(memory_bytes=1 << 20, disk_dir=str(tmp_path), disk_bytes=1 << 20)
+        await writer.put(key(), b'audio', WORDS)
+        # A fresh process: empty memory, same disk
+        reader = AudioCache(memory_bytes=1 << 20, disk_dir=str(tmp_path), disk_bytes=1 << 20)
+        assert reader.contains(key()) and reader.peek(key()) is None
+        first = await reader.get_entry(key())
+        second = await reader.get_entry(key())
+        missing = await reader.get(key('Bye'))
+        return reader, first, second, missing
+
+    reader, first, second, missing = asyncio.run(run())
+    assert first == second == (b'audio', WORDS)
+    assert missing is None
+    assert (reader.counters['hits_disk'], reader.counters['hits_memory'], reader.counters['misses']) == (1, 1, 1)
+    assert reader.stats()['hit_ratio'] == pytest.approx(2 / 3, abs=0.001)
+
+
+def test_shared_segment_serves_other_workers(tmp_path):
+    async def run():
+        shared = SharedSegment(capacity_bytes=1 << 16, index_slots=64)
+        one = AudioCache(memory_bytes=1 << 20, shared=shared)
+        two = AudioCache(memory_bytes=1 << 20, shared=shared)
+        await one.put(key(), b'audio', WORDS)
+        return two, await two.get_entry(key()), await two.get_entry(key())
+
+    two, first, second = asyncio.run(run())
+    assert first == second == (b'audio', WORDS)
+    assert (two.counters['hits_shared'], two.counters['hits_memory']) == (1, 1)
+
+
+def test_disk_write_failure_is_counted_not_raised(tmp_path, monkeypatch):
+    cache = AudioCache(memory_bytes=1 << 20, disk_dir=str(tmp_path), disk_bytes=1 << 20)
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(cache.disk, 'put', fail)
+    asyncio.run(cache.put(key(), b'audio'))
+    assert cache.counters['store_errors'] == 1
+    assert cache.peek(key()) == b'audio'
+
+
+def test_empty_audio_is_not_cached():
+    cache = AudioCache(memory_bytes=1 << 20)
+    asyncio.run(cache.put(key(), b''))
+    assert not cache.contains(key()) and cache.counters['stores'] == 0
+
+
+def test_disabled_by_env(monkeypatch):
+    monkeypatch.setenv('TTS_CACHE_ENABLED', 'false')
+    assert AudioCache.from_env() is None
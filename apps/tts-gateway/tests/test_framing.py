@@ -0,0 +1,124 @@
+"""Fixed-duration re-framing: frame sizes, chunk reassembly, padding and the frame_ms option"""
+
+import asyncio
+import json
+import random
+
+import pytest
+
+from edge_gateway.framing import MP3_FRAME_BYTES, Reframer, frame_size, reframed, silence_byte
+from edge_gateway.timing import FRAME_AUDIO, FRAME_EVENT, FRAME_HEADER, WordEvent
+
+
+@pytest.mark.parametrize('encoding, rate, frame_ms, expected', [
+    ('mulaw', 8000, 20, 160),
+    ('pcm_s16le', 8000, 20, 320),
+    ('pcm_s16le', 16000, 20, 640),
+    ('mp3', 24000, 20, MP3_FRAME_BYTES),
+    ('mp3', 24000, 100, 4 * MP3_FRAME_BYTES),
+    ('mp3', 24000, 10, MP3_FRAME_BYTES),
+])
+def test_frame_size(encoding, rate, frame_ms, expected):
+    assert frame_size(encoding, rate, frame_ms) == expected
+
+
+def test_frame_size_rejects_out_of_range_and_unknown_encodings():
+    with pytest.raises(ValueError, match='between'):
+        frame_size('mulaw', 8000, 5)
+    with pytest.raises(ValueError, match='between'):
+        frame_size('mulaw', 8000, 2000)
+    with pytest.raises(ValueError, match='Cannot re-frame'):
+        frame_size('opus', 48000, 20)
+    assert silence_byte('mulaw') == 0xFF and silence_byte('pcm_s16le') == 0 and silence_byte('mp3') is None
+
+
+def test_any_chunking_gives_the_same_whole_frames():
+    data = bytes(random.Random(7).getrandbits(8) for _ in range(5000))
+    for seed in range(5):
+        rng = random.Random(seed)
+        reframer = Reframer(160)
+        frames, pos = [], 0
+        while pos < len(data):
+            size = rng.choice((1, 7, 159, 160, 161, 320, 999))
+            frames += reframer.push(data[pos:pos + size])
+            pos += size
+        tail = reframer.flush()
+        assert all(len(frame) == 160 for frame in frames)
+        assert b''.join(frames) + tail == data
+        assert len(tail) == 5000 % 160
+        assert reframer.frames_out == len(frames) + 1
+
+
+def test_exact_frames_pass_through_without_copying():
+    reframer = Reframer(4)
+    chunk = b'abcd'
+    assert reframer.push(chunk)[0] is chunk
+    assert reframer.bytes_staged == 0
+    assert reframer.push(b'efghij') == [b'efgh']
+    assert reframer.bytes_staged == 2
+    assert reframer.push(b'kl') == [b'ijkl']
+    assert reframer.flush() is None
+
+
+def test_short_last_frame_is_padded_with_silence():
+    reframer = Reframer(4, pad_byte=silence_byte('mulaw'))
+    assert reframer.push(b'\x01\x02\x03\x04\x05') == [b'\x01\x02\x03\x04']
+    assert reframer.flush() == b'\x05\xff\xff\xff'
+    # MP3 can't be padded: the last frame is just short
+    mp3 = Reframer(4, pad_byte=silence_byte('mp3'))
+    mp3.push(b'\x01\x02\x03\x04\x05')
+    assert mp3.flush() == b'\x05'
+
+
+def test_staging_is_reused_without_leaking_earlier_frames():
+    reframer = Reframer(3)
+    first = reframer.push(b'ab') + reframer.push(b'c')
+    second = reframer.push(b'de') + reframer.push(b'f')
+    assert first == [b'abc'] and second == [b'def']
+
+
+def test_metadata_keeps_its_place_between_frames():
+    word = WordEvent(0.0, 10.0, 'hello')
+
+    async def source():
+        yield b'aaa'
+        yield word
+        yield b'bbbbbb'
+
+    async def run():
+        return [item async for item in reframed(source(), Reframer(4, pad_byte=0))]
+
+    # 'aaa' is still staged when the word arrives, so the word goes first
+    assert asyncio.run(run()) == [word, b'aaab', b'bbbb', b'b\x00\x00\x00']
+
+
+def stream(client, **options):
+    return client.post('/v1/synthesize/stream', headers={'X-API-Key': 'acme-key'},
+                       json={'text': 'Your table is ready', 'voice': 'en-NG-EzinneNeural', 'pipeline': False,
+                             **options})
+
+
+def test_frame_ms_gives_whole_mp3_frames(gateway):
+    _, client = gateway
+    response = stream(client, frame_ms=48, stream_format='framed')
+    assert response.status_code == 200
+    data, pos, audio = response.content, 0, []
+    while pos < len(data):
+        kind, length = FRAME_HEADER.unpack_from(data, pos)
+        pos += FRAME_HEADER.size
+        if kind == FRAME_AUDIO:
+            audio.append(len(data[pos:pos + length]))
+        else:
+            assert kind == FRAME_EVENT and json.loads(data[pos:pos + length])['type'] == 'word'
+        pos += length
+    assert len(audio) > 1
+    assert all(size == 2 * MP3_FRAME_BYTES for size in audio[:-1])
+    assert 0 < audio[-1] <= 2 * MP3_FRAME_BYTES
+
+
+def test_bad_frame_ms_is_a_400(gateway):
+    _, client = gateway
+    for frame_ms in (5, 'twenty', 5000):
+        response = stream(client, frame_ms=frame_ms)
+        assert response.status_code == 400
+        assert 'frame_ms' in response.json()['detail']
@@ -0,0 +1,198 @@
+"""LiveSession protocol: text fragments in, ordered audio and events out, cancel and barge-in"""
+
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+from edge_gateway.live import LiveSession
+from edge_gateway.segmenter import IncrementalSegmenter
+
+
+class Word:
+    """Metadata item riding next to the audio, like a word boundary"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def as_event(self) -> Dict[str, Any]:
+        return {'type': 'word', 'text': self.text}
+
+
+class Synth:
+    """Speaks each segment as its UTF-8 bytes in two chunks; segments containing 'slow' hang, 'fail' raise"""
+
+    def __init__(self):
+        self.started: List[str] = []
+        self.cancelled: List[str] = []
+
+    async def __call__(self, text: str):
+        self.started.append(text)
+        try:
+            await asyncio.sleep(0.001)
+            if 'fail' in text:
+                raise ConnectionError('upstream closed')
+            data = text.encode()
+            yield data[:2]
+            yield Word(text.split()[0])
+            if 'slow' in text:
+                await asyncio.sleep(10)
+            yield data[2:]
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+
+
+class Client:
+    """The socket side: everything the session sent, in order"""
+
+    def __init__(self):
+        self.sent: List[Tuple[str, Any]] = []
+
+    async def audio(self, data: bytes):
+        self.sent.append(('audio', data))
+
+    async def event(self, event: Dict[str, Any]):
+        self.sent.append(('event', event))
+
+    def events(self, kind: str = None) -> List[Dict[str, Any]]:
+        return [item for what, item in self.sent if what == 'event' and (kind is None or item['type'] == kind)]
+
+    def audio_bytes(self) -> bytes:
+        return b''.join(item for what, item in self.sent if what == 'audio')
+
+
+def make_session(synth: Synth, **kwargs):
+    client = Client()
+    session = LiveSession(synth, client.audio, client.event,
+                          IncrementalSegmenter(target_chars=1, first_chars=1), **kwargs)
+    ends = []
+    session.on_utterance_end = lambda status, summary: ends.append((status, summary['segments']))
+    return session, client, ends
+
+
+def test_fragments_become_ordered_segments_then_done():
+    async def run():
+        session, client, ends = make_session(Synth())
+        for fragment in ("Hello th", "ere. How are", " you? I am", " fine"):
+            await session.text(fragment)
+        await session.finish()
+        return session, client, ends
+
+    session, client, ends = asyncio.run(run())
+    assert [event['text'] for event in client.events('segment')] == ["Hello there.", "How are you?", "I am fine"]
+    assert client.audio_bytes() == b"Hello there.How are you?I am fine"
+    assert [event['text'] for event in client.events('word')] == ['Hello', 'How', 'I']
+    assert [event['index'] for event in client.events('segment_end')] == [0, 1, 2]
+    assert client.sent[-1] == ('event', {'type': 'done', 'segments': 3})
+    assert ends == [('success', 3)]
+    assert session.stats['segments'] == 3 and session.stats['bytes_sent'] == len(client.audio_bytes())
+
+
+def test_segment_end_follows_that_segments_last_audio():
+    async def run():
+        session, client, _ = make_session(Synth())
+        await session.text("One two. Three four. ")
+        await session.finish()
+        return client
+
+    client = asyncio.run(run())
+    kinds = [item['type'] if what == 'event' else what for what, item in client.sent]
+    first_end = kinds.index('segment_end')
+    # Both chunks of segment 0 went out before its segment_end
+    assert client.sent[first_end - 1] == ('audio', b'One two.'[2:])
+
+
+def test_flush_speaks_the_buffer_and_reports_after_its_audio():
+    async def run():
+        session, client, _ = make_session(Synth())
+        await session.flush()
+        await session.text("No sentence end yet")
+        await session.flush()
+        await asyncio.sleep(0.05)
+        return session, client
+
+    session, client = asyncio.run(run())
+    flushed = client.events('flushed')
+    assert flushed[0] == {'type': 'flushed', 'segments': 0}
+    assert flushed[1] == {'type': 'flushed', 'segments': 1, 'bytes_sent': len(b"No sentence end yet")}
+    assert client.sent.index(('event', flushed[1])) > client.sent.index(('audio', b"No sentence end yet"[2:]))
+    assert session.stats['flushes'] == 2
+
+
+def test_cancel_stops_segments_and_reports_what_was_heard():
+    async def run():
+        synth = Synth()
+        session, client, ends = make_session(synth)
+        await session.text("This is slow. Queued one. Queued two. Still typing")
+        await asyncio.sleep(0.05)
+        await session.cancel()
+        # The session carries on with a fresh turn
+        await session.text("Next turn.")
+        await session.finish()
+        return synth, session, client, ends
+
+    synth, session, client, ends = asyncio.run(run())
+    cancelled = client.events('cancelled')
+    assert cancelled == [{'type': 'cancelled', 'segments_dropped': 3, 'chars_dropped': len("Still typing"),
+                          'bytes_sent': 2}]
+    assert 'This is slow.' in synth.cancelled
+    assert client.audio_bytes() == b"Th" + b"Next turn."
+    assert ends == [('cancelled', 3), ('success', 1)]
+    assert session.stats['cancels'] == 1
+
+
+def test_barge_in_is_reported_as_such():
+    async def run():
+        session, client, _ = make_session(Synth())
+        await session.text("Very slow reply. ")
+        await asyncio.sleep(0.05)
+        await session.cancel('barge_in')
+        return session, client
+
+    session, client = asyncio.run(run())
+    assert client.events('barge_in')[0]['bytes_sent'] == 2
+    assert not client.events('cancelled')
+    assert session.stats['barge_ins'] == 1 and session.stats['cancels'] == 0
+
+
+def test_synthesis_failure_sends_an_error_event():
+    async def run():
+        session, client, ends = make_session(Synth())
+        await session.text("This will fail. ")
+        await session.finish()
+        return client, ends
+
+    client, ends = asyncio.run(run())
+    assert client.events('error') == [{'type': 'error', 'detail': 'upstream closed'}]
+    assert not client.events('done')
+    assert ends == [('failed', 1)]
+
+
+def test_abort_sends_nothing_more():
+    async def run():
+        synth = Synth()
+        session, client, ends = make_session(synth)
+        await session.text("So slow to finish. ")
+        await asyncio.sleep(0.05)
+        sent_before = len(client.sent)
+        await session.abort()
+        await asyncio.sleep(0.01)
+        return synth, client, ends, sent_before
+
+    synth, client, ends, sent_before = asyncio.run(run())
+    assert len(client.sent) == sent_before
+    assert synth.cancelled == ['So slow to finish.']
+    assert ends == [('cancelled', 1)]
+
+
+def test_wrap_audio_post_processes_the_stream():
+    async def upper(audio):
+        async for data in audio:
+            yield data.upper() if isinstance(data, bytes) else data
+
+    async def run():
+        session, client, _ = make_session(Synth(), wrap_audio=upper)
+        await session.text("quiet words. ")
+        await session.finish()
+        return client
+
+    assert asyncio.run(run()).audio_bytes() == b"QUIET WORDS."
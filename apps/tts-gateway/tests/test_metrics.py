@@ -0,0 +1,176 @@
+"""Metrics registry rendering and per-request telemetry"""
+
+from edge_gateway.metrics import MetricsRegistry
+from edge_gateway.telemetry import CLUSTER_COUNTERS, GatewayMetrics, cluster_families, voice_label
+
+
+class FakeCluster:
+    """Stands in for SharedCounters: one row, add() and totals()"""
+
+    workers = 2
+
+    def __init__(self):
+        self.counts = dict.fromkeys(CLUSTER_COUNTERS, 0)
+
+    def add(self, name: str, amount: int = 1):
+        self.counts[name] += amount
+
+    def totals(self):
+        return dict(self.counts)
+
+
+def lines(registry: MetricsRegistry):
+    return registry.render().splitlines()
+
+
+def test_counter_totals_match_on_labels():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests', ('endpoint', 'status'))
+    requests.labels('synthesize', 'success').inc()
+    requests.labels('synthesize', 'failed').inc(2)
+    requests.labels(endpoint='stream', status='success').inc(4)
+
+    assert requests.total() == 7
+    assert requests.total(status='success') == 5
+    assert requests.total(endpoint='synthesize') == 3
+    assert requests.total(endpoint='stream', status='failed') == 0
+    # Keyword and positional label values reach the same child
+    assert requests.labels('stream', 'success') is requests.labels(status='success', endpoint='stream')
+
+
+def test_gauge_set_inc_dec():
+    registry = MetricsRegistry()
+    gauge = registry.gauge('in_flight', 'In flight')
+    gauge.inc()
+    gauge.inc(3)
+    gauge.dec()
+    assert gauge.value() == 3
+    gauge.set(0.5)
+    assert gauge.value() == 0.5
+
+
+def test_histogram_buckets_render_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency', ('endpoint',), buckets=(1, 0.25))
+    child = latency.labels('stream')
+    for value in (0.1, 0.25, 0.5, 7):
+        child.observe(value)
+
+    rendered = lines(registry)
+    assert rendered[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    # Buckets are sorted, upper bounds are inclusive and each count includes the buckets below it
+    assert rendered[2:] == [
+        'latency_seconds_bucket{endpoint="stream",le="0.25"} 2',
+        'latency_seconds_bucket{endpoint="stream",le="1"} 3',
+        'latency_seconds_bucket{endpoint="stream",le="+Inf"} 4',
+        'latency_seconds_sum{endpoint="stream"} 7.85',
+        'latency_seconds_count{endpoint="stream"} 4',
+    ]
+
+
+def test_histogram_quantile_interpolates_within_buckets():
+    registry = MetricsRegistry()
+    child = registry.histogram('size', 'Size', buckets=(1, 2, 4)).labels()
+    assert child.quantile(0.5) is None
+
+    for value in (0.5, 1.5, 1.5, 3):
+        child.observe(value)
+    assert child.quantile(0.25) == 1.0
+    assert child.quantile(0.5) == 1.5
+    assert child.quantile(1.0) == 4.0
+
+    # Past the last bound the estimate is capped at it
+    child.observe(100)
+    assert child.quantile(0.99) == 4
+
+
+def test_render_escapes_labels_and_formats_values():
+    registry = MetricsRegistry()
+    counter = registry.counter('voices_total', 'Voices', ('voice',))
+    counter.labels('a "quoted"\\back\nslash').inc(3)
+    gauge = registry.gauge('ratio', 'Ratio')
+    gauge.set(0.125)
+
+    rendered = lines(registry)
+    assert 'voices_total{voice="a \\"quoted\\"\\\\back\\nslash"} 3' in rendered
+    assert 'ratio 0.125' in rendered
+    assert registry.render().endswith('\n')
+
+
+def test_collectors_run_at_scrape_time():
+    registry = MetricsRegistry()
+    state = {'entries': 1}
+    registry.collector(lambda: [('cache_entries', 'gauge', 'Entries',
+                                 [({'tier': 'memory'}, state['entries']), ({}, 2.5)])])
+    assert 'cache_entries{tier="memory"} 1' in lines(registry)
+
+    state['entries'] = 5
+    rendered = lines(registry)
+    assert rendered == ['# HELP cache_entries Entries', '# TYPE cache_entries gauge',
+                        'cache_entries{tier="memory"} 5', 'cache_entries 2.5']
+
+
+def test_voice_labels_fold_unknown_values():
+    assert voice_label('en-NG-EzinneNeural') == 'en-NG-EzinneNeural'
+    assert voice_label('female') == 'female'
+    assert voice_label('en-NG-Ezinne"}; injected') == 'other'
+    assert voice_label(None) == 'other'
+
+
+def test_request_tracker_counts_its_outcome_once():
+    metrics = GatewayMetrics()
+    tracker = metrics.track('stream', 'en-NG-EzinneNeural')
+    tracker.stream_started()
+    assert metrics.streams_in_flight.value() == 1
+    tracker.chunk(100)
+    tracker.chunk(50)
+
+    tracker.finish('success')
+    # A later error handler or disconnect must not count the request again
+    tracker.finish('failed')
+    tracker.finish('cancelled')
+
+    assert metrics.requests.total() == 1
+    assert metrics.requests.total(endpoint='stream', voice='en-NG-EzinneNeural', status='success') == 1
+    assert metrics.streams_in_flight.value() == 0
+    assert metrics.first_chunk.labels('stream').count == 1
+    assert metrics.audio_bytes.labels('stream').sum == 150
+    assert metrics.audio_chunks.labels('stream').sum == 2
+    assert metrics.snapshot()['requests_successful'] == 1
+
+
+def test_failed_requests_record_no_audio_histograms():
+    metrics = GatewayMetrics()
+    metrics.track('synthesize', 'female').finish('invalid')
+    metrics.track('synthesize', 'female').finish('failed')
+    metrics.track('synthesize', 'female').finish('rejected')
+
+    snapshot = metrics.snapshot()
+    assert snapshot['requests_total'] == 3
+    assert snapshot['requests_failed'] == 2
+    assert snapshot['requests_rejected'] == 1
+    assert list(metrics.duration.samples()) == []
+    assert list(metrics.audio_bytes.samples()) == []
+
+
+def test_cluster_counters_follow_the_tracker():
+    cluster = FakeCluster()
+    metrics = GatewayMetrics(cluster=cluster, worker=1)
+    streaming = metrics.track('stream', 'female')
+    streaming.stream_started()
+    assert cluster.counts['streams_in_flight'] == 1
+
+    streaming.finish('cancelled')
+    streaming.finish('cancelled')
+    metrics.track('synthesize', 'female').finish('success')
+
+    assert cluster.counts['streams_in_flight'] == 0
+    assert cluster.counts['requests_total'] == 2
+    assert cluster.counts['requests_cancelled'] == 1
+    snapshot = metrics.snapshot()
+    assert snapshot['requests_successful'] == 1
+    assert snapshot['workers'] == 2 and snapshot['worker'] == 1
+
+    families = {name: samples for name, _, _, samples in cluster_families(cluster)}
+    assert ({'status': 'success'}, 1) in families['tts_cluster_requests_total']
+    assert families['tts_cluster_workers'] == [({}, 2)]
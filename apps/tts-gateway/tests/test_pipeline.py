@@ -0,0 +1,169 @@
+"""Sentence segmentation (split_segments, IncrementalSegmenter) and the ordered SegmentPipeline"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from edge_gateway.pipeline import SegmentPipeline
+from edge_gateway.segmenter import IncrementalSegmenter, split_segments
+
+
+def test_short_first_segment_then_merged_sentences():
+    text = "Hi. " + "This sentence is about forty characters. " * 6
+    segments = split_segments(text, target_chars=100, first_chars=50, max_chars=200)
+    assert segments[0] == "Hi. This sentence is about forty characters."
+    assert all(len(segment) <= 100 for segment in segments)
+    assert ' '.join(segments) == ' '.join(text.split())
+
+
+def test_sentence_ends_include_quotes_and_newlines():
+    assert split_segments('He said "Stop." Then left!\nNext line', target_chars=1, first_chars=1) == [
+        'He said "Stop."', 'Then left!', 'Next line']
+
+
+def test_decimals_and_abbreviations_without_a_space_stay_together():
+    assert split_segments("It costs 3.50 today.", target_chars=1, first_chars=1) == ["It costs 3.50 today."]
+
+
+def test_long_sentence_breaks_at_clauses_then_words():
+    clauses = "first part here, second part here; third part here"
+    assert split_segments(clauses, target_chars=1, first_chars=1, max_chars=20) == [
+        'first part here,', 'second part here;', 'third part here']
+    words = ' '.join(['word'] * 20)
+    parts = split_segments(words, target_chars=1, first_chars=1, max_chars=22)
+    assert all(len(part) <= 22 for part in parts) and ' '.join(parts) == words
+    # Nothing to cut on: a hard cut at the limit
+    assert split_segments('x' * 50, target_chars=1, first_chars=1, max_chars=20) == ['x' * 20, 'x' * 20, 'x' * 10]
+
+
+def test_incremental_segments_wait_for_whitespace_after_a_boundary():
+    segmenter = IncrementalSegmenter(target_chars=1, first_chars=1)
+    assert segmenter.push("It costs 3.") == []
+    assert segmenter.push("50 naira. Call") == ["It costs 3.50 naira."]
+    assert segmenter.pending == "Call"
+    assert segmenter.push(" us now.") == []
+    assert segmenter.flush() == ["Call us now."]
+    assert segmenter.emitted == 2
+
+
+def test_incremental_run_on_text_is_cut_at_max_chars():
+    segmenter = IncrementalSegmenter(max_chars=20)
+    out = []
+    for word in ('alpha ', 'beta ', 'gamma ', 'delta ', 'epsilon ', 'zeta '):
+        out += segmenter.push(word)
+    out += segmenter.flush()
+    assert out and all(len(segment) <= 20 for segment in out)
+    assert ' '.join(out) == 'alpha beta gamma delta epsilon zeta'
+
+
+def test_reset_makes_the_next_segment_a_first_segment_again():
+    segmenter = IncrementalSegmenter(target_chars=100, first_chars=10)
+    segmenter.push("One two three. Four five six. ")
+    segmenter.push("dropped")
+    segmenter.reset()
+    assert segmenter.pending == '' and segmenter.emitted == 0
+    assert segmenter.push("Seven eight nine. Ten eleven. ") == ["Seven eight nine.", "Ten eleven."]
+
+
+class Synth:
+    """Segment i takes delays[i] seconds and yields two chunks; records render concurrency"""
+
+    def __init__(self, delays: List[float], fail: int = -1):
+        self.delays = delays
+        self.fail = fail
+        self.running = 0
+        self.peak = 0
+        self.started: List[str] = []
+        self.cancelled: List[str] = []
+
+    async def __call__(self, text: str):
+        index = int(text)
+        self.started.append(text)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delays[index])
+            if index == self.fail:
+                raise ConnectionError(f"segment {index} failed")
+            yield bytes([index]) * 3
+            yield {'word': text, 'offset_bytes': 1}
+            yield bytes([index]) * 2
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+        finally:
+            self.running -= 1
+
+
+def test_segments_render_concurrently_but_stream_in_order():
+    async def run():
+        synth = Synth([0.05, 0.01, 0.0, 0.0, 0.0])
+        pipeline = SegmentPipeline([str(i) for i in range(5)], synth, max_parallel=3,
+                                   rebase=lambda item, base: {**item, 'offset_bytes': item['offset_bytes'] + base})
+        done = []
+        pipeline.on_segment_done = lambda timing: done.append(timing['index'])
+        items = [item async for item in pipeline.stream()]
+        return synth, pipeline, items, done
+
+    synth, pipeline, items, done = asyncio.run(run())
+    audio = b''.join(item for item in items if isinstance(item, bytes))
+    assert audio == b''.join(bytes([i]) * 5 for i in range(5))
+    # Word offsets moved onto the whole stream: 5 bytes per earlier segment
+    assert [item['offset_bytes'] for item in items if isinstance(item, dict)] == [1, 6, 11, 16, 21]
+    assert synth.peak == 3
+    assert done == [0, 1, 2, 3, 4]
+    summary = pipeline.summary()
+    assert summary['segments'] == 5 and summary['first_byte_ms'] is not None
+    assert [timing['bytes'] for timing in summary['timings']] == [5] * 5
+
+
+def test_reader_leaving_cancels_renders_in_progress():
+    async def run():
+        synth = Synth([0.0, 1.0, 1.0, 1.0])
+        pipeline = SegmentPipeline([str(i) for i in range(4)], synth, max_parallel=3)
+        stream = pipeline.stream()
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return synth
+
+    synth = asyncio.run(run())
+    assert synth.started == ['0', '1', '2']
+    assert sorted(synth.cancelled) == ['1', '2']
+    assert synth.running == 0
+
+
+def test_failed_segment_ends_the_stream_after_the_ones_before_it():
+    async def run():
+        pipeline = SegmentPipeline(['0', '1', '2'], Synth([0.0, 0.0, 0.0], fail=1))
+        received = []
+        with pytest.raises(ConnectionError):
+            async for item in pipeline.stream():
+                received.append(item)
+        return received
+
+    received = asyncio.run(run())
+    assert b''.join(item for item in received if isinstance(item, bytes)) == b'\x00' * 5
+
+
+def test_open_ended_pipeline_streams_segments_added_later():
+    async def run():
+        synth = Synth([0.0] * 3)
+        pipeline = SegmentPipeline([], synth, open_ended=True)
+
+        async def feed():
+            for i in range(3):
+                await asyncio.sleep(0.005)
+                pipeline.add(str(i))
+            pipeline.close()
+
+        feeder = asyncio.ensure_future(feed())
+        audio = b''.join([item async for item in pipeline.stream() if isinstance(item, bytes)])
+        await feeder
+        return pipeline, audio
+
+    pipeline, audio = asyncio.run(run())
+    assert audio == b'\x00' * 5 + b'\x01' * 5 + b'\x02' * 5
+    with pytest.raises(RuntimeError):
+        pipeline.add('3')
@@ -0,0 +1,82 @@
+"""Batch pre-render: item and parallelism validation, manifests, and /v1/synthesize/batch on the local engine"""
+
+import json
+
+import pytest
+
+from edge_gateway import prerender
+from edge_gateway.prerender import intent_table_items, load_manifest, normalize_items, parse_parallelism
+
+
+@pytest.mark.parametrize('value, expected', [(None, 4), (1, 1), ('3', 3), (0, 1), (-5, 1), (100, 8)])
+def test_parallelism_defaults_and_clamps(value, expected):
+    assert parse_parallelism(value, default=4, maximum=8) == expected
+
+
+@pytest.mark.parametrize('value', ['abc', [], {}, 2.5, True, ''])
+def test_parallelism_must_be_an_integer(value):
+    with pytest.raises(ValueError):
+        parse_parallelism(value, default=4, maximum=8)
+
+
+def test_items_take_defaults_and_name_the_bad_one():
+    items = normalize_items(['Hello', {'text': ' Bye ', 'id': 'bye', 'voice': 'en-NG-EzinneNeural'}],
+                            {'format': 'pcm16'})
+    assert [(i['id'], i['text'], i['format']) for i in items] == [('0', 'Hello', 'pcm16'), ('bye', 'Bye', 'pcm16')]
+    assert items[1]['voice'] == 'en-NG-EzinneNeural'
+    with pytest.raises(ValueError, match='Item 1: text is required'):
+        normalize_items(['ok', {'text': '  '}])
+    with pytest.raises(ValueError, match='Item 0: text too long'):
+        normalize_items(['x' * 11], max_chars=10)
+
+
+def test_intent_table_is_a_manifest(tmp_path):
+    table = {'intents': [{'name': 'pricing', 'patterns': ['price'], 'reply': 'From $29.'},
+                         {'name': 'silent', 'patterns': ['x'], 'reply': ''}],
+             'fallback': 'Sorry?'}
+    assert intent_table_items(table) == [{'id': 'fallback.pricing', 'text': 'From $29.'},
+                                         {'id': 'fallback.default', 'text': 'Sorry?'}]
+    path = tmp_path / 'intents.json'
+    path.write_text(json.dumps(table))
+    assert [item['text'] for item in load_manifest(str(path))] == ['From $29.', 'Sorry?']
+
+
+@pytest.mark.parametrize('parallelism', ['abc', [], {'n': 1}])
+def test_bad_parallelism_is_a_400_and_charges_nothing(gateway, parallelism):
+    server, client = gateway
+    response = client.post('/v1/synthesize/batch', headers={'X-API-Key': 'acme-key'},
+                           json={'items': ['x' * 60], 'parallelism': parallelism})
+    assert response.status_code == 400
+    assert 'parallelism' in response.json()['detail']
+    assert 'acme' not in server.tenants.counters
+    # The 60 characters are still there to spend
+    response = client.post('/v1/synthesize/batch', headers={'X-API-Key': 'acme-key'},
+                           json={'items': ['x' * 60], 'parallelism': '2'})
+    assert response.status_code == 200
+    assert response.json()['summary']['parallelism'] == 2
+    assert server.tenants.counters['acme']['characters'] == 60
+
+
+def test_missing_default_manifest_is_warned_about_at_startup(make_gateway, monkeypatch, tmp_path, caplog):
+    monkeypatch.delenv('TTS_PRERENDER_MANIFESTS')
+    monkeypatch.setattr(prerender, 'DEFAULT_INTENTS_PATH', tmp_path / 'missing.json')
+    server, client = make_gateway()
+    assert server.prerender_manifests == []
+    with client:
+        pass
+    assert any('No warm-up manifest' in record.message for record in caplog.records)
+
+
+def test_default_manifest_is_the_api_intent_table(make_gateway, monkeypatch, caplog):
+    monkeypatch.delenv('TTS_PRERENDER_MANIFESTS')
+    server, _ = make_gateway()
+    assert server.prerender_manifests == [str(prerender.DEFAULT_INTENTS_PATH)]
+    assert len(load_manifest(server.prerender_manifests[0])) > 1
+
+
+def test_manifests_set_empty_disable_warm_up_quietly(gateway, caplog):
+    server, client = gateway
+    with client:
+        pass
+    assert server.prerender_manifests == []
+    assert not any('No warm-up manifest' in record.message for record in caplog.records)
@@ -0,0 +1,265 @@
+"""Circuit breaker transitions and hedged requests in ResilientEngine"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from edge_gateway.engines import LocalEngine
+from edge_gateway.resilience import CircuitBreaker, CircuitOpenError, FaultyEngine, ResilientEngine
+
+
+class ScriptedEngine:
+    """Call N waits delays[N] before its first chunk; counts streams still open"""
+
+    name = 'scripted'
+
+    def __init__(self, delays: List[float], chunks: int = 3):
+        self.delays = delays
+        self.chunks = chunks
+        self.calls = 0
+        self.open = 0
+        self.closed: List[int] = []
+
+    async def stream(self, text, voice, rate="+0%", volume="+0%"):
+        call = self.calls
+        self.calls += 1
+        self.open += 1
+        try:
+            await asyncio.sleep(self.delays[call])
+            for i in range(self.chunks):
+                yield {"type": "audio", "data": bytes([call]) * 4}
+                await asyncio.sleep(0)
+        finally:
+            self.open -= 1
+            self.closed.append(call)
+
+
+def hedging(engine, **kwargs) -> ResilientEngine:
+    # Hedge after 20 ms regardless of history, and never run out of hedge budget
+    options = {'hedge_default_ms': 20, 'hedge_min_ms': 0, 'hedge_budget': 1.0}
+    options.update(kwargs)
+    return ResilientEngine(engine, **options)
+
+
+async def collect(engine: ResilientEngine) -> List[dict]:
+    return [chunk async for chunk in engine.stream("Hello there", "en-NG-EzinneNeural")]
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.times_opened == 1
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.times_opened == 2
+
+
+def test_failures_open_breaker_and_route_to_fallback():
+    async def run():
+        engine = ResilientEngine(FaultyEngine(LocalEngine(), failure_probability=1.0),
+                                 fallback=LocalEngine(),
+                                 breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        for _ in range(3):
+            chunks = await collect(engine)
+            assert chunks and all(chunk['fallback'] for chunk in chunks)
+        return engine
+
+    engine = asyncio.run(run())
+    assert engine.breaker.state == 'open'
+    assert engine.counters['primary_failures'] == 2
+    assert engine.counters['short_circuited'] == 1
+    assert engine.counters['fallbacks'] == 3
+
+
+def test_open_breaker_without_fallback_raises():
+    async def run():
+        engine = ResilientEngine(FaultyEngine(LocalEngine(), failure_probability=1.0),
+                                 breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+        with pytest.raises(ConnectionError):
+            await collect(engine)
+        with pytest.raises(CircuitOpenError):
+            await collect(engine)
+
+    asyncio.run(run())
+
+
+def test_abandoned_half_open_trial_is_released():
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        engine = ResilientEngine(LocalEngine(), breaker=breaker)
+        stream = engine.stream("Hello there", "en-NG-EzinneNeural")
+        await stream.__anext__()
+        # Hang-up after the first chunk: neither success nor failure is recorded
+        await stream.aclose()
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+
+
+def test_breaker_tickets_release_only_their_own_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    closed_ticket = breaker.admit()
+    assert closed_ticket == CircuitBreaker.NO_TRIAL
+    breaker.record_failure()
+    trial = breaker.admit()
+    assert trial is not None and trial != closed_ticket
+    assert breaker.admit() is None
+
+    breaker.release_trial(closed_ticket)
+    assert breaker.admit() is None
+    breaker.release_trial(trial)
+    second_trial = breaker.admit()
+    assert second_trial is not None
+    # A stale ticket from the earlier trial can't free the current one
+    breaker.release_trial(trial)
+    assert not breaker.allow()
+
+
+def test_stream_from_before_the_trial_cannot_release_it():
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        engine = ResilientEngine(LocalEngine(), breaker=breaker)
+        # Started while closed, still streaming when the breaker trips
+        early = engine.stream("Hello there", "en-NG-EzinneNeural")
+        await early.__anext__()
+        breaker.record_failure()
+        trial = engine.stream("Hello there", "en-NG-EzinneNeural")
+        await trial.__anext__()
+        assert breaker.state == 'half_open'
+
+        await early.aclose()
+        # The early stream held no trial, so no second trial is let through
+        second_trial_allowed = breaker.allow()
+        await trial.aclose()
+        return breaker, second_trial_allowed
+
+    breaker, second_trial_allowed = asyncio.run(run())
+    assert not second_trial_allowed
+    assert breaker.allow()
+
+
+def test_cancel_before_first_audio_releases_trial_and_upstream():
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        primary = ScriptedEngine([5.0])
+        engine = ResilientEngine(primary, breaker=breaker, hedge_default_ms=10000)
+        task = asyncio.ensure_future(collect(engine))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return breaker, primary
+
+    breaker, primary = asyncio.run(run())
+    assert primary.open == 0
+    assert breaker.allow()
+
+
+def test_fast_first_chunk_is_not_hedged():
+    async def run():
+        primary = ScriptedEngine([0.0, 0.0])
+        engine = hedging(primary, hedge_default_ms=500)
+        chunks = await collect(engine)
+        return primary, engine, chunks
+
+    primary, engine, chunks = asyncio.run(run())
+    assert len(chunks) == 3
+    assert primary.calls == 1
+    assert engine.counters['hedges_issued'] == 0
+    assert engine.breaker.state == 'closed'
+
+
+def test_hedge_wins_and_slow_first_is_closed():
+    async def run():
+        primary = ScriptedEngine([1.0, 0.0])
+        engine = hedging(primary)
+        chunks = await collect(engine)
+        return primary, engine, chunks
+
+    primary, engine, chunks = asyncio.run(run())
+    # Every chunk came from the hedge (call 1)
+    assert [chunk['data'] for chunk in chunks] == [b'\x01' * 4] * 3
+    assert engine.counters['hedges_issued'] == 1
+    assert engine.counters['hedges_won'] == 1
+    assert primary.open == 0
+    assert sorted(primary.closed) == [0, 1]
+
+
+def test_first_wins_and_hedge_is_closed_before_streaming():
+    async def run():
+        primary = ScriptedEngine([0.06, 1.0])
+        engine = hedging(primary)
+        stream = engine.stream("Hello there", "en-NG-EzinneNeural")
+        first = await stream.__anext__()
+        # The losing hedge is gone before the winner's audio goes out
+        still_open = primary.open
+        rest = [chunk async for chunk in stream]
+        return primary, engine, [first] + rest, still_open
+
+    primary, engine, chunks, still_open = asyncio.run(run())
+    assert still_open == 1
+    assert primary.closed[0] == 1
+    assert [chunk['data'] for chunk in chunks] == [b'\x00' * 4] * 3
+    assert engine.counters['hedges_issued'] == 1
+    assert engine.counters['hedges_won'] == 0
+    assert primary.open == 0
+
+
+def test_hedge_budget_is_respected():
+    async def run():
+        primary = ScriptedEngine([0.05, 0.0])
+        engine = hedging(primary, hedge_budget=0.0)
+        await collect(engine)
+        return primary, engine
+
+    primary, engine = asyncio.run(run())
+    assert primary.calls == 1
+    assert engine.counters['hedges_issued'] == 0
+    assert engine.counters['hedges_skipped_budget'] == 1
+
+
+def test_both_contenders_failing_counts_one_failure():
+    async def run():
+        engine = hedging(FaultyEngine(LocalEngine(), first_chunk_ms=40, failure_probability=1.0),
+                         breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60))
+        with pytest.raises(ConnectionError):
+            await collect(engine)
+        return engine
+
+    engine = asyncio.run(run())
+    assert engine.counters['hedges_issued'] == 1
+    assert engine.counters['primary_failures'] == 1
+    assert engine.breaker.consecutive_failures == 1
@@ -0,0 +1,157 @@
+"""AdmissionController: priority classes, start-time fair queuing between tenants, shedding and preemption"""
+
+import asyncio
+from typing import List, Tuple
+
+import pytest
+
+from edge_gateway.scheduler import AdmissionController, AdmissionRejected
+
+
+async def admission_order(controller: AdmissionController, requests: List[Tuple]) -> List[str]:
+    """Queue (name, priority, tenant[, weight]) behind a held slot, free it, return who ran in what order"""
+    order: List[str] = []
+
+    async def request(name, priority, tenant, weight=1.0):
+        async with controller.slot(priority, tenant, weight):
+            order.append(name)
+
+    held = controller.slot()
+    await held.__aenter__()
+    tasks = [asyncio.ensure_future(request(*r)) for r in requests]
+    await asyncio.sleep(0)
+    assert controller.queued == len(requests)
+    await held.__aexit__(None, None, None)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_priority_classes_go_first():
+    controller = AdmissionController(max_concurrent=1, max_queue=10)
+    order = asyncio.run(admission_order(controller, [
+        ('batch', 'batch', 'a'),
+        ('standard', 'standard', 'a'),
+        ('live', 'live', 'a'),
+    ]))
+    assert order == ['live', 'standard', 'batch']
+    assert controller.active == 0
+    assert controller.queued == 0
+
+
+def test_flooding_tenant_only_delays_itself():
+    controller = AdmissionController(max_concurrent=1, max_queue=20)
+    flood = [(f'a{i}', 'standard', 'a') for i in range(8)]
+    order = asyncio.run(admission_order(controller, flood + [('b0', 'standard', 'b'), ('b1', 'standard', 'b')]))
+    # b queued after all eight of a's requests but is served alternately with them
+    assert order[:4] == ['a0', 'b0', 'a1', 'b1']
+    assert order[4:] == [f'a{i}' for i in range(2, 8)]
+
+
+def test_weight_sets_the_share():
+    controller = AdmissionController(max_concurrent=1, max_queue=20)
+    requests = [(f'a{i}', 'standard', 'a', 2.0) for i in range(6)] + [(f'b{i}', 'standard', 'b') for i in range(6)]
+    order = asyncio.run(admission_order(controller, requests))
+    first_six = order[:6]
+    assert sum(name.startswith('a') for name in first_six) == 4
+
+
+def test_fairness_is_per_class():
+    controller = AdmissionController(max_concurrent=1, max_queue=20)
+    order = asyncio.run(admission_order(controller, [
+        ('a-batch0', 'batch', 'a'),
+        ('a-batch1', 'batch', 'a'),
+        ('b-live', 'live', 'b'),
+        ('a-live', 'live', 'a'),
+    ]))
+    assert order == ['b-live', 'a-live', 'a-batch0', 'a-batch1']
+
+
+def test_full_queue_preempts_lower_priority():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=2)
+        held = controller.slot()
+        await held.__aenter__()
+        batch = [asyncio.ensure_future(controller.acquire('batch', 'a')) for _ in range(2)]
+        await asyncio.sleep(0)
+        live = asyncio.ensure_future(controller.acquire('live', 'b'))
+        preempted, _ = await asyncio.wait(batch, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+        # Another batch request can't displace the batch one queued ahead of it
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire('batch', 'c')
+        controller.release(0.0)
+        await live
+        controller.release(0.0)
+        await asyncio.gather(*batch, return_exceptions=True)
+        controller.release(0.0)
+        return controller, preempted, rejected.value
+
+    controller, preempted, rejected = asyncio.run(run())
+    assert [task.exception().reason for task in preempted] == ['preempted']
+    assert rejected.reason == 'queue full'
+    assert rejected.retry_after >= 1
+    stats = controller.stats()['classes']
+    assert stats['batch']['rejected_queue_full'] == 2
+    assert stats['batch']['admitted'] == 1
+    assert stats['live']['admitted'] == 1
+    assert controller.active == 0
+
+
+def test_full_queue_sheds_the_tenant_furthest_ahead_of_its_share():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=2)
+        held = controller.slot()
+        await held.__aenter__()
+        flood = [asyncio.ensure_future(controller.acquire('standard', 'a')) for _ in range(2)]
+        await asyncio.sleep(0)
+        newcomer = asyncio.ensure_future(controller.acquire('standard', 'b'))
+        shed, _ = await asyncio.wait(flood, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+        # a's second request had the latest start tag, so it made room for b
+        assert shed == {flood[1]} and flood[1].exception().reason == 'preempted'
+        # a asking again is now the one furthest ahead: refused outright
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire('standard', 'a')
+        controller.release(0.0)
+        await flood[0]
+        controller.release(0.0)
+        await newcomer
+        controller.release(0.0)
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.active == 0
+    assert controller.queued == 0
+
+
+def test_queue_timeout_rejects_and_frees_the_place():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout=0.02)
+        held = controller.slot()
+        await held.__aenter__()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire('standard', 'a')
+        assert controller.queued == 0
+        await held.__aexit__(None, None, None)
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(run())
+    assert rejected.reason == 'queue timeout'
+    assert controller.active == 0
+    assert controller.stats()['classes']['standard']['rejected_timeout'] == 1
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=5)
+        held = controller.slot()
+        await held.__aenter__()
+        waiter = asyncio.ensure_future(controller.acquire('standard', 'a'))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queued == 0
+        await held.__aexit__(None, None, None)
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.active == 0
@@ -0,0 +1,214 @@
+"""FlightGroup / StreamFlight: coalescing, replay, cancellation when every reader leaves, and backpressure"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from edge_gateway.singleflight import FlightGroup
+
+
+class Upstream:
+    """Counts sessions and chunks produced; each chunk is `size` bytes, with an optional pause before it"""
+
+    def __init__(self, chunks: int = 5, size: int = 10, gap: float = 0.0, fail_after: int = -1):
+        self.chunks = chunks
+        self.size = size
+        self.gap = gap
+        self.fail_after = fail_after
+        self.sessions = 0
+        self.produced = 0
+        self.closed = 0
+
+    def __call__(self):
+        return self.session()
+
+    async def session(self):
+        self.sessions += 1
+        try:
+            for i in range(self.chunks):
+                if self.gap:
+                    await asyncio.sleep(self.gap)
+                if i == self.fail_after:
+                    raise ConnectionError("upstream dropped")
+                self.produced += 1
+                yield bytes([i]) * self.size
+        finally:
+            self.closed += 1
+
+
+async def read_all(stream) -> List[bytes]:
+    return [chunk async for chunk in stream]
+
+
+def test_identical_requests_share_one_upstream_session():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(gap=0.001)
+        results = await asyncio.gather(*(read_all(group.stream('k', upstream)) for _ in range(5)))
+        return group, upstream, results
+
+    group, upstream, results = asyncio.run(run())
+    assert upstream.sessions == 1
+    assert all(result == results[0] for result in results) and len(results[0]) == 5
+    assert (group.counters['upstream_started'], group.counters['coalesced']) == (1, 4)
+    assert group.stats()['in_flight'] == 0
+
+
+def test_late_joiner_replays_what_was_already_produced():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(gap=0.01)
+        first = group.stream('k', upstream)
+        head = [await first.__anext__(), await first.__anext__()]
+        late = asyncio.ensure_future(read_all(group.stream('k', upstream)))
+        rest = await read_all(first)
+        return upstream, head + rest, await late
+
+    upstream, first, late = asyncio.run(run())
+    assert upstream.sessions == 1
+    assert late == first and len(first) == 5
+
+
+def test_buffered_waiters_get_the_same_bytes_object():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(gap=0.001)
+        return await asyncio.gather(group.collect('k', upstream), group.collect('k', upstream))
+
+    one, two = asyncio.run(run())
+    assert one is two and len(one) == 50
+
+
+def test_upstream_error_reaches_every_reader():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(gap=0.001, fail_after=2)
+        return await asyncio.gather(read_all(group.stream('k', upstream)), group.collect('k', upstream),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_last_reader_leaving_cancels_and_closes_upstream():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(chunks=100, gap=0.001)
+        stream = group.stream('k', upstream, expected_bytes=1000)
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        return group, upstream
+
+    group, upstream = asyncio.run(run())
+    assert upstream.closed == 1 and upstream.produced < 10
+    assert group.counters['cancelled'] == 1
+    assert group.counters['cancelled_bytes_saved'] == 1000 - upstream.produced * 10
+    assert group.stats()['in_flight'] == 0
+
+
+def test_one_reader_leaving_does_not_cancel_the_others():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(chunks=10, gap=0.001)
+        leaving = group.stream('k', upstream)
+        staying = asyncio.ensure_future(read_all(group.stream('k', upstream)))
+        await leaving.__anext__()
+        await leaving.aclose()
+        return group, await staying
+
+    group, chunks = asyncio.run(run())
+    assert len(chunks) == 10
+    assert group.counters['cancelled'] == 0
+
+
+def test_cancelled_buffered_waiter_cancels_upstream():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(chunks=100, gap=0.001)
+        waiter = asyncio.ensure_future(group.collect('k', upstream))
+        await asyncio.sleep(0.005)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.005)
+        return group, upstream
+
+    group, upstream = asyncio.run(run())
+    assert upstream.closed == 1 and upstream.produced < 100
+    assert group.counters['cancelled'] == 1
+
+
+def test_request_after_a_cancel_starts_a_new_session():
+    async def run():
+        group, upstream = FlightGroup(), Upstream(chunks=20, gap=0.001)
+        stream = group.stream('k', upstream)
+        await stream.__anext__()
+        await stream.aclose()
+        # Same tick: the cancelled flight may still be registered while it unwinds
+        again = await read_all(group.stream('k', upstream))
+        return group, upstream, again
+
+    group, upstream, again = asyncio.run(run())
+    assert upstream.sessions == 2
+    assert len(again) == 20
+    assert group.counters['coalesced'] == 0
+
+
+def test_slow_reader_pauses_upstream_reads():
+    async def run():
+        group, upstream = FlightGroup(max_ahead_bytes=30), Upstream(chunks=20, size=10)
+        stream = group.stream('k', upstream)
+        received, ahead = [], []
+        async for chunk in stream:
+            received.append(chunk)
+            await asyncio.sleep(0.001)
+            # How far upstream got past this reader
+            ahead.append(upstream.produced * 10 - len(received) * 10)
+        return group, received, max(ahead)
+
+    group, received, ahead = asyncio.run(run())
+    assert len(received) == 20
+    # One chunk past the limit at most: the check runs after each upstream chunk
+    assert ahead <= 30 + 10
+    assert group.counters['backpressure_pauses'] >= 1
+
+
+def test_buffered_waiter_is_never_held_back():
+    async def run():
+        group, upstream = FlightGroup(max_ahead_bytes=10), Upstream(chunks=20, size=10)
+        slow = group.stream('k', upstream)
+        await slow.__anext__()
+        # The waiter needs the whole utterance, so reads go on although the streaming reader stalls
+        audio = await asyncio.wait_for(group.collect('k', upstream), timeout=1)
+        rest = await read_all(slow)
+        return upstream, audio, rest
+
+    upstream, audio, rest = asyncio.run(run())
+    assert upstream.sessions == 1
+    assert len(audio) == 200 and len(rest) == 19
+
+
+def test_one_stalled_reader_does_not_hold_back_a_faster_one():
+    async def run():
+        group, upstream = FlightGroup(max_ahead_bytes=10), Upstream(chunks=20, size=10)
+        stalled = group.stream('k', upstream)
+        await stalled.__anext__()
+        # Pauses only while every streaming reader is behind; the fast one keeps reads going
+        chunks = await asyncio.wait_for(read_all(group.stream('k', upstream)), timeout=1)
+        rest = await read_all(stalled)
+        return chunks, rest
+
+    chunks, rest = asyncio.run(run())
+    assert len(chunks) == 20 and len(rest) == 19
+
+
+def test_pause_lifts_when_the_stalled_reader_catches_up():
+    async def run():
+        group, upstream = FlightGroup(max_ahead_bytes=20), Upstream(chunks=20, size=10)
+        stalled = group.stream('k', upstream)
+        await stalled.__anext__()
+        await asyncio.sleep(0.01)
+        held_at = upstream.produced
+        rest = await asyncio.wait_for(read_all(stalled), timeout=1)
+        return group, held_at, rest
+
+    group, held_at, rest = asyncio.run(run())
+    assert held_at <= 4
+    assert len(rest) == 19
+    assert group.counters['backpressure_pauses'] >= 1
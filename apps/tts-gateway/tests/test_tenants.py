@@ -0,0 +1,111 @@
+"""LocalBuckets token buckets and TenantRegistry quota charging"""
+
+import asyncio
+import json
+import math
+
+import pytest
+
+from edge_gateway import tenants
+from edge_gateway.tenants import LocalBuckets, QuotaExceeded, Tenant, TenantRegistry, key_digest
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(tenants.time, 'monotonic', clock)
+    return clock
+
+
+def take(buckets: LocalBuckets, *wanted):
+    return asyncio.run(buckets.take(list(wanted)))
+
+
+def test_bucket_starts_full_and_refuses_past_capacity(clock):
+    buckets = LocalBuckets()
+    # Capacity 3, one token a second
+    for _ in range(3):
+        assert take(buckets, ('t:rpm', 3, 1.0, 1)) == [0.0]
+    assert take(buckets, ('t:rpm', 3, 1.0, 1)) == [pytest.approx(1.0)]
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity(clock):
+    buckets = LocalBuckets()
+    take(buckets, ('t:rpm', 4, 2.0, 4))
+    clock.now += 0.5
+    assert take(buckets, ('t:rpm', 4, 2.0, 2)) == [pytest.approx(0.5)]
+    clock.now += 0.5
+    assert take(buckets, ('t:rpm', 4, 2.0, 2)) == [0.0]
+    clock.now += 3600
+    assert take(buckets, ('t:rpm', 4, 2.0, 4)) == [0.0]
+    assert take(buckets, ('t:rpm', 4, 2.0, 1)) == [pytest.approx(0.5)]
+
+
+def test_take_is_all_or_nothing(clock):
+    buckets = LocalBuckets()
+    requests, characters = ('t:rpm', 10, 1.0, 1), ('t:cpm', 100, 1.0, 80)
+    assert take(buckets, requests, characters) == [0.0, 0.0]
+    waits = take(buckets, requests, characters)
+    assert waits[0] == 0.0 and waits[1] == pytest.approx(60.0)
+    # The refused take left the request bucket alone: nine requests still fit
+    for _ in range(9):
+        assert take(buckets, requests) == [0.0]
+    assert take(buckets, requests)[0] > 0
+
+
+def test_cost_above_capacity_can_never_fit(clock):
+    assert take(LocalBuckets(), ('t:cpm', 100, 1.0, 101)) == [math.inf]
+
+
+def test_scale_splits_limits_between_workers(clock):
+    buckets = LocalBuckets(scale=0.25)
+    assert take(buckets, ('t:rpm', 8, 1.0, 2)) == [0.0]
+    assert take(buckets, ('t:rpm', 8, 1.0, 1)) == [pytest.approx(4.0)]
+
+
+def test_registry_charges_tenant_buckets(tmp_path, clock):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps({'tenants': [
+        {'tenant_id': 'acme', 'api_key': 'acme-key', 'weight': 2,
+         'rate_limit': {'requests_per_minute': 2, 'characters_per_minute': 100}},
+        {'tenant_id': 'trial', 'api_key_sha256': key_digest('trial-key'), 'rate_limit': {}},
+        {'tenant_id': 'gone', 'api_key': 'gone-key', 'active': False},
+    ]}))
+    registry = TenantRegistry(str(path))
+
+    acme = registry.resolve('acme-key')
+    assert acme == Tenant('acme', 2.0, {'requests_per_minute': 2, 'characters_per_minute': 100})
+    assert registry.resolve('trial-key').id == 'trial'
+    assert registry.resolve('gone-key') is None
+    assert registry.resolve(None) is None
+
+    asyncio.run(registry.charge(acme, characters=60))
+    with pytest.raises(QuotaExceeded) as exceeded:
+        asyncio.run(registry.charge(acme, characters=60))
+    assert exceeded.value.limit == 'characters_per_minute'
+    assert exceeded.value.retry_after == 12
+    with pytest.raises(QuotaExceeded) as too_big:
+        asyncio.run(registry.charge(acme, characters=500))
+    assert too_big.value.retry_after is None
+
+    asyncio.run(registry.charge(acme, characters=10))
+    with pytest.raises(QuotaExceeded) as exceeded:
+        asyncio.run(registry.charge(acme, characters=10))
+    assert exceeded.value.limit == 'requests_per_minute'
+    assert registry.counters['acme'] == {'allowed': 2, 'throttled': 3, 'characters': 70}
+
+
+def test_tenancy_off_charges_nothing():
+    registry = TenantRegistry()
+    tenant = registry.resolve(None)
+    for _ in range(100):
+        asyncio.run(registry.charge(tenant, characters=10_000))
+    assert registry.counters['default']['throttled'] == 0
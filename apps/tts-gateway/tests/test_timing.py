@@ -0,0 +1,127 @@
+"""Word timings: Edge boundaries, rebasing, cache round trip and the framed audio+event stream"""
+
+import asyncio
+import json
+from typing import List, Tuple
+
+from edge_gateway.timing import (
+    FRAME_AUDIO,
+    FRAME_EVENT,
+    FRAME_HEADER,
+    FRAMED_MEDIA_TYPE,
+    MP3_BYTES_PER_MS,
+    WordEvent,
+    audio_only,
+    encode_frame,
+    expected_audio_bytes,
+    framed,
+    rebase_word,
+    word_from_edge,
+    words_from_cache,
+)
+
+
+def parse_frames(data: bytes) -> List[Tuple[int, bytes]]:
+    frames, pos = [], 0
+    while pos < len(data):
+        kind, length = FRAME_HEADER.unpack_from(data, pos)
+        pos += FRAME_HEADER.size
+        frames.append((kind, data[pos:pos + length]))
+        pos += length
+    assert pos == len(data)
+    return frames
+
+
+async def items(*values):
+    for value in values:
+        yield value
+
+
+def test_edge_boundary_ticks_become_milliseconds():
+    word = word_from_edge({'type': 'WordBoundary', 'offset': 12_345_678, 'duration': 2_500_000, 'text': 'Hello'})
+    assert word == WordEvent(1234.6, 250.0, 'Hello')
+    assert word.as_event() == {'type': 'word', 'offset_ms': 1234.6, 'duration_ms': 250.0, 'text': 'Hello'}
+
+
+def test_rebase_moves_words_by_the_audio_before_them():
+    word = WordEvent(100.0, 50.0, 'two')
+    assert rebase_word(word, 0) is word
+    assert rebase_word(word, int(MP3_BYTES_PER_MS * 1500)) == WordEvent(1600.0, 50.0, 'two')
+    # Audio passes through untouched
+    assert rebase_word(b'mp3', 6000) == b'mp3'
+
+
+def test_words_survive_the_cache_as_plain_lists():
+    words = [WordEvent(0.0, 200.0, 'Hi'), WordEvent(200.0, 300.0, 'there')]
+    stored = json.loads(json.dumps(words))
+    assert words_from_cache(stored) == words
+    assert words_from_cache(None) is None
+
+
+def test_expected_size_grows_with_the_text():
+    assert expected_audio_bytes('') == 0
+    # 15 characters is about one second of 48 kbit/s audio
+    assert expected_audio_bytes('x' * 15) == 6000
+
+
+def test_frames_carry_audio_and_json_events():
+    word = WordEvent(10.0, 20.0, 'naira')
+    frames = parse_frames(encode_frame(b'\x00\x01') + encode_frame(word) + encode_frame(b''))
+    assert frames[0] == (FRAME_AUDIO, b'\x00\x01')
+    assert frames[1][0] == FRAME_EVENT and json.loads(frames[1][1]) == word.as_event()
+    assert frames[2] == (FRAME_AUDIO, b'')
+
+
+def test_stream_filters():
+    word = WordEvent(0.0, 1.0, 'a')
+
+    async def run():
+        audio = [data async for data in audio_only(items(b'ab', word, b'cd'))]
+        frames = b''.join([data async for data in framed(items(b'ab', word))])
+        return audio, frames
+
+    audio, frames = asyncio.run(run())
+    assert audio == [b'ab', b'cd']
+    assert [kind for kind, _ in parse_frames(frames)] == [FRAME_AUDIO, FRAME_EVENT]
+
+
+def stream(client, text: str, **options):
+    return client.post('/v1/synthesize/stream', headers={'X-API-Key': 'acme-key'},
+                       json={'text': text, 'voice': 'en-NG-EzinneNeural', **options})
+
+
+def test_framed_stream_has_every_word_in_order(gateway):
+    _, client = gateway
+    text = 'Your order ships today'
+    for attempt in ('miss', 'hit'):
+        response = stream(client, text, stream_format='framed', pipeline=False)
+        assert response.status_code == 200
+        assert response.headers['content-type'] == FRAMED_MEDIA_TYPE
+        assert response.headers['x-cache'] == attempt.upper()
+        frames = parse_frames(response.content)
+        events = [json.loads(payload) for kind, payload in frames if kind == FRAME_EVENT]
+        assert [event['text'] for event in events] == text.split()
+        offsets = [event['offset_ms'] for event in events]
+        assert offsets == sorted(offsets)
+        assert any(kind == FRAME_AUDIO and payload for kind, payload in frames)
+
+
+def test_pipelined_framed_stream_rebases_later_segments(gateway):
+    _, client = gateway
+    text = 'First part here. Second part there.'
+    response = stream(client, text, stream_format='framed', pipeline=True)
+    assert response.status_code == 200
+    events = [json.loads(payload) for kind, payload in parse_frames(response.content) if kind == FRAME_EVENT]
+    assert [event['text'] for event in events] == text.split()
+    offsets = [event['offset_ms'] for event in events]
+    # The second segment's words come after the first segment's audio, not from zero
+    assert offsets == sorted(offsets) and offsets[3] > offsets[2] > 0
+
+
+def test_plain_stream_has_no_words_and_bad_format_is_rejected(gateway):
+    _, client = gateway
+    response = stream(client, 'Only audio please', pipeline=False)
+    assert response.status_code == 200
+    assert response.headers['content-type'] != FRAMED_MEDIA_TYPE
+    assert response.content.startswith(b'\xff')
+    assert stream(client, 'Hello', stream_format='srt').status_code == 400
@@ -0,0 +1,181 @@
+"""Telephony transcoding: mu-law table, streaming resampler and the ffmpeg pipe"""
+
+import asyncio
+import stat
+from typing import AsyncIterator
+
+import numpy as np
+import pytest
+
+from edge_gateway.transcode import (
+    OUTPUT_FORMATS,
+    SOURCE_RATE,
+    StreamingResampler,
+    StreamTranscoder,
+    encode_mulaw,
+    encode_pcm16,
+    needs_transcoding,
+    resolve_format,
+)
+
+
+def fake_ffmpeg(tmp_path, script: str) -> str:
+    """A shell script standing in for ffmpeg; `cat` passes the 'MP3' through as if it were decoded PCM"""
+    path = tmp_path / 'ffmpeg'
+    path.write_text('#!/bin/sh\n' + script + '\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def tone(frequency: float, seconds: float, rate: int = SOURCE_RATE, amplitude: float = 8000) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return np.rint(amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def peak_frequency(samples: np.ndarray, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.fft.rfftfreq(len(samples), 1 / rate)[np.argmax(spectrum)]
+
+
+def test_resolve_format(monkeypatch, tmp_path):
+    assert resolve_format(None) == 'mp3'
+    assert resolve_format('MP3') == 'mp3'
+    assert not needs_transcoding('wav')
+    with pytest.raises(ValueError, match='Unsupported format'):
+        resolve_format('ogg')
+
+    monkeypatch.setenv('TTS_FFMPEG_PATH', '')
+    monkeypatch.setenv('PATH', str(tmp_path))
+    with pytest.raises(ValueError, match='needs ffmpeg'):
+        resolve_format('mulaw_8000')
+    monkeypatch.setenv('TTS_FFMPEG_PATH', fake_ffmpeg(tmp_path, 'exec cat'))
+    assert resolve_format('mulaw_8000') == 'mulaw_8000'
+    assert needs_transcoding('pcm_16000')
+
+
+def test_mulaw_matches_g711_reference_values():
+    samples = np.array([0, -1, 32767, -32768, 1000, -1000], dtype=np.int16)
+    assert encode_mulaw(samples) == bytes([0xFF, 0x7E, 0x80, 0x00, 0xCE, 0x4E])
+
+
+def test_mulaw_table_matches_audioop_everywhere():
+    audioop = pytest.importorskip('audioop')
+    samples = np.arange(-32768, 32768, dtype=np.int16)
+    assert encode_mulaw(samples) == audioop.lin2ulaw(samples.tobytes(), 2)
+
+
+def test_pcm16_is_little_endian():
+    assert encode_pcm16(np.array([1, -2], dtype=np.int16)) == b'\x01\x00\xfe\xff'
+
+
+def test_resampler_keeps_the_tone_and_level():
+    source = tone(440, 0.5)
+    for rate in (8000, 16000):
+        resampler = StreamingResampler(SOURCE_RATE, rate)
+        out = np.concatenate([resampler.process(source), resampler.flush()])
+        assert abs(len(out) - len(source) * rate / SOURCE_RATE) < 100
+        # Skip the filter's start-up and compare the steady part
+        steady = out[200:len(source) * rate // SOURCE_RATE]
+        assert abs(peak_frequency(steady, rate) - 440) < 5
+        assert 7000 < np.max(np.abs(steady)) < 9000
+
+
+def test_resampler_filters_above_the_new_nyquist():
+    resampler = StreamingResampler(SOURCE_RATE, 8000)
+    out = resampler.process(tone(6000, 0.5))
+    assert np.max(np.abs(out[200:])) < 100
+
+
+def test_resampler_output_does_not_depend_on_chunking():
+    source = tone(300, 0.3).astype(np.float64)
+    whole = StreamingResampler(SOURCE_RATE, 8000).process(source)
+
+    chunked = StreamingResampler(SOURCE_RATE, 8000)
+    pieces, start = [], 0
+    for size in (1, 2, 3, 7, 100, 999, 1, 4097):
+        pieces.append(chunked.process(source[start:start + size]))
+        start += size
+    pieces.append(chunked.process(source[start:]))
+    assert np.allclose(np.concatenate(pieces), whole)
+
+
+def test_same_rate_passes_through():
+    resampler = StreamingResampler(SOURCE_RATE, SOURCE_RATE)
+    samples = np.array([1, 2, 3], dtype=np.int16)
+    assert resampler.passthrough
+    assert resampler.process(samples).tolist() == [1.0, 2.0, 3.0]
+    assert len(resampler.flush()) == 0
+
+
+async def odd_chunks(data: bytes) -> AsyncIterator[bytes]:
+    # Odd sizes split 16-bit samples across chunks
+    start = 0
+    for size in (1, 3, 333, 1001):
+        yield data[start:start + size]
+        start += size
+    yield data[start:]
+
+
+def transcode(format_name: str, data: bytes):
+    transcoder = StreamTranscoder(format_name, read_size=257)
+
+    async def run():
+        return [chunk async for chunk in transcoder.transcode(odd_chunks(data))]
+
+    return transcoder, asyncio.run(run())
+
+
+def test_transcoder_streams_through_the_decoder(monkeypatch, tmp_path):
+    monkeypatch.setenv('TTS_FFMPEG_PATH', fake_ffmpeg(tmp_path, 'exec cat'))
+    source = tone(440, 0.25)
+    transcoder, chunks = transcode('pcm_8000', source.tobytes())
+
+    assert len(chunks) > 1
+    out = np.frombuffer(b''.join(chunks), dtype='<i2')
+    assert abs(len(out) - len(source) // 3) < 100
+    assert abs(peak_frequency(out[200:2000].astype(np.float64), 8000) - 440) < 5
+    stats = transcoder.stats
+    assert stats['mp3_bytes_in'] == len(source) * 2
+    assert stats['samples_decoded'] == len(source)
+    assert stats['bytes_out'] == len(out) * 2
+    assert stats['first_output_ms'] is not None
+
+
+def test_mulaw_output_is_one_byte_per_sample(monkeypatch, tmp_path):
+    monkeypatch.setenv('TTS_FFMPEG_PATH', fake_ffmpeg(tmp_path, 'exec cat'))
+    assert OUTPUT_FORMATS['mulaw_8000']['media_type'] == 'audio/basic'
+    _, mulaw = transcode('mulaw_8000', tone(440, 0.25).tobytes())
+    _, pcm = transcode('pcm_8000', tone(440, 0.25).tobytes())
+    assert len(b''.join(mulaw)) * 2 == len(b''.join(pcm))
+
+
+def test_decoder_failure_is_raised(monkeypatch, tmp_path):
+    monkeypatch.setenv('TTS_FFMPEG_PATH', fake_ffmpeg(tmp_path, 'cat >/dev/null; exit 3'))
+    with pytest.raises(RuntimeError, match='status 3'):
+        transcode('pcm_8000', tone(440, 0.1).tobytes())
+
+
+def test_upstream_failure_is_raised(monkeypatch, tmp_path):
+    monkeypatch.setenv('TTS_FFMPEG_PATH', fake_ffmpeg(tmp_path, 'exec cat'))
+    transcoder = StreamTranscoder('pcm_8000')
+
+    async def failing():
+        yield tone(440, 0.1).tobytes()
+        raise ConnectionError('upstream dropped')
+
+    async def run():
+        return [chunk async for chunk in transcoder.transcode(failing())]
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+
+
+def test_without_ffmpeg_transcoding_is_refused(monkeypatch, tmp_path):
+    monkeypatch.setenv('TTS_FFMPEG_PATH', '')
+    monkeypatch.setenv('PATH', str(tmp_path))
+
+    async def run():
+        return [chunk async for chunk in StreamTranscoder('pcm_8000').transcode(odd_chunks(b''))]
+
+    with pytest.raises(RuntimeError, match='ffmpeg is required'):
+        asyncio.run(run())
@@ -0,0 +1,80 @@
+"""verbalize.speakable: phones, naira, dates and times read one way; ordinary text is left alone"""
+
+import pytest
+
+from edge_gateway.verbalize import speakable
+
+SPOKEN = "zero eight zero three, one two three, four five six seven"
+
+
+@pytest.mark.parametrize('phone', ['+2348031234567', '2348031234567', '08031234567', '0803 123 4567',
+                                   '+234 803-123-4567', '+234 (0) 803 123 4567', '234(0)8031234567'])
+def test_prefixed_numbers_are_phones(phone):
+    assert speakable(f"Please call us back on {phone}.") == f"Please call us back on {SPOKEN}."
+    assert speakable(f"Saved {phone} for you") == f"Saved {SPOKEN} for you"
+
+
+def test_bare_ten_digits_need_a_cue_word():
+    assert speakable("Please call us back on 8031234567.") == f"Please call us back on {SPOKEN}."
+    assert speakable("WhatsApp: 803-123-4567") == f"WhatsApp: {SPOKEN}"
+
+
+@pytest.mark.parametrize('text', ['Ref 9012345678 is ready', 'Your order number 9012345678 shipped',
+                                  'Tracking ID 8031234567.'])
+def test_bare_ten_digits_without_a_cue_are_not_phones(text):
+    assert speakable(text) == text
+
+
+@pytest.mark.parametrize('text, spoken', [
+    ('It costs ₦5,000.', 'It costs five thousand naira.'),
+    ('It costs N5000.', 'It costs five thousand naira.'),
+    ('NGN 5,000.50 due', 'five thousand naira fifty kobo due'),
+    ('NGN5000 naira', 'five thousand naira'),
+    ('₦5,000 naira only', 'five thousand naira only'),
+    ('5000 naira', 'five thousand naira'),
+    ('₦2.5m', 'two million five hundred thousand naira'),
+    ('N10k a month', 'ten thousand naira a month'),
+])
+def test_naira_amounts(text, spoken):
+    assert speakable(text) == spoken
+
+
+@pytest.mark.parametrize('text, spoken', [
+    ('Due 12/03/2025.', 'Due the twelfth of March, twenty twenty-five.'),
+    ('Due 1/3/25', 'Due the first of March, twenty twenty-five'),
+    ('Due 2025-03-12', 'Due the twelfth of March, twenty twenty-five'),
+    ('Due 12th March 2025', 'Due the twelfth of March, twenty twenty-five'),
+    ('Due March 2, 2025', 'Due the second of March, twenty twenty-five'),
+])
+def test_dates(text, spoken):
+    assert speakable(text) == spoken
+
+
+@pytest.mark.parametrize('text', ['Update to version 2.10.12 now', 'Pages 3-4-2025', 'Build 1.2025-03-12',
+                                  'See /1/2/2025/report', '45/13/2025'])
+def test_version_numbers_ranges_and_paths_are_not_dates(text):
+    assert speakable(text) == text
+
+
+@pytest.mark.parametrize('text, spoken', [
+    ('Open 9am to 5pm', 'Open nine AM to five PM'),
+    ('Open 9 a.m. to 5 p.m. daily', 'Open nine AM to five PM daily'),
+    ('Closes at 5 p.m.', 'Closes at five PM.'),
+    ('Call at 3:30 pm', 'Call at three thirty PM'),
+    ('Call at 3.05pm', 'Call at three oh five PM'),
+    ('Meet at 15:30', 'Meet at three thirty PM'),
+    ('Meet at 9:30', 'Meet at nine thirty'),
+    ('Meet at 00:15', 'Meet at twelve fifteen AM'),
+])
+def test_times(text, spoken):
+    assert speakable(text) == spoken
+
+
+@pytest.mark.parametrize('text', ['I am 5 am I?', 'We are 2 pm staff', 'Room 13pm'])
+def test_am_and_pm_as_words_are_not_times(text):
+    assert speakable(text) == text
+
+
+def test_underscores_inside_words_stay():
+    assert speakable("Email john_doe@example.com") == "Email john_doe@example.com"
+    assert speakable("This is _really_ important") == "This is really important"
@@ -0,0 +1,158 @@
+"""VoiceCatalog: resolution by ID, alias, name and locale, snapshots, TTL refresh and fail-fast voices"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from edge_gateway.voices import VoiceCatalog, UnknownVoice
+
+UPSTREAM = [
+    {'ShortName': 'en-NG-EzinneNeural', 'Name': 'Microsoft Server Speech Text to Speech Voice (en-NG, EzinneNeural)',
+     'Locale': 'en-NG', 'Gender': 'Female'},
+    {'ShortName': 'en-NG-AbeoNeural', 'Locale': 'en-NG', 'Gender': 'Male'},
+    {'ShortName': 'en-US-AriaNeural', 'Locale': 'en-US', 'Gender': 'Female'},
+    {'ShortName': 'yo-NG-AdeolaNeural', 'Locale': 'yo-NG', 'Gender': 'Female'},
+]
+
+
+class Lister:
+    """Upstream voice list; raises while `fail` is set"""
+
+    def __init__(self, entries=UPSTREAM):
+        self.entries = entries
+        self.fail = False
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('list failed')
+        return self.entries
+
+
+def refreshed(lister=None, **kwargs) -> VoiceCatalog:
+    catalog = VoiceCatalog(lister or Lister(), **kwargs)
+    assert asyncio.run(catalog.refresh())
+    return catalog
+
+
+def test_builtin_catalog_lets_well_formed_names_through():
+    catalog = VoiceCatalog(Lister())
+    assert not catalog.authoritative
+    assert catalog.resolve(None) == 'en-US-AriaNeural'
+    assert catalog.resolve('alloy') == 'en-US-AriaNeural'
+    # Not in the built-in list, but shaped like a voice: the engine decides
+    assert catalog.resolve('fr-FR-DeniseNeural') == 'fr-FR-DeniseNeural'
+    with pytest.raises(UnknownVoice):
+        catalog.resolve('robot')
+    assert catalog.counters['rejected'] == 1
+
+
+def test_resolution_by_id_name_alias_and_locale():
+    catalog = refreshed()
+    assert catalog.source == 'upstream' and catalog.authoritative
+    assert catalog.resolve('en-ng-ezinneneural') == 'en-NG-EzinneNeural'
+    assert catalog.resolve(UPSTREAM[0]['Name']) == 'en-NG-EzinneNeural'
+    assert catalog.resolve('  alloy ') == 'en-US-AriaNeural'
+    # A bare locale is its first voice
+    assert catalog.resolve('en-NG') == 'en-NG-EzinneNeural'
+    assert catalog.resolve('') == 'en-US-AriaNeural'
+
+
+def test_authoritative_catalog_rejects_unknown_voices():
+    catalog = refreshed()
+    for name in ('fr-FR-DeniseNeural', 'echo', 'robot'):
+        with pytest.raises(UnknownVoice, match='Unknown voice'):
+            catalog.resolve(name)
+    assert catalog.counters['rejected'] == 3
+
+
+def test_listing_filters_by_locale_and_gender():
+    catalog = refreshed()
+    assert [v['id'] for v in catalog.list_voices(locale='en-NG')] == ['en-NG-EzinneNeural', 'en-NG-AbeoNeural']
+    assert [v['id'] for v in catalog.list_voices(gender='male')] == ['en-NG-AbeoNeural']
+    aria = catalog.list_voices(locale='en-US')[0]
+    assert aria == {'id': 'en-US-AriaNeural', 'name': 'Aria', 'language': 'en', 'locale': 'en-US',
+                    'gender': 'female', 'edge_voice': 'en-US-AriaNeural', 'aliases': ['alloy']}
+    assert catalog.stats()['locales'] == 3
+
+
+def test_failed_or_empty_refresh_keeps_the_catalog():
+    lister = Lister()
+    catalog = refreshed(lister)
+    lister.fail = True
+    assert not asyncio.run(catalog.refresh())
+    lister.fail, lister.entries = False, []
+    assert not asyncio.run(catalog.refresh())
+    assert catalog.counters['refresh_failures'] == 2
+    assert catalog.resolve('en-NG-AbeoNeural') == 'en-NG-AbeoNeural'
+
+
+def test_snapshot_is_written_and_loaded_at_startup(tmp_path):
+    path = tmp_path / 'cache' / 'voices.json'
+    first = refreshed(snapshot_path=str(path))
+    snapshot = json.loads(path.read_text())
+    assert snapshot['voices'] == UPSTREAM and snapshot['fetched_at'] == first.fetched_at
+
+    # The next start resolves against the snapshot without touching upstream
+    lister = Lister()
+    second = VoiceCatalog(lister, snapshot_path=str(path))
+    assert second.source == 'snapshot' and lister.calls == 0
+    assert second.resolve('yo-NG') == 'yo-NG-AdeolaNeural'
+    with pytest.raises(UnknownVoice):
+        second.resolve('fr-FR-DeniseNeural')
+
+
+def test_unusable_snapshot_falls_back_to_builtin(tmp_path):
+    path = tmp_path / 'voices.json'
+    path.write_text('{not json')
+    catalog = VoiceCatalog(Lister(), snapshot_path=str(path))
+    assert catalog.source == 'builtin'
+    assert catalog.resolve('en-NG-EzinneNeural') == 'en-NG-EzinneNeural'
+
+
+def test_refresh_waits_for_the_ttl(tmp_path):
+    path = tmp_path / 'voices.json'
+    path.write_text(json.dumps({'fetched_at': time.time(), 'voices': UPSTREAM}))
+    lister = Lister()
+    fresh = VoiceCatalog(lister, snapshot_path=str(path), ttl_seconds=3600)
+    assert 3590 < fresh._seconds_until_stale() <= 3600
+
+    path.write_text(json.dumps({'fetched_at': time.time() - 7200, 'voices': UPSTREAM}))
+    stale = VoiceCatalog(lister, snapshot_path=str(path), ttl_seconds=3600)
+    assert stale._seconds_until_stale() == 0
+
+    async def run():
+        task = asyncio.ensure_future(stale.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    # Stale at startup: refreshed once, then asleep until the new TTL is up
+    assert lister.calls == 1 and stale.source == 'upstream'
+
+
+def test_zero_ttl_loads_once_and_stops():
+    lister = Lister()
+    catalog = VoiceCatalog(lister, ttl_seconds=0)
+    asyncio.run(asyncio.wait_for(catalog.run(), timeout=5))
+    assert lister.calls == 1 and catalog.source == 'upstream'
+
+
+def test_unknown_voice_is_a_400_before_any_upstream_call(gateway):
+    server, client = gateway
+    response = client.post('/v1/synthesize/stream', headers={'X-API-Key': 'acme-key'},
+                           json={'text': 'Hello', 'voice': 'robot'})
+    assert response.status_code == 400
+    assert 'Unknown voice' in response.json()['detail']
+    assert server.flights.stats()['upstream_started'] == 0
+
+    listing = client.get('/v1/voices', params={'locale': 'en-NG'}).json()
+    assert {voice['id'] for voice in listing['voices']} == {'en-NG-EzinneNeural', 'en-NG-AbeoNeural'}
+    assert listing['source'] == 'builtin'
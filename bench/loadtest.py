@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+"""
+LOAD TEST - latency, time to first byte, throughput and cost per request
+Starts the TTS gateway (on the edge-tts stand-in, so every run sees the same
+upstream timing and no network) and the API as subprocesses, drives each
+scenario at increasing concurrency and writes a JSON report. --baseline
+compares against an earlier report and exits 1 on a regression.
+
+    python bench/loadtest.py
+    python bench/loadtest.py --scenarios stream,login --concurrency 1,8,32 --duration 20
+    python bench/loadtest.py --scenarios chat_under_login --background-concurrency 32
+    python bench/loadtest.py --save bench/reports/baseline.json
+    python bench/loadtest.py --baseline bench/reports/baseline.json --tolerance 0.15
+    python bench/loadtest.py --gateway-url http://10.0.0.5:3001 --scenarios synthesize
+
+Scenarios:
+  synthesize         /v1/synthesize, a new text every request (upstream path)
+  synthesize_cached  /v1/synthesize over a small warmed set of texts (cache path)
+  stream             /v1/synthesize/stream, a new text every request
+  login              /api/auth/login for users registered during setup
+  chat               /api/chat/message
+  chat_under_login   /api/chat/message while --background-concurrency clients
+                     flood /api/auth/login; reports both (password hashing
+                     must not stall other endpoints)
+  chat_stream        /api/chat/message with stream=true and history, proxied
+                     to the LLM stand-in (bench/standin/openai_llm.py); TTFB
+                     is time to the first token
+
+The load generator shares the machine with the servers; compare reports
+from the same host and settings. CPU and RSS are only measured for servers
+this script started (psutil if installed, /proc otherwise).
+"""
+
+import os
+import sys
+import json
+import time
+import itertools
+import signal
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+BENCH = os.path.join(ROOT, 'bench')
+GATEWAY_SCRIPT = os.path.join(ROOT, 'apps', 'tts-gateway', 'edge-tts-server.py')
+API_SCRIPT = os.path.join(ROOT, 'apps', 'api', 'server.py')
+
+# The gateway script has no port setting of its own; load it and call run()
+GATEWAY_BOOTSTRAP = """
+import sys, importlib.util
+path, port, workers = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+sys.path.insert(0, __import__('os').path.dirname(path))
+spec = importlib.util.spec_from_file_location('edge_tts_server', path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+if workers > 1:
+    module.EdgeTTSServer.run_workers(workers, '127.0.0.1', port)
+else:
+    module.EdgeTTSServer().run('127.0.0.1', port)
+"""
+
+TEXTS = [
+    "Hello, thanks for calling. How can I help you today?",
+    "Your appointment is confirmed for Tuesday at 10:30am. We will text you a reminder.",
+    "Sorry we missed your call. Reply to this message or call back on 0803 123 4567.",
+    "Our team is with other customers right now. Please leave your name and the best "
+    "number to reach you, and we will call you back within the hour.",
+    "Your payment of ₦25,000 was received on 12/03/2025. Thank you for your business!",
+]
+
+CHAT_MESSAGES = [
+    "Hello there",
+    "How much does it cost?",
+    "Can I get a demo?",
+    "What happens when I miss a call?",
+    "Do you work with restaurants in Lagos?",
+]
+
+BENCH_PASSWORD = 'bench-password-123'
+# Keeps texts and bench users of one run apart from those of earlier runs
+RUN_ID = f'{int(time.time())}{os.getpid()}'
+# Request numbers run on across scenarios and levels, so no level replays another's texts
+_SEQUENCE = itertools.count()
+
+
+# --- servers ----------------------------------------------------------------
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _proc_usage(pid: int) -> Tuple[float, int]:
+    """(CPU seconds, RSS bytes) of a process and its children from /proc"""
+    cpu, rss = 0.0, 0
+    ticks = os.sysconf('SC_CLK_TCK')
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss += int(line.split()[1]) * 1024
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pending += [int(child) for child in f.read().split()]
+        except (OSError, IndexError, ValueError):
+            continue
+    return cpu, rss
+
+
+class Server:
+    """A server subprocess, or just a URL when it is already running elsewhere"""
+
+    def __init__(self, name: str, url: str, ready_path: str, process: Optional[subprocess.Popen] = None,
+                 log_path: Optional[str] = None):
+        self.name = name
+        self.url = url
+        self.ready_path = ready_path
+        self.process = process
+        self.log_path = log_path
+
+    def usage(self) -> Optional[Tuple[float, int]]:
+        if self.process is None:
+            return None
+        if not PSUTIL_AVAILABLE:
+            return _proc_usage(self.process.pid)
+        try:
+            root = psutil.Process(self.process.pid)
+            cpu, rss = 0.0, 0
+            for proc in [root] + root.children(recursive=True):
+                times = proc.cpu_times()
+                cpu += times.user + times.system
+                rss += proc.memory_info().rss
+            return cpu, rss
+        except psutil.Error:
+            return None
+
+    async def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            while time.monotonic() < deadline:
+                if self.process is not None and self.process.poll() is not None:
+                    raise RuntimeError(f"{self.name} exited during startup; see {self.log_path}")
+                try:
+                    if (await client.get(self.url + self.ready_path)).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"{self.name} not ready after {timeout:.0f}s; see {self.log_path}")
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def start_gateway(args, workdir: str) -> Server:
+    if args.gateway_url:
+        return Server('gateway', args.gateway_url.rstrip('/'), '/readyz')
+    port = _free_port()
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join(filter(None, [os.path.join(BENCH, 'standin'), os.getenv('PYTHONPATH')])),
+        'TTS_ENGINE': 'edge',
+        'TTS_FALLBACK_ENGINE': '',
+        'TTS_CACHE_DIR': os.path.join(workdir, 'tts-cache'),
+        'TTS_PRERENDER_MANIFESTS': '',
+        'TTS_PROBE_INTERVAL_SECONDS': '0',
+        'TTS_WORKERS': str(args.gateway_workers),
+        'FAKE_EDGE_TTS_PROFILE': os.path.abspath(args.profile),
+        'FAKE_EDGE_TTS_SPEED': str(args.speed),
+    }
+    log_path = os.path.join(workdir, 'gateway.log')
+    process = subprocess.Popen(
+        [sys.executable, '-c', GATEWAY_BOOTSTRAP, GATEWAY_SCRIPT, str(port), str(args.gateway_workers)],
+        env=env, stdout=open(log_path, 'w'), stderr=subprocess.STDOUT, cwd=os.path.dirname(GATEWAY_SCRIPT),
+    )
+    return Server('gateway', f'http://127.0.0.1:{port}', '/readyz', process, log_path)
+
+
+def start_llm(args, workdir: str) -> Server:
+    port = _free_port()
+    env = {
+        **os.environ,
+        'FAKE_LLM_FIRST_TOKEN_MS': str(args.llm_first_token_ms),
+        'FAKE_LLM_TOKEN_MS': str(args.llm_token_ms),
+    }
+    log_path = os.path.join(workdir, 'llm.log')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH, 'standin', 'openai_llm.py'), '--port', str(port)],
+        env=env, stdout=open(log_path, 'w'), stderr=subprocess.STDOUT,
+    )
+    return Server('llm', f'http://127.0.0.1:{port}', '/stats', process, log_path)
+
+
+def start_api(args, workdir: str, llm_url: Optional[str] = None) -> Server:
+    if args.api_url:
+        return Server('api', args.api_url.rstrip('/'), '/api/health')
+    port = _free_port()
+    env = {**os.environ, 'PORT': str(port), 'API_WORKERS': str(args.api_workers), 'NODE_ENV': 'development'}
+    if llm_url:
+        env.update({'LLM_API_URL': llm_url, 'LLM_API_KEY': 'bench'})
+    log_path = os.path.join(workdir, 'api.log')
+    process = subprocess.Popen(
+        [sys.executable, API_SCRIPT],
+        env=env, stdout=open(log_path, 'w'), stderr=subprocess.STDOUT, cwd=os.path.dirname(API_SCRIPT),
+    )
+    return Server('api', f'http://127.0.0.1:{port}', '/api/health', process, log_path)
+
+
+# --- scenarios --------------------------------------------------------------
+
+# One request: (ok, status, time to first body byte, total latency), seconds
+Sample = Tuple[bool, int, float, float]
+
+
+async def timed(client: httpx.AsyncClient, method: str, url: str, body: Dict[str, Any]) -> Sample:
+    started = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream(method, url, json=body) as response:
+            async for _ in response.aiter_raw():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+            latency = time.perf_counter() - started
+            return response.status_code < 400, response.status_code, ttfb if ttfb is not None else latency, latency
+    except httpx.HTTPError:
+        latency = time.perf_counter() - started
+        return False, 0, latency, latency
+
+
+class Scenario:
+    """Requests against one endpoint; request(i) builds the i-th request body
+
+    background names another scenario on the same server that runs flat out
+    for the whole level, so this one is measured under that contention.
+    """
+
+    def __init__(self, name: str, server: str, path: str, request: Callable[[int], Dict[str, Any]],
+                 setup: Optional[Callable[[httpx.AsyncClient, str], Any]] = None,
+                 background: Optional[str] = None):
+        self.name = name
+        self.server = server
+        self.path = path
+        self.request = request
+        self.setup = setup
+        self.background = background
+
+
+def _fresh_text(i: int) -> Dict[str, Any]:
+    # Unique per request and per run, so the cache never answers
+    return {'text': f"{TEXTS[i % len(TEXTS)]} Reference {RUN_ID} {i}.", 'format': 'mp3'}
+
+
+def _cached_text(i: int) -> Dict[str, Any]:
+    return {'text': TEXTS[i % len(TEXTS)], 'format': 'mp3'}
+
+
+async def _warm_cache(client: httpx.AsyncClient, url: str):
+    for i in range(len(TEXTS)):
+        await client.post(url + '/v1/synthesize', json=_cached_text(i))
+
+
+def _login(i: int) -> Dict[str, Any]:
+    return {'email': f'bench{i % 50}-{RUN_ID}@example.com', 'password': BENCH_PASSWORD}
+
+
+async def _register_users(client: httpx.AsyncClient, url: str):
+    for i in range(50):
+        response = await client.post(url + '/api/auth/register', json={
+            **_login(i), 'business_name': f'Bench {i}', 'phone': '+2348031234567', 'industry': 'general',
+        })
+        if response.status_code not in (200, 409):
+            raise RuntimeError(f"Registering bench users failed: {response.status_code} {response.text[:200]}")
+
+
+def _chat(i: int) -> Dict[str, Any]:
+    return {'message': CHAT_MESSAGES[i % len(CHAT_MESSAGES)], 'history': []}
+
+
+def _chat_stream(i: int) -> Dict[str, Any]:
+    # History makes every request a follow-up, so the response cache never answers
+    history = [{'sender': 'user', 'content': CHAT_MESSAGES[(i + 1) % len(CHAT_MESSAGES)]},
+               {'sender': 'assistant', 'content': 'CallWaiting.ai answers your missed calls.'}]
+    return {'message': CHAT_MESSAGES[i % len(CHAT_MESSAGES)], 'history': history, 'stream': True}
+
+
+SCENARIOS = {
+    'synthesize': Scenario('synthesize', 'gateway', '/v1/synthesize', _fresh_text),
+    'synthesize_cached': Scenario('synthesize_cached', 'gateway', '/v1/synthesize', _cached_text, _warm_cache),
+    'stream': Scenario('stream', 'gateway', '/v1/synthesize/stream', _fresh_text),
+    'login': Scenario('login', 'api', '/api/auth/login', _login, _register_users),
+    'chat': Scenario('chat', 'api', '/api/chat/message', _chat),
+    'chat_under_login': Scenario('chat_under_login', 'api', '/api/chat/message', _chat, _register_users,
+                                 background='login'),
+    'chat_stream': Scenario('chat_stream', 'api', '/api/chat/message', _chat_stream),
+}
+
+
+# --- measurement ------------------------------------------------------------
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank percentiles, in milliseconds"""
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'mean': None, 'max': None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, int(len(ordered) * p / 100 + 0.5) - 1))] * 1000, 2)
+
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99),
+            'mean': round(sum(ordered) / len(ordered) * 1000, 2), 'max': round(ordered[-1] * 1000, 2)}
+
+
+async def _drive(scenario: Scenario, url: str, concurrency: int, stop_at: float, samples: List[Sample]):
+    """concurrency closed-loop clients sending scenario requests until stop_at"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def worker(client: httpx.AsyncClient):
+        while time.perf_counter() < stop_at:
+            samples.append(await timed(client, 'POST', url, scenario.request(next(_SEQUENCE))))
+
+    async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+
+
+def _summary(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    ok = [s for s in samples if s[0]]
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        statuses[str(s[1])] = statuses.get(str(s[1]), 0) + 1
+    return {
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'error_rate': round((len(samples) - len(ok)) / max(len(samples), 1), 4),
+        'statuses': statuses,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(ok) / elapsed, 2),
+        'latency_ms': percentiles([s[3] for s in ok]),
+        'ttfb_ms': percentiles([s[2] for s in ok]),
+    }
+
+
+async def run_level(scenario: Scenario, server: Server, concurrency: int, duration: float,
+                    background_concurrency: int = 0) -> Dict[str, Any]:
+    samples: List[Sample] = []
+    background_samples: List[Sample] = []
+    url = server.url + scenario.path
+
+    before = server.usage()
+    rss_peak = before[1] if before else 0
+    stop_at = time.perf_counter() + duration
+
+    async def sample_rss():
+        nonlocal rss_peak
+        while True:
+            usage = server.usage()
+            if usage:
+                rss_peak = max(rss_peak, usage[1])
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.ensure_future(sample_rss())
+    started = time.perf_counter()
+    try:
+        drivers = [_drive(scenario, url, concurrency, stop_at, samples)]
+        if scenario.background:
+            flood = SCENARIOS[scenario.background]
+            drivers.append(_drive(flood, server.url + flood.path, background_concurrency, stop_at,
+                                  background_samples))
+        await asyncio.gather(*drivers)
+    finally:
+        sampler.cancel()
+    elapsed = time.perf_counter() - started
+    after = server.usage()
+
+    result = {
+        'concurrency': concurrency,
+        **_summary(samples, elapsed),
+        'cpu_ms_per_request': None,
+        'rss_peak_mb': None,
+        'rss_growth_kb_per_inflight': None,
+    }
+    if before and after and samples:
+        result['cpu_ms_per_request'] = round((after[0] - before[0]) * 1000 / len(samples), 3)
+        result['rss_peak_mb'] = round(rss_peak / 2 ** 20, 1)
+        result['rss_growth_kb_per_inflight'] = round(max(0, rss_peak - before[1]) / 1024 / concurrency, 1)
+    if scenario.background:
+        # Server CPU above covers both; the background's own numbers show how far it was saturated
+        result['background'] = {'scenario': scenario.background, 'concurrency': background_concurrency,
+                                **_summary(background_samples, elapsed)}
+    return result
+
+
+def describe(name: str, r: Dict[str, Any]) -> str:
+    lat, ttfb = r['latency_ms'], r['ttfb_ms']
+    line = (f"   {name:18s} c={r['concurrency']:<4d} {r['requests']:6d} req {r['errors']:4d} err "
+            f"{r['throughput_rps']:8.1f} rps   latency p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']} ms   "
+            f"ttfb p50 {ttfb['p50']}  p95 {ttfb['p95']} ms")
+    if r['cpu_ms_per_request'] is not None:
+        line += f"   cpu {r['cpu_ms_per_request']:.2f} ms/req   rss {r['rss_peak_mb']} MB"
+    if 'background' in r:
+        bg = r['background']
+        line += (f"\n     + {bg['scenario']} c={bg['concurrency']} {bg['requests']} req {bg['errors']} err "
+                 f"{bg['throughput_rps']:.1f} rps   latency p50 {bg['latency_ms']['p50']}  "
+                 f"p99 {bg['latency_ms']['p99']} ms   statuses {bg['statuses']}")
+    return line
+
+
+# --- baseline comparison ----------------------------------------------------
+
+# (metric path, higher is worse, absolute slack below which a change is noise)
+CHECKS = [
+    (('latency_ms', 'p50'), True, 2.0),
+    (('latency_ms', 'p95'), True, 2.0),
+    (('latency_ms', 'p99'), True, 5.0),
+    (('ttfb_ms', 'p95'), True, 2.0),
+    (('throughput_rps',), False, 1.0),
+    (('cpu_ms_per_request',), True, 0.2),
+]
+
+
+def _metric(result: Dict[str, Any], path) -> Optional[float]:
+    value = result
+    for part in path:
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of report against baseline, one line each"""
+    regressions = []
+    for name, levels in report['results'].items():
+        base_levels = baseline.get('results', {}).get(name, {})
+        for level, result in levels.items():
+            base = base_levels.get(level)
+            if base is None:
+                continue
+            for path, higher_is_worse, slack in CHECKS:
+                new, old = _metric(result, path), _metric(base, path)
+                if new is None or old is None:
+                    continue
+                delta = new - old if higher_is_worse else old - new
+                if delta > slack and delta > abs(old) * tolerance:
+                    regressions.append(f"{name} c={level} {'.'.join(path)}: {old} -> {new} "
+                                       f"({(new - old) / old * 100 if old else 0:+.1f}%)")
+            if result['error_rate'] > base['error_rate'] + 0.01:
+                regressions.append(f"{name} c={level} error_rate: {base['error_rate']} -> {result['error_rate']}")
+    return regressions
+
+
+# --- main -------------------------------------------------------------------
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,4,16,64', help='comma-separated levels')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--profile', default=os.path.join(BENCH, 'profiles', 'synthetic.json'),
+                        help='stand-in timing profile (see record_profile.py)')
+    parser.add_argument('--speed', type=float, default=1.0, help='stand-in replay speed; 0 removes upstream delays')
+    parser.add_argument('--gateway-workers', type=int, default=1)
+    parser.add_argument('--api-workers', type=int, default=1)
+    parser.add_argument('--background-concurrency', type=int, default=16,
+                        help='clients flooding the background endpoint of *_under_* scenarios')
+    parser.add_argument('--llm-first-token-ms', type=float, default=300, help='LLM stand-in delay to the first token')
+    parser.add_argument('--llm-token-ms', type=float, default=20, help='LLM stand-in gap between tokens')
+    parser.add_argument('--gateway-url', help='use a running gateway instead of starting one')
+    parser.add_argument('--api-url', help='use a running API instead of starting one')
+    parser.add_argument('--save', help='write the JSON report here')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (have: {', '.join(SCENARIOS)})")
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    with open(args.profile, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+    if profile.get('source') == 'synthetic':
+        print("⚠️ Using the synthetic stand-in profile; record one with bench/record_profile.py for real timings")
+
+    workdir = tempfile.mkdtemp(prefix='callwaiting-bench-')
+    needed = {SCENARIOS[name].server for name in names}
+    servers: Dict[str, Server] = {}
+    try:
+        if 'gateway' in needed:
+            servers['gateway'] = start_gateway(args, workdir)
+        if 'api' in needed:
+            if not args.api_url:
+                servers['llm'] = start_llm(args, workdir)
+            servers['api'] = start_api(args, workdir, servers['llm'].url + '/v1' if 'llm' in servers else None)
+        for server in servers.values():
+            await server.wait_ready()
+            print(f"🚀 {server.name} ready at {server.url}")
+
+        results: Dict[str, Dict[str, Any]] = {}
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            for name in names:
+                scenario = SCENARIOS[name]
+                if scenario.setup is not None:
+                    await scenario.setup(client, servers[scenario.server].url)
+        for name in names:
+            scenario = SCENARIOS[name]
+            results[name] = {}
+            for level in levels:
+                result = await run_level(scenario, servers[scenario.server], level, args.duration,
+                                         args.background_concurrency)
+                results[name][str(level)] = result
+                print(describe(name, result))
+        llm_standin = None
+        if 'llm' in servers:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                llm_standin = (await client.get(servers['llm'].url + '/stats')).json()
+            print(f"🔌 LLM stand-in: {llm_standin['requests']} requests over "
+                  f"{llm_standin['connections']} connections")
+    finally:
+        for server in servers.values():
+            server.stop()
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_revision': _git_revision(),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'profile': {'path': os.path.relpath(os.path.abspath(args.profile), ROOT),
+                        'source': profile.get('source')},
+            'speed': args.speed,
+            'duration_s': args.duration,
+            'gateway_workers': args.gateway_workers,
+            'api_workers': args.api_workers,
+            'background_concurrency': args.background_concurrency,
+            'llm_first_token_ms': args.llm_first_token_ms,
+            'llm_token_ms': args.llm_token_ms,
+            'llm_standin': llm_standin,
+            'external_servers': bool(args.gateway_url or args.api_url),
+            'server_logs': workdir,
+        },
+        'results': results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+            f.write('\n')
+        print(f"💾 Report saved to {args.save}")
+    print(f"📁 Server logs in {workdir}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('host') != report['meta']['host']:
+            print("⚠️ Baseline was recorded on a different host; expect noise")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+RECORD PROFILE - capture Edge TTS chunk timing for the edge-tts stand-in
+Synthesizes a few utterances against the real service and stores, for each,
+the time to first audio and every audio chunk's size and gap since the last
+one. bench/standin/edge_tts.py replays the result so load tests see the same
+upstream rhythm on every run without touching the network.
+
+    python bench/record_profile.py --out bench/profiles/edge-en-US.json
+    python bench/record_profile.py --voice en-NG-EzinneNeural --repeat 3 --out ...
+    python bench/record_profile.py --synthetic --out bench/profiles/synthetic.json
+
+--synthetic writes the placeholder profile checked into the repo (shaped like
+Edge, not measured); record a real one before trusting absolute numbers.
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+
+TEXTS = [
+    "Hello, thanks for calling. How can I help you today?",
+    "Your appointment is confirmed for Tuesday at ten thirty in the morning. "
+    "We will send you a reminder by text message the day before.",
+    "Thank you for calling CallWaiting. Our team is helping other customers right now, "
+    "but I can take a message or book you in for a call back. Please tell me your name, "
+    "the best number to reach you on, and a short note about what you need, and someone "
+    "will get back to you within the hour during business hours.",
+]
+
+
+async def record(text: str, voice: str):
+    import edge_tts
+    try:
+        communicate = edge_tts.Communicate(text, voice, boundary="WordBoundary")
+    except TypeError:
+        communicate = edge_tts.Communicate(text, voice)
+    started = time.perf_counter()
+    last = None
+    first_audio_ms = None
+    chunks = []
+    words = 0
+    async for chunk in communicate.stream():
+        now = time.perf_counter()
+        if chunk['type'] == 'WordBoundary':
+            words += 1
+            continue
+        if chunk['type'] != 'audio':
+            continue
+        if first_audio_ms is None:
+            first_audio_ms = (now - started) * 1000
+        chunks.append([round((now - last) * 1000, 2) if last is not None else 0.0, len(chunk['data'])])
+        last = now
+    return {'chars': len(text), 'words': words, 'first_audio_ms': round(first_audio_ms or 0.0, 1), 'chunks': chunks}
+
+
+def synthetic(text: str, rng: random.Random):
+    """Edge-shaped timing: ~400 ms to first audio, ~4 KB chunks at roughly 4x real time"""
+    total = int(len(text) / 15 * 1000 * 6)
+    chunks, sent = [], 0
+    while sent < total:
+        size = min(rng.choice([2880, 4032, 4320, 5760]), total - sent)
+        gap = 0.0 if not chunks else round(size / 6 / 4 * rng.uniform(0.3, 1.7), 2)
+        chunks.append([gap, size])
+        sent += size
+    return {'chars': len(text), 'words': len(text.split()),
+            'first_audio_ms': round(rng.uniform(320, 480), 1), 'chunks': chunks}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--voice', default='en-US-AriaNeural')
+    parser.add_argument('--texts', help='file with one utterance per line (default: built-in set)')
+    parser.add_argument('--repeat', type=int, default=1, help='record each text this many times')
+    parser.add_argument('--synthetic', action='store_true', help='write the placeholder profile instead')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    texts = TEXTS
+    if args.texts:
+        with open(args.texts, 'r', encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    utterances = []
+    if args.synthetic:
+        rng = random.Random(args.seed)
+        utterances = [synthetic(text, rng) for text in texts for _ in range(args.repeat)]
+        source = {'source': 'synthetic',
+                  'note': 'Placeholder shaped like Edge TTS, not measured; replace with a recorded profile'}
+    else:
+        for text in texts:
+            for _ in range(args.repeat):
+                utterance = await record(text, args.voice)
+                print(f"🎙️ {utterance['chars']:4d} chars: first audio {utterance['first_audio_ms']:.0f}ms, "
+                      f"{len(utterance['chunks'])} chunks, {sum(s for _, s in utterance['chunks'])} bytes")
+                utterances.append(utterance)
+        import edge_tts
+        source = {'source': 'recorded', 'edge_tts_version': getattr(edge_tts, '__version__', 'unknown'),
+                  'host': platform.node()}
+
+    profile = {**source, 'voice': args.voice, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+               'utterances': utterances}
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    # One [gap_ms, bytes] pair per line keeps recorded profiles diffable
+    text = re.sub(r'\[\s+([\d.]+),\s+(\d+)\s+\]', r'[\1, \2]', json.dumps(profile, indent=1))
+    with open(args.out, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+    print(f"💾 {len(utterances)} utterances -> {args.out}")
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,124 @@
+"""
+EDGE-TTS STAND-IN - replays recorded upstream timing, no network
+Put bench/standin first on PYTHONPATH and the gateway's `import edge_tts`
+resolves here. Communicate.stream() replays a profile written by
+bench/record_profile.py: time to first audio, then the recorded chunk sizes
+and the gaps between them, stretched to the length of the requested text.
+Audio is silent CBR MP3, so transcoding and re-framing do their real work.
+
+    FAKE_EDGE_TTS_PROFILE   profile JSON (default: profiles/synthetic.json)
+    FAKE_EDGE_TTS_SPEED     replay speed; 2 halves every delay, 0 skips them
+    FAKE_EDGE_TTS_FAIL_RATE fraction of sessions that fail before any audio
+"""
+
+import os
+import json
+import random
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+__version__ = '0.0.0-standin'
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROFILE = os.path.join(_HERE, '..', 'profiles', 'synthetic.json')
+
+# One 24 ms frame of 48 kbit/s 24 kHz mono MP3 silence, as Edge streams
+_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + bytes(140)
+_FRAME_MS = 24
+_BYTES_PER_MS = len(_FRAME) / _FRAME_MS
+_TICKS_PER_MS = 10_000
+
+_profile: Optional[Dict[str, Any]] = None
+
+
+def _load_profile() -> Dict[str, Any]:
+    global _profile
+    if _profile is None:
+        with open(os.getenv('FAKE_EDGE_TTS_PROFILE', DEFAULT_PROFILE), 'r', encoding='utf-8') as f:
+            _profile = json.load(f)
+        if not _profile.get('utterances'):
+            raise ValueError("Profile has no utterances")
+    return _profile
+
+
+def _nearest(utterances: List[Dict[str, Any]], chars: int) -> Dict[str, Any]:
+    return min(utterances, key=lambda u: abs(u['chars'] - chars) / max(u['chars'], 1))
+
+
+def _audio(start: int, size: int) -> bytes:
+    """`size` bytes of an endless run of silent frames, from byte `start` of the run"""
+    offset = start % len(_FRAME)
+    repeats = (offset + size) // len(_FRAME) + 1
+    return (_FRAME * repeats)[offset:offset + size]
+
+
+class Communicate:
+    """Same constructor and stream() items as edge_tts.Communicate"""
+
+    def __init__(self, text: str, voice: str = 'en-US-AriaNeural', *, rate: str = '+0%',
+                 volume: str = '+0%', pitch: str = '+0Hz', boundary: str = 'SentenceBoundary',
+                 **_kwargs):
+        if not isinstance(text, str) or not text:
+            raise ValueError("text must be a non-empty string")
+        self.text = text
+        self.voice = voice
+        self.rate = rate
+        self.volume = volume
+        self.pitch = pitch
+        self.boundary = boundary
+
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
+        profile = _load_profile()
+        speed = float(os.getenv('FAKE_EDGE_TTS_SPEED', '1'))
+        utterance = _nearest(profile['utterances'], len(self.text))
+
+        async def pause(ms: float):
+            await asyncio.sleep(ms / 1000 / speed if speed > 0 else 0)
+
+        await pause(utterance['first_audio_ms'])
+        if random.random() < float(os.getenv('FAKE_EDGE_TTS_FAIL_RATE', '0')):
+            raise ConnectionError("Stand-in upstream failure")
+
+        # Stretch the recording to this text: same chunk rhythm, proportional audio length
+        chunks = utterance['chunks']
+        recorded_bytes = sum(size for _, size in chunks)
+        total = max(len(_FRAME), int(recorded_bytes * len(self.text) / max(utterance['chars'], 1)))
+
+        words = self.text.split()
+        word_ms = total / _BYTES_PER_MS / max(len(words), 1)
+        next_word = 0
+        sent = 0
+        index = 0
+        while sent < total:
+            gap_ms, size = chunks[index % len(chunks)]
+            if index:
+                await pause(gap_ms)
+            size = min(size, total - sent)
+            # Word boundaries arrive just ahead of the audio they start in
+            chunk_end_ms = (sent + size) / _BYTES_PER_MS
+            while self.boundary == 'WordBoundary' and next_word < len(words) and next_word * word_ms < chunk_end_ms:
+                yield {
+                    'type': 'WordBoundary',
+                    'offset': int(next_word * word_ms * _TICKS_PER_MS),
+                    'duration': int(word_ms * 0.8 * _TICKS_PER_MS),
+                    'text': words[next_word],
+                }
+                next_word += 1
+            yield {'type': 'audio', 'data': _audio(sent, size)}
+            sent += size
+            index += 1
+
+    async def save(self, audio_fname: str, metadata_fname: Optional[str] = None):
+        with open(audio_fname, 'wb') as audio:
+            async for chunk in self.stream():
+                if chunk['type'] == 'audio':
+                    audio.write(chunk['data'])
+
+
+async def list_voices(**_kwargs) -> List[Dict[str, Any]]:
+    return _load_profile().get('voices') or [
+        {'Name': 'Microsoft Server Speech Text to Speech Voice (en-US, AriaNeural)',
+         'ShortName': 'en-US-AriaNeural', 'Gender': 'Female', 'Locale': 'en-US', 'FriendlyName': 'Aria'},
+        {'Name': 'Microsoft Server Speech Text to Speech Voice (en-NG, EzinneNeural)',
+         'ShortName': 'en-NG-EzinneNeural', 'Gender': 'Female', 'Locale': 'en-NG', 'FriendlyName': 'Ezinne'},
+    ]
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+LLM STAND-IN - OpenAI-compatible streaming chat completions, no network
+Serves POST /v1/chat/completions with stream=true as the API's chat proxy
+expects: a pause before the first token, then one SSE chunk per token with a
+fixed gap, then [DONE]. GET /stats counts requests and the distinct client
+connections they arrived on, which shows whether the caller keeps its
+connections alive.
+
+    python bench/standin/openai_llm.py --port 8088
+    LLM_API_URL=http://127.0.0.1:8088/v1 python apps/api/server.py
+
+    FAKE_LLM_FIRST_TOKEN_MS  delay before the first token (default 300)
+    FAKE_LLM_TOKEN_MS        gap between tokens (default 20)
+    FAKE_LLM_TOKENS          tokens per reply (default 40)
+    FAKE_LLM_FAIL_RATE       fraction of requests answered with HTTP 500
+    FAKE_LLM_BREAK_AFTER     cut the connection after this many tokens (default 0, never)
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+WORDS = ("CallWaiting.ai answers every missed call, takes a message and texts the caller back "
+         "within seconds so no customer is lost while you are busy").split()
+
+app = FastAPI()
+_connections = set()
+_counters = {'requests': 0, 'failed': 0, 'broken': 0, 'tokens': 0}
+
+
+def _setting(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _chunk(model: str, delta: dict, finish: str = None) -> bytes:
+    body = {'id': 'chatcmpl-standin', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+            'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]}
+    return f"data: {json.dumps(body)}\n\n".encode('utf-8')
+
+
+@app.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    _counters['requests'] += 1
+    client = request.scope.get('client')
+    if client:
+        _connections.add(tuple(client))
+    if random.random() < _setting('FAKE_LLM_FAIL_RATE', 0):
+        _counters['failed'] += 1
+        return JSONResponse({'error': {'message': 'stand-in failure'}}, status_code=500)
+
+    model = body.get('model', 'standin')
+    tokens = int(min(_setting('FAKE_LLM_TOKENS', 40), body.get('max_tokens') or 1 << 30))
+    first_delay = _setting('FAKE_LLM_FIRST_TOKEN_MS', 300) / 1000
+    gap = _setting('FAKE_LLM_TOKEN_MS', 20) / 1000
+    break_after = int(_setting('FAKE_LLM_BREAK_AFTER', 0))
+
+    async def stream():
+        yield _chunk(model, {'role': 'assistant', 'content': ''})
+        await asyncio.sleep(first_delay)
+        for i in range(tokens):
+            if i:
+                await asyncio.sleep(gap)
+            if break_after and i == break_after:
+                # Raising mid-body makes the server drop the connection without ending the response
+                _counters['broken'] += 1
+                raise ConnectionAbortedError("stand-in stream broken")
+            _counters['tokens'] += 1
+            yield _chunk(model, {'content': ('' if i == 0 else ' ') + WORDS[i % len(WORDS)]})
+        yield _chunk(model, {}, 'stop')
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type='text/event-stream')
+
+
+@app.get("/stats")
+async def stats():
+    return {**_counters, 'connections': len(_connections)}
+
+
+@app.get("/v1/models")
+async def models():
+    return {'object': 'list', 'data': [{'id': 'standin', 'object': 'model'}]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning', access_log=False)
+
+
+if __name__ == '__main__':
+    main()
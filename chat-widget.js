@@ -15,7 +15,7 @@ class CallWaitingChatWidget {
         
         // API configuration - will be set from backend
         this.apiBaseUrl = 'http://localhost:3002/api';
-        this.groqApiKey = null; // Will be fetched from backend securely
+        this.streamingEnabled = false; // LLM replies are proxied by the backend; no key in the browser
         this.ttsUrl = 'http://localhost:3001/v1/synthesize';
         
         // Nigerian network optimization
@@ -38,13 +38,13 @@ class CallWaitingChatWidget {
             const response = await fetch(`${this.apiBaseUrl}/chat/config`);
             if (response.ok) {
                 const config = await response.json();
-                this.groqApiKey = config.groqApiKey;
+                this.streamingEnabled = Boolean(config.features && config.features.streaming);
                 this.ttsUrl = config.ttsUrl || this.ttsUrl;
             }
         } catch (error) {
             console.warn('Could not fetch API configuration, using fallback mode');
             // Fallback to text-only mode if API config fails
-            this.groqApiKey = null;
+            this.streamingEnabled = false;
         }
     }
 
@@ -352,6 +352,7 @@ class CallWaitingChatWidget {
                 border-radius: 18px;
                 font-size: 14px;
                 line-height: 1.4;
+                white-space: pre-wrap;
             }
 
             .message.user .message-content {
@@ -787,6 +788,35 @@ class CallWaitingChatWidget {
         this.conversationHistory.push({ sender, content, timestamp: new Date() });
     }
 
+    createStreamingMessage() {
+        // Assistant message that fills in as tokens arrive; goes into the history once finished
+        let textNode = null;
+        return {
+            update: (text) => {
+                if (!textNode) {
+                    this.hideTypingIndicator();
+                    const message = this.createMessage('assistant', '');
+                    const content = message.querySelector('.message-content');
+                    textNode = document.createTextNode('');
+                    content.insertBefore(textNode, content.firstChild);
+                    document.getElementById('chat-messages').appendChild(message);
+                }
+                textNode.textContent = text;
+                this.scrollToBottom();
+            },
+            finish: (text) => {
+                if (!textNode) {
+                    this.hideTypingIndicator();
+                    this.addMessage('assistant', text);
+                    return;
+                }
+                textNode.textContent = text;
+                this.scrollToBottom();
+                this.conversationHistory.push({ sender: 'assistant', content: text, timestamp: new Date() });
+            }
+        };
+    }
+
     showTypingIndicator() {
         const messages = document.getElementById('chat-messages');
         const typingDiv = document.createElement('div');
@@ -840,17 +870,18 @@ class CallWaitingChatWidget {
         this.updateStatus('Thinking...');
 
         try {
+            const reply = this.createStreamingMessage();
+
             // Use Nigerian network optimization for API calls
             const getResponseWithRetry = async () => {
-                return await this.getAIResponse(message);
+                return await this.getAIResponse(message, reply.update);
             };
 
             const response = this.networkOptimizer 
                 ? await this.networkOptimizer.retryWithBackoff(getResponseWithRetry, 'chat-message')
                 : await getResponseWithRetry();
 
-            this.hideTypingIndicator();
-            this.addMessage('assistant', response);
+            reply.finish(response);
             
             // Speak the response
             if (this.audioEnabled) {
@@ -937,9 +968,9 @@ class CallWaitingChatWidget {
         this.updateStatus('Thinking...');
 
         try {
-            const response = await this.getAIResponse(transcript);
-            this.hideTypingIndicator();
-            this.addMessage('assistant', response);
+            const reply = this.createStreamingMessage();
+            const response = await this.getAIResponse(transcript, reply.update);
+            reply.finish(response);
             
             // Speak the response
             if (this.audioEnabled) {
@@ -955,7 +986,7 @@ class CallWaitingChatWidget {
         }
     }
 
-    async getAIResponse(message) {
+    async getAIResponse(message, onToken = null) {
         // Use backend API for AI responses
         try {
             const response = await fetch(`${this.apiBaseUrl}/chat/message`, {
@@ -965,7 +996,8 @@ class CallWaitingChatWidget {
                 },
                 body: JSON.stringify({
                     message: message,
-                    history: this.conversationHistory.slice(-5)
+                    history: this.conversationHistory.slice(-5),
+                    stream: this.streamingEnabled
                 })
             });
 
@@ -973,14 +1005,62 @@ class CallWaitingChatWidget {
                 throw new Error(`API request failed: ${response.status}`);
             }
 
+            if (this.streamingEnabled && response.body) {
+                return await this.readStreamedResponse(response, onToken);
+            }
+
             const data = await response.json();
-            return data.response;
+            return data.data ? data.data.response : data.response;
         } catch (error) {
             // Fallback to simple responses if API is not available
             return this.getFallbackResponse(message);
         }
     }
 
+    async readStreamedResponse(response, onToken = null) {
+        // Server-sent events: meta, token..., then done (or error); onToken sees the text so far
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let finished = false;
+        while (true) {
+            let chunk;
+            try {
+                chunk = await reader.read();
+            } catch (error) {
+                // Dropped mid-answer: keep what arrived rather than swap it for a canned reply
+                if (!text) throw error;
+                break;
+            }
+            const { value, done } = chunk;
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const event of events) {
+                const name = (event.match(/^event: (.*)$/m) || [])[1];
+                const data = (event.match(/^data: (.*)$/m) || [])[1];
+                if (name === 'token' && data) {
+                    text += JSON.parse(data).text;
+                    if (onToken) onToken(text);
+                } else if (name === 'done') {
+                    finished = true;
+                } else if (name === 'error') {
+                    if (!text) throw new Error('Chat stream failed');
+                    // Part of the answer is already on screen: say it was cut off
+                    const notice = (data && JSON.parse(data).message) || 'The assistant was interrupted, please try again';
+                    return `${text}\n\n⚠️ ${notice}`;
+                }
+            }
+        }
+        if (!finished) {
+            if (!text) throw new Error('Chat stream ended early');
+            return `${text}\n\n⚠️ The connection dropped before the answer finished`;
+        }
+        return text;
+    }
+
     getFallbackResponse(message) {
         const lowerMessage = message.toLowerCase();
         
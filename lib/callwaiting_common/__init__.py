@@ -0,0 +1,3 @@
+"""
+CALLWAITING COMMON - Python modules shared by apps/api and apps/tts-gateway
+"""
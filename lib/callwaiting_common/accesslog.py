@@ -0,0 +1,265 @@
+"""
+ACCESS LOG - structured JSON access records, written in batches off the request path
+The middleware stamps every request with an ID and, when the response is
+done, appends one small dict to a bounded in-memory queue; nothing is
+formatted or written on the request path. A background task turns the queue
+into JSON lines and writes each batch in one call on a worker thread. A
+full queue drops records and counts them; busy routes (health checks,
+metrics scrapes) can be sampled, but errors are always kept.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+class RequestIds:
+    """Time-ordered, collision-free IDs: req_<ms><node><pid><seq>, all hex
+
+    Milliseconds never go backwards within a process (a clock step back
+    reuses the last value), the sequence orders IDs within one millisecond,
+    and node + pid keep processes and hosts apart. IDs sort by time across
+    processes to the millisecond and are strictly increasing within one.
+    """
+
+    def __init__(self):
+        # Random per master process, so hosts (and containers that all run as pid 1) differ;
+        # forked workers keep it and differ by pid
+        self._node = random.getrandbits(24)
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid() & 0xffffff
+        self._last_ms = 0
+        self._seq = 0
+
+    def next(self, prefix: str = 'req') -> str:
+        with self._lock:
+            now_ms = int(time.time() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms, self._seq = now_ms, 0
+            else:
+                self._seq += 1
+                if self._seq > 0xffff:
+                    # 65536 IDs in one millisecond: borrow the next one
+                    self._last_ms, self._seq = self._last_ms + 1, 0
+            return f"{prefix}_{self._last_ms:011x}{self._node:06x}{self._pid:06x}{self._seq:04x}"
+
+
+# One generator per process; shared by the access log and anything else that mints IDs
+request_ids = RequestIds()
+
+
+def _parse_sampling(spec: str) -> Dict[str, float]:
+    """'/api/health=0.01,/metrics=0' -> {path: fraction kept}"""
+    rates = {}
+    for item in spec.split(','):
+        if '=' in item:
+            path, rate = item.split('=', 1)
+            rates[path.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class AccessLog:
+    """Bounded queue of access records drained in batches by one background task"""
+
+    def __init__(self, stream: Optional[TextIO] = None, max_queue: int = 10000, batch_size: int = 256,
+                 flush_seconds: float = 0.5, sampling: Optional[Dict[str, float]] = None,
+                 fields: Optional[Dict[str, Any]] = None):
+        # stream None disables logging; IDs are still issued
+        self.stream = stream
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.sampling = sampling or {}
+        # Constant fields added to every record (service name, worker index)
+        self.fields = fields or {}
+        self._queue = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.counters = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'sampled_out': 0,
+            'batches': 0,
+            'write_errors': 0,
+        }
+        self._record_ns = 0
+        self._write_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, prefix: str, **fields) -> "AccessLog":
+        """<prefix> is stdout, stderr, off or a file path; <prefix>_SAMPLE, _QUEUE, _BATCH, _FLUSH_MS tune it"""
+        target = os.getenv(prefix, "stdout").strip()
+        if target.lower() in ("off", "false", "0", "none", ""):
+            stream = None
+        elif target == "stdout":
+            stream = sys.stdout
+        elif target == "stderr":
+            stream = sys.stderr
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            # O_APPEND with a buffer larger than any batch: each flush is one write() of whole
+            # lines, so pre-forked workers sharing the file never interleave mid-line
+            stream = open(target, 'a', encoding='utf-8', buffering=1 << 20)
+        return cls(
+            stream=stream,
+            max_queue=int(os.getenv(f"{prefix}_QUEUE", "10000")),
+            batch_size=int(os.getenv(f"{prefix}_BATCH", "256")),
+            flush_seconds=int(os.getenv(f"{prefix}_FLUSH_MS", "500")) / 1000,
+            sampling=_parse_sampling(os.getenv(f"{prefix}_SAMPLE", "")),
+            fields=fields,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.stream is not None
+
+    def record(self, request_id: str, method: str, path: str, status: int, duration: float, **extra):
+        """Queue one request; never blocks or formats. duration is in seconds"""
+        if self.stream is None:
+            return
+        started = time.perf_counter_ns()
+        rate = self.sampling.get(path)
+        if rate is not None and status < 400 and (rate <= 0 or random.random() >= rate):
+            self.counters['sampled_out'] += 1
+        elif len(self._queue) >= self.max_queue:
+            self.counters['dropped'] += 1
+        else:
+            self._queue.append((time.time(), request_id, method, path, status, duration, extra))
+            self.counters['enqueued'] += 1
+            if self._wakeup is not None and len(self._queue) >= self.batch_size:
+                self._wakeup.set()
+        self._record_ns += time.perf_counter_ns() - started
+
+    def _format(self, batch) -> str:
+        lines = []
+        for ts, request_id, method, path, status, duration, extra in batch:
+            entry = {
+                'ts': round(ts, 3),
+                'request_id': request_id,
+                'method': method,
+                'path': path,
+                'status': status,
+                'duration_ms': round(duration * 1000, 2),
+                **self.fields,
+                **extra,
+            }
+            lines.append(json.dumps(entry, separators=(',', ':'), default=str))
+        lines.append('')
+        return '\n'.join(lines)
+
+    def _write(self, batch):
+        # Formatting happens here too, on the executor thread, not the event loop
+        self.stream.write(self._format(batch))
+        self.stream.flush()
+
+    async def flush(self):
+        """Format and write everything queued, a batch at a time"""
+        loop = asyncio.get_running_loop()
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            started = time.perf_counter()
+            try:
+                await loop.run_in_executor(None, self._write, batch)
+                self.counters['written'] += len(batch)
+            except Exception as e:
+                self.counters['write_errors'] += 1
+                logger.warning(f"⚠️ Access log batch of {len(batch)} lost: {e}")
+            self.counters['batches'] += 1
+            self._write_seconds += time.perf_counter() - started
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._closing:
+            # A timer on the same event rather than wait_for: stop() never has to cancel
+            # the writer mid-batch, so nothing popped from the queue is lost
+            timer = loop.call_later(self.flush_seconds, self._wakeup.set)
+            try:
+                await self._wakeup.wait()
+            finally:
+                timer.cancel()
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the writer on the running loop; call from each worker's startup"""
+        if self.stream is None or self._task is not None:
+            return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write what is queued and stop the writer"""
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self.stream is not None:
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        handled = self.counters['enqueued'] + self.counters['dropped'] + self.counters['sampled_out']
+        return {
+            **self.counters,
+            'enabled': self.enabled,
+            'queued': len(self._queue),
+            'max_queue': self.max_queue,
+            'record_us_avg': round(self._record_ns / handled / 1000, 3) if handled else None,
+            'write_ms_per_batch': (round(self._write_seconds / self.counters['batches'] * 1000, 3)
+                                   if self.counters['batches'] else None),
+        }
+
+
+class AccessLogMiddleware:
+    """ASGI middleware: request ID in request.state and X-Request-ID, one access record per response
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streamed bodies and client
+    disconnects reach the app unchanged. duration_ms runs to the last body
+    chunk; X-Process-Time is the time to the response headers.
+    """
+
+    def __init__(self, app, log: AccessLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        request_id = request_ids.next()
+        scope.setdefault('state', {})['request_id'] = request_id
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'x-request-id', request_id.encode('ascii')))
+                headers.append((b'x-process-time', f"{time.perf_counter() - started:.6f}".encode('ascii')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            client = scope.get('client')
+            self.log.record(request_id, scope['method'], scope['path'], status, time.perf_counter() - started,
+                            client=client[0] if client else None)
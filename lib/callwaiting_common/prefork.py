@@ -0,0 +1,106 @@
+"""
+PRE-FORK WORKERS - several uvicorn processes behind one listening socket
+The master binds the port and builds any shared-memory state, then forks;
+each worker builds its own app and serves the inherited socket, and the
+kernel spreads connections across them. Dead workers are replaced; SIGTERM
+and SIGINT are passed on for a graceful shutdown. A replacement inherits the
+shared memory as it was, including any lock the dead worker was holding
+(see callwaiting_common.shm).
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# make_server(worker_index) -> uvicorn.Server, called in the worker after fork
+ServerFactory = Callable[[int], "uvicorn.Server"]
+
+# Respawning faster than this means the worker cannot start; stop instead of spinning
+MIN_WORKER_LIFETIME_SECONDS = 5
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _spawn(make_server: ServerFactory, index: int, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Worker: default signal handling, uvicorn installs its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    status = 0
+    try:
+        make_server(index).run(sockets=[sock])
+    except BaseException as e:
+        logger.error(f"❌ Worker {index} crashed: {e}")
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+def run_workers(make_server: ServerFactory, host: str, port: int, workers: int):
+    """Serve with `workers` forked processes until SIGTERM/SIGINT"""
+    sock = bind_socket(host, port)
+    children: Dict[int, int] = {}
+    started: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(workers):
+        pid = _spawn(make_server, index, sock)
+        children[pid] = index
+        started[index] = time.monotonic()
+    logger.info(f"👥 Master {os.getpid()} serving {host}:{port} with {workers} workers")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+
+        lifetime = time.monotonic() - started[index]
+        logger.warning(f"⚠️ Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)} "
+                       f"after {lifetime:.1f}s")
+        if lifetime < MIN_WORKER_LIFETIME_SECONDS:
+            logger.error(f"❌ Worker {index} keeps failing at startup; shutting down")
+            stop(signal.SIGTERM, None)
+            continue
+        pid = _spawn(make_server, index, sock)
+        children[pid] = index
+        started[index] = time.monotonic()
+
+    sock.close()
+    logger.info("👋 All workers stopped")
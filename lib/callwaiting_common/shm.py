@@ -0,0 +1,339 @@
+"""
+SHARED MEMORY - state that every pre-forked worker sees
+Anonymous MAP_SHARED mappings created in the master before fork(), so workers
+inherit them without files, sockets or a broker:
+
+  SharedCounters  one row of int64 counters per worker; single writer per row,
+                  totals summed on read, so increments never take a lock
+  SharedSegment   byte cache as a ring log plus a hash index; writers serialize,
+                  readers copy without locking and detect being lapped
+  SharedTable     fixed-size JSON slots with optional expiry (sessions, users);
+                  per-slot sequence numbers make reads lock-free
+
+Locks are fork-context multiprocessing locks held only for a memcpy. Nothing
+releases a lock whose holder died: a worker killed (SIGKILL, OOM killer) while
+holding one deadlocks every later writer of that structure, in all workers and
+in the replacements the master forks, until the whole server is restarted.
+Readers never block on it; SharedTable readers give up after LOCK_TIMEOUT.
+"""
+
+import json
+import mmap
+import time
+import struct
+import hashlib
+import multiprocessing
+from typing import Any, Dict, Iterable, List, Optional
+
+_FORK = multiprocessing.get_context('fork')
+
+
+def _hash(key: bytes) -> int:
+    # Stable across processes, unlike hash() on str
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+class SharedCounters:
+    """Named int64 counters, one row per worker"""
+
+    def __init__(self, names: Iterable[str], workers: int):
+        self.names = list(names)
+        self.workers = max(1, workers)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._values = _FORK.RawArray('q', len(self.names) * self.workers)
+        self._row = 0
+
+    def bind(self, worker: int):
+        """Called in each worker after fork; its increments go to its own row"""
+        self._row = worker * len(self.names)
+
+    def add(self, name: str, amount: int = 1):
+        self._values[self._row + self._index[name]] += amount
+
+    def set(self, name: str, value: int):
+        """Per-worker level (e.g. streams in flight); total() sums the workers"""
+        self._values[self._row + self._index[name]] = value
+
+    def total(self, name: str) -> int:
+        column, width = self._index[name], len(self.names)
+        return sum(self._values[row * width + column] for row in range(self.workers))
+
+    def totals(self) -> Dict[str, int]:
+        return {name: self.total(name) for name in self.names}
+
+    def per_worker(self, name: str) -> List[int]:
+        column, width = self._index[name], len(self.names)
+        return [self._values[row * width + column] for row in range(self.workers)]
+
+
+class SharedSegment:
+    """Bounded shared byte cache: values appended to a ring, oldest overwritten first"""
+
+    # write position (monotonic), laps
+    _HEADER = struct.Struct('<QQ')
+    # key digest, record position, record length
+    _SLOT = struct.Struct('<32sQI4x')
+    # key digest, payload length
+    _RECORD = struct.Struct('<32sI4x')
+    PROBE = 8
+
+    def __init__(self, capacity_bytes: int, index_slots: int = 65536):
+        self.index_slots = index_slots
+        self.capacity = capacity_bytes
+        self._index_at = self._HEADER.size
+        self._data_at = self._index_at + index_slots * self._SLOT.size
+        self._map = mmap.mmap(-1, self._data_at + capacity_bytes)
+        self._lock = _FORK.Lock()
+        self.max_value = capacity_bytes // 4
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=32).digest()
+
+    def _write_pos(self) -> int:
+        return self._HEADER.unpack_from(self._map, 0)[0]
+
+    def _slots(self, digest: bytes) -> List[int]:
+        start = int.from_bytes(digest[:8], 'little') % self.index_slots
+        return [(start + i) % self.index_slots for i in range(self.PROBE)]
+
+    def get(self, key: str) -> Optional[bytes]:
+        digest = self._digest(key)
+        for slot in self._slots(digest):
+            slot_key, pos, length = self._SLOT.unpack_from(self._map, self._index_at + slot * self._SLOT.size)
+            if slot_key != digest or not length:
+                continue
+            if pos + self.capacity < self._write_pos():
+                return None
+            offset = self._data_at + pos % self.capacity
+            record_key, size = self._RECORD.unpack_from(self._map, offset)
+            if record_key != digest or size + self._RECORD.size != length:
+                return None
+            start = offset + self._RECORD.size
+            value = self._map[start:start + size]
+            # A writer that lapped us mid-copy moved the write position past our record
+            if pos + self.capacity < self._write_pos():
+                return None
+            return value
+        return None
+
+    def put(self, key: str, value: bytes) -> bool:
+        length = self._RECORD.size + len(value)
+        if len(value) > self.max_value:
+            return False
+        digest = self._digest(key)
+        with self._lock:
+            write_pos, laps = self._HEADER.unpack_from(self._map, 0)
+            offset = write_pos % self.capacity
+            if offset + length > self.capacity:
+                # Records never wrap; skip the tail
+                write_pos += self.capacity - offset
+                offset = 0
+                laps += 1
+            pos = write_pos
+            # Publish the new end first so readers of the region being overwritten notice
+            self._HEADER.pack_into(self._map, 0, pos + length, laps)
+            start = self._data_at + offset
+            self._RECORD.pack_into(self._map, start, digest, len(value))
+            self._map[start + self._RECORD.size:start + length] = value
+            self._SLOT.pack_into(self._map, self._index_at + self._pick_slot(digest, pos + length) * self._SLOT.size,
+                                 digest, pos, length)
+        return True
+
+    def _pick_slot(self, digest: bytes, write_pos: int) -> int:
+        """Same key, else an empty or overwritten slot, else the oldest entry in the probe window"""
+        oldest, oldest_pos = None, None
+        for slot in self._slots(digest):
+            slot_key, pos, length = self._SLOT.unpack_from(self._map, self._index_at + slot * self._SLOT.size)
+            if slot_key == digest or not length or pos + self.capacity < write_pos:
+                return slot
+            if oldest_pos is None or pos < oldest_pos:
+                oldest, oldest_pos = slot, pos
+        return oldest
+
+    def __contains__(self, key: str) -> bool:
+        digest = self._digest(key)
+        write_pos = self._write_pos()
+        for slot in self._slots(digest):
+            slot_key, pos, length = self._SLOT.unpack_from(self._map, self._index_at + slot * self._SLOT.size)
+            if slot_key == digest and length:
+                return pos + self.capacity >= write_pos
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        write_pos, laps = self._HEADER.unpack_from(self._map, 0)
+        entries = 0
+        for slot in range(self.index_slots):
+            _, pos, length = self._SLOT.unpack_from(self._map, self._index_at + slot * self._SLOT.size)
+            if length and pos + self.capacity >= write_pos:
+                entries += 1
+        return {
+            'entries': entries,
+            'bytes': min(write_pos, self.capacity),
+            'max_bytes': self.capacity,
+            'bytes_written': write_pos,
+            'laps': laps,
+        }
+
+
+class TableFull(Exception):
+    """No free slot within the probe limit"""
+
+
+class SharedTable:
+    """Dict-like table of JSON values in fixed-size shared slots
+
+    Values whose `expiry_field` (a unix timestamp) has passed read as missing and
+    their slots are reused; entries without it live until deleted.
+    """
+
+    # sequence (odd while being written), expires_at, key length, value length
+    _SLOT = struct.Struct('<QdHI2x')
+    _EMPTY = 0
+    _DELETED = 0xFFFF
+    PROBE = 64
+    # Optimistic reads of a slot before falling back to the lock
+    READ_SPINS = 64
+    # Writers hold the lock for a memcpy; a wait this long means the holder died
+    LOCK_TIMEOUT = 1.0
+
+    def __init__(self, slots: int = 4096, slot_bytes: int = 1024, expiry_field: Optional[str] = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.expiry_field = expiry_field
+        self.max_payload = slot_bytes - self._SLOT.size
+        self._map = mmap.mmap(-1, slots * slot_bytes)
+        self._lock = _FORK.Lock()
+
+    def _probe(self, key: bytes) -> Iterable[int]:
+        start = _hash(key) % self.slots
+        return ((start + i) % self.slots for i in range(min(self.PROBE, self.slots)))
+
+    def _read(self, slot: int, locked: bool = False):
+        """(key length, (expires_at, key, value) or None) of a slot
+
+        Lock-free readers retry while a write is in progress, then read under the
+        writers' lock; callers already holding it pass locked=True. If the lock
+        can't be had within LOCK_TIMEOUT (its holder died mid-write) the slot
+        reads as deleted, so lookups miss instead of spinning forever.
+        """
+        base = slot * self.slot_bytes
+        if not locked:
+            for attempt in range(self.READ_SPINS):
+                result = self._read_once(base)
+                if result is not None:
+                    return result
+                if attempt >= 8:
+                    # Let a writer on this CPU finish its memcpy
+                    time.sleep(0)
+            if not self._lock.acquire(timeout=self.LOCK_TIMEOUT):
+                return self._DELETED, None
+            try:
+                return self._read_once(base) or (self._DELETED, None)
+            finally:
+                self._lock.release()
+        return self._read_once(base) or (self._DELETED, None)
+
+    def _read_once(self, base: int):
+        """One optimistic read; None if a writer was active before or during it"""
+        seq, expires_at, key_len, value_len = self._SLOT.unpack_from(self._map, base)
+        if seq & 1:
+            return None
+        if key_len in (self._EMPTY, self._DELETED):
+            data = None
+        else:
+            start = base + self._SLOT.size
+            data = (expires_at, self._map[start:start + key_len],
+                    self._map[start + key_len:start + key_len + value_len])
+        if self._SLOT.unpack_from(self._map, base)[0] != seq:
+            return None
+        return key_len, data
+
+    def _find(self, key: bytes, now: float):
+        for slot in self._probe(key):
+            key_len, data = self._read(slot)
+            if key_len == self._EMPTY:
+                return None
+            if data is not None and data[1] == key:
+                expires_at, _, value = data
+                return None if expires_at and expires_at <= now else value
+        return None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._find(key.encode('utf-8'), time.time())
+        return default if value is None else json.loads(value)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: str, value: Any):
+        expires_at = float(value.get(self.expiry_field, 0)) if self.expiry_field and isinstance(value, dict) else 0.0
+        self.put(key, value, expires_at)
+
+    def put(self, key: str, value: Any, expires_at: float = 0.0):
+        raw_key = key.encode('utf-8')
+        raw_value = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        if len(raw_key) + len(raw_value) > self.max_payload:
+            raise ValueError(f"Entry of {len(raw_key) + len(raw_value)} bytes exceeds the {self.max_payload}-byte slot")
+
+        now = time.time()
+        with self._lock:
+            target = None
+            for slot in self._probe(raw_key):
+                key_len, data = self._read(slot, locked=True)
+                if data is not None and data[1] == raw_key:
+                    target = slot
+                    break
+                reusable = data is None or (data[0] and data[0] <= now)
+                if reusable and target is None:
+                    target = slot
+                if key_len == self._EMPTY:
+                    break
+            if target is None:
+                raise TableFull(f"No free slot for {key!r} within {self.PROBE} probes")
+            self._write(target, raw_key, raw_value, expires_at)
+
+    def _write(self, slot: int, key: bytes, value: bytes, expires_at: float):
+        base = slot * self.slot_bytes
+        # Round an odd sequence (a write that never finished) down so the parity stays right
+        seq = self._SLOT.unpack_from(self._map, base)[0] & ~1
+        struct.pack_into('<Q', self._map, base, seq + 1)
+        start = base + self._SLOT.size
+        self._map[start:start + len(key) + len(value)] = key + value
+        self._SLOT.pack_into(self._map, base, seq + 2, expires_at,
+                             len(key) if key else self._DELETED, len(value))
+
+    def __delitem__(self, key: str):
+        if not self.pop(key):
+            raise KeyError(key)
+
+    def pop(self, key: str) -> bool:
+        raw_key = key.encode('utf-8')
+        with self._lock:
+            for slot in self._probe(raw_key):
+                key_len, data = self._read(slot, locked=True)
+                if key_len == self._EMPTY:
+                    return False
+                if data is not None and data[1] == raw_key:
+                    # Tombstone, not empty: later keys in this probe chain stay reachable
+                    self._write(slot, b'', b'', 0.0)
+                    return True
+        return False
+
+    def __len__(self) -> int:
+        now = time.time()
+        live = 0
+        for slot in range(self.slots):
+            _, data = self._read(slot)
+            if data is not None and not (data[0] and data[0] <= now):
+                live += 1
+        return live
+
+    def stats(self) -> Dict[str, Any]:
+        return {'entries': len(self), 'slots': self.slots, 'slot_bytes': self.slot_bytes}